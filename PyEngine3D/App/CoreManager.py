@@ -12,7 +12,7 @@ import numpy as np
 
 from .GameBackend import GameBackNames, Keyboard, Event, InputMode
 from PyEngine3D.Common import logger, log_level, COMMAND, VIDEO_RESIZE_TIME
-from PyEngine3D.Utilities import Singleton, GetClassName, Config, Profiler
+from PyEngine3D.Utilities import Singleton, GetClassName, Config, Profiler, FramePacer
 
 
 class CoreManager(Singleton):
@@ -28,6 +28,8 @@ class CoreManager(Singleton):
         self.cmdQueue = None
         self.uiCmdQueue = None
         self.cmdPipe = None
+        # messages to the editor, they are sent at once by flush_messages.
+        self.pending_messages = []
 
         self.need_to_gc_collect = False
 
@@ -37,6 +39,8 @@ class CoreManager(Singleton):
         self.fps = 0.0
         self.vsync = False
         self.limit_delta = 1.0 / 60.0  # 60fps
+        # sleeps until the frame deadline when vsync is on, steps the script by the fixed delta when it is not 0.
+        self.frame_pacer = FramePacer(self.limit_delta)
         self.delta = 0.0
         self.update_time = 0.0
         self.logic_time = 0.0
@@ -53,6 +57,9 @@ class CoreManager(Singleton):
         self.curr_max_delta = sys.float_info.min
         self.avg_fps = 0.0
         self.avg_ms = 0.0
+        self.p50_ms = 0.0
+        self.p95_ms = 0.0
+        self.p99_ms = 0.0
         self.frame_count = 0
         self.acc_time = 0.0
 
@@ -68,6 +75,7 @@ class CoreManager(Singleton):
 
         # managers
         self.opengl_context = None
+        self.async_readback_manager = None
         self.script_manager = None
         self.game_backend = None
         self.resource_manager = None
@@ -110,7 +118,7 @@ class CoreManager(Singleton):
             self.cmdPipe.SendAndRecv(COMMAND.UI_RUN, None, COMMAND.UI_RUN_OK, None)
 
         from PyEngine3D.UI import ViewportManager
-        from PyEngine3D.OpenGLContext import OpenGLContext
+        from PyEngine3D.OpenGLContext import OpenGLContext, AsyncReadbackManager, set_frame_texture_units
         from PyEngine3D.ResourceManager import ResourceManager
         from PyEngine3D.Render import Renderer, Renderer_Basic, RenderTargetManager, FontManager, RenderOptionManager, EffectManager, DebugLineManager, RenderOption
         from .SceneManager import SceneManager
@@ -118,6 +126,7 @@ class CoreManager(Singleton):
         from .ProjectManager import ProjectManager
 
         self.opengl_context = OpenGLContext
+        self.async_readback_manager = AsyncReadbackManager.instance()
         self.viewport_manager = ViewportManager.instance()
         self.render_option_manager = RenderOptionManager.instance()
         self.rendertarget_manager = RenderTargetManager.instance()
@@ -182,6 +191,10 @@ class CoreManager(Singleton):
 
         self.game_backend.create_window(width, height, full_screen)
         self.opengl_context.initialize()
+        set_frame_texture_units(self.opengl_context.GL_MAX_COMBINED_TEXTURE_IMAGE_UNITS)
+
+        # measure the timer granularity of the os
+        self.frame_pacer.initialize(self.limit_delta)
 
         if not self.opengl_context.check_gl_version():
             self.is_basic_mode = True
@@ -249,6 +262,7 @@ class CoreManager(Singleton):
     def exit(self):
         # send a message to close ui
         if self.uiCmdQueue:
+            self.flush_messages()
             self.uiCmdQueue.put(COMMAND.CLOSE_UI)
 
         # write config
@@ -260,6 +274,9 @@ class CoreManager(Singleton):
         # save project
         self.sound_manager.clear()
         self.project_manager.close_project()
+        self.async_readback_manager.clear()
+        if self.uiCmdQueue:
+            self.uiCmdQueue.close_shared_memory()
         self.renderer.close()
         self.resource_manager.close()
         self.sound_manager.close()
@@ -279,12 +296,23 @@ class CoreManager(Singleton):
         logger.info("The game backend was chaned to %s. It will be applied at the next run." % self.last_game_backend)
 
     # Send messages
-    def send(self, *args):
-        """
-        :param args: command, value1, value2,...
-        """
+    def send(self, cmd, value=None):
         if self.uiCmdQueue:
-            self.uiCmdQueue.put(*args)
+            self.pending_messages.append((cmd, value))
+
+    def flush_messages(self):
+        # one message a frame, the stale messages are dropped.
+        if self.uiCmdQueue and self.pending_messages:
+            self.uiCmdQueue.put_batch(self.pending_messages)
+            self.pending_messages = []
+
+    def request_texture_preview(self, texture):
+        # the texture is read back without the stall and the pixels are sent through the shared memory.
+        if self.uiCmdQueue and self.async_readback_manager.is_readable(texture):
+            self.async_readback_manager.request_texture(texture, partial(self.send_texture_preview, texture.name))
+
+    def send_texture_preview(self, texture_name, data):
+        self.send(COMMAND.TRANS_TEXTURE_PREVIEW, (texture_name, data))
 
     def request(self, *args):
         """
@@ -497,6 +525,7 @@ class CoreManager(Singleton):
             self.renderer.framebuffer_manager.clear_framebuffer()
             self.renderer.rendertarget_manager.create_rendertargets()
             self.scene_manager.reset_light_probe()
+            self.scene_manager.reset_static_shadow()
         self.commands[COMMAND.RECREATE_RENDER_TARGETS.value] = cmd_recreate_render_targets
 
         def cmd_view_rendertarget(value):
@@ -506,6 +535,7 @@ class CoreManager(Singleton):
             if self.renderer.debug_texture is not None:
                 attribute = self.renderer.debug_texture.get_attribute()
                 self.send(COMMAND.TRANS_OBJECT_ATTRIBUTE, attribute)
+                self.request_texture_preview(self.renderer.debug_texture)
         self.commands[COMMAND.VIEW_RENDERTARGET.value] = cmd_view_rendertarget
 
         def cmd_view_texture(value):
@@ -514,6 +544,7 @@ class CoreManager(Singleton):
             if texture is not None:
                 attribute = texture.get_attribute()
                 self.send(COMMAND.TRANS_OBJECT_ATTRIBUTE, attribute)
+                self.request_texture_preview(texture)
         self.commands[COMMAND.VIEW_TEXTURE.value] = cmd_view_texture
 
         def cmd_view_material_instance(value):
@@ -630,6 +661,15 @@ class CoreManager(Singleton):
                     self.scene_manager.reset_light_probe()
                 elif Keyboard._3 == event_value:
                     self.gc_collect()
+                elif Keyboard._4 == event_value:
+                    # light cluster benchmark : each press adds 100 point lights.
+                    for i in range(100):
+                        pos = [np.random.uniform(-50, 50), np.random.uniform(0, 10), np.random.uniform(-50, 50)]
+                        light_color = [np.random.uniform(0.0, 1.0) for x in range(3)]
+                        light_radius = np.random.uniform(2.0, 10.0)
+                        self.scene_manager.add_light(pos=pos, light_color=light_color, light_radius=light_radius)
+                elif Keyboard._5 == event_value:
+                    self.renderer.postprocess.benchmark_generate_min_z()
                 elif Keyboard.DELETE == event_value:
                     # Test Code
                     obj_names = set(self.scene_manager.get_object_names())
@@ -705,12 +745,19 @@ class CoreManager(Singleton):
             camera_transform.reset_transform()
 
     def update(self):
-        current_time = time.perf_counter()
+        if self.vsync:
+            # sleep instead of the busy loop of the backend
+            if self.frame_pacer.limit_delta != self.limit_delta:
+                self.frame_pacer.set_limit_delta(self.limit_delta)
+            current_time = self.frame_pacer.wait_for_next_frame()
+        else:
+            current_time = time.perf_counter()
         delta = current_time - self.current_time
 
-        if self.vsync and delta < self.limit_delta or delta == 0.0:
+        if delta == 0.0:
             return
 
+        self.frame_pacer.add_frame_delta(delta)
         self.acc_time += delta
         self.frame_count += 1
         self.curr_min_delta = min(delta, self.curr_min_delta)
@@ -736,11 +783,22 @@ class CoreManager(Singleton):
 
         self.resource_manager.update()
 
+        # finished gpu readbacks
+        self.async_readback_manager.update()
+
+        # upload the glyphs rasterized by the glyph caches
+        self.font_manager.update()
+
         if not touch_event and self.viewport_manager.main_viewport.collide(*self.get_mouse_pos()):
             if InputMode.GAME_PLAY == self.game_backend.get_input_mode():
                 if self.script_manager is not None:
                     try:
-                        self.script_manager.update(delta)
+                        # fixed time step simulation, the rendering interpolates by frame_pacer.interpolation_alpha
+                        if 0.0 < self.frame_pacer.fixed_delta:
+                            for i in range(self.frame_pacer.get_fixed_step_count(delta)):
+                                self.script_manager.update(self.frame_pacer.fixed_delta)
+                        else:
+                            self.script_manager.update(delta)
                     except:
                         logger.error(traceback.format_exc())
             else:
@@ -758,8 +816,8 @@ class CoreManager(Singleton):
         start_time = end_time
 
         if not self.video_resized:
-            # render_light_probe scene
-            self.renderer.render_light_probe(self.scene_manager.main_light_probe)
+            # bake a part of the dirty light probes
+            self.renderer.update_light_probes()
 
             # render sceme
             self.renderer.render_scene()
@@ -768,6 +826,10 @@ class CoreManager(Singleton):
             if not self.is_basic_mode:
                 self.viewport_manager.render()
 
+            # free the pooled render targets which are not used anymore
+            if not self.is_basic_mode:
+                self.rendertarget_manager.update_rendertarget_pool()
+
             end_time = time.perf_counter()
             self.render_time = (end_time - start_time) * 1000.0  # millisecond
             start_time = end_time
@@ -803,6 +865,7 @@ class CoreManager(Singleton):
             self.curr_max_delta = sys.float_info.min
             self.avg_ms = self.acc_time / self.frame_count * 1000.0
             self.avg_fps = 1000.0 / self.avg_ms
+            self.p50_ms, self.p95_ms, self.p99_ms = self.frame_pacer.get_frame_time_percentiles()
             self.frame_count = 0
             self.acc_time = 0.0
 
@@ -810,6 +873,7 @@ class CoreManager(Singleton):
         if not self.is_basic_mode and self.render_option.RENDER_FONT:
             self.font_manager.log("%.2f fps" % self.avg_fps)
             self.font_manager.log("%.2f ms (%.2f ms ~ %.2f ms)" % (self.avg_ms, self.min_delta, self.max_delta))
+            self.font_manager.log("p50 %.2f ms, p95 %.2f ms, p99 %.2f ms" % (self.p50_ms, self.p95_ms, self.p99_ms))
             self.font_manager.log("CPU : %.2f ms" % self.avg_logic_time)
             self.font_manager.log("GPU : %.2f ms" % self.avg_gpu_time)
             self.font_manager.log("Render : %.2f ms" % self.avg_render_time)
@@ -820,7 +884,11 @@ class CoreManager(Singleton):
             render_count += len(self.scene_manager.static_solid_render_infos)
             render_count += len(self.scene_manager.static_translucent_render_infos)
             self.font_manager.log("Render Count : %d" % render_count)
-            self.font_manager.log("Point Lights : %d" % self.scene_manager.point_light_count)
+            animation_lod = self.scene_manager.animation_lod
+            self.font_manager.log("Animation Update : %d full, %d partial, %d interpolated, %d skipped" %
+                                  (animation_lod.full_update_count, animation_lod.partial_update_count,
+                                   animation_lod.interpolated_count, animation_lod.not_update_count))
+            self.font_manager.log("Point Lights : %d / %d" % (self.renderer.light_cluster.light_count, self.scene_manager.point_light_count))
             self.font_manager.log("Effect Count : %d" % len(self.effect_manager.render_effects))
             self.font_manager.log("Particle Count : %d" % self.effect_manager.alive_particle_count)
 
@@ -828,10 +896,7 @@ class CoreManager(Singleton):
             selected_object = self.scene_manager.get_selected_object()
             if selected_object:
                 btn_left, btn_middle, btn_right = self.game_backend.get_mouse_pressed()
-                if InputMode.NONE == self.game_backend.get_input_mode():
-                    if btn_left:
-                        self.scene_manager.update_select_object_id()
-                elif InputMode.EDIT_OBJECT_TRANSFORM == self.game_backend.get_input_mode():
+                if InputMode.EDIT_OBJECT_TRANSFORM == self.game_backend.get_input_mode():
                     self.scene_manager.edit_selected_object_transform()
 
                 self.font_manager.log("Selected Object : %s" % selected_object.name)
@@ -839,6 +904,8 @@ class CoreManager(Singleton):
                     self.font_manager.log(selected_object.transform.get_transform_infos())
         self.gpu_time = (time.perf_counter() - start_time) * 1000.0
 
+        self.flush_messages()
+
         if self.need_to_gc_collect:
             self.need_to_gc_collect = False
             gc.collect()
@@ -9,8 +9,9 @@ import numpy as np
 from PyEngine3D.Common import logger
 from PyEngine3D.Common.Constants import *
 from PyEngine3D.Render import CollisionActor, StaticActor, SkeletonActor, AxisGizmo
-from PyEngine3D.Render import Camera, MainLight, PointLight, LightProbe
-from PyEngine3D.Render import gather_render_infos, always_pass, view_frustum_culling_geometry, shadow_culling
+from PyEngine3D.Render import Camera, MainLight, PointLight, LightProbe, AnimationLOD
+from PyEngine3D.Render.LightCluster import POINT_LIGHT_DATA_TYPE
+from PyEngine3D.Render import gather_render_infos, gather_shadow_render_infos, always_pass, view_frustum_culling_geometry
 from PyEngine3D.Render import Atmosphere, Ocean, Terrain
 from PyEngine3D.Render import Effect
 from PyEngine3D.Render import Spline3D
@@ -64,13 +65,15 @@ class SceneManager(Singleton):
 
         # render group
         self.point_light_count = 0
+        self.point_light_datas = np.zeros(0, dtype=POINT_LIGHT_DATA_TYPE)
+        self.point_light_changed = True
+        self.static_shadow_changed = True
 
         self.static_solid_render_infos = []
         self.static_translucent_render_infos = []
-        self.static_shadow_render_infos = []
         self.skeleton_solid_render_infos = []
         self.skeleton_translucent_render_infos = []
-        self.skeleton_shadow_render_infos = []
+        self.animation_lod = AnimationLOD()
 
         self.axis_gizmo_render_infos = []
         self.spline_gizmo_render_infos = []
@@ -117,12 +120,12 @@ class SceneManager(Singleton):
 
         self.static_solid_render_infos = []
         self.static_translucent_render_infos = []
-        self.static_shadow_render_infos = []
         self.skeleton_solid_render_infos = []
         self.skeleton_translucent_render_infos = []
-        self.skeleton_shadow_render_infos = []
         self.selected_object_render_info = []
         self.spline_gizmo_render_infos = []
+        self.reset_static_shadow()
+        self.reset_point_lights()
 
         self.renderer.set_debug_texture(None)
 
@@ -287,6 +290,10 @@ class SceneManager(Singleton):
                 obj.set_object_id(object_id)
                 self.objectIDMap[object_id] = obj
             self.objectMap[obj.name] = obj
+            if object_type is StaticActor:
+                self.reset_static_shadow()
+            elif object_type is PointLight:
+                self.reset_point_lights()
             self.core_manager.send_object_info(obj)
         else:
             logger.error("SceneManager::regist_object error. %s" % obj.name if obj else 'None')
@@ -302,6 +309,11 @@ class SceneManager(Singleton):
 
             self.objectMap.pop(obj.name)
 
+            if object_type is StaticActor:
+                self.reset_static_shadow()
+            elif object_type is PointLight:
+                self.reset_point_lights()
+
             if hasattr(obj, 'get_object_id'):
                 object_id = obj.get_object_id()
                 self.restore_object_id(object_id)
@@ -507,6 +519,7 @@ class SceneManager(Singleton):
         self.skeleton_actors = []
         self.splines = []
         self.objectMap = {}
+        self.reset_point_lights()
 
     def clear_actors(self):
         for obj_name in list(self.objectMap.keys()):
@@ -539,21 +552,33 @@ class SceneManager(Singleton):
         return self.objectMap.values()
 
     def get_light_probe_texture(self):
-        if RenderOption.RENDER_LIGHT_PROBE:
+        if RenderOption.RENDER_LIGHT_PROBE or 0 == self.main_light_probe.bake_count:
             return RenderTargets.LIGHT_PROBE_ATMOSPHERE
         return self.main_light_probe.texture_probe
 
     def reset_light_probe(self):
+        self.renderer.light_probe_atmosphere_changed = True
         for light_probe in self.light_probes:
             light_probe.isRendered = False
 
+    def reset_static_shadow(self):
+        self.static_shadow_changed = True
+
+    def reset_point_lights(self):
+        self.point_light_changed = True
+
     def get_object_attribute(self, object_name, objectTypeName):
         obj = self.get_object(object_name)
         return obj.get_attribute() if obj else None
 
     def set_object_attribute(self, object_name, objectTypeName, attribute_name, attribute_value, item_info_history, attribute_index):
         obj = self.get_object(object_name)
-        obj and obj.set_attribute(attribute_name, attribute_value, item_info_history, attribute_index)
+        if obj is not None:
+            obj.set_attribute(attribute_name, attribute_value, item_info_history, attribute_index)
+            if type(obj) in (StaticActor, Terrain):
+                self.reset_static_shadow()
+            elif type(obj) is PointLight:
+                self.reset_point_lights()
 
     def get_selected_object_id(self):
         return self.selected_object_id
@@ -700,20 +725,26 @@ class SceneManager(Singleton):
                         spline_point.control_point[...] = spline_control_point_gizmo_pos - spline_point_gizmo_pos
                 self.selected_object.spline_data.resampling()
 
-    def update_select_object_id(self):
+    def request_select_object_id(self, callback):
+        # The object id is read back asynchronously and passed to the callback a frame or two later.
         windows_size = self.core_manager.get_window_size()
         mouse_pos = self.core_manager.get_mouse_pos()
         x = math.floor(min(1.0, (mouse_pos[0] / windows_size[0])) * (RenderTargets.OBJECT_ID.width - 1))
         y = math.floor(min(1.0, (mouse_pos[1] / windows_size[1])) * (RenderTargets.OBJECT_ID.height - 1))
-        object_ids = RenderTargets.OBJECT_ID.get_image_data()
-        object_id = math.floor(object_ids[y][x] + 0.5)
-        return object_id
+        self.core_manager.async_readback_manager.request_texture(RenderTargets.OBJECT_ID,
+                                                                 lambda object_ids: callback(math.floor(object_ids[0][0] + 0.5)),
+                                                                 x=x, y=y, width=1, height=1)
 
     def intersect_select_object(self):
-        object_id = self.update_select_object_id()
+        self.request_select_object_id(self.select_object_by_id)
+
+    def select_object_by_id(self, object_id):
         if 0 < object_id:
             if object_id < AxisGizmo.ID_COUNT:
-                self.selected_axis_gizmo_id = object_id
+                # the button may be released before the readback arrives.
+                btn_left, btn_middle, btn_right = self.core_manager.game_backend.get_mouse_pressed()
+                if btn_left:
+                    self.selected_axis_gizmo_id = object_id
             elif object_id in self.spline_gizmo_object_map:
                 self.set_selected_spline_gizmo_id(object_id)
             else:
@@ -732,41 +763,58 @@ class SceneManager(Singleton):
         for camera in self.cameras:
             camera.update_projection(fov, aspect)
 
-    def update_static_render_info(self):
-        self.static_solid_render_infos = []
-        self.static_translucent_render_infos = []
-        self.static_shadow_render_infos = []
+    def get_static_render_infos(self, camera, mesh_lod=False):
+        solid_render_infos = []
+        translucent_render_infos = []
 
         if RenderOption.RENDER_COLLISION:
             gather_render_infos(culling_func=view_frustum_culling_geometry,
-                                camera=self.main_camera,
+                                camera=camera,
                                 light=self.main_light,
                                 actor_list=self.collision_actors,
-                                solid_render_infos=self.static_solid_render_infos,
-                                translucent_render_infos=self.static_translucent_render_infos)
+                                solid_render_infos=solid_render_infos,
+                                translucent_render_infos=translucent_render_infos,
+                                mesh_lod=mesh_lod)
 
         if RenderOption.RENDER_STATIC_ACTOR:
             gather_render_infos(culling_func=view_frustum_culling_geometry,
-                                camera=self.main_camera,
+                                camera=camera,
                                 light=self.main_light,
                                 actor_list=self.static_actors,
-                                solid_render_infos=self.static_solid_render_infos,
-                                translucent_render_infos=self.static_translucent_render_infos)
+                                solid_render_infos=solid_render_infos,
+                                translucent_render_infos=translucent_render_infos,
+                                mesh_lod=mesh_lod)
 
-            gather_render_infos(culling_func=shadow_culling,
-                                camera=self.main_camera,
-                                light=self.main_light,
-                                actor_list=self.static_actors,
-                                solid_render_infos=self.static_shadow_render_infos,
-                                translucent_render_infos=None)
+        solid_render_infos.sort(key=lambda x: (id(x.geometry), id(x.material)))
+        translucent_render_infos.sort(key=lambda x: (id(x.geometry), id(x.material)))
+        return solid_render_infos, translucent_render_infos
+
+    def update_static_render_info(self):
+        self.static_solid_render_infos, self.static_translucent_render_infos = self.get_static_render_infos(self.main_camera, mesh_lod=True)
+
+        # the shadow casters are culled per cascade
+        shadow_cascades = self.main_light.shadow_cascades
+        static_shadow_render_counts = [len(shadow_cascade.static_render_infos) for shadow_cascade in shadow_cascades]
+        for shadow_cascade in shadow_cascades:
+            shadow_cascade.static_render_infos = []
+
+        if RenderOption.RENDER_STATIC_ACTOR:
+            gather_shadow_render_infos(shadow_cascades=shadow_cascades,
+                                       actor_list=self.static_actors,
+                                       cascade_render_infos=[x.static_render_infos for x in shadow_cascades],
+                                       camera=self.main_camera)
 
-        self.static_solid_render_infos.sort(key=lambda x: (id(x.geometry), id(x.material)))
-        self.static_translucent_render_infos.sort(key=lambda x: (id(x.geometry), id(x.material)))
+        # static shadow casters were shown or hidden
+        for shadow_cascade, static_shadow_render_count in zip(shadow_cascades, static_shadow_render_counts):
+            if static_shadow_render_count != len(shadow_cascade.static_render_infos):
+                shadow_cascade.static_shadow_changed = True
 
     def update_skeleton_render_info(self):
         self.skeleton_solid_render_infos = []
         self.skeleton_translucent_render_infos = []
-        self.skeleton_shadow_render_infos = []
+        shadow_cascades = self.main_light.shadow_cascades
+        for shadow_cascade in shadow_cascades:
+            shadow_cascade.skeleton_render_infos = []
 
         if RenderOption.RENDER_SKELETON_ACTOR:
             gather_render_infos(culling_func=view_frustum_culling_geometry,
@@ -774,39 +822,40 @@ class SceneManager(Singleton):
                                 light=self.main_light,
                                 actor_list=self.skeleton_actors,
                                 solid_render_infos=self.skeleton_solid_render_infos,
-                                translucent_render_infos=self.skeleton_translucent_render_infos)
+                                translucent_render_infos=self.skeleton_translucent_render_infos,
+                                mesh_lod=True)
 
-            gather_render_infos(culling_func=shadow_culling,
-                                camera=self.main_camera,
-                                light=self.main_light,
-                                actor_list=self.skeleton_actors,
-                                solid_render_infos=self.skeleton_shadow_render_infos,
-                                translucent_render_infos=None)
+            gather_shadow_render_infos(shadow_cascades=shadow_cascades,
+                                       actor_list=self.skeleton_actors,
+                                       cascade_render_infos=[x.skeleton_render_infos for x in shadow_cascades],
+                                       camera=self.main_camera)
 
             self.skeleton_solid_render_infos.sort(key=lambda x: (id(x.geometry), id(x.material)))
             self.skeleton_translucent_render_infos.sort(key=lambda x: (id(x.geometry), id(x.material)))
 
+        # the bones are evaluated after culling, the hidden actors advance only the animation time.
+        self.animation_lod.update_animation_lod(camera=self.main_camera,
+                                                skeleton_actors=self.skeleton_actors,
+                                                view_render_infos_list=[self.skeleton_solid_render_infos, self.skeleton_translucent_render_infos],
+                                                shadow_render_infos_list=[x.skeleton_render_infos for x in shadow_cascades])
+
+        if RenderOption.RENDER_SKELETON_ACTOR:
+            if not self.core_manager.is_basic_mode:
+                # the bones of the rendered actors are uploaded once for all passes of the frame.
+                render_infos_list = [self.skeleton_solid_render_infos, self.skeleton_translucent_render_infos]
+                render_infos_list.extend([x.skeleton_render_infos for x in shadow_cascades])
+                self.renderer.skinning_palette.update_skinning_palette(render_infos_list)
+
     def update_light_render_infos(self):
-        self.point_light_count = 0
-        self.renderer.uniform_point_light_data.fill(0.0)
-
-        for point_light in self.point_lights:
-            to_light = point_light.transform.pos - self.main_camera.transform.pos
-            for i in range(4):
-                d = np.dot(self.main_camera.frustum_vectors[i], to_light)
-                if point_light.light_radius < d:
-                    # culling
-                    break
-            else:
-                # pass culling
-                point_light_uniform_block = self.renderer.uniform_point_light_data[self.point_light_count]
-                point_light_uniform_block['color'] = point_light.light_color
-                point_light_uniform_block['radius'] = point_light.light_radius
-                point_light_uniform_block['pos'] = point_light.transform.pos
-                point_light_uniform_block['render'] = 1.0
-                self.point_light_count += 1
-            if MAX_POINT_LIGHTS <= self.point_light_count:
-                break
+        # The lights are culled and clustered per camera by Renderer.light_cluster.
+        if self.point_light_changed:
+            self.point_light_changed = False
+            self.point_light_count = len(self.point_lights)
+            self.point_light_datas = np.zeros(self.point_light_count, dtype=POINT_LIGHT_DATA_TYPE)
+            if 0 < self.point_light_count:
+                self.point_light_datas['color'] = [point_light.light_color for point_light in self.point_lights]
+                self.point_light_datas['radius'] = [point_light.light_radius for point_light in self.point_lights]
+                self.point_light_datas['pos'] = [point_light.transform.pos for point_light in self.point_lights]
 
     def update_scene(self, dt):
         if not self.core_manager.is_basic_mode:
@@ -822,14 +871,24 @@ class SceneManager(Singleton):
                 self.main_light.reset_changed()
                 self.reset_light_probe()
 
+            if self.main_light.shadow_changed:
+                self.main_light.reset_shadow_changed()
+                self.reset_static_shadow()
+
         for light in self.point_lights:
-            light.update()
+            if light.update():
+                self.reset_point_lights()
+
+        for light_probe in self.light_probes:
+            if light_probe.update(dt):
+                light_probe.isRendered = False
 
         for collision_actor in self.collision_actors:
             collision_actor.update(dt)
 
         for static_actor in self.static_actors:
-            static_actor.update(dt)
+            if static_actor.update(dt):
+                self.reset_static_shadow()
 
         for skeleton_actor in self.skeleton_actors:
             skeleton_actor.update(dt)
@@ -841,8 +900,8 @@ class SceneManager(Singleton):
             self.atmosphere.update(self.main_light)
             self.ocean.update(dt)
 
-            if self.terrain.is_render_terrain:
-                self.terrain.update(dt)
+            if self.terrain.is_render_terrain and self.terrain.update(dt):
+                self.reset_static_shadow()
 
             self.effect_manager.update(dt)
 
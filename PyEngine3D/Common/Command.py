@@ -2,10 +2,12 @@ import os
 import re
 import traceback
 from multiprocessing import Queue, Pipe
+from queue import Empty
 
 # logger
 from PyEngine3D.Utilities import AutoEnum, MINOR_INFO
 from PyEngine3D.Common import logger
+from .SharedMemoryChannel import SharedMemoryChannel
 
 # UTIL : call stack function for log
 reTraceStack = re.compile("File \"(.+?)\", line (\d+?), .+")  # [0] filename, [1] line number
@@ -25,6 +27,21 @@ def getTraceCallStack():
     return ""
 
 
+# format_stack of every message is expensive, the call stack is logged only in the debug mode.
+TRACE_CALL_STACK = False
+
+
+def set_trace_call_stack(enable):
+    global TRACE_CALL_STACK
+    TRACE_CALL_STACK = enable
+
+
+def log_command(text):
+    if TRACE_CALL_STACK:
+        text = "%s in %s" % (text, getTraceCallStack())
+    logger.log(MINOR_INFO, text)
+
+
 # COMMANDS
 class COMMAND(AutoEnum):
     UI_RUN = ()
@@ -119,6 +136,12 @@ class COMMAND(AutoEnum):
     TRANS_GAME_BACKEND_LIST = ()
     CHANGE_GAME_BACKEND = ()
 
+    # (texture name, numpy array) read back from the gpu
+    TRANS_TEXTURE_PREVIEW = ()
+
+    # list of (command, value) sent at once
+    BATCH = ()
+
     COUNT = ()
 
 
@@ -126,6 +149,53 @@ def get_command_name(cmd: COMMAND) -> str:
     return str(cmd)
 
 
+# the receiver gets the values of these commands as a list, the consecutive messages are handled at once.
+BATCH_COMMANDS = (COMMAND.TRANS_RESOURCE_INFO, COMMAND.TRANS_OBJECT_INFO, COMMAND.TRANS_RENDERTARGET_INFO)
+
+
+def get_coalesce_key(cmd, value):
+    """ a message is dropped when a later message has the same key, None is never dropped. """
+    if cmd in (COMMAND.TRANS_RESOURCE_INFO, COMMAND.TRANS_OBJECT_INFO):
+        # (name, type, ...)
+        return cmd, value[0], value[1]
+    elif cmd == COMMAND.TRANS_RENDERTARGET_INFO:
+        return cmd, value
+    elif cmd in (COMMAND.TRANS_RESOURCE_ATTRIBUTE, COMMAND.TRANS_OBJECT_ATTRIBUTE, COMMAND.TRANS_SCREEN_INFO,
+                 COMMAND.TRANS_TEXTURE_PREVIEW):
+        # only the last one is shown
+        return cmd
+    return None
+
+
+def drop_stale_messages(messages):
+    last_indices = dict()
+    for index, (cmd, value) in enumerate(messages):
+        key = get_coalesce_key(cmd, value)
+        if key is not None:
+            last_indices[key] = index
+
+    result = []
+    for index, (cmd, value) in enumerate(messages):
+        key = get_coalesce_key(cmd, value)
+        if key is None or last_indices[key] == index:
+            result.append((cmd, value))
+    return result
+
+
+def coalesce_messages(messages):
+    """ drop the stale messages and merge the consecutive messages of BATCH_COMMANDS into a list """
+    result = []
+    for cmd, value in drop_stale_messages(messages):
+        if cmd in BATCH_COMMANDS:
+            if result and result[-1][0] == cmd:
+                result[-1][1].append(value)
+            else:
+                result.append((cmd, [value, ]))
+        else:
+            result.append((cmd, value))
+    return result
+
+
 def CustomPipe():
     """get CustomPipe Instances"""
     pipe1, pipe2 = Pipe()
@@ -140,77 +210,73 @@ class PipeClass:
     def __init__(self, pipe):
         self.pipe = pipe
         self.simpleLog = True
+        self.shared_memory_channel = SharedMemoryChannel()
 
-    def send(self, sendCmd, sendValue=None):
+    def close_shared_memory(self):
+        self.shared_memory_channel.close()
+
+    def get_log_text(self, cmd, value):
         if self.simpleLog:
-            logger.log(MINOR_INFO, "Pipe : Send %s in %s" % (get_command_name(sendCmd), getTraceCallStack()))
-        else:
-            logger.log(MINOR_INFO,
-                       "Pipe : Send %s, %s in %s" % (get_command_name(sendCmd), str(sendValue), getTraceCallStack()))
+            return get_command_name(cmd)
+        return "%s, %s" % (get_command_name(cmd), str(value))
+
+    def send_message(self, sendCmd, sendValue):
         # must send queue date to tuple type
-        self.pipe.send((sendCmd, sendValue))
+        self.pipe.send((sendCmd, self.shared_memory_channel.encode(sendValue)))
+
+    def recv_message(self):
+        recv, value = self.pipe.recv()
+        return recv, self.shared_memory_channel.decode(value)
+
+    def send(self, sendCmd, sendValue=None):
+        if logger.isEnabledFor(MINOR_INFO):
+            log_command("Pipe : Send %s" % self.get_log_text(sendCmd, sendValue))
+        self.send_message(sendCmd, sendValue)
 
     def recv(self):
         """must be a tuple type"""
-        cmdAndValue = self.pipe.recv()
-        if self.simpleLog:
-            logger.log(MINOR_INFO, "Pipe : Recv %s in %s" % (get_command_name(cmdAndValue[0]), getTraceCallStack()))
-        else:
-            logger.log(MINOR_INFO,
-                       "Pipe : Recv %s, %s in %s" % (
-                           get_command_name(cmdAndValue[0]), str(cmdAndValue[1]), getTraceCallStack()))
+        cmdAndValue = self.recv_message()
+        if logger.isEnabledFor(MINOR_INFO):
+            log_command("Pipe : Recv %s" % self.get_log_text(*cmdAndValue))
         return cmdAndValue
 
     def SendAndRecv(self, sendCmd, sendValue, checkRecvCmd, checkReceiveValue):
         # send message - must be a tuple type
-        self.pipe.send((sendCmd, sendValue))
+        self.send_message(sendCmd, sendValue)
 
         # wait recv message - must be a tuple type
-        recv, value = self.pipe.recv()
-        if self.simpleLog:
-            logger.log(MINOR_INFO, "Pipe : Send %s and Recv %s in %s" % (
-                get_command_name(sendCmd), get_command_name(recv), getTraceCallStack()))
-        else:
-            logger.log(MINOR_INFO, "Pipe : Send %s, %s and Recv %s, %s in %s" % (
-                get_command_name(sendCmd), str(sendValue), get_command_name(recv), str(value), getTraceCallStack()))
+        recv, value = self.recv_message()
+        if logger.isEnabledFor(MINOR_INFO):
+            log_command("Pipe : Send %s and Recv %s" % (self.get_log_text(sendCmd, sendValue),
+                                                        self.get_log_text(recv, value)))
 
         # check receive correct command and value
         if recv != checkRecvCmd or (checkReceiveValue is not None and checkReceiveValue != value):
-            if self.simpleLog:
-                logger.log(MINOR_INFO, "Pipe : RecvFailed %s and Send %s in %s" % (get_command_name(recv),
-                                                                                   COMMAND.FAIL, getTraceCallStack()))
-            else:
-                logger.log(MINOR_INFO, "Pipe : RecvFailed %s, %s and Send %s, %s in %s" % (
-                    get_command_name(recv), str(value), COMMAND.FAIL, "None", getTraceCallStack()))
+            if logger.isEnabledFor(MINOR_INFO):
+                log_command("Pipe : RecvFailed %s and Send %s" % (self.get_log_text(recv, value),
+                                                                  self.get_log_text(COMMAND.FAIL, None)))
             logger.error("ERROR : Received %s not %s" % (recv, checkRecvCmd))
             raise BaseException("Pipe receive error.")
         return value
 
     def RecvAndSend(self, checkRecvCmd, checkReceiveValue, sendCmd, sendValue):
         # wait recv message - must be a tuple type
-        recv, value = self.pipe.recv()
+        recv, value = self.recv_message()
 
         if recv == checkRecvCmd and (checkReceiveValue is None or checkReceiveValue == value):
             # receive succesfull - send message, must be a tuple type
-            self.pipe.send((sendCmd, sendValue))
-            if self.simpleLog:
-                logger.log(MINOR_INFO, "Pipe : Recv %s and Send %s in %s" % (
-                    get_command_name(recv), get_command_name(sendCmd), getTraceCallStack()))
-            else:
-                logger.log(MINOR_INFO, "Pipe : Recv %s, %s and Send %s, %s in %s" % (
-                    get_command_name(recv), str(value), get_command_name(sendCmd), str(sendValue), getTraceCallStack()))
+            self.send_message(sendCmd, sendValue)
+            if logger.isEnabledFor(MINOR_INFO):
+                log_command("Pipe : Recv %s and Send %s" % (self.get_log_text(recv, value),
+                                                            self.get_log_text(sendCmd, sendValue)))
 
             # return received value
             return value
         else:
-            self.pipe.send((COMMAND.FAIL, None))
-            if self.simpleLog:
-                logger.log(MINOR_INFO,
-                           "Pipe : RecvFailed %s and Send %s in %s" % (
-                               get_command_name(recv), COMMAND.FAIL, getTraceCallStack()))
-            else:
-                logger.log(MINOR_INFO, "Pipe : RecvFailed %s, %s and Send %s, %s in %s" % (
-                    get_command_name(recv), str(value), COMMAND.FAIL, "None", getTraceCallStack()))
+            self.send_message(COMMAND.FAIL, None)
+            if logger.isEnabledFor(MINOR_INFO):
+                log_command("Pipe : RecvFailed %s and Send %s" % (self.get_log_text(recv, value),
+                                                                  self.get_log_text(COMMAND.FAIL, None)))
             logger.error("ERROR : Received %s not %s" % (recv, checkRecvCmd))
             raise BaseException("Pipe receive error.")
 
@@ -220,26 +286,55 @@ class CustomQueue:
     def __init__(self):
         self.queue = Queue()
         self.simpleLog = True
+        # the large numpy arrays are sent through the shared memory, only the handles go through the queue.
+        self.shared_memory_channel = SharedMemoryChannel()
+
+    def close_shared_memory(self):
+        self.shared_memory_channel.close()
 
     def empty(self):
         return self.queue.empty()
 
     def get(self):
         # receive value must be tuple type
-        cmdAndValue = self.queue.get(self)
-        if self.simpleLog:
-            logger.log(MINOR_INFO, "Queue : get %s in %s" % (get_command_name(cmdAndValue[0]), getTraceCallStack()))
-        else:
-            logger.log(MINOR_INFO,
-                       "Queue : get %s, %s in %s" % (
-                           get_command_name(cmdAndValue[0]), str(cmdAndValue[1]), getTraceCallStack()))
-        return cmdAndValue
+        cmd, value = self.queue.get(self)
+        value = self.shared_memory_channel.decode(value)
+        if logger.isEnabledFor(MINOR_INFO):
+            if self.simpleLog:
+                log_command("Queue : get %s" % get_command_name(cmd))
+            else:
+                log_command("Queue : get %s, %s" % (get_command_name(cmd), str(value)))
+        return cmd, value
+
+    def get_all(self, block=True, timeout=None):
+        """ wait for a message then drain the queue, the batches are unpacked. return : list of (command, value) """
+        messages = []
+        try:
+            cmdAndValue = self.queue.get(block, timeout)
+            while True:
+                if COMMAND.BATCH == cmdAndValue[0]:
+                    messages.extend(cmdAndValue[1])
+                else:
+                    messages.append(cmdAndValue)
+                cmdAndValue = self.queue.get_nowait()
+        except Empty:
+            pass
+        messages = self.shared_memory_channel.decode(messages)
+        logger.log(MINOR_INFO, "Queue : get_all %d messages" % len(messages))
+        return messages
 
     def put(self, cmdIndex, value=None):
-        if self.simpleLog:
-            logger.log(MINOR_INFO, "Queue : put %s in %s" % (get_command_name(cmdIndex), getTraceCallStack()))
-        else:
-            logger.log(MINOR_INFO,
-                       "Queue : put %s, %s in %s" % (get_command_name(cmdIndex), str(value), getTraceCallStack()))
+        if logger.isEnabledFor(MINOR_INFO):
+            if self.simpleLog:
+                log_command("Queue : put %s" % get_command_name(cmdIndex))
+            else:
+                log_command("Queue : put %s, %s" % (get_command_name(cmdIndex), str(value)))
         # must send queue date to tuple type
-        self.queue.put((cmdIndex, value))
+        self.queue.put((cmdIndex, self.shared_memory_channel.encode(value)))
+
+    def put_batch(self, messages):
+        """ send the list of (command, value) with one message """
+        if messages:
+            if logger.isEnabledFor(MINOR_INFO):
+                log_command("Queue : put_batch %d messages" % len(messages))
+            self.queue.put((COMMAND.BATCH, self.shared_memory_channel.encode(drop_stale_messages(messages))))
@@ -6,14 +6,34 @@ INITIAL_WIDTH = 800
 INITIAL_HEIGHT = 600
 VIDEO_RESIZE_TIME = 0.5
 GRAVITY = 980.0
-MAX_POINT_LIGHTS = 10
+MAX_POINT_LIGHTS = 4096
+LIGHT_CLUSTER_COUNT_X = 16
+LIGHT_CLUSTER_COUNT_Y = 8
+LIGHT_CLUSTER_COUNT_Z = 24
+MAX_LIGHT_INDEX_COUNT = 262144
 NULL_POINTER = ctypes.c_void_p(0)
 SHADOW_SAMPLES = 16
 SHADOW_EXP = 1000.0
 SHADOW_BIAS = 0.005
 SHADOW_DISTANCE = 50.0
-SHADOW_UPDATE_DIST = 10.0
+SHADOW_MAP_SIZE = 2048
+MAX_SHADOW_CASCADE_COUNT = 4
+SHADOW_CASCADE_COUNT = 4
+SHADOW_CASCADE_SPLIT_LAMBDA = 0.75
+SHADOW_CASCADE_NEAR_RATIO = 0.01
+SHADOW_CASCADE_UPDATE_RATIO = 0.2
+SHADOW_CASCADE_MIN_CASTER_TEXELS = 2.0
 WORK_GROUP_SIZE = 64
+LIGHT_PROBE_BAKE_STEPS_PER_FRAME = 1
+TERRAIN_LOD_PIXEL_ERROR = 2.0
+TERRAIN_LOD_MIN_RANGE_RATIO = 8.0
+TERRAIN_MORPH_START_RATIO = 0.7
+MESH_LOD_TRIANGLE_RATIOS = (0.5, 0.25, 0.125)
+MESH_LOD_MIN_TRIANGLES = 64
+MESH_LOD_MAX_TRIANGLES = 20000
+MESH_LOD_SCREEN_SIZES = (0.5, 0.25, 0.125)
+MESH_LOD_HYSTERESIS = 0.1
+MESH_LOD_SHADOW_BIAS = 0.5
 
 SOUND_DISTANCE_RATIO = 0.025
 
@@ -0,0 +1,106 @@
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from PyEngine3D.Common import logger
+
+
+# smaller arrays are pickled with the message
+SHARED_MEMORY_MIN_SIZE = 64 * 1024
+
+# the sender keeps the names of the latest segments, the ones which are not received are unlinked when the channel is closed.
+MAX_PENDING_SEGMENTS = 1024
+
+
+def create_shared_memory(size):
+    """ the segment is not tracked by the sender, the receiver unlinks it after the array is copied. """
+    try:
+        return shared_memory.SharedMemory(create=True, size=size, track=False)
+    except TypeError:
+        # python < 3.13 : the resource tracker of this process must not unlink the segment of the receiver.
+        segment = shared_memory.SharedMemory(create=True, size=size)
+        if 'posix' == os.name:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(segment._name, 'shared_memory')
+        return segment
+
+
+def unlink_shared_memory(name):
+    """ attach and unlink, the tracker of this process registers and unregisters the segment. return : False when it was released """
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    segment.close()
+    segment.unlink()
+    return True
+
+
+class SharedMemoryHandle:
+    """ picklable reference to an array in a shared memory segment """
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = shape
+        self.dtype = dtype
+
+
+class SharedMemoryChannel:
+    """
+    The large numpy arrays of the messages are copied to the shared memory and only the handles are pickled.
+    Each array has its own segment, the receiver copies the array and unlinks the segment,
+    so an array which is not received yet is never overwritten by the next messages.
+    """
+    def __init__(self):
+        self.pending_segment_names = []
+
+    def __getstate__(self):
+        # the segments belong to the process, a new process starts with an empty channel.
+        return dict()
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def close(self):
+        # the segments which the receiver did not read
+        for name in self.pending_segment_names:
+            unlink_shared_memory(name)
+        self.pending_segment_names = []
+
+    def write(self, array):
+        array = np.ascontiguousarray(array)
+        segment = create_shared_memory(array.nbytes)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        segment.close()
+
+        self.pending_segment_names.append(segment.name)
+        if MAX_PENDING_SEGMENTS < len(self.pending_segment_names):
+            self.pending_segment_names.pop(0)
+        return SharedMemoryHandle(segment.name, array.shape, array.dtype.str)
+
+    def read(self, handle):
+        """ return : the copy of the array, the segment is released. """
+        try:
+            segment = shared_memory.SharedMemory(name=handle.name)
+        except FileNotFoundError:
+            logger.error("The shared memory %s of %s %s array is released, the payload is dropped." %
+                         (handle.name, handle.shape, handle.dtype))
+            return None
+        array = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=segment.buf).copy()
+        segment.close()
+        segment.unlink()
+        return array
+
+    def encode(self, value):
+        if isinstance(value, np.ndarray) and SHARED_MEMORY_MIN_SIZE <= value.nbytes:
+            return self.write(value)
+        elif type(value) in (tuple, list):
+            return type(value)(self.encode(x) for x in value)
+        return value
+
+    def decode(self, value):
+        if isinstance(value, SharedMemoryHandle):
+            return self.read(value)
+        elif type(value) in (tuple, list):
+            return type(value)(self.decode(x) for x in value)
+        return value
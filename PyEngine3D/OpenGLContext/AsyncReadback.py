@@ -0,0 +1,168 @@
+from ctypes import string_at, c_void_p
+
+import numpy as np
+
+from OpenGL.GL import *
+
+from PyEngine3D.Common import logger
+from PyEngine3D.Utilities import Singleton
+from .FrameBuffer import FrameBufferManager
+from .Texture import get_numpy_dtype
+
+
+def get_component_count(texture_format):
+    if texture_format in (GL_RED, GL_RED_INTEGER, GL_DEPTH_COMPONENT):
+        return 1
+    elif texture_format in (GL_RG, GL_RG_INTEGER):
+        return 2
+    elif texture_format in (GL_RGB, GL_BGR, GL_RGB_INTEGER):
+        return 3
+    return 4
+
+
+class ReadbackRequest:
+    def __init__(self, name, callback, width, height, component_count, dtype):
+        self.name = name
+        self.callback = callback
+        self.width = width
+        self.height = height
+        self.component_count = component_count
+        self.dtype = dtype
+        self.nbytes = width * height * component_count * np.dtype(dtype).itemsize
+        self.fence = None
+
+
+class PixelBuffer:
+    def __init__(self):
+        self.buffer = glGenBuffers(1)
+        self.buffer_size = 0
+        self.request = None
+
+    def delete(self):
+        if self.request is not None and self.request.fence is not None:
+            glDeleteSync(self.request.fence)
+        self.request = None
+        glDeleteBuffers(1, [self.buffer, ])
+
+    def reserve(self, nbytes):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.buffer)
+        if self.buffer_size < nbytes:
+            self.buffer_size = nbytes
+            glBufferData(GL_PIXEL_PACK_BUFFER, nbytes, None, GL_STREAM_READ)
+
+
+class AsyncReadbackManager(Singleton):
+    """
+    Reads textures back without waiting for the GPU.
+    glReadPixels writes into a pixel buffer object of the ring and the data is mapped
+    once its fence is signaled, usually one or two frames later, then passed to the callback.
+    The ring grows up to max_ring_size while every pixel buffer is in flight, then the requests are dropped.
+    """
+    def __init__(self, ring_size=3, max_ring_size=8):
+        self.ring_size = ring_size
+        self.max_ring_size = max_ring_size
+        self.pixel_buffers = []
+        self.ring_index = 0
+
+    def clear(self):
+        for pixel_buffer in self.pixel_buffers:
+            pixel_buffer.delete()
+        self.pixel_buffers = []
+        self.ring_index = 0
+
+    def get_pixel_buffer(self):
+        if len(self.pixel_buffers) < self.ring_size:
+            self.pixel_buffers.append(PixelBuffer())
+
+        for i in range(len(self.pixel_buffers)):
+            index = (self.ring_index + i) % len(self.pixel_buffers)
+            if self.pixel_buffers[index].request is None:
+                self.ring_index = (index + 1) % len(self.pixel_buffers)
+                return self.pixel_buffers[index]
+
+        # every pixel buffer is in flight.
+        if self.max_ring_size <= len(self.pixel_buffers):
+            return None
+        pixel_buffer = PixelBuffer()
+        self.pixel_buffers.append(pixel_buffer)
+        return pixel_buffer
+
+    @staticmethod
+    def is_readable(texture):
+        # the texture is attached to the color attachment of the read framebuffer.
+        return texture is not None and texture.target == GL_TEXTURE_2D and \
+            texture.texture_format not in (GL_DEPTH_COMPONENT, GL_DEPTH_STENCIL)
+
+    def request_texture(self, texture, callback, x=0, y=0, width=0, height=0, level=0):
+        """
+        :param callback: callback(data), data is a numpy array shaped (height, width) or (height, width, components).
+        :param x, y, width, height: region of interest, the whole mip level when width or height is 0.
+        """
+        if not self.is_readable(texture):
+            logger.error("AsyncReadbackManager supports only the color Texture2D. %s" % texture.name)
+            return False
+
+        pixel_buffer = self.get_pixel_buffer()
+        if pixel_buffer is None:
+            logger.warn("AsyncReadbackManager dropped the readback of %s, every pixel buffer is in flight." % texture.name)
+            return False
+
+        mip_width, mip_height = texture.get_mipmap_size(level)
+        width = width or mip_width
+        height = height or mip_height
+        x = max(0, min(x, mip_width - 1))
+        y = max(0, min(y, mip_height - 1))
+        width = min(width, mip_width - x)
+        height = min(height, mip_height - y)
+
+        request = ReadbackRequest(texture.name,
+                                  callback,
+                                  width,
+                                  height,
+                                  get_component_count(texture.texture_format),
+                                  get_numpy_dtype(texture.data_type))
+
+        pixel_buffer.reserve(request.nbytes)
+
+        framebuffer_manager = FrameBufferManager.instance()
+        current_framebuffer = framebuffer_manager.current_framebuffer
+        framebuffer = framebuffer_manager.get_framebuffer(texture, target_level=level)
+
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, framebuffer.buffer)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glReadPixels(x, y, width, height, texture.texture_format, texture.data_type, c_void_p(0))
+        glPixelStorei(GL_PACK_ALIGNMENT, 4)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, current_framebuffer.buffer if current_framebuffer else 0)
+
+        request.fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        pixel_buffer.request = request
+        return True
+
+    def update(self):
+        for pixel_buffer in self.pixel_buffers:
+            request = pixel_buffer.request
+            if request is None:
+                continue
+
+            # poll without waiting
+            result = glClientWaitSync(request.fence, 0, 0)
+            if result not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                continue
+
+            glDeleteSync(request.fence)
+            request.fence = None
+            pixel_buffer.request = None
+
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pixel_buffer.buffer)
+            data_ptr = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, request.nbytes, GL_MAP_READ_BIT)
+            data = np.frombuffer(string_at(data_ptr, request.nbytes), dtype=request.dtype)
+            glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+            if 1 == request.component_count:
+                data = data.reshape(request.height, request.width)
+            else:
+                data = data.reshape(request.height, request.width, request.component_count)
+            request.callback(data)
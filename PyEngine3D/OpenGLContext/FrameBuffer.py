@@ -18,6 +18,9 @@ class FrameBuffer:
         GL_FRAMEBUFFER_UNSUPPORTED
     )
 
+    # the viewport scale of the dynamic resolution render targets
+    render_scale = 1.0
+
     def __init__(self, name=''):
         logger.info("Create %s framebuffer" % name)
         self.name = name
@@ -142,8 +145,12 @@ class FrameBuffer:
     def bind_framebuffer(self):
         viewport_scale = 1.0 / (2.0 ** self.target_level)
         if self.attach_count > 0:
+            if self.color_textures[0].dynamic_resolution:
+                viewport_scale *= FrameBuffer.render_scale
             self.set_viewport(0, 0, self.color_textures[0].width, self.color_textures[0].height, viewport_scale)
         elif self.depth_texture is not None:
+            if self.depth_texture.dynamic_resolution:
+                viewport_scale *= FrameBuffer.render_scale
             self.set_viewport(0, 0, self.depth_texture.width, self.depth_texture.height, viewport_scale)
 
         glBindFramebuffer(GL_FRAMEBUFFER, self.buffer)
@@ -214,6 +221,15 @@ class FrameBufferManager(Singleton):
             framebuffer = self.framebuffers.pop(key)
             framebuffer.delete()
 
+    def delete_framebuffers_of_texture(self, texture):
+        for key in list(self.framebuffers.keys()):
+            textures, depth_texture = key[0], key[1]
+            if texture in textures or texture is depth_texture:
+                framebuffer = self.framebuffers.pop(key)
+                if framebuffer is self.current_framebuffer:
+                    self.current_framebuffer = None
+                framebuffer.delete()
+
     def get_framebuffer(self, *textures, depth_texture=None, target_face=GL_TEXTURE_CUBE_MAP_POSITIVE_X, target_layer=0, target_level=0):
         key = (textures, depth_texture, target_face, target_layer, target_level)
         if key in self.framebuffers:
@@ -255,6 +271,14 @@ class FrameBufferManager(Singleton):
     def unbind_framebuffer(self):
         glBindFramebuffer(GL_FRAMEBUFFER, 0)
 
+    @staticmethod
+    def get_render_scale():
+        return FrameBuffer.render_scale
+
+    @staticmethod
+    def set_render_scale(render_scale):
+        FrameBuffer.render_scale = render_scale
+
     def copy_rendertarget(self, src_render_target, dst_render_target,
                            src_x=0, src_y=0, src_w=0, src_h=0,
                            dst_x=0, dst_y=0, dst_w=0, dst_h=0, target=GL_COLOR_BUFFER_BIT, filter_type=GL_LINEAR):
@@ -14,7 +14,8 @@ from PyEngine3D.Common import logger
 from PyEngine3D.Utilities import Attributes, Logger
 from PyEngine3D.App import CoreManager
 from PyEngine3D.OpenGLContext import OpenGLContext, CreateUniformDataFromString
-from .UniformBuffer import CreateUniformBuffer, UniformTextureBase
+from .UniformBuffer import CreateUniformBuffer, UniformTextureBase, FRAME_TEXTURE_UNITS
+from .UniformBlock import get_std140_layout
 
 
 class Material:
@@ -32,6 +33,11 @@ class Material:
         uniform_datas = material_datas.get('uniform_datas', {})
 
         self.material_component_names = [x[1] for x in material_datas.get('material_components', [])]
+
+        # the material components packed into the material_parameters block, see pack_material_parameters
+        self.material_parameters = material_datas.get('material_parameters', [])
+        self.material_parameter_offsets, self.material_parameter_block_size = get_std140_layout(self.material_parameters)
+
         self.macros = material_datas.get('macros', OrderedDict())
 
         self.is_translucent = True if 0 < self.macros.get('TRANSPARENT_MATERIAL', 0) else False
@@ -148,10 +154,13 @@ class Material:
         for uniform_type, uniform_name in uniforms:
             # self.uniform_datas
             default_data = CreateUniformDataFromString(uniform_type, default_uniform_datas.get(uniform_name))
-            uniform_buffer = CreateUniformBuffer(self.program, uniform_type, uniform_name, default_data=default_data)
+            block_offset = self.material_parameter_offsets.get(uniform_name, -1)
+            uniform_buffer = CreateUniformBuffer(self.program, uniform_type, uniform_name, default_data=default_data, block_offset=block_offset)
             if uniform_buffer is not None:
                 # Important : set texture binding index
-                if issubclass(uniform_buffer.__class__, UniformTextureBase):
+                if uniform_name in FRAME_TEXTURE_UNITS and issubclass(uniform_buffer.__class__, UniformTextureBase):
+                    uniform_buffer.set_frame_texture_unit(self.program, FRAME_TEXTURE_UNITS[uniform_name])
+                elif issubclass(uniform_buffer.__class__, UniformTextureBase):
                     uniform_buffer.set_texture_index(active_texture_index)
                     active_texture_index += 1
                 self.uniform_buffers[uniform_name] = uniform_buffer
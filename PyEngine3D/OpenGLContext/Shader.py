@@ -13,6 +13,7 @@ from OpenGL.GL import *
 from PyEngine3D.Common import logger
 from PyEngine3D.Utilities import GetClassName, Attributes, Logger, AutoEnum
 from PyEngine3D.App import CoreManager
+from .UniformBlock import MATERIAL_PARAMETER_BINDING, MATERIAL_PARAMETER_BLOCK_NAME, STD140_TYPES, sort_std140_members
 
 reInclude = re.compile('\#include\s+[\"|\<](.+?)[\"|\>]')  # [include file name, ]
 reVersion = re.compile("(\#version\s+.+)")  # [version code, ]
@@ -24,6 +25,7 @@ reVoidMain = re.compile('void\s+main\s*\(')
 
 reFindUniform = re.compile("uniform\s+(.+?)\s+(.+?)\s*;")  # [Variable Type, Variable Name]
 reMacro = re.compile('\#(ifdef|ifndef|if|elif|else|endif)\s*(.*)')  # [macro type, expression]
+reMaterialParameter = re.compile("\s*uniform\s+(%s)\s+([a-zA-Z_][a-zA-Z_0-9]*)\s*;" % "|".join(STD140_TYPES.keys()))  # [Variable Type, Variable Name]
 
 shader_types = OrderedDict(
     VERTEX_SHADER=GL_VERTEX_SHADER,
@@ -111,42 +113,87 @@ def parsing_uniforms(shader_code_list):
     return uniforms
 
 
+def get_material_component_lines(code_lines):
+    """ return : [(line index, code line), ...] of the codes in the MATERIAL_COMPONENTS blocks """
+    material_component_lines = []
+    depth = 0
+    is_in_material_block = False
+    for line_index, code_line in enumerate(code_lines):
+        # remove comment
+        if "//" in code_line:
+            code_line = code_line.split("//")[0]
+
+        m = re.search(reMacro, code_line)
+        # find macro
+        if m is not None:
+            macro_type, macro_value = [group.strip() for group in m.groups()]
+            if macro_type in ('ifdef', 'ifndef', 'if'):
+                # increase depth
+                if is_in_material_block:
+                    depth += 1
+                # start material block
+                elif macro_type == 'ifdef' and 'MATERIAL_COMPONENTS' == macro_value.split(" ")[0]:
+                    is_in_material_block = True
+                    depth = 1
+            elif macro_type == 'endif' and is_in_material_block:
+                depth -= 1
+                if depth == 0:
+                    # exit material block
+                    is_in_material_block = False
+        # gather common code in material component
+        elif is_in_material_block:
+            material_component_lines.append((line_index, code_line))
+    return material_component_lines
+
+
 def parsing_material_components(shader_code_list):
     material_components = []
     for code in shader_code_list:
-        depth = 0
-        is_in_material_block = False
-
         # remove comment block
         code = re.sub(reComment, "", code)
-        code_lines = code.splitlines()
+        material_components.extend([code_line for line_index, code_line in get_material_component_lines(code.splitlines())])
+    return re.findall(reFindUniform, "\n".join(material_components))
 
-        for code_line in code_lines:
-            # remove comment
-            if "//" in code_line:
-                code_line = code_line.split("//")[0]
 
-            m = re.search(reMacro, code_line)
-            # find macro
+def pack_material_parameters(shader_codes):
+    """
+    The scalar and vector uniforms of the material components are moved into the material_parameters uniform block,
+    the members keep their names so the shader codes are not changed. The textures are left as the uniforms.
+    :param shader_codes: {shader_type: final shader code}, the codes are replaced.
+    return : [(uniform_type, uniform_name), ...] in the order of the block
+    """
+    code_lines_map = dict()
+    parameter_lines_map = dict()
+    parameters = []
+    for shader_type, shader_code in shader_codes.items():
+        code_lines = shader_code.splitlines()
+        parameter_lines = []
+        for line_index, code_line in get_material_component_lines(code_lines):
+            m = re.match(reMaterialParameter, code_line)
             if m is not None:
-                macro_type, macro_value = [group.strip() for group in m.groups()]
-                if macro_type in ('ifdef', 'ifndef', 'if'):
-                    # increase depth
-                    if is_in_material_block:
-                        depth += 1
-                    # start material block
-                    elif macro_type == 'ifdef' and 'MATERIAL_COMPONENTS' == macro_value.split(" ")[0]:
-                        is_in_material_block = True
-                        depth = 1
-                elif macro_type == 'endif' and is_in_material_block:
-                    depth -= 1
-                    if depth == 0:
-                        # exit material block
-                        is_in_material_block = False
-            # gather common code in material component
-            elif is_in_material_block:
-                material_components.append(code_line)
-    return re.findall(reFindUniform, "\n".join(material_components))
+                parameter_lines.append(line_index)
+                if m.groups() not in parameters:
+                    parameters.append(m.groups())
+        if parameter_lines:
+            code_lines_map[shader_type] = code_lines
+            parameter_lines_map[shader_type] = parameter_lines
+
+    if not parameters:
+        return []
+
+    # every stage declares the same block, the block definitions must match to link the program.
+    parameters = sort_std140_members(parameters)
+    block_lines = ["layout(std140, binding=%d) uniform %s" % (MATERIAL_PARAMETER_BINDING, MATERIAL_PARAMETER_BLOCK_NAME), "{"]
+    block_lines.extend(["    %s %s;" % parameter for parameter in parameters])
+    block_lines.append("};")
+
+    for shader_type, code_lines in code_lines_map.items():
+        parameter_lines = parameter_lines_map[shader_type]
+        for line_index in parameter_lines:
+            code_lines[line_index] = ""
+        code_lines[parameter_lines[0]] = "\n".join(block_lines)
+        shader_codes[shader_type] = "\n".join(code_lines)
+    return parameters
 
 
 class Shader:
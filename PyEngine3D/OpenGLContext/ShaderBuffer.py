@@ -83,6 +83,11 @@ class ShaderBuffer:
         #     glBufferSubData(self.target, offset, data.nbytes, data)
         #     offset += data.nbytes
 
+    def set_buffer_sub_data(self, data, offset=0):
+        if 0 < data.nbytes:
+            glBindBuffer(self.target, self.buffer)
+            glBufferSubData(self.target, offset, data.nbytes, data)
+
     def get_buffer_data(self):
         # too slow..
         glBindBuffer(self.target, self.buffer)
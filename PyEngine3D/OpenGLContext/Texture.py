@@ -105,6 +105,7 @@ class Texture:
         self.sRGB = False
         self.clear_color = None
         self.multisample_count = 0
+        self.dynamic_resolution = False
 
         self.width = 0
         self.height = 0
@@ -135,6 +136,8 @@ class Texture:
         self.sRGB = texture_data.get('sRGB', False)
         self.clear_color = texture_data.get('clear_color')
         self.multisample_count = 0
+        # the render target is rendered in the sub rect of the render scale.
+        self.dynamic_resolution = texture_data.get('dynamic_resolution', False)
 
         if self.internal_format is None and self.image_mode:
             self.internal_format = get_internal_format(self.image_mode)
@@ -210,6 +213,7 @@ class Texture:
             wrap_s=self.wrap_s,
             wrap_t=self.wrap_t,
             wrap_r=self.wrap_r,
+            dynamic_resolution=self.dynamic_resolution,
         )
 
     def get_save_data(self):
@@ -395,6 +399,11 @@ class Texture2D(Texture):
 
         glBindTexture(GL_TEXTURE_2D, 0)
 
+    def update_sub_image(self, x, y, width, height, data, level=0):
+        glBindTexture(GL_TEXTURE_2D, self.buffer)
+        glTexSubImage2D(GL_TEXTURE_2D, level, x, y, width, height, self.texture_format, self.data_type, data)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
 
 class Texture2DArray(Texture):
     target = GL_TEXTURE_2D_ARRAY
@@ -4,6 +4,7 @@ import numpy as np
 from OpenGL.GL import *
 
 from PyEngine3D.Common import logger
+from PyEngine3D.Utilities import Singleton
 
 
 class UniformBlock:
@@ -28,3 +29,91 @@ class UniformBlock:
         glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
         glBindBufferBase(GL_UNIFORM_BUFFER, self.buffer_bind, self.buffer)
         glBufferData(GL_UNIFORM_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+
+
+# the binding of the material_parameters block, 0 ~ 6 are the uniform blocks of the renderer.
+MATERIAL_PARAMETER_BINDING = 7
+MATERIAL_PARAMETER_BLOCK_NAME = "material_parameters"
+
+# the largest GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT allowed by the spec, so every driver accepts the ranges.
+MATERIAL_PARAMETER_ALIGNMENT = 256
+MATERIAL_PARAMETER_BUFFER_SIZE = MATERIAL_PARAMETER_ALIGNMENT * 256
+
+# the types packed into the material_parameters block - (std140 base alignment, component count, dtype)
+STD140_TYPES = dict(
+    float=(4, 1, np.float32), vec2=(8, 2, np.float32), vec3=(16, 3, np.float32), vec4=(16, 4, np.float32),
+    int=(4, 1, np.int32), ivec2=(8, 2, np.int32), ivec3=(16, 3, np.int32), ivec4=(16, 4, np.int32),
+    uint=(4, 1, np.uint32), uvec2=(8, 2, np.uint32), uvec3=(16, 3, np.uint32), uvec4=(16, 4, np.uint32),
+    bool=(4, 1, np.int32), bvec2=(8, 2, np.int32), bvec3=(16, 3, np.int32), bvec4=(16, 4, np.int32),
+)
+
+
+def sort_std140_members(members):
+    """ the larger alignments first to minimize the padding, members : [(uniform_type, name), ...] """
+    return sorted(members, key=lambda member: -STD140_TYPES[member[0]][0])
+
+
+def get_std140_layout(members):
+    """ return : {name: offset}, the block size aligned to 16 bytes """
+    offsets = dict()
+    offset = 0
+    for uniform_type, name in members:
+        alignment, component_count, dtype = STD140_TYPES[uniform_type]
+        offset = (offset + alignment - 1) // alignment * alignment
+        offsets[name] = offset
+        offset += component_count * 4
+    return offsets, (offset + 15) // 16 * 16
+
+
+class MaterialParameterBuffer(Singleton):
+    """
+    The material parameters of all material instances live in one uniform buffer, an instance owns an aligned range.
+    The values are packed into the cpu copy, the range is uploaded when it has changed and bound with glBindBufferRange.
+    """
+    def __init__(self):
+        self.buffer = None
+        self.data = np.zeros(MATERIAL_PARAMETER_BUFFER_SIZE, dtype=np.uint8)
+        self.allocated_size = 0
+        self.free_offsets = dict()  # range size : [offset, ...]
+        self.need_to_upload_all = True
+
+    @staticmethod
+    def get_range_size(block_size):
+        return (block_size + MATERIAL_PARAMETER_ALIGNMENT - 1) // MATERIAL_PARAMETER_ALIGNMENT * MATERIAL_PARAMETER_ALIGNMENT
+
+    def allocate(self, block_size):
+        range_size = self.get_range_size(block_size)
+        free_offsets = self.free_offsets.get(range_size)
+        if free_offsets:
+            return free_offsets.pop()
+
+        if len(self.data) < self.allocated_size + range_size:
+            data = np.zeros(max(len(self.data) * 2, self.allocated_size + range_size), dtype=np.uint8)
+            data[:self.allocated_size] = self.data[:self.allocated_size]
+            self.data = data
+            # the buffer is recreated with the new size
+            self.need_to_upload_all = True
+
+        offset = self.allocated_size
+        self.allocated_size += range_size
+        return offset
+
+    def release(self, offset, block_size):
+        self.free_offsets.setdefault(self.get_range_size(block_size), []).append(offset)
+
+    def set_value(self, offset, uniform_type, value):
+        alignment, component_count, dtype = STD140_TYPES[uniform_type]
+        value = np.array(value, dtype=dtype).reshape(-1)[:component_count]
+        self.data[offset:offset + value.nbytes] = value.view(np.uint8)
+
+    def bind_range(self, offset, block_size, upload):
+        if self.buffer is None:
+            self.buffer = glGenBuffers(1)
+
+        glBindBuffer(GL_UNIFORM_BUFFER, self.buffer)
+        if self.need_to_upload_all:
+            glBufferData(GL_UNIFORM_BUFFER, self.data.nbytes, self.data, GL_DYNAMIC_DRAW)
+            self.need_to_upload_all = False
+        elif upload:
+            glBufferSubData(GL_UNIFORM_BUFFER, offset, block_size, self.data[offset:offset + block_size])
+        glBindBufferRange(GL_UNIFORM_BUFFER, MATERIAL_PARAMETER_BINDING, self.buffer, offset, block_size)
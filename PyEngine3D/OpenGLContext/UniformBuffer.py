@@ -9,6 +9,43 @@ from PyEngine3D.App import CoreManager
 
 ignore_uniform_types = ["atomic_bool", "atomic_uint", "atomic_int", "atomic_float"]
 
+# the material textures use the units below it, see texture_offset of the UniformTexture classes.
+MATERIAL_TEXTURE_UNIT_COUNT = 80
+
+# the textures which are the same for all actors of a pass have fixed units above the units of the material textures,
+# so they are bound once per pass instead of every material instance. see set_frame_texture_units
+FRAME_TEXTURE_NAMES = ('texture_probe', 'texture_shadow', 'texture_ssao', 'texture_scene_reflect')
+FRAME_TEXTURE_UNITS = dict((name, MATERIAL_TEXTURE_UNIT_COUNT + i) for i, name in enumerate(FRAME_TEXTURE_NAMES))
+
+
+def set_frame_texture_units(max_texture_units):
+    """
+    It must be set when the context is created, before the materials are created.
+    The units of the material textures are clamped to GL_MAX_COMBINED_TEXTURE_IMAGE_UNITS, the frame textures take the units above them.
+    """
+    global MATERIAL_TEXTURE_UNIT_COUNT
+    texture_classes = (UniformTexture2D, UniformTexture2DArray, UniformTexture2DMultiSample, UniformTexture3D, UniformTextureCube)
+    material_texture_unit_count = max_texture_units - len(FRAME_TEXTURE_NAMES)
+    if material_texture_unit_count < MATERIAL_TEXTURE_UNIT_COUNT:
+        # each sampler type keeps an equal range of the units
+        units_per_type = material_texture_unit_count // len(texture_classes)
+        if units_per_type < 1:
+            raise BaseException("GL_MAX_COMBINED_TEXTURE_IMAGE_UNITS is %d, the frame textures do not fit." % max_texture_units)
+        logger.warn("GL_MAX_COMBINED_TEXTURE_IMAGE_UNITS is %d, the material textures are clamped to %d units per sampler type." %
+                    (max_texture_units, units_per_type))
+        MATERIAL_TEXTURE_UNIT_COUNT = units_per_type * len(texture_classes)
+        for i, texture_class in enumerate(texture_classes):
+            texture_class.texture_offset = units_per_type * i
+
+    for i, texture_name in enumerate(FRAME_TEXTURE_NAMES):
+        FRAME_TEXTURE_UNITS[texture_name] = MATERIAL_TEXTURE_UNIT_COUNT + i
+
+
+def bind_frame_texture(texture_name, texture):
+    if texture is not None:
+        glActiveTexture(GL_TEXTURE0 + FRAME_TEXTURE_UNITS[texture_name])
+        texture.bind_texture()
+
 
 def CreateUniformDataFromString(data_type, strValue=None):
     """ return converted data from string or default data """
@@ -76,8 +113,11 @@ def CreateUniformDataFromString(data_type, strValue=None):
     return None
 
 
-def CreateUniformBuffer(program, uniform_type, uniform_name, default_data=None):
-    """ create uniform buffer from .mat(shader) file """
+def CreateUniformBuffer(program, uniform_type, uniform_name, default_data=None, block_offset=-1):
+    """
+    create uniform buffer from .mat(shader) file
+    :param block_offset: the offset of the member in the material_parameters block, -1 is the plain uniform.
+    """
     uniform_classes = [
         UniformBool, UniformInt, UniformUint, UniformFloat,
         UniformVector2, UniformVector3, UniformVector4,
@@ -96,7 +136,10 @@ def CreateUniformBuffer(program, uniform_type, uniform_name, default_data=None):
                 uniform_data = default_data
             else:
                 uniform_data = CreateUniformDataFromString(uniform_type)
-            uniform_buffer = uniform_class(program, uniform_name)
+            if 0 <= block_offset:
+                uniform_buffer = uniform_class(program, uniform_name, block_offset=block_offset)
+            else:
+                uniform_buffer = uniform_class(program, uniform_name)
             uniform_buffer.set_default_value(uniform_data)
             return uniform_buffer if uniform_buffer.valid else None
     else:
@@ -111,13 +154,15 @@ class UniformVariable:
     data_type = ""
     uniform_type = ""
 
-    def __init__(self, program, variable_name):
+    def __init__(self, program, variable_name, block_offset=-1):
         self.name = variable_name
-        self.location = glGetUniformLocation(program, variable_name)
+        # the member of the material_parameters block has no location, the value is packed at the block_offset.
+        self.block_offset = block_offset
+        self.location = glGetUniformLocation(program, variable_name) if block_offset < 0 else -1
         self.show_message = True
         self.default_value = None
         self.valid = True
-        if self.location == -1:
+        if self.location == -1 and block_offset < 0:
             self.valid = False
             # logger.warn("%s location is -1" % variable_name)
 
@@ -301,6 +346,11 @@ class UniformTextureBase(UniformVariable):
     def set_texture_index(self, textureIndex):
         self.textureIndex = textureIndex + self.texture_offset
 
+    def set_frame_texture_unit(self, program, texture_unit):
+        # the sampler points to the unit once, see bind_frame_texture
+        self.textureIndex = texture_unit
+        glProgramUniform1i(program, self.location, texture_unit)
+
     def bind_uniform(self, texture, wrap=None):
         if texture is not None:
             glActiveTexture(GL_TEXTURE0 + self.textureIndex)
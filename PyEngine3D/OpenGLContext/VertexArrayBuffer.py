@@ -36,6 +36,9 @@ def CreateVertexArrayBuffer(geometry_data):
     if not isinstance(indices, np.ndarray):
         indices = np.array(indices, dtype=np.uint32)
 
+    # the simplified indices of the lods refer to the vertices of the base geometry, see MeshSimplifier.
+    lod_indices = [np.array(x, dtype=np.uint32) for x in geometry_data.get('lod_indices', [])]
+
     if not isinstance(bone_indicies, np.ndarray):
         bone_indicies = np.array(bone_indicies, dtype=np.float32)
 
@@ -67,12 +70,14 @@ def CreateVertexArrayBuffer(geometry_data):
         vertex_array_buffer = VertexArrayBuffer(geometry_name,
                                                 mode,
                                                 [positions, colors, normals, tangents, texcoords, bone_indicies, bone_weights],
-                                                indices)
+                                                indices,
+                                                lod_indices)
     else:
         vertex_array_buffer = VertexArrayBuffer(geometry_name,
                                                 mode,
                                                 [positions, colors, normals, tangents, texcoords],
-                                                indices)
+                                                indices,
+                                                lod_indices)
     return vertex_array_buffer
 
 
@@ -113,15 +118,21 @@ class InstanceBuffer:
 
         self.instance_buffer = glGenBuffers(1)
 
-    def bind_instance_buffer(self, datas, divisor=1):
-        instance_buffer_size = sum(data.nbytes for data in datas)
+    def delete(self):
+        glDeleteBuffers(1, [self.instance_buffer, ])
+
+    def bind_instance_buffer(self, datas, divisor=1, upload=True):
+        """ :param upload: False binds the attributes of the datas uploaded before. """
         glBindBuffer(GL_ARRAY_BUFFER, self.instance_buffer)
-        glBufferData(GL_ARRAY_BUFFER, instance_buffer_size, None, GL_STATIC_DRAW)
+        if upload:
+            instance_buffer_size = sum(data.nbytes for data in datas)
+            glBufferData(GL_ARRAY_BUFFER, instance_buffer_size, None, GL_STATIC_DRAW)
 
         offset = 0
         location = self.location_offset
         for i, data in enumerate(datas):
-            glBufferSubData(GL_ARRAY_BUFFER, offset, data.nbytes, data)
+            if upload:
+                glBufferSubData(GL_ARRAY_BUFFER, offset, data.nbytes, data)
 
             divide_count = self.divide_counts[i]
             for j in range(divide_count):
@@ -141,7 +152,7 @@ class InstanceBuffer:
 
 
 class VertexArrayBuffer:
-    def __init__(self, name, mode, datas, index_data):
+    def __init__(self, name, mode, datas, index_data, lod_index_datas=[]):
         self.name = name
         self.mode = mode
         self.vertex_buffer_offset = []
@@ -175,10 +186,18 @@ class VertexArrayBuffer:
             glVertexAttribDivisor(location, 0)
             offset += data.nbytes
 
-        self.index_buffer_size = index_data.nbytes
+        # the indices of the lods follow the base indices in the index buffer, (byte offset, index count) per lod
+        index_datas = [index_data.astype(np.uint32).reshape(-1), ] + [x.reshape(-1) for x in lod_index_datas if 0 < x.size]
+        self.index_ranges = []
+        offset = 0
+        for data in index_datas:
+            self.index_ranges.append((offset, data.size))
+            offset += data.nbytes
+        self.index_count = index_datas[0].size
+        self.index_buffer_size = offset
         self.index_buffer = glGenBuffers(1)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer_size, index_data, GL_STATIC_DRAW)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer_size, np.concatenate(index_datas), GL_STATIC_DRAW)
 
         glBindVertexArray(0)
 
@@ -188,15 +207,27 @@ class VertexArrayBuffer:
         glDeleteBuffers(1, GLuint(self.vertex_buffer))
         glDeleteBuffers(1, GLuint(self.index_buffer))
 
-    def draw_elements(self):
+    def get_lod_count(self):
+        return len(self.index_ranges)
+
+    def get_index_range(self, lod=0):
+        offset, count = self.index_ranges[min(lod, len(self.index_ranges) - 1)]
+        return c_void_p(offset), count
+
+    def draw_elements(self, lod=0):
         OpenGLContext.bind_vertex_array(self.vertex_array)
-        glDrawElements(self.mode, self.index_buffer_size, GL_UNSIGNED_INT, NULL_POINTER)
+        offset, count = self.get_index_range(lod)
+        glDrawElements(self.mode, count, GL_UNSIGNED_INT, offset)
 
-    def draw_elements_instanced(self, instance_count, instance_buffer=None, instance_datas=[]):
+    def draw_elements_instanced(self, instance_count, instance_buffer=None, instance_datas=[], base_instance=0, upload=True, lod=0):
         OpenGLContext.bind_vertex_array(self.vertex_array)
         if instance_buffer is not None:
-            instance_buffer.bind_instance_buffer(datas=instance_datas)
-        glDrawElementsInstanced(self.mode, self.index_buffer_size, GL_UNSIGNED_INT, NULL_POINTER, instance_count)
+            instance_buffer.bind_instance_buffer(datas=instance_datas, upload=upload)
+        offset, count = self.get_index_range(lod)
+        if 0 < base_instance:
+            glDrawElementsInstancedBaseInstance(self.mode, count, GL_UNSIGNED_INT, offset, instance_count, base_instance)
+        else:
+            glDrawElementsInstanced(self.mode, count, GL_UNSIGNED_INT, offset, instance_count)
 
     def draw_elements_indirect(self, offset=0):
         OpenGLContext.bind_vertex_array(self.vertex_array)
@@ -2,10 +2,11 @@ from .OpenGLContext import OpenGLContext, glGetTexImage
 from .FrameBuffer import FrameBuffer, FrameBufferManager
 from .RenderBuffer import RenderBuffer
 from .Shader import Shader, ShaderCompileOption, ShaderCompileMessage, default_compile_option
-from .Shader import parsing_macros, parsing_uniforms, parsing_material_components
+from .Shader import parsing_macros, parsing_uniforms, parsing_material_components, pack_material_parameters
 from .Texture import CreateTexture, Texture2D, Texture2DArray, Texture3D, Texture2DMultiSample, TextureCube
-from .UniformBlock import UniformBlock
-from .UniformBuffer import CreateUniformBuffer, CreateUniformDataFromString, \
+from .AsyncReadback import AsyncReadbackManager
+from .UniformBlock import UniformBlock, MaterialParameterBuffer
+from .UniformBuffer import CreateUniformBuffer, CreateUniformDataFromString, bind_frame_texture, set_frame_texture_units, \
                             UniformArray, UniformInt, UniformFloat, \
                             UniformVector2, UniformVector3, UniformVector4, \
                             UniformMatrix2, UniformMatrix3, UniformMatrix4, \
@@ -5,6 +5,7 @@ import numpy as np
 from PyEngine3D.Utilities import *
 from PyEngine3D.App import CoreManager
 from .Mesh import BoundBox
+from .BakedAnimation import BakedAnimationManager
 
 
 class StaticActor:
@@ -77,11 +78,16 @@ class StaticActor:
         self.has_mesh = model is not None and model.mesh is not None
 
         self.geometry_bound_boxes.clear()
+        # the selected lods of the geometries for the view and the shadow, see select_geometry_lod
+        self.geometry_lods = []
+        self.shadow_geometry_lods = []
         if self.has_mesh:
             self.bound_box.clone(self.model.mesh.bound_box)
             for i, geometry in enumerate(self.model.mesh.geometries):
                 self.geometry_bound_boxes.append(BoundBox())
                 self.geometry_bound_boxes[i].clone(geometry.bound_box)
+                self.geometry_lods.append(0)
+                self.shadow_geometry_lods.append(0)
 
     def get_save_data(self):
         save_data = dict(
@@ -237,8 +243,10 @@ class StaticActor:
                     self.geometry_bound_boxes[i].update_with_matrix(geometry.bound_box, self.transform.matrix)
 
     def update(self, dt):
-        if self.transform.update_transform():
+        updated = self.transform.update_transform()
+        if updated:
             self.update_bound_box()
+        return updated
 
 
 class CollisionActor(StaticActor):
@@ -265,6 +273,28 @@ class SkeletonActor(StaticActor):
         self.blend_animation_buffers = []
         self.animation_count = 0
         self.animation_mesh = None
+        self.animation_blend_ratio = 1.0
+        self.animation_delta_time = 0.0
+
+        # the bones are evaluated every lod interval frames by AnimationLOD, the frames between are interpolated.
+        self.animation_lod_interval = 1
+        self.animation_lod_frame = 0
+        self.animation_lod_bone_depth = None
+        self.animation_lod_visible = False
+        self.lod_from_animation_buffers = []
+        self.lod_to_animation_buffers = []
+        # the local transforms of the bones, the bones deeper than the lod bone depth keep them between the evaluations.
+        self.local_animation_buffers = []
+
+        # the instances play the animations baked into the textures on the gpu, see BakedAnimation.
+        self.baked_animation = object_data.get('baked_animation', False)
+        self.baked_animation_meshes = []
+        self.instance_playback_rate = RangeVariable(**object_data.get('instance_playback_rate', dict(min_value=1.0)))
+        # (animation index, time offset, playback rate, 0) per instance
+        self.instance_animation_data = None
+        # the instance datas are static, they are uploaded to the instance buffer of the actor when they change.
+        self.instance_buffer = None
+        self.instance_buffer_dirty = True
 
         if self.has_mesh:
             for animation in self.model.mesh.animations:
@@ -274,15 +304,85 @@ class SkeletonActor(StaticActor):
                     self.prev_animation_buffers.append(animation_buffer.copy())
                     self.animation_buffers.append(animation_buffer.copy())
                     self.blend_animation_buffers.append(animation_buffer.copy())
+                    self.lod_from_animation_buffers.append(animation_buffer.copy())
+                    self.lod_to_animation_buffers.append(animation_buffer.copy())
+                    self.local_animation_buffers.append(animation.local_transforms.copy())
                 else:
                     self.prev_animation_buffers.append(None)
                     self.animation_buffers.append(None)
                     self.blend_animation_buffers.append(None)
+                    self.lod_from_animation_buffers.append(None)
+                    self.lod_to_animation_buffers.append(None)
+                    self.local_animation_buffers.append(None)
             self.animation_mesh = self.model.mesh
+            self.baked_animation_meshes = [self.model.mesh, ]
+        self.update_instance_animation_data()
+        self.bake_animation()
+
+    def delete(self):
+        if self.instance_buffer is not None:
+            self.instance_buffer.delete()
+            self.instance_buffer = None
 
     def is_skeletal_actor(self):
         return True
 
+    def get_save_data(self):
+        save_data = StaticActor.get_save_data(self)
+        save_data['baked_animation'] = self.baked_animation
+        save_data['instance_playback_rate'] = self.instance_playback_rate.get_save_data()
+        return save_data
+
+    def get_attribute(self):
+        StaticActor.get_attribute(self)
+        self.attributes.set_attribute('baked_animation', self.baked_animation)
+        self.attributes.set_attribute('instance_playback_rate', self.instance_playback_rate.get_save_data())
+        return self.attributes
+
+    def set_attribute(self, attribute_name, attribute_value, item_info_history, attribute_index):
+        StaticActor.set_attribute(self, attribute_name, attribute_value, item_info_history, attribute_index)
+        if attribute_name == 'baked_animation':
+            self.bake_animation()
+
+    def set_instance_count(self, count):
+        StaticActor.set_instance_count(self, count)
+        if hasattr(self, 'instance_playback_rate'):
+            self.update_instance_animation_data()
+
+    def is_baked_animation(self):
+        return self.baked_animation and 0 < len(self.baked_animation_meshes)
+
+    def set_baked_animation_meshes(self, meshes):
+        """ the animations which the instances play, the instances are distributed to the animations evenly. """
+        self.baked_animation_meshes = list(meshes)
+        self.update_instance_animation_data()
+        self.bake_animation()
+
+    def get_baked_animation_meshes(self):
+        return self.baked_animation_meshes
+
+    def bake_animation(self):
+        """ the animations are baked when they are set, not in the draw loop. """
+        if self.is_baked_animation():
+            BakedAnimationManager.instance().get_baked_animation(self.baked_animation_meshes)
+
+    def get_baked_animation(self):
+        return BakedAnimationManager.instance().get_baked_animation(self.baked_animation_meshes)
+
+    def update_instance_animation_data(self):
+        count = max(1, self.instance_count)
+        self.instance_buffer_dirty = True
+        self.instance_animation_data = np.zeros((count, 4), dtype=np.float32)
+        if self.baked_animation_meshes:
+            animation_lengths = []
+            for mesh in self.baked_animation_meshes:
+                animation = next((x for x in mesh.animations if x is not None), None)
+                animation_lengths.append(animation.animation_length if animation is not None else 0.0)
+            animation_indices = np.arange(count) % len(animation_lengths)
+            self.instance_animation_data[:, 0] = animation_indices
+            self.instance_animation_data[:, 1] = np.random.uniform(0.0, 1.0, count) * np.array(animation_lengths)[animation_indices]
+            self.instance_animation_data[:, 2] = [self.instance_playback_rate.get_uniform() for i in range(count)]
+
     def set_animation(self, mesh, speed=1.0, loop=True, start_time=0.0, end_time=None, blend_time=0.5, force=False, reset=True):
         if mesh != self.animation_mesh or force:
             self.animation_mesh = mesh
@@ -295,8 +395,16 @@ class SkeletonActor(StaticActor):
                 self.animation_play_time = start_time
                 self.animation_frame = 0.0
                 self.is_animation_end = False
-            # swap
-            self.animation_buffers, self.blend_animation_buffers = self.blend_animation_buffers, self.animation_buffers
+            # the current pose is kept to blend, the animation buffers stay the displayed pose for the lod interpolation.
+            for animation_buffer, blend_animation_buffer in zip(self.animation_buffers, self.blend_animation_buffers):
+                if animation_buffer is not None:
+                    blend_animation_buffer[...] = animation_buffer
+            # the bones deeper than the lod bone depth start from the pose of the new animation.
+            for animation, local_animation_buffer in zip(mesh.animations, self.local_animation_buffers):
+                if animation is not None and local_animation_buffer is not None:
+                    animation.get_animation_transforms(self.animation_frame, None, local_animation_buffer)
+            self.last_animation_frame = -1.0
+            self.animation_lod_frame = 0
 
     def get_prev_animation_buffer(self, index):
         return self.prev_animation_buffers[index]
@@ -305,49 +413,137 @@ class SkeletonActor(StaticActor):
         return self.animation_buffers[index]
 
     def update(self, dt):
-        StaticActor.update(self, dt)
+        """ only the animation time advances here, the bones are evaluated by update_animation_buffers. """
+        updated = StaticActor.update(self, dt)
+
+        if self.is_baked_animation():
+            # the bones are sampled from the baked animation on the gpu.
+            return updated
+
+        animation = next((x for x in self.animation_mesh.animations if x is not None), None)
+        if animation is not None:
+            # update animation frame only first animation
+            frame_count = animation.frame_count
+            if frame_count > 1:
+                self.animation_play_time += dt * self.animation_speed
+
+                animation_end_time = self.get_animation_end_time(animation)
+
+                if self.animation_loop:
+                    if animation_end_time < self.animation_play_time:
+                        self.animation_play_time = math.fmod(self.animation_play_time, animation_end_time)
+                else:
+                    self.animation_play_time = min(animation_end_time, self.animation_play_time)
+                    if animation_end_time == self.animation_play_time:
+                        self.is_animation_end = True
+                self.animation_frame = animation.get_time_to_frame(self.animation_frame, self.animation_play_time)
+            else:
+                self.animation_frame = 0.0
+
+            self.animation_blend_ratio = 1.0
+            if self.animation_elapsed_time < self.animation_blend_time:
+                self.animation_blend_ratio = self.animation_elapsed_time / self.animation_blend_time
+            self.animation_elapsed_time += dt
+            self.animation_delta_time = dt
+        return updated
+
+    def get_animation_end_time(self, animation):
+        animation_end_time = animation.animation_length
+        if self.animation_end_time is not None and self.animation_end_time < animation_end_time:
+            animation_end_time = self.animation_end_time
+        return animation_end_time
+
+    def get_lod_animation_frame(self, lod_interval):
+        """ return : the frame and the blend ratio at the last frame of the lod interval, the time advances as update does. """
+        delta_time = (lod_interval - 1) * self.animation_delta_time
+        if delta_time <= 0.0:
+            return self.animation_frame, self.animation_blend_ratio
 
-        # update animation
-        animation_end = self.is_animation_end
         blend_ratio = 1.0
-        update_animation_frame = True
+        blend_elapsed_time = self.animation_elapsed_time - self.animation_delta_time + delta_time
+        if blend_elapsed_time < self.animation_blend_time:
+            blend_ratio = blend_elapsed_time / self.animation_blend_time
+
+        animation = next((x for x in self.animation_mesh.animations if x is not None), None)
+        if animation is None or animation.frame_count <= 1:
+            return self.animation_frame, blend_ratio
+
+        animation_play_time = self.animation_play_time + delta_time * self.animation_speed
+        animation_end_time = self.get_animation_end_time(animation)
+        if self.animation_loop:
+            if animation_end_time < animation_play_time:
+                animation_play_time = math.fmod(animation_play_time, animation_end_time)
+        else:
+            animation_play_time = min(animation_end_time, animation_play_time)
+        return animation.get_time_to_frame(self.animation_frame, animation_play_time), blend_ratio
+
+    def evaluate_animation_buffers(self, animation_frame, blend_ratio, max_bone_depth=None):
+        """ evaluate the pose of the frame into the lod target buffers. """
+        if self.last_animation_frame == animation_frame and self.animation_lod_bone_depth == max_bone_depth and 1.0 <= blend_ratio:
+            return
+
+        self.last_animation_frame = animation_frame
+        self.animation_lod_bone_depth = max_bone_depth
         for i, animation in enumerate(self.animation_mesh.animations):
             if animation is not None:
-                # update animation frame only first animation
-                if update_animation_frame:
-                    update_animation_frame = False
-                    frame_count = animation.frame_count
-                    if frame_count > 1:
-                        self.animation_play_time += dt * self.animation_speed
-
-                        animation_end_time = animation.animation_length
-
-                        if self.animation_end_time is not None and self.animation_end_time < animation_end_time:
-                            animation_end_time = self.animation_end_time
-
-                        if self.animation_loop:
-                            if animation_end_time < self.animation_play_time:
-                                self.animation_play_time = math.fmod(self.animation_play_time, animation_end_time)
-                        else:
-                            self.animation_play_time = min(animation_end_time, self.animation_play_time)
-                            if animation_end_time == self.animation_play_time:
-                                animation_end = True
-                        self.animation_frame = animation.get_time_to_frame(self.animation_frame, self.animation_play_time)
-                    else:
-                        self.animation_frame = 0.0
-                    if self.animation_elapsed_time < self.animation_blend_time:
-                        blend_ratio = self.animation_elapsed_time / self.animation_blend_time
-                    self.animation_elapsed_time += dt
-
-                # update animation buffers
-                self.prev_animation_buffers[i][...] = self.animation_buffers[i]
-
-                if self.last_animation_frame != self.animation_frame:
-                    self.last_animation_frame = self.animation_frame
-                    animation_buffer = animation.get_animation_transforms(self.animation_frame)
-
-                    if blend_ratio < 1.0:
-                        self.animation_buffers[i][...] = self.blend_animation_buffers[i] * (1.0 - blend_ratio) + animation_buffer * blend_ratio
-                    else:
-                        self.animation_buffers[i][...] = animation_buffer
-        self.is_animation_end = animation_end
+                animation_buffer = animation.get_animation_transforms(animation_frame, max_bone_depth, self.local_animation_buffers[i])
+                if blend_ratio < 1.0:
+                    self.lod_to_animation_buffers[i][...] = self.blend_animation_buffers[i] * (1.0 - blend_ratio) + animation_buffer * blend_ratio
+                else:
+                    self.lod_to_animation_buffers[i][...] = animation_buffer
+
+    def update_animation_buffers(self, lod_interval=1, max_bone_depth=None):
+        """
+        The bones are evaluated every lod interval frames at the time of the last frame of the interval,
+        the frames between are interpolated from the displayed pose to the evaluated pose,
+        so the displayed pose keeps up with the animation time and the previous animation buffers stay coherent.
+        return : True when the bones were evaluated.
+        """
+        if self.is_baked_animation():
+            return False
+
+        for i, animation_buffer in enumerate(self.animation_buffers):
+            if animation_buffer is not None:
+                self.prev_animation_buffers[i][...] = animation_buffer
+
+        evaluated = False
+        if 0 == self.animation_lod_frame or lod_interval < self.animation_lod_interval or not self.animation_lod_visible:
+            if self.animation_lod_visible:
+                for i, animation_buffer in enumerate(self.animation_buffers):
+                    if animation_buffer is not None:
+                        self.lod_from_animation_buffers[i][...] = animation_buffer
+            else:
+                # the pose before the actor was hidden is stale, the interpolation starts from the current pose of all bones.
+                self.evaluate_animation_buffers(self.animation_frame, self.animation_blend_ratio)
+                for i, animation_buffer in enumerate(self.lod_to_animation_buffers):
+                    if animation_buffer is not None:
+                        self.lod_from_animation_buffers[i][...] = animation_buffer
+            self.animation_lod_interval = lod_interval
+            self.animation_lod_frame = 0
+            self.evaluate_animation_buffers(*self.get_lod_animation_frame(lod_interval), max_bone_depth)
+            evaluated = True
+
+        self.animation_lod_frame += 1
+        ratio = self.animation_lod_frame / self.animation_lod_interval
+        for i, animation_buffer in enumerate(self.animation_buffers):
+            if animation_buffer is not None:
+                if ratio < 1.0:
+                    animation_buffer[...] = lerp(self.lod_from_animation_buffers[i], self.lod_to_animation_buffers[i], ratio)
+                else:
+                    animation_buffer[...] = self.lod_to_animation_buffers[i]
+
+        if not self.animation_lod_visible:
+            # the actor has appeared, the pose is not blurred from the pose before it was hidden.
+            self.animation_lod_visible = True
+            for i, animation_buffer in enumerate(self.animation_buffers):
+                if animation_buffer is not None:
+                    self.prev_animation_buffers[i][...] = animation_buffer
+
+        if self.animation_lod_interval <= self.animation_lod_frame:
+            self.animation_lod_frame = 0
+        return evaluated
+
+    def skip_animation_buffers(self):
+        """ the hidden actor keeps only the animation time, the bones are evaluated again when it appears. """
+        self.animation_lod_visible = False
+        self.animation_lod_frame = 0
@@ -2,6 +2,7 @@ import copy
 
 from PyEngine3D.Common import logger
 from PyEngine3D.Utilities import *
+from .AnimationCompression import CompressedAnimation
 
 
 class Animation:
@@ -23,11 +24,21 @@ class Animation:
 
         self.root_node = self.nodes[0] if 0 < len(self.nodes) else None
 
+        # the keys compressed at import are sampled for all nodes at once.
+        self.compressed_animation = None
+        if any(animation_node_data.get('compressed', False) for animation_node_data in animation_data):
+            self.compressed_animation = CompressedAnimation(animation_data)
+            self.bone_depths = np.array([node.bone.depth for node in self.nodes], dtype=np.int32)
+            self.inv_bind_matrices = np.array([node.bone.inv_bind_matrix for node in self.nodes], dtype=np.float32)
+
         if 0 < self.frame_count:
             self.animation_length = max(self.frame_times)
 
         self.last_frame = 0.0
 
+        # the local transforms of the last full evaluation, the actors keep their own local transforms.
+        self.local_transforms = np.array([Matrix4() for i in range(len(self.nodes))], dtype=np.float32)
+
         # just update animation transforms
         self.animation_transforms = np.array([Matrix4() for i in range(len(self.nodes))], dtype=np.float32)
         self.get_animation_transforms(0.0)
@@ -51,31 +62,79 @@ class Animation:
             return float(frame) + ratio
         return 0.0
 
-    def get_animation_transforms(self, frame=0.0):
-        if self.last_frame == frame:
-            return self.animation_transforms
-        else:
-            self.last_frame = frame
+    def get_frame_to_time(self, frame):
+        if 1 < self.frame_count:
+            rate = frame - int(frame)
+            frame = int(frame) % self.frame_count
+            next_frame = min(frame + 1, self.frame_count - 1)
+            return self.frame_times[frame] * (1.0 - rate) + self.frame_times[next_frame] * rate
+        return 0.0
+
+    def get_compressed_animation_transforms(self, frame, max_bone_depth, local_transforms):
+        precompute_parent_matrix = self.root_node.precompute_parent_matrix
+        node_mask = None if max_bone_depth is None or precompute_parent_matrix else self.bone_depths <= max_bone_depth
+        transforms = self.compressed_animation.get_transforms(self.get_frame_to_time(frame), node_mask, local_transforms)
+        if not self.root_node.precompute_inv_bind_matrix:
+            transforms = np.matmul(self.inv_bind_matrices, transforms)
 
-            if self.root_node.precompute_parent_matrix:
-                for i, node in enumerate(self.nodes):
-                    self.animation_transforms[i][...] = node.get_transform(frame)
-            else:
-                def animation(parent_bone, parent_matrix):
-                    for bone in parent_bone.children:
-                        node = self.nodes[bone.index]
-                        node.get_transform(frame)
-                        transform = self.animation_transforms[bone.index]
-                        transform[...] = np.dot(node.transform, parent_matrix)
-                        animation(bone, transform)
-
-                for bone in self.skeleton.hierachy:
-                    node = self.nodes[bone.index]
+        if precompute_parent_matrix:
+            self.animation_transforms[...] = transforms
+        else:
+            def animation(parent_bone, parent_matrix):
+                for bone in parent_bone.children:
                     transform = self.animation_transforms[bone.index]
-                    transform[...] = node.get_transform(frame)
+                    transform[...] = np.dot(transforms[bone.index], parent_matrix)
                     animation(bone, transform)
+
+            for bone in self.skeleton.hierachy:
+                transform = self.animation_transforms[bone.index]
+                transform[...] = transforms[bone.index]
+                animation(bone, transform)
+
+    def get_animation_transforms(self, frame=0.0, max_bone_depth=None, local_transforms=None):
+        """
+        local_transforms : the local transforms of the bones which the actor keeps, they are updated by the evaluation.
+        max_bone_depth : the bones deeper than it keep the local transforms of the actor and follow their parents only,
+        all bones are evaluated without the local transforms of the actor.
+        The transforms which precompute the parent matrix are always evaluated fully.
+        """
+        if local_transforms is None or self.root_node.precompute_parent_matrix:
+            max_bone_depth = None
+
+        # only the full evaluation is shared by the actors
+        if max_bone_depth is None and self.last_frame == frame:
+            if local_transforms is not None:
+                local_transforms[...] = self.local_transforms
             return self.animation_transforms
 
+        self.last_frame = frame if max_bone_depth is None else None
+        transforms = self.local_transforms if max_bone_depth is None else local_transforms
+
+        if self.compressed_animation is not None:
+            self.get_compressed_animation_transforms(frame, max_bone_depth, transforms)
+        elif self.root_node.precompute_parent_matrix:
+            for i, node in enumerate(self.nodes):
+                transforms[i][...] = node.get_transform(frame)
+                self.animation_transforms[i][...] = transforms[i]
+        else:
+            def animation(parent_bone, parent_matrix):
+                for bone in parent_bone.children:
+                    if max_bone_depth is None or bone.depth <= max_bone_depth:
+                        transforms[bone.index][...] = self.nodes[bone.index].get_transform(frame)
+                    transform = self.animation_transforms[bone.index]
+                    transform[...] = np.dot(transforms[bone.index], parent_matrix)
+                    animation(bone, transform)
+
+            for bone in self.skeleton.hierachy:
+                transform = self.animation_transforms[bone.index]
+                transforms[bone.index][...] = self.nodes[bone.index].get_transform(frame)
+                transform[...] = transforms[bone.index]
+                animation(bone, transform)
+
+        if local_transforms is not None and transforms is not local_transforms:
+            local_transforms[...] = transforms
+        return self.animation_transforms
+
 
 class AnimationNode:
     def __init__(self, bone, animation_node_data):
@@ -84,6 +143,8 @@ class AnimationNode:
         self.precompute_parent_matrix = animation_node_data.get('precompute_parent_matrix', False)
         self.precompute_inv_bind_matrix = animation_node_data.get('precompute_inv_bind_matrix', False)
         self.target = animation_node_data.get('target', '')  # bone name
+        # the compressed keys are sampled by Animation, see AnimationCompression.
+        self.compressed = animation_node_data.get('compressed', False)
         self.frame_times = animation_node_data.get('times', [])
         self.locations = animation_node_data.get('locations', [])
         self.rotations = animation_node_data.get('rotations', [])
@@ -99,7 +160,7 @@ class AnimationNode:
         self.get_transform(0.0)
 
     def get_transform(self, frame=0.0):
-        if self.last_frame == frame or self.frame_count == 0:
+        if self.last_frame == frame or self.frame_count == 0 or self.compressed:
             return self.transform
         else:
             self.last_frame = frame
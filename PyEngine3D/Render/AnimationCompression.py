@@ -0,0 +1,359 @@
+import math
+
+import numpy as np
+
+from PyEngine3D.Common import logger
+
+
+# the default error tolerances of the keyframe reduction per channel
+ROTATION_TOLERANCE = 0.001  # radian
+LOCATION_TOLERANCE = 0.0005
+SCALE_TOLERANCE = 0.0005
+
+# the quantized vector is the ratio in the range of the channel of the node.
+VECTOR_QUANTIZE_MAX = 65535
+
+# smallest three : the largest component of the quaternion is dropped and the others are in [-1/sqrt(2), 1/sqrt(2)],
+# the index of the largest component is packed into the high bits of the first two components.
+QUATERNION_QUANTIZE_MAX = 32767
+QUATERNION_COMPONENT_RANGE = 1.0 / math.sqrt(2.0)
+QUATERNION_SMALL_INDICES = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]], dtype=np.int32)
+
+IDENTITY_QUATERNION = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+ZERO_LOCATION = np.array([0.0, 0.0, 0.0], dtype=np.float32)
+ONE_SCALE = np.array([1.0, 1.0, 1.0], dtype=np.float32)
+
+
+def encode_quaternions(quaternions):
+    """ quaternions : (n, 4) w, x, y, z, return : (n, 3) uint16 """
+    count = len(quaternions)
+    rows = np.arange(count)
+    largest = np.argmax(np.abs(quaternions), axis=1)
+    # q and -q are the same rotation, the largest component is kept positive.
+    signs = np.where(quaternions[rows, largest] < 0.0, -1.0, 1.0)
+    small = quaternions[rows[:, None], QUATERNION_SMALL_INDICES[largest]] * signs[:, None]
+    small = (small / QUATERNION_COMPONENT_RANGE) * 0.5 + 0.5
+    keys = np.clip(np.round(small * QUATERNION_QUANTIZE_MAX), 0, QUATERNION_QUANTIZE_MAX).astype(np.uint16)
+    keys[:, 0] |= ((largest & 1) << 15).astype(np.uint16)
+    keys[:, 1] |= ((largest >> 1) << 15).astype(np.uint16)
+    return keys
+
+
+def decode_quaternions(keys):
+    """ keys : (n, 3) uint16, return : (n, 4) w, x, y, z """
+    count = len(keys)
+    rows = np.arange(count)
+    largest = (keys[:, 0] >> 15) | ((keys[:, 1] >> 15) << 1)
+    small = (keys & 0x7fff).astype(np.float32) / QUATERNION_QUANTIZE_MAX
+    small = (small * 2.0 - 1.0) * QUATERNION_COMPONENT_RANGE
+    quaternions = np.empty((count, 4), dtype=np.float32)
+    quaternions[rows[:, None], QUATERNION_SMALL_INDICES[largest]] = small
+    quaternions[rows, largest] = np.sqrt(np.maximum(0.0, 1.0 - np.sum(small * small, axis=1)))
+    return quaternions
+
+
+def encode_vectors(vectors, vector_range):
+    """ vector_range : (minimum, extent) """
+    extent = np.where(0.0 < vector_range[1], vector_range[1], 1.0)
+    keys = np.round((vectors - vector_range[0]) / extent * VECTOR_QUANTIZE_MAX)
+    return np.clip(keys, 0, VECTOR_QUANTIZE_MAX).astype(np.uint16)
+
+
+def decode_vectors(keys, vector_ranges):
+    """ vector_ranges : (n, 2, 3) minimum and extent per key """
+    return vector_ranges[:, 0] + keys.astype(np.float32) / VECTOR_QUANTIZE_MAX * vector_ranges[:, 1]
+
+
+def nlerp_quaternions(quaternions0, quaternions1, ratio):
+    # the shorter arc
+    signs = np.where(np.sum(quaternions0 * quaternions1, axis=-1, keepdims=True) < 0.0, -1.0, 1.0)
+    quaternions = quaternions0 * (1.0 - ratio) + quaternions1 * signs * ratio
+    return quaternions / np.linalg.norm(quaternions, axis=-1, keepdims=True)
+
+
+def lerp_vectors(vectors0, vectors1, ratio):
+    return vectors0 * (1.0 - ratio) + vectors1 * ratio
+
+
+def quaternion_errors(quaternions0, quaternions1):
+    """ return : the angles between the rotations """
+    dots = np.abs(np.sum(quaternions0 * quaternions1, axis=-1))
+    return 2.0 * np.arccos(np.clip(dots, 0.0, 1.0))
+
+
+def vector_errors(vectors0, vectors1):
+    return np.linalg.norm(vectors0 - vectors1, axis=-1)
+
+
+def quaternions_to_matrices(quaternions, matrices):
+    """ vectorized quaternion_to_matrix, only the rotation part of the matrices is written. """
+    qw, qx, qy, qz = quaternions[:, 0], quaternions[:, 1], quaternions[:, 2], quaternions[:, 3]
+    qxqx = qx * qx * 2.0
+    qxqy = qx * qy * 2.0
+    qxqz = qx * qz * 2.0
+    qxqw = qx * qw * 2.0
+    qyqy = qy * qy * 2.0
+    qyqz = qy * qz * 2.0
+    qyqw = qy * qw * 2.0
+    qzqw = qz * qw * 2.0
+    qzqz = qz * qz * 2.0
+    matrices[:, 0, 0] = 1.0 - qyqy - qzqz
+    matrices[:, 0, 1] = qxqy + qzqw
+    matrices[:, 0, 2] = qxqz - qyqw
+    matrices[:, 1, 0] = qxqy - qzqw
+    matrices[:, 1, 1] = 1.0 - qxqx - qzqz
+    matrices[:, 1, 2] = qyqz + qxqw
+    matrices[:, 2, 0] = qxqz + qyqw
+    matrices[:, 2, 1] = qyqz - qxqw
+    matrices[:, 2, 2] = 1.0 - qxqx - qyqy
+
+
+def compose_matrices(rotations, locations, scales, matrices):
+    """ the same transform as AnimationNode.get_transform """
+    quaternions_to_matrices(rotations, matrices)
+    matrices[:, :3, :3] *= scales[:, :, None]
+    matrices[:, 3, :3] = locations
+    return matrices
+
+
+def reduce_keys(times, values, decoded_values, interpolate, get_errors, tolerance):
+    """
+    Curve fitting by splitting : the keys between two kept keys are removed while the interpolation of the kept keys
+    is within the tolerance to the source values, otherwise the key of the largest error is kept and both sides are fitted.
+    return : the indices of the kept keys
+    """
+    last = len(times) - 1
+    kept = [0, last]
+    segments = [(0, last)]
+    while segments:
+        begin, end = segments.pop()
+        if end - begin < 2:
+            continue
+        duration = times[end] - times[begin]
+        ratio = (times[begin + 1:end] - times[begin]) / duration if 0.0 < duration else np.zeros(end - begin - 1)
+        ratio = ratio.reshape(-1, 1).astype(np.float32)
+        errors = get_errors(interpolate(decoded_values[begin], decoded_values[end], ratio), values[begin + 1:end])
+        index = int(np.argmax(errors))
+        if tolerance < errors[index]:
+            index += begin + 1
+            kept.append(index)
+            segments.append((begin, index))
+            segments.append((index, end))
+    return np.array(sorted(set(kept)), dtype=np.int32)
+
+
+def compress_channel(times, values, decoded_values, default_value, interpolate, get_errors, tolerance):
+    """ return : the indices of the kept keys, the constant channel keeps a key and the default channel keeps nothing. """
+    if len(times) == 0 or np.max(get_errors(default_value, values)) <= tolerance:
+        return np.zeros(0, dtype=np.int32)
+    if np.max(get_errors(decoded_values[0], values)) <= tolerance:
+        return np.zeros(1, dtype=np.int32)
+    return reduce_keys(times, values, decoded_values, interpolate, get_errors, tolerance)
+
+
+def get_vector_range(vectors):
+    vector_min = np.min(vectors, axis=0)
+    return np.array([vector_min, np.max(vectors, axis=0) - vector_min], dtype=np.float32)
+
+
+def get_frame_index_type(frame_count):
+    """ the key frame indices are uint16, the clips of more frames store them as uint32. """
+    return np.uint16 if frame_count <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def compress_animation_node_data(animation_node_data,
+                                 rotation_tolerance=ROTATION_TOLERANCE,
+                                 location_tolerance=LOCATION_TOLERANCE,
+                                 scale_tolerance=SCALE_TOLERANCE):
+    times = np.array(animation_node_data.get('times', []), dtype=np.float32)
+    compressed_data = dict(
+        name=animation_node_data.get('name', ''),
+        target=animation_node_data.get('target', ''),
+        precompute_parent_matrix=animation_node_data.get('precompute_parent_matrix', False),
+        precompute_inv_bind_matrix=animation_node_data.get('precompute_inv_bind_matrix', False),
+        compressed=True,
+        times=times
+    )
+
+    if 0 < len(times):
+        frame_index_type = get_frame_index_type(len(times))
+        rotations = np.array(animation_node_data['rotations'], dtype=np.float32).reshape(-1, 4)
+        keys = encode_quaternions(rotations)
+        indices = compress_channel(times, rotations, decode_quaternions(keys), IDENTITY_QUATERNION,
+                                   nlerp_quaternions, quaternion_errors, rotation_tolerance)
+        compressed_data['rotation_frames'] = indices.astype(frame_index_type)
+        compressed_data['rotation_keys'] = keys[indices]
+
+        for channel, default_value, tolerance in (('location', ZERO_LOCATION, location_tolerance),
+                                                  ('scale', ONE_SCALE, scale_tolerance)):
+            vectors = np.array(animation_node_data[channel + 's'], dtype=np.float32).reshape(-1, 3)
+            vector_range = get_vector_range(vectors)
+            keys = encode_vectors(vectors, vector_range)
+            decoded_vectors = decode_vectors(keys, np.tile(vector_range, (len(keys), 1, 1)))
+            indices = compress_channel(times, vectors, decoded_vectors, default_value,
+                                       lerp_vectors, vector_errors, tolerance)
+            compressed_data[channel + '_frames'] = indices.astype(frame_index_type)
+            compressed_data[channel + '_keys'] = keys[indices]
+            compressed_data[channel + '_range'] = vector_range
+    return compressed_data
+
+
+def get_animation_data_size(animation_data):
+    """ the size of the source keys as float32 or the size of the compressed arrays """
+    size = 0
+    for animation_node_data in animation_data:
+        if animation_node_data.get('compressed', False):
+            size += sum(value.nbytes for value in animation_node_data.values() if isinstance(value, np.ndarray))
+        else:
+            size += len(animation_node_data.get('times', [])) * (1 + 4 + 3 + 3) * 4
+    return size
+
+
+def get_max_pose_error(animation_data, compressed_data, inv_bind_matrices):
+    """
+    The largest distance between the vertices at the bind positions of the bones
+    transformed by the source keys and by the compressed keys at every source frame.
+    The transforms of the nodes are in the model space when they precompute the parent matrix.
+    """
+    node_count = len(animation_data)
+    bind_positions = np.zeros((node_count, 4), dtype=np.float32)
+    bind_positions[:, 3] = 1.0
+    for i in range(min(node_count, len(inv_bind_matrices))):
+        bind_positions[i][:3] = np.linalg.inv(np.array(inv_bind_matrices[i], dtype=np.float32))[3, :3]
+
+    compressed_animation = CompressedAnimation(compressed_data)
+    source_matrices = np.tile(np.eye(4, dtype=np.float32), (node_count, 1, 1))
+    rotations = np.tile(IDENTITY_QUATERNION, (node_count, 1))
+    locations = np.tile(ZERO_LOCATION, (node_count, 1))
+    scales = np.tile(ONE_SCALE, (node_count, 1))
+    frame_times = max((animation_node_data.get('times', []) for animation_node_data in animation_data), key=len)
+
+    max_error = 0.0
+    for frame, frame_time in enumerate(frame_times):
+        for i, animation_node_data in enumerate(animation_data):
+            if frame < len(animation_node_data.get('times', [])):
+                rotations[i] = animation_node_data['rotations'][frame]
+                locations[i] = animation_node_data['locations'][frame]
+                scales[i] = animation_node_data['scales'][frame]
+        compose_matrices(rotations, locations, scales, source_matrices)
+        compressed_matrices = compressed_animation.get_transforms(frame_time)
+        source_positions = np.einsum('ni,nij->nj', bind_positions, source_matrices)
+        compressed_positions = np.einsum('ni,nij->nj', bind_positions, compressed_matrices)
+        max_error = max(max_error, float(np.max(vector_errors(source_positions[:, :3], compressed_positions[:, :3]))))
+    return max_error
+
+
+def compress_animation_data(name, animation_data, inv_bind_matrices,
+                            rotation_tolerance=ROTATION_TOLERANCE,
+                            location_tolerance=LOCATION_TOLERANCE,
+                            scale_tolerance=SCALE_TOLERANCE):
+    """ animation_data : the animation node datas of a skeleton ordered by bone index """
+    compressed_data = [compress_animation_node_data(animation_node_data,
+                                                    rotation_tolerance=rotation_tolerance,
+                                                    location_tolerance=location_tolerance,
+                                                    scale_tolerance=scale_tolerance) for animation_node_data in animation_data]
+
+    source_size = get_animation_data_size(animation_data)
+    compressed_size = get_animation_data_size(compressed_data)
+    max_pose_error = get_max_pose_error(animation_data, compressed_data, inv_bind_matrices) if animation_data else 0.0
+    logger.info("Compress %s animation : %d bytes -> %d bytes (%.1f%%), max pose error %f" %
+                (name, source_size, compressed_size, compressed_size * 100.0 / max(1, source_size), max_pose_error))
+    return compressed_data
+
+
+class CompressedChannel:
+    """
+    The keys of a channel of all nodes are concatenated, the key times are shifted by the node
+    so the keys of all nodes are found by one search. The nodes without keys keep the default value.
+    decode : decode(keys, active_nodes), interpolate : interpolate(values0, values1, ratio) of the channel type.
+    """
+    def __init__(self, animation_data, channel, default_value, decode, interpolate):
+        self.channel = channel
+        self.decode = decode
+        self.interpolate = interpolate
+        counts = np.array([len(x.get(channel + '_frames', [])) for x in animation_data], dtype=np.int32)
+        self.node_indices = np.nonzero(counts)[0]
+        self.counts = counts[self.node_indices]
+        self.starts = np.cumsum(self.counts) - self.counts
+        self.values = np.tile(default_value, (len(animation_data), 1)).astype(np.float32)
+
+        if 0 < len(self.node_indices):
+            # the keys store the indices of the source frames
+            self.key_times = np.concatenate([animation_data[i]['times'][animation_data[i][channel + '_frames']] for i in self.node_indices])
+            self.keys = np.concatenate([animation_data[i][channel + '_keys'] for i in self.node_indices])
+        else:
+            self.key_times = np.zeros(0, dtype=np.float32)
+            self.keys = np.zeros((0, 3), dtype=np.uint16)
+        self.time_span = (float(np.max(self.key_times)) if 0 < len(self.key_times) else 0.0) + 1.0
+        key_nodes = np.repeat(np.arange(len(self.node_indices)), self.counts)
+        self.shifted_key_times = self.key_times.astype(np.float64) + key_nodes * self.time_span
+
+    def sample(self, time, node_mask=None):
+        """ return : the values of all nodes, only the nodes of the mask are updated. """
+        if node_mask is None:
+            active_nodes = np.arange(len(self.node_indices))
+        else:
+            active_nodes = np.nonzero(node_mask[self.node_indices])[0]
+
+        if 0 < len(active_nodes):
+            starts = self.starts[active_nodes]
+            lasts = starts + self.counts[active_nodes] - 1
+            indices = np.searchsorted(self.shifted_key_times, time + active_nodes * self.time_span, side='right') - 1
+            indices = np.clip(indices, starts, lasts)
+            next_indices = np.minimum(indices + 1, lasts)
+            times0 = self.key_times[indices]
+            durations = self.key_times[next_indices] - times0
+            ratio = np.clip((time - times0) / np.where(0.0 < durations, durations, 1.0), 0.0, 1.0)
+            ratio = np.where(0.0 < durations, ratio, 0.0).reshape(-1, 1)
+            values0 = self.decode(self.keys[indices], active_nodes)
+            values1 = self.decode(self.keys[next_indices], active_nodes)
+            self.values[self.node_indices[active_nodes]] = self.interpolate(values0, values1, ratio)
+        return self.values
+
+
+class CompressedRotationChannel(CompressedChannel):
+    def __init__(self, animation_data):
+        CompressedChannel.__init__(self, animation_data, 'rotation', IDENTITY_QUATERNION, self.decode_keys, nlerp_quaternions)
+
+    def decode_keys(self, keys, active_nodes):
+        return decode_quaternions(keys)
+
+
+class CompressedVectorChannel(CompressedChannel):
+    def __init__(self, animation_data, channel, default_value):
+        CompressedChannel.__init__(self, animation_data, channel, default_value, self.decode_keys, lerp_vectors)
+        if 0 < len(self.node_indices):
+            self.ranges = np.array([animation_data[i][channel + '_range'] for i in self.node_indices], dtype=np.float32)
+        else:
+            self.ranges = np.zeros((0, 2, 3), dtype=np.float32)
+
+    def decode_keys(self, keys, active_nodes):
+        return decode_vectors(keys, self.ranges[active_nodes])
+
+
+class CompressedAnimation:
+    """ The keys of all nodes are decompressed and interpolated at once. """
+    def __init__(self, animation_data):
+        self.rotation_channel = CompressedRotationChannel(animation_data)
+        self.location_channel = CompressedVectorChannel(animation_data, 'location', ZERO_LOCATION)
+        self.scale_channel = CompressedVectorChannel(animation_data, 'scale', ONE_SCALE)
+        self.transforms = np.tile(np.eye(4, dtype=np.float32), (len(animation_data), 1, 1))
+
+    def get_transforms(self, time, node_mask=None, transforms=None):
+        """
+        transforms : the output transforms, the transforms of the animation by default.
+        node_mask : only the nodes of the mask are written, the others keep the values of the output transforms.
+        """
+        if transforms is None:
+            transforms = self.transforms
+        rotations = self.rotation_channel.sample(time, node_mask)
+        locations = self.location_channel.sample(time, node_mask)
+        scales = self.scale_channel.sample(time, node_mask)
+        if node_mask is None:
+            return compose_matrices(rotations, locations, scales, transforms)
+
+        # the sampled values of the other nodes are left by the previous calls
+        indices = np.nonzero(node_mask)[0]
+        matrices = np.tile(np.eye(4, dtype=np.float32), (len(indices), 1, 1))
+        transforms[indices] = compose_matrices(rotations[indices], locations[indices], scales[indices], matrices)
+        return transforms
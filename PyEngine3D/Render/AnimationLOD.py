@@ -0,0 +1,67 @@
+from .RenderInfo import get_screen_size
+
+
+# the bones deeper than it, such as the fingers and the face, are not evaluated at the distant lods.
+ANIMATION_LOD_BONE_DEPTH = 6
+
+# (minimum screen size, update interval, max bone depth) from the nearest lod,
+# the screen size is the ratio of the bound diameter to the screen height.
+ANIMATION_LODS = (
+    (0.25, 1, None),
+    (0.1, 2, None),
+    (0.04, 4, ANIMATION_LOD_BONE_DEPTH),
+    (0.0, 8, ANIMATION_LOD_BONE_DEPTH),
+)
+
+# the actor which is out of the view but casts a shadow
+SHADOW_ANIMATION_LOD = ANIMATION_LODS[-1]
+
+
+def get_animation_lod(screen_size):
+    for animation_lod in ANIMATION_LODS:
+        if animation_lod[0] <= screen_size:
+            return animation_lod
+    return ANIMATION_LODS[-1]
+
+
+class AnimationLOD:
+    """
+    The skeleton actors choose the update interval and the evaluated bones by the screen size and the visibility,
+    the bones of the actors culled from the view and the shadow cascades are not evaluated, only the time advances.
+    full : every bone is evaluated, partial : the deep bones are skipped,
+    interpolated : the pose is interpolated between the evaluations, not updated : the actor is culled.
+    """
+    def __init__(self):
+        self.full_update_count = 0
+        self.partial_update_count = 0
+        self.interpolated_count = 0
+        self.not_update_count = 0
+
+    def update_animation_lod(self, camera, skeleton_actors, view_render_infos_list, shadow_render_infos_list):
+        self.full_update_count = 0
+        self.partial_update_count = 0
+        self.interpolated_count = 0
+        self.not_update_count = 0
+
+        view_actors = set(render_info.actor for render_infos in view_render_infos_list for render_info in render_infos)
+        shadow_actors = set(render_info.actor for render_infos in shadow_render_infos_list for render_info in render_infos)
+
+        for actor in skeleton_actors:
+            if actor.is_baked_animation():
+                continue
+
+            if actor in view_actors:
+                min_screen_size, lod_interval, max_bone_depth = get_animation_lod(get_screen_size(camera, actor.bound_box))
+            elif actor in shadow_actors:
+                min_screen_size, lod_interval, max_bone_depth = SHADOW_ANIMATION_LOD
+            else:
+                actor.skip_animation_buffers()
+                self.not_update_count += 1
+                continue
+
+            if not actor.update_animation_buffers(lod_interval, max_bone_depth):
+                self.interpolated_count += 1
+            elif max_bone_depth is None:
+                self.full_update_count += 1
+            else:
+                self.partial_update_count += 1
@@ -0,0 +1,119 @@
+import numpy as np
+from OpenGL.GL import *
+
+from PyEngine3D.Common import logger
+from PyEngine3D.OpenGLContext import CreateTexture, Texture2D
+from PyEngine3D.Utilities import *
+
+
+# the sampling rate of the baked animations
+BAKED_ANIMATION_FRAME_RATE = 30.0
+
+# reference : default_vs.glsl
+MAX_BAKED_ANIMATIONS = 16
+
+
+def get_baked_frame_count(animation, frame_rate=BAKED_ANIMATION_FRAME_RATE):
+    if animation is None or animation.animation_length <= 0.0:
+        return 1
+    return max(1, int(round(animation.animation_length * frame_rate)))
+
+
+def bake_animation(animation, frame_count):
+    """
+    Sample the bone matrices at the fixed rate, the frames divide the animation length equally,
+    so the frame after the last one is the first one and the baked animation loops seamlessly.
+    return : (frame_count, bone_count, 4, 4)
+    """
+    transforms = np.zeros((frame_count, len(animation.nodes), 4, 4), dtype=np.float32)
+    frame = 0.0
+    for i in range(frame_count):
+        frame = animation.get_time_to_frame(frame, animation.animation_length * i / frame_count)
+        transforms[i][...] = animation.get_animation_transforms(frame)
+    return transforms
+
+
+class BakedAnimation:
+    """
+    The animations of the meshes are baked into a float texture per skeleton, a row is a frame
+    and four texels are the rows of a bone matrix. The animations are stacked vertically.
+    animation_infos : (row offset, frame count, frame rate, 0) per animation.
+    """
+    def __init__(self, name, animation_meshes, frame_rate=BAKED_ANIMATION_FRAME_RATE):
+        self.name = name
+        self.animation_meshes = animation_meshes[:MAX_BAKED_ANIMATIONS]
+        if MAX_BAKED_ANIMATIONS < len(animation_meshes):
+            logger.warn("%s baked animation can have %d animations." % (name, MAX_BAKED_ANIMATIONS))
+
+        self.animation_infos = np.zeros((len(self.animation_meshes), 4), dtype=np.float32)
+        row_offset = 0
+        for i, mesh in enumerate(self.animation_meshes):
+            animation = next((x for x in mesh.animations if x is not None), None)
+            frame_count = get_baked_frame_count(animation, frame_rate)
+            animation_length = animation.animation_length if animation is not None else 0.0
+            self.animation_infos[i] = (row_offset, frame_count, frame_count / animation_length if 0.0 < animation_length else 0.0, 0.0)
+            row_offset += frame_count
+
+        self.textures = []
+        for skeleton_index, skeleton in enumerate(self.animation_meshes[0].skeletons):
+            frames = []
+            for i, mesh in enumerate(self.animation_meshes):
+                frame_count = int(self.animation_infos[i][1])
+                animation = mesh.get_animation(skeleton_index)
+                if animation is not None and len(animation.nodes) == len(skeleton.bones):
+                    frames.append(bake_animation(animation, frame_count))
+                else:
+                    logger.warn("%s has no animation of %s skeleton, the bind pose is baked." % (mesh.name, skeleton.name))
+                    frames.append(np.tile(MATRIX4_IDENTITY.astype(np.float32), (frame_count, len(skeleton.bones), 1, 1)))
+            frames = np.concatenate(frames)
+            height, bone_count = frames.shape[:2]
+            texture = CreateTexture(name="%s_%s" % (name, skeleton.name),
+                                    texture_type=Texture2D,
+                                    width=bone_count * 4,
+                                    height=height,
+                                    internal_format=GL_RGBA32F,
+                                    texture_format=GL_RGBA,
+                                    data_type=GL_FLOAT,
+                                    min_filter=GL_NEAREST,
+                                    mag_filter=GL_NEAREST,
+                                    wrap=GL_CLAMP_TO_EDGE,
+                                    data=np.ascontiguousarray(frames.reshape(height, bone_count * 4, 4)))
+            self.textures.append(texture)
+        logger.info("Bake %s animation : %d animations, %d frames." % (name, len(self.animation_meshes), row_offset))
+
+    def delete(self):
+        for texture in self.textures:
+            texture.delete()
+        self.textures = []
+
+    def get_animation_count(self):
+        return len(self.animation_meshes)
+
+    def get_texture(self, skeleton_index):
+        return self.textures[skeleton_index]
+
+
+class BakedAnimationManager(Singleton):
+    def __init__(self):
+        self.baked_animations = dict()
+
+    def clear(self):
+        for baked_animation in self.baked_animations.values():
+            baked_animation.delete()
+        self.baked_animations = dict()
+
+    def get_baked_animation(self, animation_meshes):
+        """ the actors of the same animations share the textures, they are baked when the actor is loaded. """
+        key = tuple(mesh.name for mesh in animation_meshes)
+        baked_animation = self.baked_animations.get(key)
+        if baked_animation is None:
+            baked_animation = BakedAnimation("_".join(key), animation_meshes)
+            self.baked_animations[key] = baked_animation
+        return baked_animation
+
+    def rebake_animations(self, mesh_name):
+        """ the baked animations of the reloaded mesh are stale, they are baked again from the reloaded mesh. """
+        for key in [key for key in self.baked_animations if mesh_name in key]:
+            baked_animation = self.baked_animations.pop(key)
+            baked_animation.delete()
+            self.baked_animations[key] = BakedAnimation(baked_animation.name, baked_animation.animation_meshes)
@@ -0,0 +1,163 @@
+import math
+
+from OpenGL.GL import *
+
+from PyEngine3D.Common import logger
+
+
+# in flight timer queries, the result of a query is read a few frames later without waiting for the GPU.
+GPU_TIMER_QUERY_COUNT = 3
+
+# the render scale is kept while the gpu time is in [target * (1 - headroom - dead_band), target * (1 - headroom)]
+DYNAMIC_RESOLUTION_HEADROOM = 0.05
+DYNAMIC_RESOLUTION_DEAD_BAND = 0.1
+
+# go down fast to recover the frame rate, go up slowly to avoid the oscillation.
+DYNAMIC_RESOLUTION_MAX_STEP_DOWN = 0.1
+DYNAMIC_RESOLUTION_MAX_STEP_UP = 0.02
+
+# the render scale is quantized to avoid the resize of the viewport every frame.
+DYNAMIC_RESOLUTION_SCALE_STEP = 1.0 / 64.0
+
+# smoothing of the measured gpu time
+GPU_TIME_SMOOTHING = 0.2
+
+
+def get_next_render_scale(render_scale, gpu_time, target_time, min_scale, max_scale=1.0):
+    """
+    The gpu time is assumed to be proportional to the pixel count, i.e. the square of the render scale.
+    :param gpu_time, target_time: milliseconds
+    :return: the render scale of the next frame
+    """
+    if gpu_time <= 0.0 or target_time <= 0.0:
+        return render_scale
+
+    budget = target_time * (1.0 - DYNAMIC_RESOLUTION_HEADROOM)
+    if budget * (1.0 - DYNAMIC_RESOLUTION_DEAD_BAND) <= gpu_time <= budget:
+        return render_scale
+
+    desired_scale = render_scale * math.sqrt(budget / gpu_time)
+    desired_scale = max(render_scale - DYNAMIC_RESOLUTION_MAX_STEP_DOWN,
+                        min(render_scale + DYNAMIC_RESOLUTION_MAX_STEP_UP, desired_scale))
+    desired_scale = round(desired_scale / DYNAMIC_RESOLUTION_SCALE_STEP) * DYNAMIC_RESOLUTION_SCALE_STEP
+    return max(min_scale, min(max_scale, desired_scale))
+
+
+def get_render_scale_xy(width, height, render_scale):
+    # the ratio of the integer viewport, see FrameBuffer.set_viewport
+    return max(1, int(width * render_scale)) / max(1, width), max(1, int(height * render_scale)) / max(1, height)
+
+
+class GPUTimer:
+    """ GL_TIME_ELAPSED queries of a ring, the results are polled and never wait. """
+    def __init__(self, query_count=GPU_TIMER_QUERY_COUNT):
+        self.query_count = query_count
+        self.queries = []
+        self.query_index = 0
+        self.pending_queries = []
+        self.is_measuring = False
+        self.gpu_time = 0.0  # smoothed milliseconds
+
+    def initialize(self):
+        self.clear()
+        self.queries = list(glGenQueries(self.query_count))
+
+    def clear(self):
+        if self.queries:
+            glDeleteQueries(len(self.queries), self.queries)
+        self.queries = []
+        self.query_index = 0
+        self.pending_queries = []
+        self.is_measuring = False
+        self.gpu_time = 0.0
+
+    def begin(self):
+        if not self.queries or self.is_measuring:
+            return False
+
+        query = self.queries[self.query_index]
+        if query in self.pending_queries:
+            # every query is in flight, skip the measurement of this frame.
+            return False
+
+        self.query_index = (self.query_index + 1) % len(self.queries)
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        self.is_measuring = True
+        self.pending_queries.append(query)
+        return True
+
+    def end(self):
+        if self.is_measuring:
+            glEndQuery(GL_TIME_ELAPSED)
+            self.is_measuring = False
+
+    def update(self):
+        """ return : True when a new result is available, it must be called outside of begin and end. """
+        updated = False
+        while self.pending_queries and not self.is_measuring:
+            query = self.pending_queries[0]
+            if not glGetQueryObjectuiv(query, GL_QUERY_RESULT_AVAILABLE):
+                break
+
+            self.pending_queries.pop(0)
+            elapsed_time = glGetQueryObjectui64v(query, GL_QUERY_RESULT) / 1000000.0
+            if 0.0 < self.gpu_time:
+                self.gpu_time += (elapsed_time - self.gpu_time) * GPU_TIME_SMOOTHING
+            else:
+                self.gpu_time = elapsed_time
+            updated = True
+        return updated
+
+
+class DynamicResolution:
+    """
+    The scene render targets are allocated at the full size and rendered in the sub rect of the render scale.
+    The render scale follows the gpu time of the scene to meet the target frame time,
+    the sub rect is upscaled to the back buffer by the tone mapping.
+    """
+    def __init__(self):
+        self.gpu_timer = GPUTimer()
+        self.render_scale = 1.0
+        self.prev_render_scale = 1.0
+
+    def initialize(self):
+        self.gpu_timer.initialize()
+        self.render_scale = 1.0
+        self.prev_render_scale = 1.0
+
+    def clear(self):
+        self.gpu_timer.clear()
+
+    def get_gpu_time(self):
+        return self.gpu_timer.gpu_time
+
+    def begin_frame(self):
+        self.gpu_timer.begin()
+
+    def end_frame(self):
+        self.gpu_timer.end()
+
+    def update(self, enable, target_time, min_scale):
+        """ called once a frame before the scene is rendered. """
+        self.prev_render_scale = self.render_scale
+
+        if not enable:
+            self.render_scale = 1.0
+        elif self.gpu_timer.update():
+            self.render_scale = get_next_render_scale(self.render_scale, self.gpu_timer.gpu_time, target_time, min_scale)
+        return self.render_scale
+
+
+def benchmark_dynamic_resolution(frame_count=120, full_resolution_time=25.0, target_time=16.6, min_scale=0.5):
+    # simulated gpu time : proportional to the pixel count with a fixed cost
+    render_scale = 1.0
+    for frame in range(frame_count):
+        gpu_time = 2.0 + (full_resolution_time - 2.0) * render_scale * render_scale
+        render_scale = get_next_render_scale(render_scale, gpu_time, target_time, min_scale)
+        if 0 == frame % 10:
+            logger.info("frame %d : render scale %.3f, gpu time %.2fms" % (frame, render_scale, gpu_time))
+    return render_scale
+
+
+if __name__ == '__main__':
+    benchmark_dynamic_resolution()
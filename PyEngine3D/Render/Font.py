@@ -1,9 +1,85 @@
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
+from OpenGL.GL import *
+
+from PyEngine3D.Common import logger
+from PyEngine3D.OpenGLContext import CreateTexture, Texture2D
 from PyEngine3D.Utilities import *
 from .RenderOptions import RenderOption
 
 
+# the size of the atlas of a dynamic font, the memory does not depend on the size of the unicode block.
+GLYPH_CACHE_TEXTURE_SIZE = 1024
+
+# the slot of the empty glyph which is shown until the glyph is rasterized
+EMPTY_GLYPH_SLOT = 0
+
+# the laid out lines kept by a font
+MAX_GLYPH_RUN_COUNT = 4096
+
+
+def layout_lines(lines, font_data):
+    """
+    return : (columns, texcoords) of the glyphs of each line, the spaces and the tabs take a column without a glyph.
+    there is exactly one run per line, the lines are the physical lines without the line breaks.
+    """
+    codes = np.frombuffer('\n'.join(lines).encode('utf-32-le'), dtype=np.uint32)
+    is_newline = codes == 10
+    row_indices = np.cumsum(is_newline) - is_newline
+    row_starts = np.concatenate([[0], np.nonzero(is_newline)[0] + 1])
+    columns = np.arange(len(codes)) - row_starts[row_indices]
+    # the runs are split by the lengths of the lines, so a line break in a line does not shift the runs of the others.
+    line_lengths = np.array([len(line) + 1 for line in lines], dtype=np.int64)
+    line_indices = np.repeat(np.arange(len(lines)), line_lengths)[:len(codes)]
+
+    is_glyph = np.logical_not(is_newline | (codes == 9) | (codes == 32))
+    slots = font_data.get_glyph_slots(codes[is_glyph])
+    count_of_side = font_data.count_of_side
+    texcoords = np.empty((len(slots), 2), dtype=np.float32)
+    texcoords[:, 0] = (slots % count_of_side) / count_of_side
+    texcoords[:, 1] = (count_of_side - 1 - slots // count_of_side) / count_of_side
+
+    split_indices = np.cumsum(np.bincount(line_indices[is_glyph], minlength=len(lines)))[:-1]
+    return list(zip(np.split(columns[is_glyph].astype(np.float32), split_indices), np.split(texcoords, split_indices)))
+
+
+class GlyphRunCache:
+    """ the laid out lines of a font, a line is laid out once until the glyph cache replaces the glyphs. """
+    def __init__(self, max_count=MAX_GLYPH_RUN_COUNT):
+        self.max_count = max_count
+        self.runs = OrderedDict()
+        self.generation = 0
+
+    def get_runs(self, lines, font_data):
+        """ lines : the physical lines, a cached run is a line without the line breaks. """
+        if self.generation != font_data.generation:
+            self.generation = font_data.generation
+            self.runs.clear()
+
+        runs = self.runs
+        unique_lines = set(lines)
+        missing_lines = [line for line in unique_lines if line not in runs]
+        # the glyphs of the cached lines are used again, so the glyph cache keeps them.
+        font_data.touch_glyphs([line for line in unique_lines if line in runs])
+        if missing_lines:
+            # the missing lines are laid out at once.
+            for line, run in zip(missing_lines, layout_lines(missing_lines, font_data)):
+                runs[line] = run
+
+        result = []
+        for line in lines:
+            result.append(runs[line])
+            runs.move_to_end(line)
+
+        while self.max_count < len(runs):
+            runs.popitem(last=False)
+        return result
+
+
 class TextRenderData:
     def __init__(self):
         self._text = ""
@@ -15,6 +91,7 @@ class TextRenderData:
         self.initial_column = 0
         self.initial_row = 0
         self.font_data = None
+        self.glyph_generation = 0
         self.render_count = 0
         self.render_queue = np.zeros(1, (np.float32, 4))
 
@@ -24,42 +101,45 @@ class TextRenderData:
 
     @text.setter
     def text(self, text):
-        self._text = text
-
-        ratio = 1.0 / self.font_data.count_of_side
-        text_count = len(text)
-
-        if len(self.render_queue) < text_count:
-            self.render_queue.resize((text_count, 4), refcheck=False)
-
-        render_index = 0
-        max_column = self.initial_column
-        column = self.initial_column
-        row = self.initial_row
-
-        for c in text:
-            if c == '\n':
-                column = self.initial_column
-                row += 1
-            elif c == '\t':
-                column += 1
-            elif c == ' ':
-                column += 1
-            else:
-                index = max(0, ord(c) - self.font_data.range_min)
-                texcoord_x = (index % self.font_data.count_of_side) * ratio
-                texcoord_y = (self.font_data.count_of_side - 1 - int(index * ratio)) * ratio
-                self.render_queue[render_index][...] = [column, row, texcoord_x, texcoord_y]
-                render_index += 1
-                column += 1
-            max_column = max(max_column, column)
-        row += 1
-
-        self.column = max_column - self.initial_column
-        self.row = row - self.initial_row
+        self.set_lines(text.split('\n'), text)
+
+    def set_lines(self, lines, text=None):
+        """ lay out the lines with the runs cached by the font, the output is the same as the text setter """
+        self._text = '\n'.join(lines) if text is None else text
+        self.glyph_generation = self.font_data.generation
+        # an entry of the lines may have the line breaks, a run and a row are a physical line.
+        lines = self._text.split('\n')
+
+        runs = self.font_data.glyph_run_cache.get_runs(lines, self.font_data)
+        glyph_counts = [len(columns) for columns, texcoords in runs]
+        render_count = sum(glyph_counts)
+
+        if len(self.render_queue) < render_count:
+            self.render_queue.resize((render_count, 4), refcheck=False)
+
+        if 0 < render_count:
+            render_queue = self.render_queue[:render_count]
+            render_queue[:, 0] = np.concatenate([columns for columns, texcoords in runs])
+            render_queue[:, 0] += self.initial_column
+            render_queue[:, 1] = np.repeat(np.arange(len(lines)), glyph_counts)
+            render_queue[:, 1] += self.initial_row
+            render_queue[:, 2:4] = np.concatenate([texcoords for columns, texcoords in runs])
+
+        self.column = max(len(line) for line in lines)
+        self.row = len(lines)
         self.width = self.column * self.font_size
         self.height = self.row * self.font_size
-        self.render_count = render_index
+        self.render_count = render_count
+
+    def is_expired(self):
+        """ the glyph cache replaced the glyphs, the slots of the text must be found again. """
+        return self.font_data is not None and self.glyph_generation != self.font_data.generation
+
+    def update_glyphs(self):
+        if self.is_expired():
+            self.text = self._text
+            return True
+        return False
 
     def set_text(self, text, font_data, initial_column=0, initial_row=0, font_size=10, skip_check=False):
         if not skip_check and text == self.text:
@@ -73,6 +153,14 @@ class TextRenderData:
         self.text = text
         return True
 
+    def set_text_lines(self, lines, font_data, initial_column=0, initial_row=0, font_size=10):
+        self.font_data = font_data
+        self.font_size = font_size
+        self.initial_column = initial_column
+        self.initial_row = initial_row
+
+        self.set_lines(lines)
+
 
 class FontData:
     def __init__(self, unicode_block_name, font_data):
@@ -83,6 +171,118 @@ class FontData:
         self.count_of_side = font_data['count_of_side']
         self.font_size = font_data['font_size']
         self.texture = font_data['texture']
+        self.generation = 0
+        self.glyph_run_cache = GlyphRunCache()
+
+    def get_glyph_slot(self, code):
+        return max(0, code - self.range_min)
+
+    def get_glyph_slots(self, codes):
+        return np.maximum(codes.astype(np.int64) - self.range_min, 0)
+
+    def touch_glyphs(self, lines):
+        pass
+
+    def delete(self):
+        self.texture.delete()
+
+
+class DynamicFontData:
+    """
+    The glyphs are rasterized on the first use by the worker thread and uploaded to a cell of a fixed atlas.
+    When the atlas is full, the least recently used glyph is replaced and the generation is increased,
+    so the texts of the old generation find their slots again.
+    """
+    def __init__(self, name, unicode_block_name, range_min, range_max, rasterizer):
+        self.unicode_block_name = unicode_block_name
+        self.range_min = range_min
+        self.range_max = range_max
+        self.rasterizer = rasterizer
+        self.font_size = rasterizer.cell_size
+        self.count_of_side = max(2, GLYPH_CACHE_TEXTURE_SIZE // self.font_size)
+        self.text_count = self.count_of_side * self.count_of_side
+        self.generation = 0
+        self.glyph_run_cache = GlyphRunCache()
+
+        texture_size = self.count_of_side * self.font_size
+        self.texture = CreateTexture(name=name,
+                                     texture_type=Texture2D,
+                                     image_mode='RGB',
+                                     width=texture_size,
+                                     height=texture_size,
+                                     data=np.zeros((texture_size, texture_size, 3), dtype=np.uint8),
+                                     min_filter=GL_LINEAR,
+                                     mag_filter=GL_LINEAR)
+
+        # code : slot, the order of the use
+        self.slots = OrderedDict()
+        self.free_slots = list(range(self.text_count - 1, EMPTY_GLYPH_SLOT, -1))
+        # (code, slot, future) of the glyphs on the worker thread
+        self.pending_glyphs = []
+        self.clear_slots = []
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def get_glyph_slot(self, code):
+        slot = self.slots.get(code)
+        if slot is not None:
+            self.slots.move_to_end(code)
+            return slot
+
+        if code < self.range_min or self.range_max < code:
+            return EMPTY_GLYPH_SLOT
+
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            evicted_code, slot = self.slots.popitem(last=False)
+            self.clear_slots.append(slot)
+            self.generation += 1
+        self.slots[code] = slot
+        self.pending_glyphs.append((code, slot, self.executor.submit(self.rasterizer, code)))
+        return slot
+
+    def touch_glyphs(self, lines):
+        """ mark the glyphs of the lines as recently used without looking up their slots """
+        slots = self.slots
+        for char in set(''.join(lines)):
+            code = ord(char)
+            if code in slots:
+                slots.move_to_end(code)
+
+    def get_glyph_slots(self, codes):
+        unique_codes, inverse_indices = np.unique(codes, return_inverse=True)
+        slots = np.array([self.get_glyph_slot(int(code)) for code in unique_codes], dtype=np.int64)
+        return slots[inverse_indices]
+
+    def get_slot_offset(self, slot):
+        x = (slot % self.count_of_side) * self.font_size
+        y = (self.count_of_side - 1 - slot // self.count_of_side) * self.font_size
+        return x, y
+
+    def upload_glyphs(self):
+        """ upload the rasterized glyphs to their cells, it must be called on the render thread. """
+        for slot in self.clear_slots:
+            x, y = self.get_slot_offset(slot)
+            self.texture.update_sub_image(x, y, self.font_size, self.font_size,
+                                          np.zeros((self.font_size, self.font_size, 3), dtype=np.uint8))
+        self.clear_slots = []
+
+        pending_glyphs = []
+        for code, slot, future in self.pending_glyphs:
+            if not future.done():
+                pending_glyphs.append((code, slot, future))
+            elif self.slots.get(code) == slot:
+                try:
+                    glyph_image = future.result()
+                    x, y = self.get_slot_offset(slot)
+                    self.texture.update_sub_image(x, y, self.font_size, self.font_size, glyph_image)
+                except:
+                    logger.error(traceback.format_exc())
+        self.pending_glyphs = pending_glyphs
+
+    def delete(self):
+        self.executor.shutdown(wait=False)
+        self.texture.delete()
 
 
 class FontManager(Singleton):
@@ -95,6 +295,7 @@ class FontManager(Singleton):
 
         self.logs = []
         self.text_render_data = None
+        self.dynamic_font_datas = []
 
     def initialize(self, core_manager):
         self.core_manager = core_manager
@@ -102,6 +303,20 @@ class FontManager(Singleton):
         self.ascii = self.resource_manager.get_default_font_data()
         self.text_render_data = TextRenderData()
 
+    def add_dynamic_font_data(self, font_data):
+        self.dynamic_font_datas.append(font_data)
+
+    def remove_dynamic_font_data(self, font_data):
+        if font_data in self.dynamic_font_datas:
+            self.dynamic_font_datas.remove(font_data)
+
+    def get_glyph_cache_generation(self):
+        return sum(font_data.generation for font_data in self.dynamic_font_datas)
+
+    def update(self):
+        for font_data in self.dynamic_font_datas:
+            font_data.upload_glyphs()
+
     def clear_logs(self):
         self.logs = []
         self.text_render_data.set_text("", self.ascii, font_size=12)
@@ -117,7 +332,7 @@ class FontManager(Singleton):
 
     def render_log(self, canvas_width, canvas_height):
         if RenderOption.RENDER_FONT and self.show and 0 < len(self.logs):
-            text = "\n".join(self.logs)
+            # the lines which did not change are not laid out again.
+            self.text_render_data.set_text_lines(self.logs, self.ascii, font_size=12)
             self.logs = []
-            self.text_render_data.set_text(text, self.ascii, font_size=12, skip_check=True)
             self.core_manager.renderer.render_text(self.text_render_data, 0.0, canvas_height - self.text_render_data.font_size, canvas_width, canvas_height)
@@ -0,0 +1,187 @@
+import numpy as np
+
+
+# the iterations of the ray traversal, a ray which is not finished is a miss.
+MAX_RAY_STEPS = 4096
+
+# nudges the position over the node boundary to find the next node
+RAY_STEP_EPSILON = 1e-4
+
+
+class HeightField:
+    """
+    The cpu mirror of the height map, the heights are bilinear between the texel centers and repeated like GL_REPEAT.
+    The cells between the texel centers are the leaves of a min/max pyramid, the rays skip the nodes above the max height.
+    The coordinates are the local coordinates of the terrain, the height map is repeated every height_map_size.
+    """
+    def __init__(self, heights, height_map_size):
+        self.heights = np.ascontiguousarray(heights, dtype=np.float32)
+        self.texture_height, self.texture_width = self.heights.shape
+        self.height_map_size = np.array(height_map_size, dtype=np.float32)
+
+        # the corners of the cells, the cell (x, y) is between the texel centers (x, y) and (x + 1, y + 1).
+        heights_x = np.roll(self.heights, -1, axis=1)
+        corners = np.stack([self.heights, heights_x, np.roll(self.heights, -1, axis=0), np.roll(heights_x, -1, axis=0)])
+        self.min_heights = [corners.min(axis=0), ]
+        self.max_heights = [corners.max(axis=0), ]
+
+        # the pyramid keeps the repeat, so it stops at an odd size.
+        min_heights, max_heights = self.min_heights[0], self.max_heights[0]
+        while 1 < max(min_heights.shape) and 0 == min_heights.shape[0] % 2 and 0 == min_heights.shape[1] % 2:
+            height, width = min_heights.shape[0] // 2, min_heights.shape[1] // 2
+            min_heights = min_heights.reshape(height, 2, width, 2).min(axis=(1, 3))
+            max_heights = max_heights.reshape(height, 2, width, 2).max(axis=(1, 3))
+            self.min_heights.append(min_heights)
+            self.max_heights.append(max_heights)
+        self.level_count = len(self.max_heights)
+
+    def get_min_height(self):
+        return self.min_heights[-1].min()
+
+    def get_max_height(self):
+        return self.max_heights[-1].max()
+
+    def to_texel_space(self, x, z):
+        return (x / self.height_map_size[0] * self.texture_width - 0.5,
+                z / self.height_map_size[1] * self.texture_height - 0.5)
+
+    def get_cell_corners(self, cell_x, cell_y):
+        x0 = cell_x % self.texture_width
+        y0 = cell_y % self.texture_height
+        x1 = (x0 + 1) % self.texture_width
+        y1 = (y0 + 1) % self.texture_height
+        heights = self.heights
+        return heights[y0, x0], heights[y0, x1], heights[y1, x0], heights[y1, x1]
+
+    def get_heights(self, x, z):
+        """ return : the heights at the local positions, x and z are arrays of the same shape """
+        texel_x, texel_y = self.to_texel_space(np.asarray(x, dtype=np.float32), np.asarray(z, dtype=np.float32))
+        cell_x = np.floor(texel_x)
+        cell_y = np.floor(texel_y)
+        u = texel_x - cell_x
+        v = texel_y - cell_y
+        h00, h10, h01, h11 = self.get_cell_corners(cell_x.astype(np.int64), cell_y.astype(np.int64))
+        return (h00 * (1.0 - u) + h10 * u) * (1.0 - v) + (h01 * (1.0 - u) + h11 * u) * v
+
+    def get_gradients(self, x, z):
+        """ return : dh/dx, dh/dz at the local positions """
+        texel_x, texel_y = self.to_texel_space(np.asarray(x, dtype=np.float32), np.asarray(z, dtype=np.float32))
+        cell_x = np.floor(texel_x)
+        cell_y = np.floor(texel_y)
+        u = texel_x - cell_x
+        v = texel_y - cell_y
+        h00, h10, h01, h11 = self.get_cell_corners(cell_x.astype(np.int64), cell_y.astype(np.int64))
+        gradient_x = ((h10 - h00) * (1.0 - v) + (h11 - h01) * v) * (self.texture_width / self.height_map_size[0])
+        gradient_z = ((h01 - h00) * (1.0 - u) + (h11 - h10) * u) * (self.texture_height / self.height_map_size[1])
+        return gradient_x, gradient_z
+
+    def intersect_cells(self, origins, directions, cell_x, cell_y, t_min, t_max):
+        """ the first intersection of the rays in texel space with the bilinear cells in [t_min, t_max], the miss is inf. """
+        h00, h10, h01, h11 = self.get_cell_corners(cell_x, cell_y)
+        u0 = origins[:, 0] - cell_x
+        v0 = origins[:, 2] - cell_y
+        du = directions[:, 0]
+        dv = directions[:, 2]
+        # ray height - bilinear height = a * t^2 + b * t + c
+        k = h00 - h10 - h01 + h11
+        a = -k * du * dv
+        b = directions[:, 1] - (h10 - h00) * du - (h01 - h00) * dv - k * (u0 * dv + v0 * du)
+        c = origins[:, 1] - h00 - (h10 - h00) * u0 - (h01 - h00) * v0 - k * u0 * v0
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            discriminant = b * b - 4.0 * a * c
+            sqrt_discriminant = np.sqrt(np.maximum(discriminant, 0.0))
+            # the stable roots of the quadratic equation, the linear equation when a is zero
+            q = -0.5 * (b + np.where(b < 0.0, -sqrt_discriminant, sqrt_discriminant))
+            is_linear = np.abs(a) < 1e-12
+            t0 = np.where(is_linear, -c / b, q / a)
+            t1 = np.where(is_linear, np.inf, c / q)
+
+        result = np.full(len(origins), np.inf)
+        for t in (t1, t0):
+            valid = (0.0 <= discriminant) & (t_min <= t) & (t <= t_max) & np.isfinite(t)
+            result = np.where(valid & (t < result), t, result)
+        # the ray starts under the surface
+        result = np.where((c + (b + a * t_min) * t_min <= 0.0) & (result == np.inf), t_min, result)
+        return result
+
+    def ray_cast(self, origins, directions, t_start, t_end):
+        """
+        :param origins, directions: (n, 3) local rays, t_start, t_end: (n,) ray ranges in the terrain
+        return : t of the first intersections, inf for the misses
+        """
+        count = len(origins)
+        scale = np.array([self.texture_width / self.height_map_size[0], 1.0, self.texture_height / self.height_map_size[1]])
+        texel_origins = origins * scale - [0.5, 0.0, 0.5]
+        texel_directions = directions * scale
+
+        results = np.full(count, np.inf)
+        t = np.array(t_start, dtype=np.float64)
+        t_end = np.array(t_end, dtype=np.float64)
+        levels = np.full(count, self.level_count - 1, dtype=np.int64)
+        active = np.nonzero(t < t_end)[0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv_directions = 1.0 / texel_directions[:, (0, 2)]
+
+        for step in range(MAX_RAY_STEPS):
+            if 0 == len(active):
+                break
+
+            ray_origins = texel_origins[active]
+            ray_directions = texel_directions[active]
+            ray_t = t[active]
+            ray_levels = levels[active]
+            node_size = (1 << ray_levels).astype(np.float64)
+
+            # the node of the position a little ahead to leave the boundary of the previous node
+            positions = ray_origins[:, (0, 2)] + ray_directions[:, (0, 2)] * ray_t[:, None]
+            nudge = np.sign(ray_directions[:, (0, 2)]) * RAY_STEP_EPSILON
+            nodes = np.floor((positions + nudge) / node_size[:, None]).astype(np.int64)
+
+            with np.errstate(invalid='ignore'):
+                bounds = (nodes + (ray_directions[:, (0, 2)] > 0.0)) * node_size[:, None]
+                t_exits = (bounds - ray_origins[:, (0, 2)]) * inv_directions[active]
+            t_exits = np.where(np.isfinite(t_exits), t_exits, np.inf).min(axis=1)
+            t_exits = np.minimum(np.maximum(t_exits, ray_t), t_end[active])
+
+            max_heights = np.empty(len(active), dtype=np.float32)
+            min_heights = np.empty(len(active), dtype=np.float32)
+            for level in np.unique(ray_levels):
+                in_level = ray_levels == level
+                level_nodes = nodes[in_level]
+                level_max_heights = self.max_heights[level]
+                level_min_heights = self.min_heights[level]
+                node_x = level_nodes[:, 0] % level_max_heights.shape[1]
+                node_y = level_nodes[:, 1] % level_max_heights.shape[0]
+                max_heights[in_level] = level_max_heights[node_y, node_x]
+                min_heights[in_level] = level_min_heights[node_y, node_x]
+
+            enter_heights = ray_origins[:, 1] + ray_directions[:, 1] * ray_t
+            exit_heights = ray_origins[:, 1] + ray_directions[:, 1] * t_exits
+            above = max_heights < np.minimum(enter_heights, exit_heights)
+            below = np.maximum(enter_heights, exit_heights) < min_heights
+            is_leaf = 0 == ray_levels
+
+            # the ray under all of the node has entered the surface at the start of the node.
+            results[active[below]] = ray_t[below]
+
+            hit_t = np.full(len(active), np.inf)
+            leaves = np.nonzero(is_leaf & ~above & ~below)[0]
+            if 0 < len(leaves):
+                hit_t[leaves] = self.intersect_cells(ray_origins[leaves], ray_directions[leaves],
+                                                     nodes[leaves, 0], nodes[leaves, 1],
+                                                     ray_t[leaves], t_exits[leaves])
+            hits = np.isfinite(hit_t)
+            results[active[hits]] = hit_t[hits]
+
+            # skip the node above the ray or the missed leaf and go up, descend to the node the ray may hit.
+            advance = (above | is_leaf) & ~hits & ~below
+            t[active[advance]] = t_exits[advance]
+            levels[active[advance]] = np.minimum(ray_levels[advance] + 1, self.level_count - 1)
+            descend = ~advance & ~hits & ~below
+            levels[active[descend]] = ray_levels[descend] - 1
+
+            finished = hits | below | (advance & (t_end[active] <= t_exits))
+            active = active[~finished]
+        return results
@@ -7,6 +7,103 @@ from PyEngine3D.App import CoreManager
 from .Actor import StaticActor
 
 
+class ShadowSplitScheme:
+    UNIFORM = 'uniform'
+    LOGARITHMIC = 'logarithmic'
+    PRACTICAL = 'practical'
+
+
+# bias from the clip space to the uv and the depth [0, 1]
+SHADOW_UV_BIAS_MATRIX = np.array([[0.5, 0.0, 0.0, 0.0],
+                                  [0.0, 0.5, 0.0, 0.0],
+                                  [0.0, 0.0, 0.5, 0.0],
+                                  [0.5, 0.5, 0.5, 1.0]], dtype=np.float32)
+
+
+def get_shadow_cascade_splits(cascade_count, split_scheme=ShadowSplitScheme.PRACTICAL, split_lambda=SHADOW_CASCADE_SPLIT_LAMBDA):
+    """ return : the far distances of the cascades in ratio of the shadow distance """
+    near = SHADOW_CASCADE_NEAR_RATIO
+    splits = []
+    for i in range(1, cascade_count + 1):
+        ratio = i / cascade_count
+        uniform_split = near + (1.0 - near) * ratio
+        logarithmic_split = near * pow(1.0 / near, ratio)
+        if ShadowSplitScheme.UNIFORM == split_scheme:
+            splits.append(uniform_split)
+        elif ShadowSplitScheme.LOGARITHMIC == split_scheme:
+            splits.append(logarithmic_split)
+        else:
+            # Parallel-Split Shadow Maps, Zhang et al.
+            splits.append(uniform_split + (logarithmic_split - uniform_split) * split_lambda)
+    return splits
+
+
+def get_shadow_cascade_uv_rect(cascade_index, cascade_count):
+    # a tile of the 2 x 2 atlas, a single cascade uses the whole shadow map.
+    if 1 == cascade_count:
+        return Float4(0.0, 0.0, 1.0, 1.0)
+    return Float4((cascade_index % 2) * 0.5, (cascade_index // 2) * 0.5, 0.5, 0.5)
+
+
+class ShadowCascade:
+    """
+    Orthogonal shadow volume centered on the camera. The cascade follows the camera in steps of
+    SHADOW_CASCADE_UPDATE_RATIO of its size, so the static shadow of a cascade is cached until it moves.
+    """
+    def __init__(self, index, width, height, depth, uv_rect):
+        self.index = index
+        self.width = width  # half size
+        self.height = height
+        self.depth = depth
+        self.uv_rect = uv_rect  # offset, scale in the atlas
+        self.resolution = SHADOW_MAP_SIZE * uv_rect[2]
+        # the far cascades draw the dynamic shadow less often
+        self.update_interval = 2 ** max(0, index - 1)
+        self.update_frame = 0
+
+        self.center = FLOAT3_ZERO.copy()  # light space
+        self.orthogonal = Matrix4()
+        self.view_projection = Matrix4()  # world to the clip space
+        self.shadow_matrix = Matrix4()  # world to the uv and the depth of the cascade
+        ortho(self.orthogonal, -width, width, -height, height, -depth, depth)
+
+        self.static_shadow_changed = True
+        self.dynamic_shadow_rendered = True
+        self.static_render_infos = []
+        self.skeleton_render_infos = []
+
+    def get_viewport(self, shadow_map_width, shadow_map_height):
+        return (int(self.uv_rect[0] * shadow_map_width),
+                int(self.uv_rect[1] * shadow_map_height),
+                int(self.uv_rect[2] * shadow_map_width),
+                int(self.uv_rect[3] * shadow_map_height))
+
+    def is_dynamic_shadow_frame(self):
+        self.update_frame = (self.update_frame + 1) % self.update_interval
+        return 0 == self.update_frame
+
+    def update(self, light_view, camera_pos, force=False):
+        """ return : True when the cascade moved """
+        pos = np.dot(np.array([camera_pos[0], camera_pos[1], camera_pos[2], 1.0], dtype=np.float32), light_view)[:3]
+        update_step = max(self.width, self.height) * SHADOW_CASCADE_UPDATE_RATIO
+        if not force and all(abs(pos - self.center) < update_step):
+            return False
+
+        # the center snaps to the texels, the edges of the shadow do not shimmer while the camera moves.
+        texel_size_x = 2.0 * self.width / self.resolution
+        texel_size_y = 2.0 * self.height / self.resolution
+        self.center[0] = round(pos[0] / texel_size_x) * texel_size_x
+        self.center[1] = round(pos[1] / texel_size_y) * texel_size_y
+        self.center[2] = round(pos[2] / update_step) * update_step
+
+        translate = Matrix4()
+        set_translate_matrix(translate, *(-self.center))
+        self.view_projection[...] = np.dot(np.dot(light_view, translate), self.orthogonal)
+        self.shadow_matrix[...] = np.dot(self.view_projection, SHADOW_UV_BIAS_MATRIX)
+        self.static_shadow_changed = True
+        return True
+
+
 class MainLight(StaticActor):
     def __init__(self, name, **object_data):
         StaticActor.__init__(self, name, **object_data)
@@ -15,7 +112,7 @@ class MainLight(StaticActor):
         self.transform.set_rotation(object_data.get('rot', [-1.0, 0, 0]))
 
         self.last_shadow_camera = None
-        self.last_shadow_position = FLOAT3_ZERO.copy()
+        self.light_view = Matrix4()
 
         self.shadow_samples = object_data.get('shadow_samples', SHADOW_SAMPLES)
         self.shadow_exp = object_data.get('shadow_exp', SHADOW_EXP)
@@ -23,21 +120,34 @@ class MainLight(StaticActor):
         self.shadow_width = object_data.get('shadow_width', SHADOW_DISTANCE)
         self.shadow_height = object_data.get('shadow_height', SHADOW_DISTANCE)
         self.shadow_depth = object_data.get('shadow_depth', SHADOW_DISTANCE)
-        self.shadow_orthogonal = Matrix4()
-        self.shadow_view_projection = Matrix4()
+        self.shadow_cascade_count = object_data.get('shadow_cascade_count', SHADOW_CASCADE_COUNT)
+        self.shadow_split_scheme = object_data.get('shadow_split_scheme', ShadowSplitScheme.PRACTICAL)
+        self.shadow_split_lambda = object_data.get('shadow_split_lambda', SHADOW_CASCADE_SPLIT_LAMBDA)
+        self.shadow_cascades = []
         self.changed = False
+        self.shadow_changed = False
 
-        self.update_shadow_orthogonal()
+        self.update_shadow_cascades()
 
     def reset_changed(self):
         self.changed = False
 
-    def update_shadow_orthogonal(self):
-        ortho(self.shadow_orthogonal,
-              -self.shadow_width, self.shadow_width,
-              -self.shadow_height, self.shadow_height,
-              -self.shadow_depth, self.shadow_depth)
+    def reset_shadow_changed(self):
+        self.shadow_changed = False
+
+    def update_shadow_cascades(self):
+        self.shadow_cascade_count = max(1, min(MAX_SHADOW_CASCADE_COUNT, int(self.shadow_cascade_count)))
+        splits = get_shadow_cascade_splits(self.shadow_cascade_count, self.shadow_split_scheme, self.shadow_split_lambda)
+        self.shadow_cascades = []
+        for i, split in enumerate(splits):
+            shadow_cascade = ShadowCascade(i,
+                                           self.shadow_width * split,
+                                           self.shadow_height * split,
+                                           self.shadow_depth,
+                                           get_shadow_cascade_uv_rect(i, self.shadow_cascade_count))
+            self.shadow_cascades.append(shadow_cascade)
         self.changed = True
+        self.shadow_changed = True
 
     def get_attribute(self):
         super().get_attribute()
@@ -45,6 +155,9 @@ class MainLight(StaticActor):
         self.attributes.set_attribute('shadow_width', self.shadow_width)
         self.attributes.set_attribute('shadow_height', self.shadow_height)
         self.attributes.set_attribute('shadow_depth', self.shadow_depth)
+        self.attributes.set_attribute('shadow_cascade_count', self.shadow_cascade_count)
+        self.attributes.set_attribute('shadow_split_scheme', self.shadow_split_scheme)
+        self.attributes.set_attribute('shadow_split_lambda', self.shadow_split_lambda)
         self.attributes.set_attribute('shadow_exp', self.shadow_exp)
         self.attributes.set_attribute('shadow_bias', self.shadow_bias)
         self.attributes.set_attribute('shadow_samples', self.shadow_samples)
@@ -54,9 +167,10 @@ class MainLight(StaticActor):
         if 'light_color' == attribute_name:
             self.light_color[...] = attribute_value
             self.changed = True
-        elif attribute_name in ('shadow_width', 'shadow_height', 'shadow_depth'):
+        elif attribute_name in ('shadow_width', 'shadow_height', 'shadow_depth', 'shadow_cascade_count',
+                                'shadow_split_scheme', 'shadow_split_lambda'):
             setattr(self, attribute_name, attribute_value)
-            self.update_shadow_orthogonal()
+            self.update_shadow_cascades()
         else:
             super().set_attribute(attribute_name, attribute_value, item_info_history, attribute_index)
 
@@ -66,22 +180,34 @@ class MainLight(StaticActor):
         save_data['shadow_width'] = self.shadow_width
         save_data['shadow_height'] = self.shadow_height
         save_data['shadow_depth'] = self.shadow_depth
+        save_data['shadow_cascade_count'] = self.shadow_cascade_count
+        save_data['shadow_split_scheme'] = self.shadow_split_scheme
+        save_data['shadow_split_lambda'] = self.shadow_split_lambda
         save_data['shadow_exp'] = self.shadow_exp
         save_data['shadow_bias'] = self.shadow_bias
         save_data['shadow_samples'] = self.shadow_samples
         return save_data
 
+    def reset_static_shadow_cascades(self):
+        for shadow_cascade in self.shadow_cascades:
+            shadow_cascade.static_shadow_changed = True
+
     def update(self, current_camera):
         changed = self.transform.update_transform(update_inverse_matrix=True)
         self.changed = self.changed or changed
+        self.shadow_changed = self.shadow_changed or changed
 
         if current_camera is not None:
-            camera_pos = current_camera.transform.get_pos()
+            force = self.shadow_changed or self.last_shadow_camera is not current_camera
+            if force:
+                self.last_shadow_camera = current_camera
+                # rotation only, the cascades are centered on the camera.
+                self.light_view[...] = self.transform.inverse_matrix
+                self.light_view[3, 0:3] = 0.0
 
-            self.last_shadow_camera = current_camera
-            self.last_shadow_position[...] = camera_pos
-            set_translate_matrix(self.shadow_view_projection, *(-camera_pos))
-            self.shadow_view_projection[...] = np.dot(np.dot(self.shadow_view_projection, self.transform.inverse_matrix), self.shadow_orthogonal)
+            camera_pos = current_camera.transform.get_pos()
+            for shadow_cascade in self.shadow_cascades:
+                shadow_cascade.update(self.light_view, camera_pos, force)
 
 
 class PointLight(StaticActor):
@@ -110,4 +236,4 @@ class PointLight(StaticActor):
         return save_data
 
     def update(self):
-        self.transform.update_transform()
+        return self.transform.update_transform()
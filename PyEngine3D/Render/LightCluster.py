@@ -0,0 +1,189 @@
+import math
+import time
+
+import numpy as np
+
+from PyEngine3D.Common import logger
+from PyEngine3D.Common.Constants import *
+from PyEngine3D.OpenGLContext import ShaderStorageBuffer
+
+
+LIGHT_CLUSTER_COUNT = LIGHT_CLUSTER_COUNT_X * LIGHT_CLUSTER_COUNT_Y * LIGHT_CLUSTER_COUNT_Z
+
+# reference : scene_constants.glsl
+POINT_LIGHT_BINDING = 10
+LIGHT_CLUSTER_GRID_BINDING = 11
+LIGHT_INDEX_LIST_BINDING = 12
+
+POINT_LIGHT_DATA_TYPE = np.dtype([('color', np.float32, 3),
+                                  ('radius', np.float32),
+                                  ('pos', np.float32, 3),
+                                  ('dummy', np.float32)])
+
+
+def get_light_cluster_z_scale_bias(near, far):
+    # exponential depth slice : slice = log(depth) * scale - bias
+    log_depth_range = math.log(far / near)
+    scale = LIGHT_CLUSTER_COUNT_Z / log_depth_range
+    bias = LIGHT_CLUSTER_COUNT_Z * math.log(near) / log_depth_range
+    return scale, bias
+
+
+def build_light_cluster(view, projection, near, far, light_positions, light_radius,
+                        max_light_count=MAX_POINT_LIGHTS, max_light_index_count=MAX_LIGHT_INDEX_COUNT):
+    """
+    Cull the point light bounds against the view frustum and assign them to the froxel grid.
+    return : (uploaded light indices, cluster grid (offset, count), light index list)
+    """
+    cluster_grid = np.zeros((LIGHT_CLUSTER_COUNT, 2), dtype=np.uint32)
+    empty_result = (np.zeros(0, dtype=np.int64), cluster_grid, np.zeros(0, dtype=np.uint32))
+
+    if 0 == len(light_radius):
+        return empty_result
+
+    view_positions = np.dot(light_positions, view[:3, :3]) + view[3, :3]
+    depth = -view_positions[:, 2]
+    z_min = np.maximum(depth - light_radius, near)
+    z_max = np.minimum(depth + light_radius, far)
+
+    # conservative ndc bounds of the light spheres
+    x_min = view_positions[:, 0] - light_radius
+    x_max = view_positions[:, 0] + light_radius
+    y_min = view_positions[:, 1] - light_radius
+    y_max = view_positions[:, 1] + light_radius
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ndc_x_min = np.where(x_min < 0.0, x_min / z_min, x_min / z_max) * projection[0][0]
+        ndc_x_max = np.where(0.0 < x_max, x_max / z_min, x_max / z_max) * projection[0][0]
+        ndc_y_min = np.where(y_min < 0.0, y_min / z_min, y_min / z_max) * projection[1][1]
+        ndc_y_max = np.where(0.0 < y_max, y_max / z_min, y_max / z_max) * projection[1][1]
+
+    visible = (z_min < z_max) & (ndc_x_min < 1.0) & (-1.0 < ndc_x_max) & (ndc_y_min < 1.0) & (-1.0 < ndc_y_max)
+    light_indices = np.flatnonzero(visible)
+
+    if 0 == len(light_indices):
+        return empty_result
+
+    # nearest lights first, so the far lights are dropped when the lists overflow.
+    light_indices = light_indices[np.argsort(depth[light_indices], kind='stable')][:max_light_count]
+
+    def to_cluster(ndc, cluster_count):
+        return np.clip(np.floor((ndc * 0.5 + 0.5) * cluster_count), 0, cluster_count - 1).astype(np.int64)
+
+    z_scale, z_bias = get_light_cluster_z_scale_bias(near, far)
+
+    def to_cluster_z(linear_depth):
+        cluster_z = np.floor(np.log(linear_depth) * z_scale - z_bias)
+        return np.clip(cluster_z, 0, LIGHT_CLUSTER_COUNT_Z - 1).astype(np.int64)
+
+    cluster_x_min = to_cluster(ndc_x_min[light_indices], LIGHT_CLUSTER_COUNT_X)
+    cluster_x_max = to_cluster(ndc_x_max[light_indices], LIGHT_CLUSTER_COUNT_X)
+    cluster_y_min = to_cluster(ndc_y_min[light_indices], LIGHT_CLUSTER_COUNT_Y)
+    cluster_y_max = to_cluster(ndc_y_max[light_indices], LIGHT_CLUSTER_COUNT_Y)
+    cluster_z_min = to_cluster_z(z_min[light_indices])
+    cluster_z_max = to_cluster_z(z_max[light_indices])
+
+    size_x = cluster_x_max - cluster_x_min + 1
+    size_y = cluster_y_max - cluster_y_min + 1
+    size_z = cluster_z_max - cluster_z_min + 1
+    cluster_counts = size_x * size_y * size_z
+
+    # bound the per frame cost by the capacity of the light index list.
+    light_count = np.searchsorted(np.cumsum(cluster_counts), max_light_index_count, side='right')
+    light_indices = light_indices[:light_count]
+    cluster_counts = cluster_counts[:light_count]
+
+    if 0 == light_count:
+        return empty_result
+
+    # expand the cluster boxes to (cluster, light) pairs
+    light_slots = np.repeat(np.arange(light_count), cluster_counts)
+    first_pairs = np.cumsum(cluster_counts) - cluster_counts
+    local_index = np.arange(len(light_slots)) - first_pairs[light_slots]
+    size_x = size_x[light_slots]
+    size_xy = size_x * size_y[light_slots]
+    cluster_x = cluster_x_min[light_slots] + local_index % size_x
+    cluster_y = cluster_y_min[light_slots] + (local_index % size_xy) // size_x
+    cluster_z = cluster_z_min[light_slots] + local_index // size_xy
+    cluster_ids = (cluster_z * LIGHT_CLUSTER_COUNT_Y + cluster_y) * LIGHT_CLUSTER_COUNT_X + cluster_x
+
+    order = np.argsort(cluster_ids, kind='stable')
+    light_index_list = light_slots[order].astype(np.uint32)
+
+    counts = np.bincount(cluster_ids, minlength=LIGHT_CLUSTER_COUNT)
+    cluster_grid[:, 0] = np.cumsum(counts) - counts
+    cluster_grid[:, 1] = counts
+    return light_indices, cluster_grid, light_index_list
+
+
+class LightCluster:
+    def __init__(self):
+        self.point_light_data = np.zeros(MAX_POINT_LIGHTS, dtype=POINT_LIGHT_DATA_TYPE)
+        self.cluster_grid = np.zeros((LIGHT_CLUSTER_COUNT, 2), dtype=np.uint32)
+        self.light_index_list = np.zeros(0, dtype=np.uint32)
+        self.light_count = 0
+        self.z_scale_bias = np.array([1.0, 0.0], dtype=np.float32)
+
+        self.point_light_buffer = None
+        self.cluster_grid_buffer = None
+        self.light_index_buffer = None
+
+    def initialize(self):
+        logger.info("Initialize LightCluster")
+        self.point_light_buffer = ShaderStorageBuffer(name='point_light_buffer',
+                                                      data_size=self.point_light_data.nbytes,
+                                                      dtype=POINT_LIGHT_DATA_TYPE,
+                                                      init_data=self.point_light_data)
+
+        self.cluster_grid_buffer = ShaderStorageBuffer(name='light_cluster_grid_buffer',
+                                                       data_size=self.cluster_grid.nbytes,
+                                                       dtype=np.uint32,
+                                                       init_data=self.cluster_grid)
+
+        self.light_index_buffer = ShaderStorageBuffer(name='light_index_list_buffer',
+                                                      data_size=np.dtype(np.uint32).itemsize * MAX_LIGHT_INDEX_COUNT,
+                                                      dtype=np.uint32)
+
+    def close(self):
+        for buffer in (self.point_light_buffer, self.cluster_grid_buffer, self.light_index_buffer):
+            if buffer is not None:
+                buffer.delete()
+        self.point_light_buffer = None
+        self.cluster_grid_buffer = None
+        self.light_index_buffer = None
+
+    def update_light_cluster(self, camera, point_light_datas):
+        self.z_scale_bias[...] = get_light_cluster_z_scale_bias(camera.near, camera.far)
+
+        light_indices, self.cluster_grid, self.light_index_list = build_light_cluster(
+            camera.view, camera.projection, camera.near, camera.far, point_light_datas['pos'], point_light_datas['radius'])
+
+        self.light_count = len(light_indices)
+        self.point_light_data[:self.light_count] = point_light_datas[light_indices]
+
+        self.point_light_buffer.set_buffer_sub_data(self.point_light_data[:self.light_count])
+        self.cluster_grid_buffer.set_buffer_sub_data(self.cluster_grid)
+        self.light_index_buffer.set_buffer_sub_data(self.light_index_list)
+
+    def bind_light_cluster(self):
+        self.point_light_buffer.bind_buffer_base(POINT_LIGHT_BINDING)
+        self.cluster_grid_buffer.bind_buffer_base(LIGHT_CLUSTER_GRID_BINDING)
+        self.light_index_buffer.bind_buffer_base(LIGHT_INDEX_LIST_BINDING)
+
+
+if __name__ == '__main__':
+    from PyEngine3D.Utilities import Matrix4, perspective
+
+    view = Matrix4()
+    projection = perspective(60.0, 16.0 / 9.0, 0.1, 2000.0)
+
+    for count in (100, 1000, 4000, 10000):
+        positions = np.random.uniform(-200.0, 200.0, (count, 3)).astype(np.float32)
+        positions[:, 2] -= 200.0
+        radius = np.random.uniform(2.0, 10.0, count).astype(np.float32)
+
+        start_time = time.perf_counter()
+        loop = 10
+        for i in range(loop):
+            result = build_light_cluster(view, projection, 0.1, 2000.0, positions, radius)
+        elapsed_time = (time.perf_counter() - start_time) * 1000.0 / loop
+        print("lights : %d, visible : %d, light indices : %d, %.3fms" % (count, len(result[0]), len(result[2]), elapsed_time))
@@ -18,6 +18,7 @@ class LightProbe(StaticActor):
         StaticActor.__init__(self, name, **object_data)
 
         self.isRendered = False
+        self.bake_count = 0
 
         if CoreManager.instance().is_basic_mode:
             self.texture_probe = None
@@ -37,6 +38,11 @@ class LightProbe(StaticActor):
         self.delete()
         self.texture_probe = texture_probe
 
+    def swap_texture_probe(self, texture_probe):
+        old_texture_probe = self.texture_probe
+        self.texture_probe = texture_probe
+        return old_texture_probe
+
     @staticmethod
     def generate_texture_probe(name):
         texture_datas = RenderTargets.LIGHT_PROBE_ATMOSPHERE.get_texture_info()
@@ -11,7 +11,7 @@ from OpenGL.GL import *
 
 from PyEngine3D.Common import logger
 from PyEngine3D.App import CoreManager
-from PyEngine3D.OpenGLContext import CreateUniformBuffer, CreateUniformDataFromString
+from PyEngine3D.OpenGLContext import CreateUniformBuffer, CreateUniformDataFromString, MaterialParameterBuffer
 from PyEngine3D.Utilities import Attributes
 
 
@@ -27,6 +27,12 @@ class MaterialInstance:
         self.macros = copy.copy(data.get('macros', OrderedDict()))
         self.linked_uniform_map = dict()
         self.linked_material_component_map = dict()
+        # the material components which are not in the material_parameters block, the textures.
+        self.bind_material_components = []
+        # the range of the material parameters in the MaterialParameterBuffer
+        self.material_parameter_offset = -1
+        self.material_parameter_block_size = 0
+        self.need_to_upload_material_parameters = False
         self.show_message = {}
         self.Attributes = Attributes()
 
@@ -100,6 +106,9 @@ class MaterialInstance:
                     else:
                         logger.error("%s material instance failed to create %s uniform data %s." % (self.name, uniform_name, uniform_data))
                         continue
+                else:
+                    # the uniform of the new material, the data is kept.
+                    self.linked_uniform_map[uniform_name][0] = uniform_buffer
 
                 if uniform_name in material_component_names:
                     self.linked_material_component_map[uniform_name] = self.linked_uniform_map[uniform_name]
@@ -107,13 +116,47 @@ class MaterialInstance:
             for uniform_name in old_uniform_names:
                 self.linked_uniform_map.pop(uniform_name)
 
+            self.bind_material_components = [uniform for uniform in self.linked_material_component_map.values() if uniform[0].block_offset < 0]
+            self.allocate_material_parameters()
+
+    def allocate_material_parameters(self):
+        material_parameter_buffer = MaterialParameterBuffer.instance()
+        if 0 <= self.material_parameter_offset:
+            material_parameter_buffer.release(self.material_parameter_offset, self.material_parameter_block_size)
+            self.material_parameter_offset = -1
+
+        self.material_parameter_block_size = self.material.material_parameter_block_size
+        if 0 < self.material_parameter_block_size:
+            self.material_parameter_offset = material_parameter_buffer.allocate(self.material_parameter_block_size)
+            for uniform_buffer, uniform_data in self.linked_uniform_map.values():
+                if 0 <= uniform_buffer.block_offset:
+                    self.set_material_parameter(uniform_buffer, uniform_data)
+
+    def set_material_parameter(self, uniform_buffer, uniform_data):
+        MaterialParameterBuffer.instance().set_value(self.material_parameter_offset + uniform_buffer.block_offset,
+                                                     uniform_buffer.uniform_type,
+                                                     uniform_data)
+        self.need_to_upload_material_parameters = True
+
+    def bind_material_parameters(self):
+        if 0 <= self.material_parameter_offset:
+            MaterialParameterBuffer.instance().bind_range(self.material_parameter_offset,
+                                                          self.material_parameter_block_size,
+                                                          self.need_to_upload_material_parameters)
+            self.need_to_upload_material_parameters = False
+
     def bind_material_instance(self):
-        for uniform_buffer, uniform_data in self.linked_material_component_map.values():
+        self.bind_material_parameters()
+        for uniform_buffer, uniform_data in self.bind_material_components:
             uniform_buffer.bind_uniform(uniform_data)
 
     def bind_uniform_data(self, uniform_name, uniform_data, **kwargs):
         uniform = self.linked_uniform_map.get(uniform_name)
-        if uniform:
+        if uniform and 0 <= uniform[0].block_offset:
+            # the member of the block keeps the value until it is changed again.
+            self.set_uniform_data(uniform_name, uniform_data)
+            self.bind_material_parameters()
+        elif uniform:
             uniform[0].bind_uniform(uniform_data, **kwargs)
         elif uniform_name not in self.show_message or self.show_message[uniform_name]:
             self.show_message[uniform_name] = False
@@ -127,6 +170,8 @@ class MaterialInstance:
         uniform = self.linked_uniform_map.get(uniform_name)
         if uniform:
             uniform[1] = uniform_data
+            if 0 <= uniform[0].block_offset:
+                self.set_material_parameter(uniform[0], uniform_data)
 
     def set_uniform_data_from_string(self, uniform_name, str_uniform_data):
         uniform = self.linked_uniform_map.get(uniform_name)
@@ -136,6 +181,8 @@ class MaterialInstance:
                 uniform_data = CreateUniformDataFromString(uniform_buffer.uniform_type, str_uniform_data)
                 if uniform_data is not None:
                     uniform[1] = uniform_data
+                    if 0 <= uniform_buffer.block_offset:
+                        self.set_material_parameter(uniform_buffer, uniform_data)
                     return True
         logger.warn("%s material instance has no %s uniform variable. It may have been optimized by the compiler..)" % (self.name, uniform_name))
 
@@ -70,11 +70,14 @@ class Geometry:
         self.skeleton = geometry_data.get('skeleton')
         self.bound_box = BoundBox(**geometry_data)
 
-    def draw_elements(self):
-        self.vertex_buffer.draw_elements()
+    def get_lod_count(self):
+        return self.vertex_buffer.get_lod_count() if self.vertex_buffer is not None else 1
 
-    def draw_elements_instanced(self, instance_count, instance_buffer=None, instance_datas=[]):
-        self.vertex_buffer.draw_elements_instanced(instance_count, instance_buffer, instance_datas)
+    def draw_elements(self, lod=0):
+        self.vertex_buffer.draw_elements(lod=lod)
+
+    def draw_elements_instanced(self, instance_count, instance_buffer=None, instance_datas=[], upload=True, lod=0):
+        self.vertex_buffer.draw_elements_instanced(instance_count, instance_buffer, instance_datas, upload=upload, lod=lod)
 
     def draw_elements_indirect(self, offset=0):
         self.vertex_buffer.draw_elements_indirect(offset)
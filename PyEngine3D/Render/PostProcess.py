@@ -10,7 +10,7 @@ from OpenGL.GLU import *
 
 from PyEngine3D.App import CoreManager
 from PyEngine3D.Common import logger, log_level, COMMAND
-from PyEngine3D.OpenGLContext import FrameBufferManager
+from PyEngine3D.OpenGLContext import CreateTexture, FrameBufferManager, Texture2D
 from PyEngine3D.Utilities import *
 from .Mesh import ScreenQuad
 from .RenderTarget import RenderTargets
@@ -32,6 +32,33 @@ def Hammersley2D(sampleIdx, numSamples):
     return float(sampleIdx) / float(numSamples), RadicalInverseBase2(sampleIdx)
 
 
+# reference : generate_min_z.glsl, compute_focus_distance.glsl
+COMPUTE_GROUP_SIZE = 8
+DEPTH_PYRAMID_MAX_MIP_COUNT = 4
+
+
+def get_depth_pyramid_dispatches(width, height, lod_count):
+    """
+    Split the mip chain of the depth pyramid into dispatches.
+    A dispatch reduces up to DEPTH_PYRAMID_MAX_MIP_COUNT mips in shared memory,
+    the chain continues only while the source level is even sized, the odd sized levels start a new dispatch.
+    :return: [(first output lod, mip count), ...]
+    """
+    dispatches = []
+    lod = 1
+    while lod < lod_count:
+        mip_count = 1
+        while mip_count < DEPTH_PYRAMID_MAX_MIP_COUNT and (lod + mip_count) < lod_count:
+            source_width = max(1, width >> (lod + mip_count - 1))
+            source_height = max(1, height >> (lod + mip_count - 1))
+            if (1 < source_width and source_width % 2) or (1 < source_height and source_height % 2):
+                break
+            mip_count += 1
+        dispatches.append((lod, mip_count))
+        lod += mip_count
+    return dispatches
+
+
 class JitterMode:
     Uniform2x = np.array([[0.25, 0.75], [0.5, 0.5]], dtype=np.float32) * 2.0 - 1.0
     Hammersley4x = np.array([Hammersley2D(i, 4) for i in range(4)], dtype=np.float32) * 2.0 - 1.0
@@ -104,6 +131,10 @@ class PostProcess:
         self.screen_space_reflection = None
         self.screen_space_reflection_resolve = None
 
+        self.is_dynamic_resolution = False
+        self.dynamic_resolution_target_time = 16.6  # milliseconds
+        self.dynamic_resolution_min_scale = 0.5
+
         self.is_render_tonemapping = True
         self.exposure = 1.0
         self.contrast = 1.1
@@ -223,6 +254,10 @@ class PostProcess:
         self.Attributes.set_attribute('light_shaft_decay', self.light_shaft_decay)
         self.Attributes.set_attribute('light_shaft_samples', self.light_shaft_samples)
 
+        self.Attributes.set_attribute('is_dynamic_resolution', self.is_dynamic_resolution)
+        self.Attributes.set_attribute('dynamic_resolution_target_time', self.dynamic_resolution_target_time)
+        self.Attributes.set_attribute('dynamic_resolution_min_scale', self.dynamic_resolution_min_scale)
+
         self.Attributes.set_attribute('is_render_tonemapping', self.is_render_tonemapping)
         self.Attributes.set_attribute('exposure', self.exposure)
         self.Attributes.set_attribute('contrast', self.contrast)
@@ -275,14 +310,19 @@ class PostProcess:
         return self.anti_aliasing == AntiAliasing.TAA
 
     def update(self):
+        render_scale = self.renderer.dynamic_resolution.update(self.is_dynamic_resolution,
+                                                               self.dynamic_resolution_target_time,
+                                                               self.dynamic_resolution_min_scale)
+
         if self.renderer.postprocess.is_TAA():
             self.jitter_frame = (self.jitter_frame + 1) % len(self.jitter_mode)
 
             # offset of camera projection matrix. NDC Space -1.0 ~ 1.0
+            # the jitter is a sub pixel of the render scaled viewport.
             self.jitter_prev[...] = self.jitter
             self.jitter[...] = self.jitter_mode[self.jitter_frame]
-            self.jitter[0] /= RenderTargets.TAA_RESOLVE.width
-            self.jitter[1] /= RenderTargets.TAA_RESOLVE.height
+            self.jitter[0] /= max(1, int(RenderTargets.HDR.width * render_scale))
+            self.jitter[1] /= max(1, int(RenderTargets.HDR.height * render_scale))
 
             # Multiplies by 0.5 because it is in screen coordinate system. 0.0 ~ 1.0
             self.jitter_delta[...] = (self.jitter - self.jitter_prev) * 0.5
@@ -347,8 +387,9 @@ class PostProcess:
         self.compute_focus_distance.bind_uniform_data("img_output", RenderTargets.FOCUS_DISTANCE, access=GL_READ_WRITE)
         width = RenderTargets.FOCUS_DISTANCE.width
         height = RenderTargets.FOCUS_DISTANCE.height
-        glDispatchCompute(width, height, 1)
-        glMemoryBarrier(GL_ALL_BARRIER_BITS)
+        glDispatchCompute(math.ceil(width / COMPUTE_GROUP_SIZE), math.ceil(height / COMPUTE_GROUP_SIZE), 1)
+        # depth_of_field samples the focus distance, the next frame reads it again with imageLoad.
+        glMemoryBarrier(GL_TEXTURE_FETCH_BARRIER_BIT | GL_SHADER_IMAGE_ACCESS_BARRIER_BIT)
 
         # depth of field
         texture_temp = RenderTargets.HDR_TEMP
@@ -403,16 +444,17 @@ class PostProcess:
         self.quad.draw_elements()
 
     def render_bloom(self, texture_target):
-        texture_bloom0 = RenderTargets.BLOOM_0
-        texture_bloom1 = RenderTargets.BLOOM_1
-        texture_bloom2 = RenderTargets.BLOOM_2
-        texture_bloom3 = RenderTargets.BLOOM_3
-        texture_bloom4 = RenderTargets.BLOOM_4
-        texture_bloom0_temp = self.rendertarget_manager.get_temporary('bloom0_temp', texture_bloom0)
-        texture_bloom1_temp = self.rendertarget_manager.get_temporary('bloom1_temp', texture_bloom1)
-        texture_bloom2_temp = self.rendertarget_manager.get_temporary('bloom2_temp', texture_bloom2)
-        texture_bloom3_temp = self.rendertarget_manager.get_temporary('bloom3_temp', texture_bloom3)
-        texture_bloom4_temp = self.rendertarget_manager.get_temporary('bloom4_temp', texture_bloom4)
+        # the bloom targets are released after the tone map.
+        texture_bloom0 = self.rendertarget_manager.acquire_transient('BLOOM_0')
+        texture_bloom1 = self.rendertarget_manager.acquire_transient('BLOOM_1')
+        texture_bloom2 = self.rendertarget_manager.acquire_transient('BLOOM_2')
+        texture_bloom3 = self.rendertarget_manager.acquire_transient('BLOOM_3')
+        texture_bloom4 = self.rendertarget_manager.acquire_transient('BLOOM_4')
+        texture_bloom0_temp = self.rendertarget_manager.get_temporary_transient('bloom0_temp', texture_bloom0)
+        texture_bloom1_temp = self.rendertarget_manager.get_temporary_transient('bloom1_temp', texture_bloom1)
+        texture_bloom2_temp = self.rendertarget_manager.get_temporary_transient('bloom2_temp', texture_bloom2)
+        texture_bloom3_temp = self.rendertarget_manager.get_temporary_transient('bloom3_temp', texture_bloom3)
+        texture_bloom4_temp = self.rendertarget_manager.get_temporary_transient('bloom4_temp', texture_bloom4)
 
         self.framebuffer_manager.bind_framebuffer(RenderTargets.BLOOM_0)
         glClear(GL_COLOR_BUFFER_BIT)
@@ -459,34 +501,72 @@ class PostProcess:
                 self.gaussian_blur.bind_uniform_data("texture_diffuse", temp_bloom_target)
                 self.quad.draw_elements()
 
-    def render_linear_depth(self, texture_depth, texture_linear_depth):
+        for temp_bloom_target in temp_bloom_rendertargets:
+            self.rendertarget_manager.release_rendertarget(temp_bloom_target)
+
+    def render_linear_depth(self, texture_depth, texture_linear_depth, memory_barrier=GL_TEXTURE_FETCH_BARRIER_BIT):
         self.linear_depth.use_program()
         self.linear_depth.bind_material_instance()
         self.linear_depth.bind_uniform_data("texture_depth", texture_depth)
         self.quad.draw_elements()
 
-        self.render_generate_min_z(texture_linear_depth, min_z=True)
+        self.render_generate_min_z(texture_linear_depth, min_z=True, memory_barrier=memory_barrier)
 
-    def render_generate_min_z(self, texture_linear_depth, min_z=True):
+    def render_generate_min_z(self, texture_linear_depth, min_z=True, memory_barrier=GL_TEXTURE_FETCH_BARRIER_BIT):
+        """ :param memory_barrier: issued after the last dispatch, 0 when the render graph places the barrier. """
         lod_count = texture_linear_depth.get_mipmap_count()
-        width = texture_linear_depth.width
-        height = texture_linear_depth.height
+        dispatches = get_depth_pyramid_dispatches(texture_linear_depth.width, texture_linear_depth.height, lod_count)
 
         self.generate_min_z.use_program()
+        self.generate_min_z.bind_uniform_data("generate_min_z", min_z)
 
-        for lod in range(1, lod_count - 1):
-            self.generate_min_z.bind_uniform_data("generate_min_z", min_z)
+        for lod, mip_count in dispatches:
+            self.generate_min_z.bind_uniform_data("mip_count", mip_count)
             self.generate_min_z.bind_uniform_data("img_input", texture_linear_depth, level=lod-1, access=GL_READ_ONLY)
-            self.generate_min_z.bind_uniform_data("img_output", texture_linear_depth, level=lod, access=GL_WRITE_ONLY)
+            for i in range(DEPTH_PYRAMID_MAX_MIP_COUNT):
+                # the unused outputs are bound to the last mip, they are never written.
+                level = lod + min(i, mip_count - 1)
+                self.generate_min_z.bind_uniform_data("img_output_%d" % i, texture_linear_depth, level=level, access=GL_WRITE_ONLY)
 
-            width = math.floor(width / 2)
-            height = math.floor(height / 2)
-            glDispatchCompute(width, height, 1)
-            glMemoryBarrier(GL_ALL_BARRIER_BITS)
+            width, height = texture_linear_depth.get_mipmap_size(lod)
+            glDispatchCompute(math.ceil(width / COMPUTE_GROUP_SIZE), math.ceil(height / COMPUTE_GROUP_SIZE), 1)
+            # the next dispatch reads the written mips with imageLoad.
+            glMemoryBarrier(GL_SHADER_IMAGE_ACCESS_BARRIER_BIT)
+
+        # ssr, ssao and the atmosphere sample the pyramid as a texture.
+        if memory_barrier:
+            glMemoryBarrier(memory_barrier)
 
     def render_generate_max_z(self, texture_linear_depth):
         self.render_generate_min_z(texture_linear_depth, min_z=False)
 
+    def benchmark_generate_min_z(self, loop=100):
+        query = glGenQueries(1)
+        for width, height in ((1920, 1080), (3840, 2160)):
+            texture = CreateTexture(
+                name="benchmark_linear_depth",
+                texture_type=Texture2D,
+                width=width,
+                height=height,
+                internal_format=GL_R32F,
+                texture_format=GL_RED,
+                data_type=GL_FLOAT,
+                min_filter=GL_NEAREST_MIPMAP_NEAREST,
+                mag_filter=GL_NEAREST,
+                wrap=GL_CLAMP
+            )
+            dispatches = get_depth_pyramid_dispatches(width, height, texture.get_mipmap_count())
+
+            glBeginQuery(GL_TIME_ELAPSED, query)
+            for i in range(loop):
+                self.render_generate_min_z(texture)
+            glEndQuery(GL_TIME_ELAPSED)
+            elapsed_time = glGetQueryObjectui64v(query, GL_QUERY_RESULT) / 1000000.0 / loop
+
+            logger.info("generate_min_z %dx%d : %.3fms, dispatches : %d" % (width, height, elapsed_time, len(dispatches)))
+            texture.delete()
+        glDeleteQueries(1, [query, ])
+
     def render_tone_map(self, texture_diffuse, texture_bloom0, texture_bloom1, texture_bloom2, texture_bloom3,
                         texture_bloom4, texture_light_shaft):
         self.tonemapping.use_program()
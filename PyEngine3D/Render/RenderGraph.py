@@ -0,0 +1,191 @@
+from OpenGL.GL import *
+
+from .RenderTarget import RenderTargets
+
+
+class ResourceAccess:
+    FRAMEBUFFER = 0  # attachment, clear, blend, blit
+    TEXTURE = 1  # sampler
+    IMAGE = 2  # imageLoad, imageStore
+    STORAGE = 3  # shader storage buffer
+    PIXEL = 4  # glReadPixels, glGetTexImage, glTexSubImage
+
+
+# the writes which are not visible to the following accesses without glMemoryBarrier
+INCOHERENT_ACCESSES = (ResourceAccess.IMAGE, ResourceAccess.STORAGE)
+
+MEMORY_BARRIER_BITS = {
+    ResourceAccess.FRAMEBUFFER: GL_FRAMEBUFFER_BARRIER_BIT,
+    ResourceAccess.TEXTURE: GL_TEXTURE_FETCH_BARRIER_BIT,
+    ResourceAccess.IMAGE: GL_SHADER_IMAGE_ACCESS_BARRIER_BIT,
+    ResourceAccess.STORAGE: GL_SHADER_STORAGE_BARRIER_BIT,
+    ResourceAccess.PIXEL: GL_PIXEL_BUFFER_BARRIER_BIT | GL_TEXTURE_UPDATE_BARRIER_BIT,
+}
+
+
+def get_resource_accesses(resources, default_access):
+    # a resource is 'NAME' or ('NAME', ResourceAccess)
+    resource_accesses = []
+    for resource in resources:
+        if type(resource) in (tuple, list):
+            resource_accesses.append((resource[0], resource[1]))
+        else:
+            resource_accesses.append((resource, default_access))
+    return resource_accesses
+
+
+class RenderPass:
+    def __init__(self, name, execute, reads=(), writes=(), color_attachments=(), depth_attachment='', side_effect=False):
+        """
+        :param reads: resources used by the pass. The render target names of RenderTargets or any other name.
+        :param writes: resources modified by the pass. The pass must also read a resource which it does not overwrite entirely.
+        :param color_attachments, depth_attachment: names of RenderTargets, the framebuffer is bound before execute.
+            The depth attachment is read only when it is in reads but not in writes.
+        :param side_effect: the pass is never culled, e.g. the result is read back by the cpu.
+        """
+        self.name = name
+        self.execute = execute
+        self.reads = get_resource_accesses(reads, ResourceAccess.TEXTURE)
+        self.writes = get_resource_accesses(writes, ResourceAccess.FRAMEBUFFER)
+        self.color_attachments = color_attachments
+        self.depth_attachment = depth_attachment
+        self.side_effect = side_effect
+
+        attachments = list(color_attachments)
+        if depth_attachment and not self.is_read(depth_attachment):
+            attachments.append(depth_attachment)
+        for attachment in attachments:
+            if not self.is_written(attachment):
+                self.writes.append((attachment, ResourceAccess.FRAMEBUFFER))
+
+        # compiled
+        self.memory_barrier = 0
+        self.acquire_transients = []
+        self.release_transients = []
+
+    def is_read(self, resource_name):
+        return any(resource_name == resource for resource, access in self.reads)
+
+    def is_written(self, resource_name):
+        return any(resource_name == resource for resource, access in self.writes)
+
+
+class RenderGraph:
+    """
+    The passes are recorded every frame in the order of submission, a pass depends on the last writers of its reads.
+    compile culls the passes which do not contribute to the outputs, places the memory barriers
+    and the lifetimes of the transient render targets, then execute runs the remaining passes.
+    """
+    def __init__(self):
+        self.rendertarget_manager = None
+        self.framebuffer_manager = None
+        self.passes = []
+        self.compiled_passes = []
+        self.culled_pass_names = []
+
+        # transient render targets which keep their contents between frames, they are acquired by the passes.
+        self.history_resources = set()
+
+    def initialize(self, rendertarget_manager, framebuffer_manager):
+        self.rendertarget_manager = rendertarget_manager
+        self.framebuffer_manager = framebuffer_manager
+
+    def clear(self):
+        self.passes = []
+        self.compiled_passes = []
+
+    def add_pass(self, name, execute, **kwargs):
+        render_pass = RenderPass(name, execute, **kwargs)
+        self.passes.append(render_pass)
+        return render_pass
+
+    def is_transient(self, resource_name):
+        return resource_name in self.rendertarget_manager.transient_rendertarget_datas and \
+            resource_name not in self.history_resources
+
+    def compile(self, outputs):
+        # dependencies : the passes which produced the current contents of the resources
+        writers = dict()
+        dependencies = []
+        for index, render_pass in enumerate(self.passes):
+            dependency = set()
+            for resource, access in render_pass.reads:
+                dependency.update(writers.get(resource, []))
+            dependencies.append(dependency)
+
+            for resource, access in render_pass.writes:
+                if render_pass.is_read(resource):
+                    writers[resource] = writers.get(resource, []) + [index, ]
+                else:
+                    writers[resource] = [index, ]
+
+        # culling
+        live = [False] * len(self.passes)
+        stack = [index for index, render_pass in enumerate(self.passes) if render_pass.side_effect]
+        for output in outputs:
+            stack.extend(writers.get(output, []))
+
+        while stack:
+            index = stack.pop()
+            if not live[index]:
+                live[index] = True
+                stack.extend(dependencies[index])
+
+        self.compiled_passes = [render_pass for index, render_pass in enumerate(self.passes) if live[index]]
+        self.culled_pass_names = [render_pass.name for index, render_pass in enumerate(self.passes) if not live[index]]
+
+        # memory barriers : barrier bits issued after the last incoherent write of the resources
+        issued_barriers = dict()
+        for render_pass in self.compiled_passes:
+            memory_barrier = 0
+            for resource, access in render_pass.reads + render_pass.writes:
+                if resource in issued_barriers:
+                    barrier_bits = MEMORY_BARRIER_BITS[access]
+                    if barrier_bits & ~issued_barriers[resource]:
+                        memory_barrier |= barrier_bits
+            render_pass.memory_barrier = memory_barrier
+
+            if memory_barrier:
+                for resource in issued_barriers:
+                    issued_barriers[resource] |= memory_barrier
+
+            for resource, access in render_pass.writes:
+                if access in INCOHERENT_ACCESSES:
+                    issued_barriers[resource] = 0
+
+        # lifetimes of the transient render targets : from the first write to the last access
+        last_passes = dict()
+        for render_pass in self.compiled_passes:
+            render_pass.acquire_transients = []
+            render_pass.release_transients = []
+
+            for resource, access in render_pass.writes:
+                if resource not in last_passes and self.is_transient(resource):
+                    render_pass.acquire_transients.append(resource)
+                    last_passes[resource] = render_pass
+
+            for resource, access in render_pass.reads + render_pass.writes:
+                if resource in last_passes:
+                    last_passes[resource] = render_pass
+
+        for resource, render_pass in last_passes.items():
+            render_pass.release_transients.append(resource)
+
+    def execute(self):
+        for render_pass in self.compiled_passes:
+            for resource in render_pass.acquire_transients:
+                self.rendertarget_manager.acquire_transient(resource)
+
+            if render_pass.memory_barrier:
+                glMemoryBarrier(render_pass.memory_barrier)
+
+            if render_pass.color_attachments or render_pass.depth_attachment:
+                color_textures = [getattr(RenderTargets, attachment) for attachment in render_pass.color_attachments]
+                depth_texture = getattr(RenderTargets, render_pass.depth_attachment) if render_pass.depth_attachment else None
+                self.framebuffer_manager.bind_framebuffer(*color_textures, depth_texture=depth_texture)
+
+            render_pass.execute()
+
+            for resource in render_pass.release_transients:
+                self.rendertarget_manager.release_transient(resource)
+        self.clear()
@@ -1,6 +1,7 @@
 import math
 
 from PyEngine3D.Utilities import *
+from PyEngine3D.Common import SHADOW_CASCADE_MIN_CASTER_TEXELS, MESH_LOD_SCREEN_SIZES, MESH_LOD_HYSTERESIS, MESH_LOD_SHADOW_BIAS
 
 
 def always_pass(*args):
@@ -33,33 +34,71 @@ def view_frustum_culling_geometry(camera, light, actor, geometry_bound_box):
     return False
 
 
-def shadow_culling(camera, light, actor, geometry_bound_box):
-    bound_min = np.dot(np.array([geometry_bound_box.bound_min[0], geometry_bound_box.bound_min[1], geometry_bound_box.bound_min[2], 1.0], dtype=np.float32), light.shadow_view_projection)[: 3]
-    bound_max = np.dot(np.array([geometry_bound_box.bound_max[0], geometry_bound_box.bound_max[1], geometry_bound_box.bound_max[2], 1.0], dtype=np.float32), light.shadow_view_projection)[: 3]
-    minimum = np.minimum(bound_min, bound_max)
-    maximum = np.maximum(bound_min, bound_max)
-    if any(x < -1.0 for x in maximum) or any(1.0 < x for x in minimum):
+def shadow_cascade_culling(shadow_cascade, geometry_bound_box):
+    """ return : True when the geometry is out of the cascade or its shadow is smaller than a few texels of the cascade """
+    view_projection = shadow_cascade.view_projection
+    center = np.dot(geometry_bound_box.bound_center, view_projection[:3, :3]) + view_projection[3, :3]
+    extent = np.dot((geometry_bound_box.bound_max - geometry_bound_box.bound_min) * 0.5, np.abs(view_projection[:3, :3]))
+    if any(1.0 < abs(center) - extent):
         return True
-    return False
-
-
-def gather_render_infos(culling_func, camera, light, actor_list, solid_render_infos, translucent_render_infos):
+    # extent is the half size in the clip space [-1, 1]
+    return max(extent[0], extent[1]) * shadow_cascade.resolution < SHADOW_CASCADE_MIN_CASTER_TEXELS
+
+
+def get_screen_size(camera, bound_box):
+    """ the ratio of the diameter of the bound sphere to the screen height """
+    distance = length(bound_box.bound_center - camera.transform.pos)
+    if distance <= camera.near:
+        return math.inf
+    # projection[1][1] is 1 / tan(fov / 2), bound_box.radius is the length of the diagonal.
+    return bound_box.radius * camera.projection[1][1] * 0.5 / distance
+
+
+def select_geometry_lod(camera, bound_box, lod, lod_count, lod_bias=1.0):
+    """
+    The lod i + 1 is used under MESH_LOD_SCREEN_SIZES[i], the lod changes only when the screen size
+    passes the threshold by the hysteresis ratio, so the geometries near a threshold do not flicker.
+    """
+    screen_size = get_screen_size(camera, bound_box) * lod_bias
+    max_lod = min(lod_count - 1, len(MESH_LOD_SCREEN_SIZES))
+    lod = min(lod, max_lod)
+    while lod < max_lod and screen_size < MESH_LOD_SCREEN_SIZES[lod] * (1.0 - MESH_LOD_HYSTERESIS):
+        lod += 1
+    while 0 < lod and MESH_LOD_SCREEN_SIZES[lod - 1] * (1.0 + MESH_LOD_HYSTERESIS) < screen_size:
+        lod -= 1
+    return lod
+
+
+def create_render_info(actor, geometry_index, material_instance, lod=0):
+    render_info = RenderInfo()
+    render_info.actor = actor
+    render_info.lod = lod
+    render_info.geometry = actor.get_geometry(geometry_index)
+    render_info.geometry_data = actor.get_geometry_data(geometry_index)
+    render_info.gl_call_list = actor.get_gl_call_list(geometry_index)
+    render_info.material = material_instance.material if material_instance else None
+    render_info.material_instance = material_instance
+    return render_info
+
+
+def gather_render_infos(culling_func, camera, light, actor_list, solid_render_infos, translucent_render_infos, mesh_lod=False):
+    """ mesh_lod : the lods of the geometries are selected by the screen size on the camera """
     for actor in actor_list:
         for i in range(actor.get_geometry_count()):
             if not actor.visible:
                 continue
 
-            if culling_func(camera, light, actor, actor.get_geometry_bound_box(i)):
+            geometry_bound_box = actor.get_geometry_bound_box(i)
+            if culling_func(camera, light, actor, geometry_bound_box):
                 continue
 
+            lod = 0
+            if mesh_lod:
+                lod = select_geometry_lod(camera, geometry_bound_box, actor.geometry_lods[i], actor.get_geometry(i).get_lod_count())
+                actor.geometry_lods[i] = lod
+
             material_instance = actor.get_material_instance(i)
-            render_info = RenderInfo()
-            render_info.actor = actor
-            render_info.geometry = actor.get_geometry(i)
-            render_info.geometry_data = actor.get_geometry_data(i)
-            render_info.gl_call_list = actor.get_gl_call_list(i)
-            render_info.material = material_instance.material if material_instance else None
-            render_info.material_instance = material_instance
+            render_info = create_render_info(actor, i, material_instance, lod)
             if render_info.material_instance is not None and render_info.material_instance.is_translucent():
                 if translucent_render_infos is not None:
                     translucent_render_infos.append(render_info)
@@ -67,9 +106,40 @@ def gather_render_infos(culling_func, camera, light, actor_list, solid_render_in
                 solid_render_infos.append(render_info)
 
 
+def gather_shadow_render_infos(shadow_cascades, actor_list, cascade_render_infos, camera=None):
+    """
+    the solid geometries are culled by each cascade, cascade_render_infos is a list of render infos per cascade.
+    camera : the lods of the shadow casters are selected by the screen size on the camera with MESH_LOD_SHADOW_BIAS.
+    """
+    for actor in actor_list:
+        if not actor.visible:
+            continue
+
+        for i in range(actor.get_geometry_count()):
+            geometry_bound_box = actor.get_geometry_bound_box(i)
+            render_info = None
+            for shadow_cascade, render_infos in zip(shadow_cascades, cascade_render_infos):
+                if shadow_cascade_culling(shadow_cascade, geometry_bound_box):
+                    continue
+
+                if render_info is None:
+                    material_instance = actor.get_material_instance(i)
+                    if material_instance is not None and material_instance.is_translucent():
+                        break
+
+                    lod = 0
+                    if camera is not None:
+                        lod = select_geometry_lod(camera, geometry_bound_box, actor.shadow_geometry_lods[i],
+                                                  actor.get_geometry(i).get_lod_count(), MESH_LOD_SHADOW_BIAS)
+                        actor.shadow_geometry_lods[i] = lod
+                    render_info = create_render_info(actor, i, material_instance, lod)
+                render_infos.append(render_info)
+
+
 class RenderInfo:
     def __init__(self):
         self.actor = None
+        self.lod = 0
         self.geometry = None
         self.geometry_data = None
         self.gl_call_list = None
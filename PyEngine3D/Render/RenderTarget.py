@@ -8,15 +8,49 @@ from OpenGL.GL.ARB.framebuffer_object import *
 from OpenGL.GL.EXT.framebuffer_object import *
 
 from PyEngine3D.Utilities import *
-from PyEngine3D.Common import logger, COLOR_BLACK
+from PyEngine3D.Common import logger, COLOR_BLACK, SHADOW_MAP_SIZE
 from PyEngine3D.OpenGLContext import Texture2D, Texture2DArray, Texture2DMultiSample, TextureCube, RenderBuffer, CreateTexture
 from .Ocean import Constants as OceanConstants
 
 
+# frames to keep an unused render target in the pool
+RENDER_TARGET_POOL_KEEP_FRAMES = 60
+
+BYTES_PER_PIXEL = {
+    GL_R8: 1,
+    GL_R16F: 2,
+    GL_R32F: 4,
+    GL_RG16F: 4,
+    GL_RG32F: 8,
+    GL_RGB8: 3,
+    GL_RGB16F: 6,
+    GL_RGB32F: 12,
+    GL_RGBA8: 4,
+    GL_RGBA16F: 8,
+    GL_RGBA32F: 16,
+    GL_DEPTH_COMPONENT32: 4,
+    GL_DEPTH_COMPONENT32F: 4,
+    GL_DEPTH24_STENCIL8: 4,
+}
+
+
+def get_rendertarget_memory_size(rendertarget):
+    """ estimated video memory of the render target in bytes """
+    bytes_per_pixel = BYTES_PER_PIXEL.get(rendertarget.internal_format, 4)
+    memory_size = rendertarget.width * rendertarget.height * max(1, rendertarget.depth) * bytes_per_pixel
+    memory_size *= max(1, rendertarget.multisample_count)
+    if GL_TEXTURE_CUBE_MAP == rendertarget.target:
+        memory_size *= 6
+    if rendertarget.enable_mipmap:
+        memory_size = memory_size * 4 // 3
+    return memory_size
+
+
 class Option:
     NONE = 0
     MSAA = 1 << 1
     SSAA = 1 << 2
+    DYNAMIC_RESOLUTION = 1 << 3  # rendered in the sub rect of the render scale, see DynamicResolution
 
 
 class RenderTargets:
@@ -71,6 +105,13 @@ class RenderTargetManager(Singleton):
         self.rendertargets = dict()
         self.immutable_rendertarget_names = []
         self.temp_rendertargets = dict()
+        # transient render targets are declared by create_rendertargets and acquired by the passes every frame.
+        self.transient_rendertarget_datas = dict()
+        self.transient_rendertargets = dict()
+        # pooled render targets which are not used now, { key : [(rendertarget, released frame), ...] }
+        self.rendertarget_pool = dict()
+        self.frame_count = 0
+        self.peak_memory_size = 0
         self.first_time = True
         self.texture_lod_in_ssao = 1.0
 
@@ -84,6 +125,7 @@ class RenderTargetManager(Singleton):
     def clear(self, force=False):
         self.clear_rendertargets(force)
         self.clear_temp_rendertargets()
+        self.clear_rendertarget_pool()
 
     def clear_rendertargets(self, force=False):
         delete_list = []
@@ -107,11 +149,23 @@ class RenderTargetManager(Singleton):
         self.temp_rendertargets = dict()
         self.core_manager.gc_collect()
 
+    def clear_rendertarget_pool(self):
+        for rendertarget_name in list(self.transient_rendertargets.keys()):
+            self.release_transient(rendertarget_name)
+
+        for pooled_rendertargets in self.rendertarget_pool.values():
+            for rendertarget, released_frame in pooled_rendertargets:
+                rendertarget.delete()
+        self.rendertarget_pool = dict()
+        self.peak_memory_size = 0
+
     def find_rendertarget(self, rendertarget_index, rendertarget_name):
         if rendertarget_index < len(self.rendertargets) and rendertarget_name in self.rendertargets:
             return self.rendertargets[rendertarget_name]
         elif rendertarget_name in self.temp_rendertargets:
             return self.temp_rendertargets[rendertarget_name]
+        elif rendertarget_name in self.transient_rendertargets:
+            return self.transient_rendertargets[rendertarget_name]
         return None
 
     def get_rendertarget(self, rendertarget_name):
@@ -138,10 +192,13 @@ class RenderTargetManager(Singleton):
             logger.warn("Failed to get temporary %s render target." % rendertarget_name)
         return temp_rendertarget
 
-    def create_rendertarget(self, rendertarget_name, **datas):
+    def get_rendertarget_type(self, datas):
+        """ apply the anti aliasing options, datas is modified. """
         option = datas.get('option', Option.NONE)
 
         rendertarget_type = datas.get('texture_type', Texture2D)
+        if type(rendertarget_type) is str:
+            rendertarget_type = eval(rendertarget_type)
 
         if (Option.MSAA & option) and self.renderer.postprocess.enable_MSAA():
             if rendertarget_type == Texture2D:
@@ -151,6 +208,14 @@ class RenderTargetManager(Singleton):
             datas['width'] = datas.get('width', 1) * 2
             datas['height'] = datas.get('height', 1) * 2
 
+        datas['width'] = int(datas.get('width', 1))
+        datas['height'] = int(datas.get('height', 1))
+        datas['dynamic_resolution'] = bool(Option.DYNAMIC_RESOLUTION & option)
+        return rendertarget_type
+
+    def create_rendertarget(self, rendertarget_name, **datas):
+        rendertarget_type = self.get_rendertarget_type(datas)
+
         immutable = datas.get('immutable', False)
 
         rendertarget = None
@@ -179,6 +244,122 @@ class RenderTargetManager(Singleton):
 
         return rendertarget
 
+    @staticmethod
+    def get_rendertarget_key(rendertarget_type, datas):
+        # render targets which have the same key are interchangeable.
+        return (rendertarget_type.__name__,
+                datas.get('internal_format'),
+                datas.get('width'),
+                datas.get('height'),
+                datas.get('depth', 1),
+                datas.get('multisample_count', 0),
+                datas.get('min_filter'),
+                datas.get('mag_filter'),
+                datas.get('wrap'),
+                datas.get('dynamic_resolution', False))
+
+    def declare_transient(self, rendertarget_name, fallback_texture_name='', **datas):
+        """
+        Declare a render target which is allocated from the pool only while a pass uses it.
+        RenderTargets.<rendertarget_name> points to the fallback texture while it is not acquired.
+        """
+        rendertarget_type = self.get_rendertarget_type(datas)
+        self.transient_rendertarget_datas[rendertarget_name] = (rendertarget_type, fallback_texture_name, datas)
+        setattr(RenderTargets, rendertarget_name, self.get_fallback_texture(rendertarget_name))
+
+    def get_fallback_texture(self, rendertarget_name):
+        fallback_texture_name = self.transient_rendertarget_datas[rendertarget_name][1]
+        if fallback_texture_name:
+            return self.core_manager.resource_manager.get_texture(fallback_texture_name)
+        return None
+
+    def get_transient_datas(self, rendertarget_name):
+        return self.transient_rendertarget_datas[rendertarget_name][2]
+
+    def acquire_transient(self, rendertarget_name):
+        if rendertarget_name in self.transient_rendertargets:
+            return self.transient_rendertargets[rendertarget_name]
+
+        rendertarget_type, fallback_texture_name, datas = self.transient_rendertarget_datas[rendertarget_name]
+        rendertarget = self.acquire_rendertarget(rendertarget_name, rendertarget_type, datas)
+        self.transient_rendertargets[rendertarget_name] = rendertarget
+        setattr(RenderTargets, rendertarget_name, rendertarget)
+        return rendertarget
+
+    def release_transient(self, rendertarget_name):
+        if rendertarget_name in self.transient_rendertargets:
+            self.release_rendertarget(self.transient_rendertargets.pop(rendertarget_name))
+            setattr(RenderTargets, rendertarget_name, self.get_fallback_texture(rendertarget_name))
+
+    def swap_transient(self, rendertarget_name_a, rendertarget_name_b):
+        rendertarget_a = self.transient_rendertargets[rendertarget_name_a]
+        rendertarget_b = self.transient_rendertargets[rendertarget_name_b]
+        self.transient_rendertargets[rendertarget_name_a] = rendertarget_b
+        self.transient_rendertargets[rendertarget_name_b] = rendertarget_a
+        setattr(RenderTargets, rendertarget_name_a, rendertarget_b)
+        setattr(RenderTargets, rendertarget_name_b, rendertarget_a)
+
+    def get_temporary_transient(self, rendertarget_name, reference_rendertarget, scale=1.0):
+        """ a pooled render target like reference_rendertarget, it must be released by release_rendertarget. """
+        datas = reference_rendertarget.get_texture_info()
+        datas['width'] = int(datas['width'] * scale)
+        datas['height'] = int(datas['height'] * scale)
+        rendertarget_type = datas['texture_type']
+        if type(rendertarget_type) is str:
+            rendertarget_type = eval(rendertarget_type)
+        return self.acquire_rendertarget(rendertarget_name, rendertarget_type, datas)
+
+    def acquire_rendertarget(self, rendertarget_name, rendertarget_type, datas):
+        key = self.get_rendertarget_key(rendertarget_type, datas)
+        pooled_rendertargets = self.rendertarget_pool.get(key)
+        if pooled_rendertargets:
+            # alias a render target released by a previous pass.
+            rendertarget = pooled_rendertargets.pop()[0]
+            rendertarget.name = rendertarget_name
+        else:
+            if rendertarget_type == RenderBuffer:
+                rendertarget = RenderBuffer(name=rendertarget_name, **datas)
+            else:
+                rendertarget = CreateTexture(name=rendertarget_name, **datas)
+            rendertarget.pool_key = key
+            self.update_peak_memory_size()
+        return rendertarget
+
+    def release_rendertarget(self, rendertarget):
+        if rendertarget is not None:
+            if rendertarget.pool_key not in self.rendertarget_pool:
+                self.rendertarget_pool[rendertarget.pool_key] = []
+            self.rendertarget_pool[rendertarget.pool_key].append((rendertarget, self.frame_count))
+
+    def update_rendertarget_pool(self):
+        """ free the render targets which are not used for a while, e.g. the effect is disabled. """
+        self.frame_count += 1
+        for key in list(self.rendertarget_pool.keys()):
+            pooled_rendertargets = self.rendertarget_pool[key]
+            for rendertarget, released_frame in pooled_rendertargets:
+                if RENDER_TARGET_POOL_KEEP_FRAMES < (self.frame_count - released_frame):
+                    self.renderer.framebuffer_manager.delete_framebuffers_of_texture(rendertarget)
+                    rendertarget.delete()
+            pooled_rendertargets[:] = [(rendertarget, released_frame) for rendertarget, released_frame in pooled_rendertargets
+                                       if (self.frame_count - released_frame) <= RENDER_TARGET_POOL_KEEP_FRAMES]
+            if not pooled_rendertargets:
+                self.rendertarget_pool.pop(key)
+
+    def get_memory_size(self):
+        """ return : (persistent render targets, transient render targets in use and in the pool) in bytes """
+        persistent_memory_size = sum([get_rendertarget_memory_size(rendertarget) for rendertarget in self.rendertargets.values()])
+        persistent_memory_size += sum([get_rendertarget_memory_size(rendertarget) for rendertarget in self.temp_rendertargets.values()])
+        transient_memory_size = sum([get_rendertarget_memory_size(rendertarget) for rendertarget in self.transient_rendertargets.values()])
+        for pooled_rendertargets in self.rendertarget_pool.values():
+            transient_memory_size += sum([get_rendertarget_memory_size(rendertarget) for rendertarget, released_frame in pooled_rendertargets])
+        return persistent_memory_size, transient_memory_size
+
+    def update_peak_memory_size(self):
+        memory_size = sum(self.get_memory_size())
+        if self.peak_memory_size < memory_size:
+            self.peak_memory_size = memory_size
+            logger.info("RenderTarget peak memory : %.2fMB" % (memory_size / 1048576.0))
+
     def create_rendertargets(self):
         self.clear()
 
@@ -200,6 +381,10 @@ class RenderTargetManager(Singleton):
         hdr_internal_format = GL_RGBA16F
         hdr_data_type = GL_FLOAT
 
+        # Note : the render targets of the effects are declared as transient,
+        # they are allocated from the pool only when the effect is rendered and share the memory with the other passes.
+        self.transient_rendertarget_datas = dict()
+
         RenderTargets.SCREENBUFFER = self.create_rendertarget(
             "SCREENBUFFER",
             texture_type=Texture2D,
@@ -232,7 +417,7 @@ class RenderTargetManager(Singleton):
         RenderTargets.DEPTH = self.create_rendertarget(
             "DEPTH",
             texture_type=Texture2D,
-            option=Option.SSAA,
+            option=Option.SSAA | Option.DYNAMIC_RESOLUTION,
             width=fullsize_x,
             height=fullsize_y,
             internal_format=GL_DEPTH_COMPONENT32F,
@@ -289,7 +474,7 @@ class RenderTargetManager(Singleton):
 
         hdr_options = dict(
             texture_type=Texture2D,
-            option=Option.MSAA | Option.SSAA,
+            option=Option.MSAA | Option.SSAA | Option.DYNAMIC_RESOLUTION,
             width=fullsize_x,
             height=fullsize_y,
             internal_format=hdr_internal_format,
@@ -303,11 +488,11 @@ class RenderTargetManager(Singleton):
 
         RenderTargets.HDR = self.create_rendertarget("HDR", **hdr_options)
         RenderTargets.HDR_TEMP = self.create_rendertarget("HDR_TEMP", **hdr_options)
-        RenderTargets.HDR_BACKUP = self.create_rendertarget("HDR_BACKUP", **hdr_options)
+        self.declare_transient("HDR_BACKUP", **hdr_options)
 
         bloom_options = dict(
             texture_type=Texture2D,
-            option=Option.SSAA,
+            option=Option.SSAA | Option.DYNAMIC_RESOLUTION,
             internal_format=hdr_internal_format,
             texture_format=GL_RGBA,
             min_filter=GL_LINEAR,
@@ -316,44 +501,51 @@ class RenderTargetManager(Singleton):
             wrap=GL_CLAMP
         )
 
-        RenderTargets.BLOOM_0 = self.create_rendertarget(
+        self.declare_transient(
             "BLOOM_0",
+            'common.flat_black',
             width=fullsize_x / 2,
             height=fullsize_y / 2,
             **bloom_options
         )
 
-        RenderTargets.BLOOM_1 = self.create_rendertarget(
+        self.declare_transient(
             "BLOOM_1",
+            'common.flat_black',
             width=fullsize_x / 4,
             height=fullsize_y / 4,
             **bloom_options
         )
 
-        RenderTargets.BLOOM_2 = self.create_rendertarget(
+        self.declare_transient(
             "BLOOM_2",
+            'common.flat_black',
             width=fullsize_x / 8,
             height=fullsize_y / 8,
             **bloom_options
         )
 
-        RenderTargets.BLOOM_3 = self.create_rendertarget(
+        self.declare_transient(
             "BLOOM_3",
+            'common.flat_black',
             width=fullsize_x / 16,
             height=fullsize_y / 16,
             **bloom_options
         )
 
-        RenderTargets.BLOOM_4 = self.create_rendertarget(
+        self.declare_transient(
             "BLOOM_4",
+            'common.flat_black',
             width=fullsize_x / 32,
             height=fullsize_y / 32,
             **bloom_options
         )
 
-        RenderTargets.LIGHT_SHAFT = self.create_rendertarget(
+        self.declare_transient(
             "LIGHT_SHAFT",
+            'common.flat_black',
             texture_type=Texture2D,
+            option=Option.DYNAMIC_RESOLUTION,
             width=halfsize_x,
             height=halfsize_y,
             internal_format=hdr_internal_format,
@@ -381,6 +573,7 @@ class RenderTargetManager(Singleton):
         RenderTargets.ATMOSPHERE = self.create_rendertarget(
             "ATMOSPHERE",
             texture_type=Texture2D,
+            option=Option.DYNAMIC_RESOLUTION,
             width=quatersize_x,
             height=quatersize_y,
             internal_format=hdr_internal_format,
@@ -395,6 +588,7 @@ class RenderTargetManager(Singleton):
         RenderTargets.ATMOSPHERE_INSCATTER = self.create_rendertarget(
             "ATMOSPHERE_INSCATTER",
             texture_type=Texture2D,
+            option=Option.DYNAMIC_RESOLUTION,
             width=quatersize_x,
             height=quatersize_y,
             internal_format=hdr_internal_format,
@@ -406,10 +600,10 @@ class RenderTargetManager(Singleton):
             immutable=True
         )
 
-        RenderTargets.TAA_RESOLVE = self.create_rendertarget(
-            "TAA Resolve",
+        self.declare_transient(
+            "TAA_RESOLVE",
             texture_type=Texture2D,
-            option=Option.MSAA | Option.SSAA,
+            option=Option.MSAA | Option.SSAA | Option.DYNAMIC_RESOLUTION,
             width=fullsize_x,
             height=fullsize_y,
             internal_format=hdr_internal_format,
@@ -423,7 +617,7 @@ class RenderTargetManager(Singleton):
         RenderTargets.DIFFUSE = self.create_rendertarget(
             "DIFFUSE",
             texture_type=Texture2D,
-            option=Option.SSAA,
+            option=Option.SSAA | Option.DYNAMIC_RESOLUTION,
             width=fullsize_x,
             height=fullsize_y,
             internal_format=GL_RGBA8,
@@ -437,7 +631,7 @@ class RenderTargetManager(Singleton):
         RenderTargets.MATERIAL = self.create_rendertarget(
             "MATERIAL",
             texture_type=Texture2D,
-            option=Option.SSAA,
+            option=Option.SSAA | Option.DYNAMIC_RESOLUTION,
             width=fullsize_x,
             height=fullsize_y,
             internal_format=GL_RGBA8,
@@ -451,7 +645,7 @@ class RenderTargetManager(Singleton):
         RenderTargets.WORLD_NORMAL = self.create_rendertarget(
             "WORLD_NORMAL",
             texture_type=Texture2D,
-            option=Option.SSAA,
+            option=Option.SSAA | Option.DYNAMIC_RESOLUTION,
             width=fullsize_x,
             height=fullsize_y,
             internal_format=GL_RGBA8,
@@ -462,8 +656,8 @@ class RenderTargetManager(Singleton):
             wrap=GL_CLAMP
         )
 
-        # It must attach to depth render target
-        shadow_map_size = 2048
+        # It must attach to depth render target, the cascades are the tiles of the atlas.
+        shadow_map_size = SHADOW_MAP_SIZE
         RenderTargets.STATIC_SHADOWMAP = self.create_rendertarget(
             "STATIC_SHADOWMAP",
             texture_type=Texture2D,
@@ -507,6 +701,7 @@ class RenderTargetManager(Singleton):
         RenderTargets.LINEAR_DEPTH = self.create_rendertarget(
             "LINEAR_DEPTH",
             texture_type=Texture2D,
+            option=Option.DYNAMIC_RESOLUTION,
             width=fullsize_x,
             height=fullsize_y,
             internal_format=GL_R32F,
@@ -534,6 +729,7 @@ class RenderTargetManager(Singleton):
 
         ssr_options = dict(
             texture_type=Texture2D,
+            option=Option.DYNAMIC_RESOLUTION,
             width=halfsize_x,
             height=halfsize_y,
             internal_format=hdr_internal_format,
@@ -545,13 +741,15 @@ class RenderTargetManager(Singleton):
             wrap=GL_CLAMP
         )
 
-        RenderTargets.SCREEN_SPACE_REFLECTION = self.create_rendertarget("SCREEN_SPACE_REFLECTION", **ssr_options)
-        RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED_PREV = self.create_rendertarget("SCREEN_SPACE_REFLECTION_RESOLVED_PREV", **ssr_options)
-        RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED = self.create_rendertarget("SCREEN_SPACE_REFLECTION_RESOLVED", **ssr_options)
+        self.declare_transient("SCREEN_SPACE_REFLECTION", 'common.flat_black', **ssr_options)
+        self.declare_transient("SCREEN_SPACE_REFLECTION_RESOLVED_PREV", 'common.flat_black', **ssr_options)
+        self.declare_transient("SCREEN_SPACE_REFLECTION_RESOLVED", 'common.flat_black', **ssr_options)
 
-        RenderTargets.SSAO = self.create_rendertarget(
+        self.declare_transient(
             "SSAO",
+            'common.flat_white',
             texture_type=Texture2D,
+            option=Option.DYNAMIC_RESOLUTION,
             width=halfsize_x,
             height=halfsize_y,
             internal_format=GL_R16F,
@@ -565,7 +763,7 @@ class RenderTargetManager(Singleton):
         RenderTargets.VELOCITY = self.create_rendertarget(
             "VELOCITY",
             texture_type=Texture2D,
-            option=Option.SSAA,
+            option=Option.SSAA | Option.DYNAMIC_RESOLUTION,
             width=fullsize_x,
             height=fullsize_y,
             internal_format=GL_RG32F,
@@ -608,7 +806,7 @@ class RenderTargetManager(Singleton):
             immutable=True
         )
 
-        RenderTargets.TEMP_RGBA8 = self.create_rendertarget(
+        self.declare_transient(
             "TEMP_RGBA8",
             texture_type=Texture2D,
             width=fullsize_x,
@@ -621,7 +819,7 @@ class RenderTargetManager(Singleton):
             wrap=GL_CLAMP
         )
 
-        RenderTargets.TEMP_2D_ARRAY = self.create_rendertarget(
+        self.declare_transient(
             "TEMP_2D_ARRAY",
             texture_type=Texture2DArray,
             width=fullsize_x,
@@ -635,7 +833,7 @@ class RenderTargetManager(Singleton):
             wrap=GL_CLAMP
         )
 
-        RenderTargets.TEMP_MULTISAMPLE_X4 = self.create_rendertarget(
+        self.declare_transient(
             "TEMP_MULTISAMPLE_X4",
             texture_type=Texture2DMultiSample,
             multisample_count=4,
@@ -649,7 +847,7 @@ class RenderTargetManager(Singleton):
             wrap=GL_CLAMP
         )
 
-        RenderTargets.TEMP_RENDER_BUFFER_MULTISAMPLE = self.create_rendertarget(
+        self.declare_transient(
             "TEMP_RENDER_BUFFER_MULTISAMPLE",
             texture_type=RenderBuffer,
             multisample_count=4,
@@ -672,6 +870,8 @@ class RenderTargetManager(Singleton):
             wrap=GL_CLAMP
         )
 
-        self.texture_lod_in_ssao = math.log2(RenderTargets.LINEAR_DEPTH.width) - math.log2(RenderTargets.SSAO.width)
+        self.texture_lod_in_ssao = math.log2(RenderTargets.LINEAR_DEPTH.width) - math.log2(self.get_transient_datas("SSAO")['width'])
+
+        self.update_peak_memory_size()
 
         self.core_manager.gc_collect()
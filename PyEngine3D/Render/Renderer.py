@@ -9,11 +9,17 @@ from OpenGL.GLU import *
 from PyEngine3D.Common import logger, COMMAND
 from PyEngine3D.Common.Constants import *
 from PyEngine3D.Utilities import *
-from PyEngine3D.OpenGLContext import InstanceBuffer, FrameBufferManager, RenderBuffer, UniformBlock, CreateTexture
+from PyEngine3D.OpenGLContext import InstanceBuffer, FrameBufferManager, RenderBuffer, UniformBlock, CreateTexture, bind_frame_texture
 from .PostProcess import AntiAliasing, PostProcess
 from . import RenderTargets, RenderOption, RenderingType, RenderGroup, RenderMode
 from . import SkeletonActor, StaticActor, ScreenQuad, Line
 from . import Spline3D
+from .Camera import Camera
+from .LightCluster import LightCluster
+from .SkinningPalette import SkinningPalette
+from .BakedAnimation import BakedAnimationManager
+from .DynamicResolution import DynamicResolution, get_render_scale_xy
+from .RenderGraph import RenderGraph, ResourceAccess
 
 
 class Renderer(Singleton):
@@ -56,13 +62,27 @@ class Renderer(Singleton):
         self.uniform_view_projection_data = None
         self.uniform_light_buffer = None
         self.uniform_light_data = None
-        self.uniform_point_light_buffer = None
-        self.uniform_point_light_data = None
+        self.uniform_light_cluster_buffer = None
+        self.uniform_light_cluster_data = None
         self.uniform_particle_common_buffer = None
         self.uniform_particle_common_data = None
         self.uniform_particle_infos_buffer = None
         self.uniform_particle_infos_data = None
 
+        # clustered point lights
+        self.light_cluster = LightCluster()
+
+        # the bone matrices of the skeleton actors
+        self.skinning_palette = SkinningPalette()
+
+        # light probe baking
+        self.render_camera = None
+        self.light_probe_camera = None
+        self.baking_light_probe = None
+        self.light_probe_bake_step = 0
+        self.light_probe_atmosphere_changed = True
+        self.light_probe_convolve_texture = None
+
         # material instances
         self.scene_constants_material = None
         self.debug_bone_material = None
@@ -82,8 +102,16 @@ class Renderer(Singleton):
 
         self.actor_instance_buffer = None
 
+        # shadow map cache
+        self.need_to_composite_shadowmap = True
+
         self.render_custom_translucent_callbacks = []
 
+        self.render_graph = RenderGraph()
+
+        # the scene is rendered in the sub rect of the render targets, the scale follows the gpu time.
+        self.dynamic_resolution = DynamicResolution()
+
     def initialize(self, core_manager):
         logger.info("Initialize Renderer")
         self.core_manager = core_manager
@@ -100,6 +128,12 @@ class Renderer(Singleton):
 
         self.framebuffer_manager = FrameBufferManager.instance()
 
+        self.render_graph.initialize(self.rendertarget_manager, self.framebuffer_manager)
+        self.dynamic_resolution.initialize()
+        self.render_graph.history_resources.update(['SCREEN_SPACE_REFLECTION_RESOLVED',
+                                                    'SCREEN_SPACE_REFLECTION_RESOLVED_PREV',
+                                                    'TAA_RESOLVE'])
+
         # material instances
         self.scene_constants_material = self.resource_manager.get_material_instance('scene_constants_main')
         self.debug_bone_material = self.resource_manager.get_material_instance("debug_bone")
@@ -138,7 +172,9 @@ class Renderer(Singleton):
                                                      ('BACKBUFFER_SIZE', np.float32, 2),
                                                      ('MOUSE_POS', np.float32, 2),
                                                      ('DELTA_TIME', np.float32),
-                                                     ('SCENE_DUMMY_0', np.int32)])
+                                                     ('SCENE_DUMMY_0', np.int32),
+                                                     ('RENDER_SCALE', np.float32, 2),
+                                                     ('PREV_RENDER_SCALE', np.float32, 2)])
         self.uniform_scene_buffer = UniformBlock("scene_constants", program, 0, self.uniform_scene_data)
 
         self.uniform_view_data = np.zeros(1, dtype=[('VIEW', np.float32, (4, 4)),
@@ -160,20 +196,25 @@ class Renderer(Singleton):
         self.uniform_view_projection_buffer = UniformBlock("view_projection", program, 2,
                                                            self.uniform_view_projection_data)
 
-        self.uniform_light_data = np.zeros(1, dtype=[('SHADOW_MATRIX', np.float32, (4, 4)),
+        self.uniform_light_data = np.zeros(1, dtype=[('SHADOW_CASCADE_MATRICES', np.float32, (MAX_SHADOW_CASCADE_COUNT, 4, 4)),
+                                                     ('SHADOW_CASCADE_UV_RECTS', np.float32, (MAX_SHADOW_CASCADE_COUNT, 4)),
                                                      ('LIGHT_POSITION', np.float32, 3),
                                                      ('SHADOW_EXP', np.float32),
                                                      ('LIGHT_DIRECTION', np.float32, 3),
                                                      ('SHADOW_BIAS', np.float32),
                                                      ('LIGHT_COLOR', np.float32, 3),
-                                                     ('SHADOW_SAMPLES', np.int32)])
+                                                     ('SHADOW_SAMPLES', np.int32),
+                                                     ('SHADOW_CASCADE_COUNT', np.int32),
+                                                     ('SHADOW_DUMMY_0', np.float32),
+                                                     ('SHADOW_DUMMY_1', np.float32, 2)])
         self.uniform_light_buffer = UniformBlock("light_constants", program, 3, self.uniform_light_data)
 
-        self.uniform_point_light_data = np.zeros(MAX_POINT_LIGHTS, dtype=[('color', np.float32, 3),
-                                                                          ('radius', np.float32),
-                                                                          ('pos', np.float32, 3),
-                                                                          ('render', np.float32)])
-        self.uniform_point_light_buffer = UniformBlock("point_light_constants", program, 4, self.uniform_point_light_data)
+        self.uniform_light_cluster_data = np.zeros(1, dtype=[('LIGHT_CLUSTER_Z_SCALE_BIAS', np.float32, 2),
+                                                             ('POINT_LIGHT_COUNT', np.int32),
+                                                             ('LIGHT_CLUSTER_DUMMY_0', np.int32)])
+        self.uniform_light_cluster_buffer = UniformBlock("light_cluster_constants", program, 4, self.uniform_light_cluster_data)
+        self.light_cluster.initialize()
+        self.skinning_palette.initialize()
 
         self.uniform_particle_common_data = np.zeros(1, dtype=[
             ('PARTICLE_COLOR', np.float32, 3),
@@ -235,7 +276,14 @@ class Renderer(Singleton):
         self.core_manager.send_rendering_type_list(rendering_type_list)
 
     def close(self):
-        pass
+        self.light_cluster.close()
+        self.skinning_palette.close()
+        BakedAnimationManager.instance().clear()
+        self.dynamic_resolution.clear()
+
+        if self.light_probe_convolve_texture is not None:
+            self.light_probe_convolve_texture.delete()
+            self.light_probe_convolve_texture = None
 
     def render_custom_translucent(self, render_custom_translucent_callback):
         self.render_custom_translucent_callbacks.append(render_custom_translucent_callback)
@@ -274,6 +322,7 @@ class Renderer(Singleton):
         self.framebuffer_manager.clear_framebuffer()
         self.rendertarget_manager.create_rendertargets()
         self.scene_manager.reset_light_probe()
+        self.scene_manager.reset_static_shadow()
         self.core_manager.gc_collect()
 
     def ortho_view(self, look_at=True):
@@ -316,7 +365,7 @@ class Renderer(Singleton):
             self.debug_texture = None
 
     def bind_uniform_blocks(self):
-        camera = self.scene_manager.main_camera
+        camera = self.get_render_camera()
         main_light = self.scene_manager.main_light
 
         if not camera or not main_light:
@@ -333,6 +382,14 @@ class Renderer(Singleton):
         uniform_data['BACKBUFFER_SIZE'] = (RenderTargets.BACKBUFFER.width, RenderTargets.BACKBUFFER.height)
         uniform_data['MOUSE_POS'] = self.core_manager.get_mouse_pos()
         uniform_data['DELTA_TIME'] = self.core_manager.delta
+        if RenderOption.RENDER_LIGHT_PROBE:
+            uniform_data['RENDER_SCALE'] = (1.0, 1.0)
+            uniform_data['PREV_RENDER_SCALE'] = (1.0, 1.0)
+        else:
+            # the ratio of the integer viewport of the scene render targets
+            width, height = RenderTargets.HDR.width, RenderTargets.HDR.height
+            uniform_data['RENDER_SCALE'] = get_render_scale_xy(width, height, self.dynamic_resolution.render_scale)
+            uniform_data['PREV_RENDER_SCALE'] = get_render_scale_xy(width, height, self.dynamic_resolution.prev_render_scale)
         self.uniform_scene_buffer.bind_uniform_block(data=uniform_data)
 
         uniform_data = self.uniform_view_data
@@ -349,7 +406,10 @@ class Renderer(Singleton):
         self.uniform_view_buffer.bind_uniform_block(data=uniform_data)
 
         uniform_data = self.uniform_light_data
-        uniform_data['SHADOW_MATRIX'][...] = main_light.shadow_view_projection
+        for i, shadow_cascade in enumerate(main_light.shadow_cascades):
+            uniform_data['SHADOW_CASCADE_MATRICES'][0][i][...] = shadow_cascade.shadow_matrix
+            uniform_data['SHADOW_CASCADE_UV_RECTS'][0][i][...] = shadow_cascade.uv_rect
+        uniform_data['SHADOW_CASCADE_COUNT'] = len(main_light.shadow_cascades)
         uniform_data['SHADOW_EXP'] = main_light.shadow_exp
         uniform_data['SHADOW_BIAS'] = main_light.shadow_bias
         uniform_data['SHADOW_SAMPLES'] = main_light.shadow_samples
@@ -358,63 +418,57 @@ class Renderer(Singleton):
         uniform_data['LIGHT_COLOR'][...] = main_light.light_color[:3]
         self.uniform_light_buffer.bind_uniform_block(data=uniform_data)
 
-        self.uniform_point_light_buffer.bind_uniform_block(data=self.uniform_point_light_data)
-
-    def render_light_probe(self, light_probe):
-        if light_probe.isRendered:
-            return
-
-        logger.info("Rendering Light Probe")
-
-        # Set Valid
-        light_probe.isRendered = True
-
-        camera = self.scene_manager.main_camera
-
-        old_pos = camera.transform.get_pos().copy()
-        old_rot = camera.transform.get_rotation().copy()
-        old_fov = camera.fov
-        old_aspect = camera.aspect
-        old_render_font = RenderOption.RENDER_FONT
-        old_render_skeleton = RenderOption.RENDER_SKELETON_ACTOR
-        old_render_effect = RenderOption.RENDER_EFFECT
-        old_render_collision = RenderOption.RENDER_COLLISION
-
-        old_render_ssr = self.postprocess.is_render_ssr
-        old_render_motion_blur = self.postprocess.is_render_motion_blur
-        old_antialiasing = self.postprocess.anti_aliasing
-        old_debug_absolute = self.postprocess.debug_absolute
-        old_debug_mipmap = self.postprocess.debug_mipmap
-        old_debug_intensity_min = self.postprocess.debug_intensity_min
-        old_debug_intensity_max = self.postprocess.debug_intensity_max
-
-        # set render light probe
-        RenderOption.RENDER_LIGHT_PROBE = True
-        RenderOption.RENDER_SKELETON_ACTOR = False
-        RenderOption.RENDER_EFFECT = False
-        RenderOption.RENDER_FONT = False
-        self.postprocess.is_render_motion_blur = False
-        self.postprocess.anti_aliasing = AntiAliasing.NONE_AA
-
-        camera.update_projection(fov=90.0, aspect=1.0)
-
-        def render_cube_face(dst_texture, target_face, pos, rotation):
-            camera.transform.set_pos(pos)
-            camera.transform.set_rotation(rotation)
-            camera.update(force_update=True)
-
-            # render
-            self.render_scene()
-
-            # copy
-            src_framebuffer = self.framebuffer_manager.get_framebuffer(RenderTargets.HDR)
-            self.framebuffer_manager.bind_framebuffer(dst_texture, target_face=target_face)
-            glClear(GL_COLOR_BUFFER_BIT)
-
-            self.framebuffer_manager.mirror_framebuffer(src_framebuffer)
-
-            return dst_texture
-
+        # cluster the point lights for the current camera, light probe faces included.
+        self.light_cluster.update_light_cluster(camera, self.scene_manager.point_light_datas)
+        uniform_data = self.uniform_light_cluster_data
+        uniform_data['LIGHT_CLUSTER_Z_SCALE_BIAS'][...] = self.light_cluster.z_scale_bias
+        uniform_data['POINT_LIGHT_COUNT'] = self.light_cluster.light_count
+        self.uniform_light_cluster_buffer.bind_uniform_block(data=uniform_data)
+        self.light_cluster.bind_light_cluster()
+
+    def get_render_camera(self):
+        # the off-screen camera while baking a light probe, otherwise the main camera.
+        if self.render_camera is not None:
+            return self.render_camera
+        return self.scene_manager.main_camera
+
+    def get_light_probe_bake_priority(self, light_probe):
+        # never baked light probes first, then the nearest one from the main camera.
+        to_light_probe = light_probe.transform.get_pos() - self.scene_manager.main_camera.transform.get_pos()
+        return 0 < light_probe.bake_count, np.dot(to_light_probe, to_light_probe)
+
+    def update_light_probes(self):
+        light_probes = self.scene_manager.light_probes
+
+        if self.baking_light_probe is not None and self.baking_light_probe not in light_probes:
+            self.baking_light_probe = None
+
+        if self.baking_light_probe is None:
+            dirty_light_probes = [light_probe for light_probe in light_probes if not light_probe.isRendered]
+            if not dirty_light_probes:
+                return
+            self.baking_light_probe = min(dirty_light_probes, key=self.get_light_probe_bake_priority)
+            self.baking_light_probe.isRendered = True
+            self.light_probe_bake_step = 0
+            logger.info("Bake Light Probe : %s" % self.baking_light_probe.name)
+        # the light probe changed while baking stays dirty, it is baked again after this bake is complete,
+        # so the bake is not restarted forever while the light keeps moving.
+
+        for i in range(LIGHT_PROBE_BAKE_STEPS_PER_FRAME):
+            if self.render_light_probe_step(self.baking_light_probe, self.light_probe_bake_step):
+                self.baking_light_probe = None
+                break
+            self.light_probe_bake_step += 1
+
+    def render_light_probe_step(self, light_probe, bake_step):
+        """
+        bake_step 0 ~ 5 : atmosphere faces, 6 ~ 11 : scene faces, 12 ~ 17 : convolution faces
+        return : True when the light probe is complete
+        """
+        if bake_step < 6 and not self.light_probe_atmosphere_changed:
+            bake_step = self.light_probe_bake_step = 6
+
+        face = bake_step % 6
         target_faces = [GL_TEXTURE_CUBE_MAP_POSITIVE_X,
                         GL_TEXTURE_CUBE_MAP_NEGATIVE_X,
                         GL_TEXTURE_CUBE_MAP_POSITIVE_Y,
@@ -422,34 +476,23 @@ class Renderer(Singleton):
                         GL_TEXTURE_CUBE_MAP_POSITIVE_Z,
                         GL_TEXTURE_CUBE_MAP_NEGATIVE_Z]
 
-        pos = light_probe.transform.get_pos()
-
-        camera_rotations = [[0.0, math.pi * 1.5, 0.0],
-                            [0.0, math.pi * 0.5, 0.0],
-                            [math.pi * -0.5, math.pi * 1.0, 0.0],
-                            [math.pi * 0.5, math.pi * 1.0, 0.0],
-                            [0.0, math.pi * 1.0, 0.0],
-                            [0.0, 0.0, 0.0]]
+        texture_bake = self.rendertarget_manager.get_temporary('light_probe_bake', RenderTargets.LIGHT_PROBE_ATMOSPHERE)
 
-        # render atmosphere scene to light_probe textures.
-        RenderOption.RENDER_ONLY_ATMOSPHERE = True
-        texture_cube = RenderTargets.LIGHT_PROBE_ATMOSPHERE
-        for i in range(6):
-            render_cube_face(texture_cube, target_faces[i], pos, camera_rotations[i])
-        texture_cube.generate_mipmap()
-
-        # render final scene to temp textures.
-        RenderOption.RENDER_ONLY_ATMOSPHERE = False
-        texture_cube = light_probe.texture_probe
-        for i in range(6):
-            render_cube_face(texture_cube, target_faces[i], pos, camera_rotations[i])
-        texture_cube.generate_mipmap()
+        if bake_step < 12:
+            self.render_light_probe_face(RenderTargets.LIGHT_PROBE_ATMOSPHERE if bake_step < 6 else texture_bake,
+                                         target_faces[face],
+                                         light_probe.transform.get_pos(),
+                                         render_only_atmosphere=bake_step < 6)
+            if 5 == bake_step:
+                RenderTargets.LIGHT_PROBE_ATMOSPHERE.generate_mipmap()
+                self.light_probe_atmosphere_changed = False
+            elif 11 == bake_step:
+                texture_bake.generate_mipmap()
+            return False
 
         # convolution
-        texture_info = light_probe.texture_probe.get_texture_info()
-        texture_info['name'] = 'temp_cube'
-        temp_cube = CreateTexture(**texture_info)
-        mipmap_count = temp_cube.get_mipmap_count()
+        if self.light_probe_convolve_texture is None:
+            self.light_probe_convolve_texture = light_probe.generate_texture_probe('light_probe_convolve')
 
         face_matrixies = [np.array([[0, 0, 1, 0], [0, 1, 0, 0], [-1, 0, 0, 0], [0, 0, 0, 1]], dtype=np.float32),
                           np.array([[0, 0, -1, 0], [0, 1, 0, 0], [1, 0, 0, 0], [0, 0, 0, 1]], dtype=np.float32),
@@ -458,42 +501,91 @@ class Renderer(Singleton):
                           np.array([[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]], dtype=np.float32),
                           np.array([[-1, 0, 0, 0], [0, 1, 0, 0], [0, 0, -1, 0], [0, 0, 0, 1]], dtype=np.float32)]
 
+        self.set_blend_state(False)
+
+        temp_cube = self.light_probe_convolve_texture
+        mipmap_count = temp_cube.get_mipmap_count()
         convolve_environment = self.resource_manager.get_material_instance('convolve_environment')
         convolve_environment.use_program()
+        for lod in range(mipmap_count):
+            self.framebuffer_manager.bind_framebuffer(temp_cube, target_face=target_faces[face], target_level=lod)
+            glClear(GL_COLOR_BUFFER_BIT)
+            convolve_environment.bind_uniform_data("texture_environment", texture_bake)
+            convolve_environment.bind_uniform_data("face_matrix", face_matrixies[face])
+            convolve_environment.bind_uniform_data("lod", float(lod))
+            convolve_environment.bind_uniform_data("mipmap_count", float(mipmap_count))
+            self.postprocess.draw_elements()
 
-        for i in range(6):
-            for lod in range(mipmap_count):
-                self.framebuffer_manager.bind_framebuffer(temp_cube, target_face=target_faces[i], target_level=lod)
-                glClear(GL_COLOR_BUFFER_BIT)
-                convolve_environment.bind_uniform_data("texture_environment", texture_cube)
-                convolve_environment.bind_uniform_data("face_matrix", face_matrixies[i])
-                convolve_environment.bind_uniform_data("lod", float(lod))
-                convolve_environment.bind_uniform_data("mipmap_count", float(mipmap_count))
-                self.postprocess.draw_elements()
+        if 17 == bake_step:
+            # publish the complete light probe, the previous texture is reused for the next convolution.
+            self.light_probe_convolve_texture = light_probe.swap_texture_probe(temp_cube)
+            light_probe.bake_count += 1
+            return True
+        return False
 
-        light_probe.replace_texture_probe(temp_cube)
+    def render_light_probe_face(self, dst_texture, target_face, pos, render_only_atmosphere):
+        main_camera = self.scene_manager.main_camera
 
-        self.rendertarget_manager.get_temporary('temp_cube', light_probe.texture_probe)
+        if self.light_probe_camera is None:
+            self.light_probe_camera = Camera(name='light_probe_camera', scene_manager=self.scene_manager)
+
+        camera_rotations = {GL_TEXTURE_CUBE_MAP_POSITIVE_X: [0.0, math.pi * 1.5, 0.0],
+                            GL_TEXTURE_CUBE_MAP_NEGATIVE_X: [0.0, math.pi * 0.5, 0.0],
+                            GL_TEXTURE_CUBE_MAP_POSITIVE_Y: [math.pi * -0.5, math.pi * 1.0, 0.0],
+                            GL_TEXTURE_CUBE_MAP_NEGATIVE_Y: [math.pi * 0.5, math.pi * 1.0, 0.0],
+                            GL_TEXTURE_CUBE_MAP_POSITIVE_Z: [0.0, math.pi * 1.0, 0.0],
+                            GL_TEXTURE_CUBE_MAP_NEGATIVE_Z: [0.0, 0.0, 0.0]}
+
+        camera = self.light_probe_camera
+        camera.near = main_camera.near
+        camera.far = main_camera.far
+        camera.update_projection(fov=90.0, aspect=1.0, force_update=True)
+        camera.transform.set_pos(pos)
+        camera.transform.set_rotation(camera_rotations[target_face])
+        camera.update(force_update=True)
+
+        old_render_font = RenderOption.RENDER_FONT
+        old_render_skeleton = RenderOption.RENDER_SKELETON_ACTOR
+        old_render_effect = RenderOption.RENDER_EFFECT
+        old_render_motion_blur = self.postprocess.is_render_motion_blur
+        old_antialiasing = self.postprocess.anti_aliasing
 
+        # set render light probe
+        RenderOption.RENDER_LIGHT_PROBE = True
+        RenderOption.RENDER_ONLY_ATMOSPHERE = render_only_atmosphere
+        RenderOption.RENDER_SKELETON_ACTOR = False
+        RenderOption.RENDER_EFFECT = False
+        RenderOption.RENDER_FONT = False
+        self.postprocess.is_render_motion_blur = False
+        self.postprocess.anti_aliasing = AntiAliasing.NONE_AA
+        self.render_camera = camera
+
+        # the render infos of the scene manager are culled by the main camera.
+        main_render_infos = (self.scene_manager.static_solid_render_infos, self.scene_manager.static_translucent_render_infos)
+        if not render_only_atmosphere:
+            # the light probes are captured with the full geometries
+            self.scene_manager.static_solid_render_infos, self.scene_manager.static_translucent_render_infos = \
+                self.scene_manager.get_static_render_infos(camera)
+
+        # render
+        self.render_scene()
+
+        # copy
+        src_framebuffer = self.framebuffer_manager.get_framebuffer(RenderTargets.HDR)
+        self.framebuffer_manager.bind_framebuffer(dst_texture, target_face=target_face)
+        glClear(GL_COLOR_BUFFER_BIT)
+        self.framebuffer_manager.mirror_framebuffer(src_framebuffer)
+
+        # restore
+        self.scene_manager.static_solid_render_infos, self.scene_manager.static_translucent_render_infos = main_render_infos
+        self.render_camera = None
         RenderOption.RENDER_LIGHT_PROBE = False
+        RenderOption.RENDER_ONLY_ATMOSPHERE = False
         RenderOption.RENDER_SKELETON_ACTOR = old_render_skeleton
         RenderOption.RENDER_EFFECT = old_render_effect
         RenderOption.RENDER_FONT = old_render_font
-        RenderOption.RENDER_COLLISION = old_render_collision
-
-        self.postprocess.is_render_ssr = old_render_ssr
         self.postprocess.is_render_motion_blur = old_render_motion_blur
         self.postprocess.anti_aliasing = old_antialiasing
-        self.postprocess.debug_absolute = old_debug_absolute
-        self.postprocess.debug_mipmap = old_debug_mipmap
-        self.postprocess.debug_intensity_min = old_debug_intensity_min
-        self.postprocess.debug_intensity_max = old_debug_intensity_max
-
-        camera.update_projection(old_fov, old_aspect)
-
-        camera.transform.set_pos(old_pos)
-        camera.transform.set_rotation(old_rot)
-        camera.update(force_update=True)
 
     def render_gbuffer(self):
         self.framebuffer_manager.bind_framebuffer(RenderTargets.DIFFUSE,
@@ -533,77 +625,110 @@ class Renderer(Singleton):
 
     def render_shadow(self):
         light = self.scene_manager.main_light
-        self.uniform_view_projection_data['VIEW_PROJECTION'][...] = light.shadow_view_projection
-        self.uniform_view_projection_data['PREV_VIEW_PROJECTION'][...] = light.shadow_view_projection
-        self.uniform_view_projection_buffer.bind_uniform_block(data=self.uniform_view_projection_data)
 
-        # static shadow
-        self.framebuffer_manager.bind_framebuffer(depth_texture=RenderTargets.STATIC_SHADOWMAP)
-        glClear(GL_DEPTH_BUFFER_BIT)
-        glFrontFace(GL_CCW)
+        # static shadow : cached per cascade until the light, the cascade or the static scene is changed.
+        if self.scene_manager.static_shadow_changed:
+            self.scene_manager.static_shadow_changed = False
+            light.reset_static_shadow_cascades()
 
-        if self.scene_manager.terrain.is_render_terrain:
-            self.scene_manager.terrain.render_terrain(RenderMode.SHADOW)
+        shadow_map_width = RenderTargets.STATIC_SHADOWMAP.width
+        shadow_map_height = RenderTargets.STATIC_SHADOWMAP.height
+        need_to_composite_shadowmap = self.need_to_composite_shadowmap
 
-        if RenderOption.RENDER_STATIC_ACTOR:
-            self.render_actors(RenderGroup.STATIC_ACTOR, RenderMode.SHADOW, self.scene_manager.static_shadow_render_infos, self.shadowmap_material)
+        # the cascades are the tiles of the shadow maps, the scissor keeps the clear in the tile.
+        glEnable(GL_SCISSOR_TEST)
+        for shadow_cascade in light.shadow_cascades:
+            static_shadow_changed = shadow_cascade.static_shadow_changed
 
-        # dyanmic shadow
-        self.framebuffer_manager.bind_framebuffer(depth_texture=RenderTargets.DYNAMIC_SHADOWMAP)
-        glClear(GL_DEPTH_BUFFER_BIT)
-        glFrontFace(GL_CCW)
+            # dynamic shadow : skip when there is nothing to render and the tile is already cleared.
+            render_dynamic_shadow = RenderOption.RENDER_SKELETON_ACTOR and 0 < len(shadow_cascade.skeleton_render_infos)
+            update_dynamic_shadow = static_shadow_changed or \
+                (render_dynamic_shadow and shadow_cascade.is_dynamic_shadow_frame()) or \
+                (not render_dynamic_shadow and shadow_cascade.dynamic_shadow_rendered)
 
-        if RenderOption.RENDER_SKELETON_ACTOR:
-            self.render_actors(RenderGroup.SKELETON_ACTOR, RenderMode.SHADOW, self.scene_manager.skeleton_shadow_render_infos, self.shadowmap_skeletal_material)
+            if not static_shadow_changed and not update_dynamic_shadow:
+                continue
 
-        # composite shadow maps
-        self.framebuffer_manager.bind_framebuffer(RenderTargets.COMPOSITE_SHADOWMAP)
-        glClearColor(1.0, 1.0, 1.0, 1.0)
-        glClear(GL_COLOR_BUFFER_BIT)
-        glDisable(GL_CULL_FACE)
+            self.uniform_view_projection_data['VIEW_PROJECTION'][...] = shadow_cascade.view_projection
+            self.uniform_view_projection_data['PREV_VIEW_PROJECTION'][...] = shadow_cascade.view_projection
+            self.uniform_view_projection_buffer.bind_uniform_block(data=self.uniform_view_projection_data)
+            viewport = shadow_cascade.get_viewport(shadow_map_width, shadow_map_height)
 
-        self.postprocess.render_composite_shadowmap(RenderTargets.STATIC_SHADOWMAP, RenderTargets.DYNAMIC_SHADOWMAP)
+            if static_shadow_changed:
+                shadow_cascade.static_shadow_changed = False
 
-    def render_preprocess(self):
-        # Linear depth
-        self.framebuffer_manager.bind_framebuffer(RenderTargets.LINEAR_DEPTH)
-        glClearColor(1.0, 1.0, 1.0, 1.0)
-        glClear(GL_COLOR_BUFFER_BIT)
-        self.postprocess.render_linear_depth(RenderTargets.DEPTH, RenderTargets.LINEAR_DEPTH)
+                self.framebuffer_manager.bind_framebuffer(depth_texture=RenderTargets.STATIC_SHADOWMAP)
+                glViewport(*viewport)
+                glScissor(*viewport)
+                glClear(GL_DEPTH_BUFFER_BIT)
+                glFrontFace(GL_CCW)
 
-        # Screen Space Reflection
-        if self.postprocess.is_render_ssr:
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.SCREEN_SPACE_REFLECTION)
-            glClearColor(0.0, 0.0, 0.0, 0.0)
-            glClear(GL_COLOR_BUFFER_BIT)
-            self.postprocess.render_screen_space_reflection(RenderTargets.HDR,
-                                                            RenderTargets.WORLD_NORMAL,
-                                                            RenderTargets.MATERIAL,
-                                                            RenderTargets.VELOCITY,
-                                                            RenderTargets.LINEAR_DEPTH)
+                if self.scene_manager.terrain.is_render_terrain:
+                    self.scene_manager.terrain.render_terrain(RenderMode.SHADOW, shadow_cascade)
 
-            # swap ssr resolve textures
-            RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED, RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED_PREV = \
-                RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED_PREV, RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED
+                if RenderOption.RENDER_STATIC_ACTOR:
+                    self.render_actors(RenderGroup.STATIC_ACTOR, RenderMode.SHADOW, shadow_cascade.static_render_infos, self.shadowmap_material)
 
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED)
-            glClearColor(0.0, 0.0, 0.0, 0.0)
-            glClear(GL_COLOR_BUFFER_BIT)
-            self.postprocess.render_screen_space_reflection_resolve(RenderTargets.SCREEN_SPACE_REFLECTION,
-                                                                    RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED_PREV,
-                                                                    RenderTargets.VELOCITY)
+            if update_dynamic_shadow:
+                shadow_cascade.dynamic_shadow_rendered = render_dynamic_shadow
 
-        # SSAO
-        if self.postprocess.is_render_ssao:
-            temp_ssao = self.rendertarget_manager.get_temporary('temp_ssao', RenderTargets.SSAO)
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.SSAO)
+                self.framebuffer_manager.bind_framebuffer(depth_texture=RenderTargets.DYNAMIC_SHADOWMAP)
+                glViewport(*viewport)
+                glScissor(*viewport)
+                glClear(GL_DEPTH_BUFFER_BIT)
+                glFrontFace(GL_CCW)
+
+                if render_dynamic_shadow:
+                    self.render_actors(RenderGroup.SKELETON_ACTOR, RenderMode.SHADOW, shadow_cascade.skeleton_render_infos, self.shadowmap_skeletal_material)
+            need_to_composite_shadowmap = True
+        glDisable(GL_SCISSOR_TEST)
+
+        # composite shadow maps
+        if need_to_composite_shadowmap:
+            self.need_to_composite_shadowmap = False
+
+            self.framebuffer_manager.bind_framebuffer(RenderTargets.COMPOSITE_SHADOWMAP)
             glClearColor(1.0, 1.0, 1.0, 1.0)
             glClear(GL_COLOR_BUFFER_BIT)
-            self.postprocess.render_ssao(texture_size=(RenderTargets.SSAO.width, RenderTargets.SSAO.height),
-                                         texture_lod=self.rendertarget_manager.texture_lod_in_ssao,
-                                         texture_normal=RenderTargets.WORLD_NORMAL,
-                                         texture_linear_depth=RenderTargets.LINEAR_DEPTH)
-            self.postprocess.render_gaussian_blur(RenderTargets.SSAO, temp_ssao)
+            glDisable(GL_CULL_FACE)
+
+            self.postprocess.render_composite_shadowmap(RenderTargets.STATIC_SHADOWMAP, RenderTargets.DYNAMIC_SHADOWMAP)
+
+    def render_screen_space_reflection(self):
+        # the resolved textures are kept while ssr is enabled, they are the history of the resolve.
+        self.rendertarget_manager.acquire_transient('SCREEN_SPACE_REFLECTION_RESOLVED')
+        self.rendertarget_manager.acquire_transient('SCREEN_SPACE_REFLECTION_RESOLVED_PREV')
+
+        self.framebuffer_manager.bind_framebuffer(RenderTargets.SCREEN_SPACE_REFLECTION)
+        glClearColor(0.0, 0.0, 0.0, 0.0)
+        glClear(GL_COLOR_BUFFER_BIT)
+        self.postprocess.render_screen_space_reflection(RenderTargets.HDR,
+                                                        RenderTargets.WORLD_NORMAL,
+                                                        RenderTargets.MATERIAL,
+                                                        RenderTargets.VELOCITY,
+                                                        RenderTargets.LINEAR_DEPTH)
+
+        # swap ssr resolve textures
+        self.rendertarget_manager.swap_transient('SCREEN_SPACE_REFLECTION_RESOLVED', 'SCREEN_SPACE_REFLECTION_RESOLVED_PREV')
+
+        self.framebuffer_manager.bind_framebuffer(RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED)
+        glClearColor(0.0, 0.0, 0.0, 0.0)
+        glClear(GL_COLOR_BUFFER_BIT)
+        self.postprocess.render_screen_space_reflection_resolve(RenderTargets.SCREEN_SPACE_REFLECTION,
+                                                                RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED_PREV,
+                                                                RenderTargets.VELOCITY)
+
+    def render_ssao(self):
+        temp_ssao = self.rendertarget_manager.get_temporary_transient('temp_ssao', RenderTargets.SSAO)
+        self.framebuffer_manager.bind_framebuffer(RenderTargets.SSAO)
+        glClearColor(1.0, 1.0, 1.0, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT)
+        self.postprocess.render_ssao(texture_size=(RenderTargets.SSAO.width, RenderTargets.SSAO.height),
+                                     texture_lod=self.rendertarget_manager.texture_lod_in_ssao,
+                                     texture_normal=RenderTargets.WORLD_NORMAL,
+                                     texture_linear_depth=RenderTargets.LINEAR_DEPTH)
+        self.postprocess.render_gaussian_blur(RenderTargets.SSAO, temp_ssao)
+        self.rendertarget_manager.release_rendertarget(temp_ssao)
 
     def render_solid(self):
         if RenderingType.DEFERRED_RENDERING == self.render_option_manager.rendering_type:
@@ -644,6 +769,13 @@ class Renderer(Singleton):
             scene_material_instance.use_program()
             scene_material_instance.bind_material_instance()
 
+        if RenderMode.FORWARD_SHADING == render_mode:
+            # the frame textures have the fixed units, see FRAME_TEXTURE_UNITS
+            bind_frame_texture('texture_probe', self.scene_manager.get_light_probe_texture())
+            bind_frame_texture('texture_shadow', RenderTargets.COMPOSITE_SHADOWMAP)
+            bind_frame_texture('texture_ssao', RenderTargets.SSAO)
+            bind_frame_texture('texture_scene_reflect', RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED)
+
         # render
         for render_info in render_infos:
             actor = render_info.actor
@@ -657,18 +789,17 @@ class Renderer(Singleton):
                 if last_actor_material != actor_material and actor_material is not None:
                     actor_material.use_program()
 
-                if last_actor_material_instance != actor_material_instance and actor_material_instance is not None:
-                    actor_material_instance.bind_material_instance()
+                    # the uniforms of the program are kept while the material instances of the material are changed.
+                    if actor_material_instance is not None:
+                        actor_material_instance.bind_uniform_data('is_render_gbuffer', RenderMode.GBUFFER == render_mode)
 
-                    actor_material_instance.bind_uniform_data('is_render_gbuffer', RenderMode.GBUFFER == render_mode)
+                        if RenderMode.FORWARD_SHADING == render_mode:
+                            # Bind Atmosphere
+                            self.scene_manager.atmosphere.bind_precomputed_atmosphere(actor_material_instance)
 
-                    if RenderMode.FORWARD_SHADING == render_mode:
-                        actor_material_instance.bind_uniform_data('texture_probe', self.scene_manager.get_light_probe_texture())
-                        actor_material_instance.bind_uniform_data('texture_shadow', RenderTargets.COMPOSITE_SHADOWMAP)
-                        actor_material_instance.bind_uniform_data('texture_ssao', RenderTargets.SSAO)
-                        actor_material_instance.bind_uniform_data('texture_scene_reflect', RenderTargets.SCREEN_SPACE_REFLECTION_RESOLVED)
-                        # Bind Atmosphere
-                        self.scene_manager.atmosphere.bind_precomputed_atmosphere(actor_material_instance)
+                if last_actor_material_instance != actor_material_instance and actor_material_instance is not None:
+                    # the material parameters are bound with a range of the uniform buffer, the textures are bound.
+                    actor_material_instance.bind_material_instance()
             elif RenderMode.SHADOW == render_mode:
                 if last_actor_material_instance != actor_material_instance and actor_material_instance is not None:
                     # get diffuse texture from actor material instance
@@ -684,23 +815,45 @@ class Renderer(Singleton):
                 material_instance.bind_uniform_data('is_instancing', is_instancing)
                 material_instance.bind_uniform_data('model', actor.transform.matrix)
                 if render_group == RenderGroup.SKELETON_ACTOR:
-                    animation_buffer = actor.get_animation_buffer(geometry.skeleton.index)
-                    prev_animation_buffer = actor.get_prev_animation_buffer(geometry.skeleton.index)
-                    material_instance.bind_uniform_data('bone_matrices', animation_buffer, num=len(animation_buffer))
-                    material_instance.bind_uniform_data('prev_bone_matrices', prev_animation_buffer, num=len(prev_animation_buffer))
+                    is_baked_animation = actor.is_baked_animation()
+                    material_instance.bind_uniform_data('is_baked_animation', is_baked_animation)
+                    if is_baked_animation:
+                        baked_animation = actor.get_baked_animation()
+                        material_instance.bind_uniform_data('texture_baked_animation', baked_animation.get_texture(geometry.skeleton.index))
+                        material_instance.bind_uniform_data('baked_animation_infos', baked_animation.animation_infos, num=baked_animation.get_animation_count())
+                    else:
+                        bone_palette_offset = self.skinning_palette.get_bone_palette_offset(actor, geometry.skeleton.index)
+                        material_instance.bind_uniform_data('bone_palette_offset', bone_palette_offset)
             # draw
-            if is_instancing:
-                geometry.draw_elements_instanced(actor.get_instance_render_count(), self.actor_instance_buffer, [actor.instance_matrix, ])
+            if render_group == RenderGroup.SKELETON_ACTOR and (is_instancing or actor.is_baked_animation()):
+                # the instances of the skeleton actor always have the animation data, even for a single actor.
+                instance_matrix = actor.instance_matrix if is_instancing else MATRIX4_IDENTITY.reshape(1, 4, 4)
+                instance_buffer, upload = self.get_skeleton_instance_buffer(actor)
+                geometry.draw_elements_instanced(actor.get_instance_render_count(), instance_buffer, [instance_matrix, actor.instance_animation_data], upload=upload, lod=render_info.lod)
+            elif is_instancing:
+                geometry.draw_elements_instanced(actor.get_instance_render_count(), self.actor_instance_buffer, [actor.instance_matrix, ], lod=render_info.lod)
             else:
-                geometry.draw_elements()
+                geometry.draw_elements(lod=render_info.lod)
 
             last_actor = actor
             last_actor_material = actor_material
             last_actor_material_instance = actor_material_instance
 
+    @staticmethod
+    def get_skeleton_instance_buffer(actor):
+        """ the instance datas of the skeleton actor are static, they are uploaded to its own buffer when they change. return : instance buffer, upload """
+        if actor.instance_buffer is None:
+            # instance matrix, (animation index, time offset, playback rate, 0)
+            actor.instance_buffer = InstanceBuffer(name="%s_instance_buffer" % actor.name, location_offset=7, element_datas=[MATRIX4_IDENTITY, FLOAT4_ZERO])
+            actor.instance_buffer_dirty = True
+        upload = actor.instance_buffer_dirty
+        actor.instance_buffer_dirty = False
+        return actor.instance_buffer, upload
+
     def render_selected_object(self):
         selected_object = self.scene_manager.get_selected_object()
         if selected_object is not None:
+            self.rendertarget_manager.acquire_transient('TEMP_RGBA8')
             self.framebuffer_manager.bind_framebuffer(RenderTargets.TEMP_RGBA8)
             glDisable(GL_DEPTH_TEST)
             glDepthMask(False)
@@ -723,6 +876,7 @@ class Renderer(Singleton):
                 self.debug_line_manager.bind_render_spline_program()
                 self.debug_line_manager.render_spline(selected_object, Float4(1.0, 1.0, 1.0, 1.0))
             else:
+                self.rendertarget_manager.release_transient('TEMP_RGBA8')
                 return
 
             # composite
@@ -732,6 +886,8 @@ class Renderer(Singleton):
             self.selcted_object_composite_material.bind_uniform_data("texture_mask", RenderTargets.TEMP_RGBA8)
             self.postprocess.draw_elements()
 
+            self.rendertarget_manager.release_transient('TEMP_RGBA8')
+
     def render_axis_gizmo(self, render_mode):
         if self.scene_manager.get_selected_object() is not None:
             axis_gizmo_actor = self.scene_manager.get_axis_gizmo()
@@ -864,83 +1020,139 @@ class Renderer(Singleton):
                         for bone in skeleton.hierachy:
                             draw_bone(mesh, skeleton_mesh, Matrix4().copy(), material_instance, bone, matrix, isAnimation)
 
-    def render_postprocess(self):
-        # bind frame buffer
-        self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR)
+    def set_postprocess_state(self):
+        glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+        self.set_blend_state(False)
 
-        # copy HDR target
-        src_framebuffer = self.framebuffer_manager.get_framebuffer(RenderTargets.HDR)
-        self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR_TEMP)
+    def copy_to_current_framebuffer(self, src_rendertarget):
+        src_framebuffer = self.framebuffer_manager.get_framebuffer(src_rendertarget)
         glClear(GL_COLOR_BUFFER_BIT)
-        self.framebuffer_manager.copy_framebuffer(src_framebuffer)
+        if src_rendertarget.dynamic_resolution:
+            # the viewport of the source framebuffer may be of the previous frame, copy the sub rect of the render scale.
+            current_framebuffer = self.framebuffer_manager.current_framebuffer
+            self.framebuffer_manager.copy_framebuffer(src_framebuffer,
+                                                      src_w=current_framebuffer.viewport_width,
+                                                      src_h=current_framebuffer.viewport_height)
+        else:
+            self.framebuffer_manager.copy_framebuffer(src_framebuffer)
 
-        # Temporal AA
-        if AntiAliasing.TAA == self.postprocess.anti_aliasing:
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR)
-            glClear(GL_COLOR_BUFFER_BIT)
-            self.postprocess.render_temporal_antialiasing(RenderTargets.HDR_TEMP,
-                                                          RenderTargets.TAA_RESOLVE,
-                                                          RenderTargets.VELOCITY)
+    def add_postprocess_passes(self):
+        render_graph = self.render_graph
+        postprocess = self.postprocess
 
-            src_framebuffer = self.framebuffer_manager.get_framebuffer(RenderTargets.HDR)
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.TAA_RESOLVE)
-            glClear(GL_COLOR_BUFFER_BIT)
-            self.framebuffer_manager.copy_framebuffer(src_framebuffer)
+        # copy HDR target
+        render_graph.add_pass('copy_hdr_temp',
+                              lambda: self.copy_to_current_framebuffer(RenderTargets.HDR),
+                              reads=('HDR',),
+                              color_attachments=('HDR_TEMP',))
+
+        # Temporal AA
+        if AntiAliasing.TAA == postprocess.anti_aliasing:
+            def render_temporal_antialiasing():
+                self.set_postprocess_state()
+                # kept while TAA is enabled, it is the history.
+                self.rendertarget_manager.acquire_transient('TAA_RESOLVE')
+                glClear(GL_COLOR_BUFFER_BIT)
+                postprocess.render_temporal_antialiasing(RenderTargets.HDR_TEMP,
+                                                         RenderTargets.TAA_RESOLVE,
+                                                         RenderTargets.VELOCITY)
+
+                self.framebuffer_manager.bind_framebuffer(RenderTargets.TAA_RESOLVE)
+                self.copy_to_current_framebuffer(RenderTargets.HDR)
+
+            render_graph.add_pass('temporal_antialiasing',
+                                  render_temporal_antialiasing,
+                                  reads=('HDR_TEMP', 'TAA_RESOLVE', 'VELOCITY'),
+                                  writes=('TAA_RESOLVE',),
+                                  color_attachments=('HDR',))
+        else:
+            self.rendertarget_manager.release_transient('TAA_RESOLVE')
 
         # Bloom
-        if self.postprocess.is_render_bloom:
-            self.postprocess.render_bloom(RenderTargets.HDR)
+        if postprocess.is_render_bloom:
+            def render_bloom():
+                self.set_postprocess_state()
+                postprocess.render_bloom(RenderTargets.HDR)
+
+            render_graph.add_pass('bloom',
+                                  render_bloom,
+                                  reads=('HDR',),
+                                  writes=('BLOOM_0', 'BLOOM_1', 'BLOOM_2', 'BLOOM_3', 'BLOOM_4'))
 
         # Light Shaft
-        if self.postprocess.is_render_light_shaft:
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.LIGHT_SHAFT)
-            self.postprocess.render_light_shaft(RenderTargets.ATMOSPHERE, RenderTargets.DEPTH)
+        if postprocess.is_render_light_shaft:
+            def render_light_shaft():
+                self.set_postprocess_state()
+                postprocess.render_light_shaft(RenderTargets.ATMOSPHERE, RenderTargets.DEPTH)
 
-        # Depth Of Field
-        if self.postprocess.is_render_depth_of_field:
-            self.postprocess.render_depth_of_field()
+            render_graph.add_pass('light_shaft',
+                                  render_light_shaft,
+                                  reads=('ATMOSPHERE', 'DEPTH'),
+                                  color_attachments=('LIGHT_SHAFT',))
 
-        self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR)
+        # Depth Of Field
+        if postprocess.is_render_depth_of_field:
+            def render_depth_of_field():
+                self.set_postprocess_state()
+                postprocess.render_depth_of_field()
 
-        RenderTargets.HDR.generate_mipmap()
+            render_graph.add_pass('depth_of_field',
+                                  render_depth_of_field,
+                                  reads=('HDR', 'LINEAR_DEPTH', ('LINEAR_DEPTH', ResourceAccess.IMAGE), ('FOCUS_DISTANCE', ResourceAccess.IMAGE)),
+                                  writes=('HDR', 'HDR_TEMP', ('FOCUS_DISTANCE', ResourceAccess.IMAGE)))
 
         # Tone Map
-        self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER)
-        glClear(GL_COLOR_BUFFER_BIT)
-        self.postprocess.render_tone_map(RenderTargets.HDR,
-                                         RenderTargets.BLOOM_0,
-                                         RenderTargets.BLOOM_1,
-                                         RenderTargets.BLOOM_2,
-                                         RenderTargets.BLOOM_3,
-                                         RenderTargets.BLOOM_4,
-                                         RenderTargets.LIGHT_SHAFT)
-
-        # MSAA Test
-        if AntiAliasing.MSAA == self.postprocess.anti_aliasing:
-            src_framebuffer = self.framebuffer_manager.get_framebuffer(RenderTargets.BACKBUFFER)
+        def render_tone_map():
+            self.set_postprocess_state()
+            RenderTargets.HDR.generate_mipmap()
+
+            self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER)
             glClear(GL_COLOR_BUFFER_BIT)
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR)
-            # resolve MSAA
-            self.framebuffer_manager.copy_framebuffer(src_framebuffer)
+            postprocess.render_tone_map(RenderTargets.HDR,
+                                        RenderTargets.BLOOM_0,
+                                        RenderTargets.BLOOM_1,
+                                        RenderTargets.BLOOM_2,
+                                        RenderTargets.BLOOM_3,
+                                        RenderTargets.BLOOM_4,
+                                        RenderTargets.LIGHT_SHAFT)
+
+        render_graph.add_pass('tone_map',
+                              render_tone_map,
+                              reads=('HDR', 'BLOOM_0', 'BLOOM_1', 'BLOOM_2', 'BLOOM_3', 'BLOOM_4', 'LIGHT_SHAFT'),
+                              writes=('HDR', 'BACKBUFFER'))
+
+        # MSAA Test : resolve MSAA
+        if AntiAliasing.MSAA == postprocess.anti_aliasing:
+            render_graph.add_pass('resolve_msaa',
+                                  lambda: self.copy_to_current_framebuffer(RenderTargets.BACKBUFFER),
+                                  reads=('BACKBUFFER',),
+                                  color_attachments=('HDR',))
 
         # Motion Blur
-        if self.postprocess.is_render_motion_blur:
-            backbuffer_copy = self.rendertarget_manager.get_temporary('backbuffer_copy', RenderTargets.BACKBUFFER)
-            self.framebuffer_manager.bind_framebuffer(backbuffer_copy)
-            glClear(GL_COLOR_BUFFER_BIT)
-            self.postprocess.render_motion_blur(RenderTargets.VELOCITY, RenderTargets.BACKBUFFER)
+        if postprocess.is_render_motion_blur:
+            def render_motion_blur():
+                self.set_postprocess_state()
+                backbuffer_copy = self.rendertarget_manager.get_temporary_transient('backbuffer_copy', RenderTargets.BACKBUFFER)
+                self.framebuffer_manager.bind_framebuffer(backbuffer_copy)
+                glClear(GL_COLOR_BUFFER_BIT)
+                postprocess.render_motion_blur(RenderTargets.VELOCITY, RenderTargets.BACKBUFFER)
 
-            # copy to backbuffer
-            src_framebuffer = self.framebuffer_manager.get_framebuffer(backbuffer_copy)
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER)
-            glClear(GL_COLOR_BUFFER_BIT)
-            self.framebuffer_manager.copy_framebuffer(src_framebuffer)
+                # copy to backbuffer
+                self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER)
+                self.copy_to_current_framebuffer(backbuffer_copy)
+                self.rendertarget_manager.release_rendertarget(backbuffer_copy)
+
+            render_graph.add_pass('motion_blur',
+                                  render_motion_blur,
+                                  reads=('VELOCITY', 'BACKBUFFER'),
+                                  writes=('BACKBUFFER',))
 
     def render_log(self):
         self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER)
         self.font_manager.render_log(self.viewport.width, self.viewport.height)
 
     def render_text(self, text_render_data, offset_x, offset_y, canvas_width, canvas_height):
+        text_render_data.update_glyphs()
         if 0 < text_render_data.render_count:
             self.font_shader.use_program()
             self.font_shader.bind_material_instance()
@@ -961,218 +1173,366 @@ class Renderer(Singleton):
         self.debug_line_manager.draw_debug_line_2d(line_offset, line_offset + camera.view_origin[1][0:2] * line_size, color=Float4(0.0, 1.0, 0.0, 1.0), width=line_thickness)
         self.debug_line_manager.draw_debug_line_2d(line_offset, line_offset + camera.view_origin[0][0:2] * line_size, color=Float4(1.0, 0.0, 0.0, 1.0), width=line_thickness)
 
-    def render_scene(self):
-        main_camera = self.scene_manager.main_camera
-
-        # bind scene constants uniform blocks
-        self.bind_uniform_blocks()
+    def bind_view_projection(self, view_projection, prev_view_projection):
+        self.uniform_view_projection_data['VIEW_PROJECTION'][...] = view_projection
+        self.uniform_view_projection_data['PREV_VIEW_PROJECTION'][...] = prev_view_projection
+        self.uniform_view_projection_buffer.bind_uniform_block(data=self.uniform_view_projection_data)
 
-        self.set_blend_state(False)
+    def add_scene_passes(self, main_camera):
+        render_graph = self.render_graph
+        ocean = self.scene_manager.ocean
+        atmosphere = self.scene_manager.atmosphere
 
-        glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)
-        glPolygonMode(GL_FRONT_AND_BACK, self.view_mode)
-        # glEnable(GL_FRAMEBUFFER_SRGB)
-        glEnable(GL_MULTISAMPLE)
-        glEnable(GL_TEXTURE_CUBE_MAP_SEAMLESS)
-        glDepthFunc(GL_LEQUAL)
-        glEnable(GL_CULL_FACE)
-        glFrontFace(GL_CCW)
-        glEnable(GL_DEPTH_TEST)
-        glDepthMask(True)
-        glClearColor(0.0, 0.0, 0.0, 1.0)
-        glClearDepth(1.0)
+        def bind_view_projection_jitter():
+            self.bind_view_projection(main_camera.view_projection_jitter, main_camera.prev_view_projection_jitter)
 
-        if self.postprocess.is_render_shader() and not RenderOption.RENDER_LIGHT_PROBE:
-            """ debug shader """
-            self.set_blend_state(False)
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER)
-            glClear(GL_COLOR_BUFFER_BIT)
+        def bind_view_projection():
+            self.bind_view_projection(main_camera.view_projection, main_camera.prev_view_projection)
 
-            self.postprocess.render_material_instance()
+        render_graph.add_pass('ocean_simulation', ocean.simulateFFTWaves, writes=('OCEAN_SPECTRUM',))
 
-        elif RenderOption.RENDER_ONLY_ATMOSPHERE and RenderOption.RENDER_LIGHT_PROBE:
-            """ render light probe preprocess """
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.COMPOSITE_SHADOWMAP)
-            glClearColor(1.0, 1.0, 1.0, 1.0)
-            glClear(GL_COLOR_BUFFER_BIT)
+        # render gbuffer & preprocess
+        def render_gbuffer():
+            bind_view_projection_jitter()
+            self.render_gbuffer()
 
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.WORLD_NORMAL, depth_texture=RenderTargets.DEPTH)
-            glClearColor(0.0, 1.0, 0.0, 1.0)
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        render_graph.add_pass('gbuffer',
+                              render_gbuffer,
+                              writes=('DIFFUSE', 'MATERIAL', 'WORLD_NORMAL', 'VELOCITY', 'DEPTH'))
 
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.LINEAR_DEPTH)
+        # Linear depth : the depth pyramid is written by imageStore, the barrier is placed by the render graph.
+        def render_linear_depth():
             glClearColor(1.0, 1.0, 1.0, 1.0)
             glClear(GL_COLOR_BUFFER_BIT)
-            self.postprocess.render_linear_depth(RenderTargets.DEPTH, RenderTargets.LINEAR_DEPTH)
+            self.postprocess.render_linear_depth(RenderTargets.DEPTH, RenderTargets.LINEAR_DEPTH, memory_barrier=0)
 
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR)
-            glClearColor(0.0, 0.0, 0.0, 1.0)
-            glClear(GL_COLOR_BUFFER_BIT)
+        render_graph.add_pass('linear_depth',
+                              render_linear_depth,
+                              reads=('DEPTH',),
+                              writes=(('LINEAR_DEPTH', ResourceAccess.IMAGE),),
+                              color_attachments=('LINEAR_DEPTH',))
 
-            # render atmosphere
-            if self.scene_manager.atmosphere.is_render_atmosphere:
-                self.scene_manager.atmosphere.render_precomputed_atmosphere(RenderTargets.LINEAR_DEPTH,
-                                                                            RenderTargets.COMPOSITE_SHADOWMAP,
-                                                                            RenderOption.RENDER_LIGHT_PROBE)
-            # done render light probe preprocess
-            return
+        # Screen Space Reflection : reads the HDR of the previous frame.
+        if self.postprocess.is_render_ssr:
+            render_graph.add_pass('screen_space_reflection',
+                                  self.render_screen_space_reflection,
+                                  reads=('HDR', 'WORLD_NORMAL', 'MATERIAL', 'VELOCITY', 'LINEAR_DEPTH', 'SCREEN_SPACE_REFLECTION_RESOLVED'),
+                                  writes=('SCREEN_SPACE_REFLECTION', 'SCREEN_SPACE_REFLECTION_RESOLVED', 'SCREEN_SPACE_REFLECTION_RESOLVED_PREV'))
         else:
-            """ render normal scene """
-            self.scene_manager.ocean.simulateFFTWaves()
-
-            # render gbuffer & preprocess
-            camera = self.scene_manager.main_camera
-            self.uniform_view_projection_data['VIEW_PROJECTION'][...] = camera.view_projection_jitter
-            self.uniform_view_projection_data['PREV_VIEW_PROJECTION'][...] = camera.prev_view_projection_jitter
-            self.uniform_view_projection_buffer.bind_uniform_block(data=self.uniform_view_projection_data)
+            self.rendertarget_manager.release_transient('SCREEN_SPACE_REFLECTION_RESOLVED')
+            self.rendertarget_manager.release_transient('SCREEN_SPACE_REFLECTION_RESOLVED_PREV')
 
-            self.render_gbuffer()
-
-            self.render_preprocess()
-
-            self.render_shadow()
+        # SSAO
+        if self.postprocess.is_render_ssao:
+            render_graph.add_pass('ssao', self.render_ssao, reads=('WORLD_NORMAL', 'LINEAR_DEPTH'), writes=('SSAO',))
 
-            # render solid
-            camera = self.scene_manager.main_camera
-            self.uniform_view_projection_data['VIEW_PROJECTION'][...] = camera.view_projection_jitter
-            self.uniform_view_projection_data['PREV_VIEW_PROJECTION'][...] = camera.prev_view_projection_jitter
-            self.uniform_view_projection_buffer.bind_uniform_block(data=self.uniform_view_projection_data)
+        # shadow maps are cached, they are read and written.
+        shadowmaps = ('STATIC_SHADOWMAP', 'DYNAMIC_SHADOWMAP', 'COMPOSITE_SHADOWMAP')
+        render_graph.add_pass('shadow', self.render_shadow, reads=shadowmaps, writes=shadowmaps)
 
+        # render solid
+        def render_solid():
+            bind_view_projection_jitter()
             glFrontFace(GL_CCW)
-
             glDepthMask(False)  # cause depth prepass and gbuffer
-
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR, depth_texture=RenderTargets.DEPTH)
             glClear(GL_COLOR_BUFFER_BIT)
-
             self.render_solid()
 
-            # copy HDR Target
-            src_framebuffer = self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR)
-            dst_framebuffer = self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR_TEMP)
-            glClear(GL_COLOR_BUFFER_BIT)
-            dst_framebuffer.copy_framebuffer(src_framebuffer)
-            src_framebuffer.bind_framebuffer()
-
-            # set common projection matrix
-            camera = self.scene_manager.main_camera
-            self.uniform_view_projection_data['VIEW_PROJECTION'][...] = camera.view_projection
-            self.uniform_view_projection_data['PREV_VIEW_PROJECTION'][...] = camera.prev_view_projection
-            self.uniform_view_projection_buffer.bind_uniform_block(data=self.uniform_view_projection_data)
-
-            # render ocean
-            if self.scene_manager.ocean.is_render_ocean:
-                self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR, depth_texture=RenderTargets.DEPTH)
+        render_graph.add_pass('solid',
+                              render_solid,
+                              reads=('DIFFUSE', 'MATERIAL', 'WORLD_NORMAL', 'DEPTH', 'LINEAR_DEPTH', 'SSAO',
+                                     'SCREEN_SPACE_REFLECTION_RESOLVED', 'COMPOSITE_SHADOWMAP', 'LIGHT_PROBE_ATMOSPHERE'),
+                              color_attachments=('HDR',),
+                              depth_attachment='DEPTH')
+
+        # copy HDR Target
+        render_graph.add_pass('copy_hdr',
+                              lambda: self.copy_to_current_framebuffer(RenderTargets.HDR),
+                              reads=('HDR',),
+                              color_attachments=('HDR_TEMP',))
+
+        # render ocean
+        if ocean.is_render_ocean:
+            def render_ocean():
+                bind_view_projection()
                 glDisable(GL_CULL_FACE)
                 glEnable(GL_DEPTH_TEST)
                 glDepthMask(True)
 
-                self.scene_manager.ocean.render_ocean(atmosphere=self.scene_manager.atmosphere,
-                                                      texture_scene=RenderTargets.HDR_TEMP,
-                                                      texture_linear_depth=RenderTargets.LINEAR_DEPTH,
-                                                      texture_probe=RenderTargets.LIGHT_PROBE_ATMOSPHERE,
-                                                      texture_shadow=RenderTargets.COMPOSITE_SHADOWMAP)
+                ocean.render_ocean(atmosphere=atmosphere,
+                                   texture_scene=RenderTargets.HDR_TEMP,
+                                   texture_linear_depth=RenderTargets.LINEAR_DEPTH,
+                                   texture_probe=RenderTargets.LIGHT_PROBE_ATMOSPHERE,
+                                   texture_shadow=RenderTargets.COMPOSITE_SHADOWMAP)
 
                 # re copy Linear depth
                 self.framebuffer_manager.bind_framebuffer(RenderTargets.LINEAR_DEPTH)
-                self.postprocess.render_linear_depth(RenderTargets.DEPTH, RenderTargets.LINEAR_DEPTH)
-
-            # render atmosphere
-            if self.scene_manager.atmosphere.is_render_atmosphere:
-                self.framebuffer_manager.bind_framebuffer(RenderTargets.ATMOSPHERE,
-                                                          RenderTargets.ATMOSPHERE_INSCATTER)
-                self.scene_manager.atmosphere.render_precomputed_atmosphere(RenderTargets.LINEAR_DEPTH,
-                                                                            RenderTargets.COMPOSITE_SHADOWMAP,
-                                                                            RenderOption.RENDER_LIGHT_PROBE)
-
-            glEnable(GL_CULL_FACE)
-            glEnable(GL_DEPTH_TEST)
-            glDepthMask(False)
+                self.postprocess.render_linear_depth(RenderTargets.DEPTH, RenderTargets.LINEAR_DEPTH, memory_barrier=0)
+
+            render_graph.add_pass('ocean',
+                                  render_ocean,
+                                  reads=('OCEAN_SPECTRUM', ('HDR', ResourceAccess.FRAMEBUFFER), 'HDR_TEMP', 'DEPTH', 'LINEAR_DEPTH',
+                                         'LIGHT_PROBE_ATMOSPHERE', 'COMPOSITE_SHADOWMAP'),
+                                  writes=('HDR', 'DEPTH', ('LINEAR_DEPTH', ResourceAccess.IMAGE)),
+                                  color_attachments=('HDR',),
+                                  depth_attachment='DEPTH')
+
+        # render atmosphere
+        if atmosphere.is_render_atmosphere:
+            def render_atmosphere():
+                bind_view_projection()
+                atmosphere.render_precomputed_atmosphere(RenderTargets.LINEAR_DEPTH,
+                                                         RenderTargets.COMPOSITE_SHADOWMAP,
+                                                         RenderOption.RENDER_LIGHT_PROBE)
+
+            render_graph.add_pass('atmosphere',
+                                  render_atmosphere,
+                                  reads=('LINEAR_DEPTH', 'COMPOSITE_SHADOWMAP'),
+                                  color_attachments=('ATMOSPHERE', 'ATMOSPHERE_INSCATTER'))
 
             # Composite Atmosphere
-            if self.scene_manager.atmosphere.is_render_atmosphere:
-                self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR)
-
+            def render_composite_atmosphere():
+                glEnable(GL_CULL_FACE)
+                glEnable(GL_DEPTH_TEST)
+                glDepthMask(False)
                 self.set_blend_state(True, GL_FUNC_ADD, GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
 
                 composite_atmosphere = self.resource_manager.get_material_instance("precomputed_atmosphere.composite_atmosphere")
                 composite_atmosphere.use_program()
-                above_the_cloud = self.scene_manager.atmosphere.cloud_altitude < main_camera.transform.get_pos()[1]
+                above_the_cloud = atmosphere.cloud_altitude < main_camera.transform.get_pos()[1]
                 composite_atmosphere.bind_uniform_data("above_the_cloud", above_the_cloud)
-                composite_atmosphere.bind_uniform_data("inscatter_power", self.scene_manager.atmosphere.inscatter_power)
+                composite_atmosphere.bind_uniform_data("inscatter_power", atmosphere.inscatter_power)
                 composite_atmosphere.bind_uniform_data("texture_atmosphere", RenderTargets.ATMOSPHERE)
                 composite_atmosphere.bind_uniform_data("texture_inscatter", RenderTargets.ATMOSPHERE_INSCATTER)
                 composite_atmosphere.bind_uniform_data("texture_linear_depth", RenderTargets.LINEAR_DEPTH)
                 self.postprocess.draw_elements()
 
-            # prepare translucent
-            self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR, depth_texture=RenderTargets.DEPTH)
-            glEnable(GL_DEPTH_TEST)
+            render_graph.add_pass('composite_atmosphere',
+                                  render_composite_atmosphere,
+                                  reads=(('HDR', ResourceAccess.FRAMEBUFFER), 'ATMOSPHERE', 'ATMOSPHERE_INSCATTER', 'LINEAR_DEPTH'),
+                                  color_attachments=('HDR',))
 
-            # Translucent
+        # Translucent
+        def render_translucent():
+            bind_view_projection()
+            glEnable(GL_CULL_FACE)
+            glEnable(GL_DEPTH_TEST)
+            glDepthMask(False)
+            self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
             self.render_translucent()
 
-            # render particle
-            if RenderOption.RENDER_EFFECT:
+        # the forward shading of the translucent actors samples the ssao and the screen space reflection too
+        translucent_reads = (('HDR', ResourceAccess.FRAMEBUFFER), 'DEPTH', 'LINEAR_DEPTH', 'SSAO', 'SCREEN_SPACE_REFLECTION_RESOLVED',
+                             'COMPOSITE_SHADOWMAP', 'LIGHT_PROBE_ATMOSPHERE')
+        render_graph.add_pass('translucent',
+                              render_translucent,
+                              reads=translucent_reads,
+                              color_attachments=('HDR',),
+                              depth_attachment='DEPTH')
+
+        # render particle
+        if RenderOption.RENDER_EFFECT:
+            def render_effect():
+                bind_view_projection()
                 glDisable(GL_CULL_FACE)
-                glEnable(GL_BLEND)
+                glEnable(GL_DEPTH_TEST)
+                glDepthMask(False)
+                self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
                 self.render_effect()
 
                 glDisable(GL_BLEND)
                 glEnable(GL_CULL_FACE)
 
-            # render probe done
-            if RenderOption.RENDER_LIGHT_PROBE:
-                return
-
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            render_graph.add_pass('effect',
+                                  render_effect,
+                                  reads=translucent_reads,
+                                  color_attachments=('HDR',),
+                                  depth_attachment='DEPTH')
 
-            self.set_blend_state(False)
+    def add_overlay_passes(self, main_camera):
+        render_graph = self.render_graph
 
-            self.render_postprocess()
+        def bind_view_projection():
+            self.bind_view_projection(main_camera.view_projection, main_camera.prev_view_projection)
 
+        # the object id is read back by the picking.
         if RenderOption.RENDER_OBJECT_ID:
-            self.render_object_id()
+            def render_object_id():
+                bind_view_projection()
+                self.render_object_id()
+
+            render_graph.add_pass('object_id',
+                                  render_object_id,
+                                  writes=('OBJECT_ID', 'OBJECT_ID_DEPTH'),
+                                  side_effect=True)
 
-        self.render_selected_object()
+        def render_selected_object():
+            bind_view_projection()
+            self.render_selected_object()
 
-        # debug render target
+        render_graph.add_pass('selected_object',
+                              render_selected_object,
+                              reads=(('BACKBUFFER', ResourceAccess.FRAMEBUFFER),),
+                              writes=('BACKBUFFER',))
+
+        # debug render target : the passes which only contribute to the back buffer are culled.
         if self.debug_texture is not None:
-            self.set_blend_state(False)
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER)
-            glClear(GL_COLOR_BUFFER_BIT)
-            self.postprocess.render_texture(self.debug_texture)
+            debug_texture_name = self.debug_texture.name
+
+            def render_debug_texture():
+                self.set_blend_state(False)
+                glClear(GL_COLOR_BUFFER_BIT)
+                # a transient render target is acquired again from the pool every frame.
+                debug_texture = getattr(RenderTargets, debug_texture_name, None)
+                self.postprocess.render_texture(self.debug_texture if debug_texture is None else debug_texture)
+
+            render_graph.add_pass('debug_texture',
+                                  render_debug_texture,
+                                  reads=(debug_texture_name,),
+                                  color_attachments=('BACKBUFFER',))
 
         if RenderOption.RENDER_FONT:
-            self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-            self.render_log()
+            def render_log():
+                self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+                self.render_log()
+
+            render_graph.add_pass('font',
+                                  render_log,
+                                  reads=(('BACKBUFFER', ResourceAccess.FRAMEBUFFER),),
+                                  writes=('BACKBUFFER',))
 
         if RenderOption.RENDER_DEBUG_LINE and self.debug_texture is None:
-            # render world axis
-            self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER, depth_texture=RenderTargets.DEPTH)
-            self.render_axis()
+            def render_debug_line():
+                bind_view_projection()
+                # render world axis
+                self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+                self.render_axis()
 
-            self.debug_line_manager.bind_render_spline_program()
-            for spline in self.scene_manager.splines:
-                self.debug_line_manager.render_spline(spline)
+                self.debug_line_manager.bind_render_spline_program()
+                for spline in self.scene_manager.splines:
+                    self.debug_line_manager.render_spline(spline)
 
-            self.debug_line_manager.render_debug_lines()
+                self.debug_line_manager.render_debug_lines()
+
+            render_graph.add_pass('debug_line',
+                                  render_debug_line,
+                                  reads=(('BACKBUFFER', ResourceAccess.FRAMEBUFFER), 'DEPTH'),
+                                  color_attachments=('BACKBUFFER',),
+                                  depth_attachment='DEPTH')
 
         if RenderOption.RENDER_GIZMO and self.debug_texture is None:
-            self.framebuffer_manager.bind_framebuffer(RenderTargets.BACKBUFFER, depth_texture=RenderTargets.DEPTH)
-            glEnable(GL_DEPTH_TEST)
-            glDepthMask(True)
-            self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+            def render_gizmo():
+                bind_view_projection()
+                glEnable(GL_DEPTH_TEST)
+                glDepthMask(True)
+                self.set_blend_state(True, GL_FUNC_ADD, GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-            # render spline gizmo
-            self.render_actors(RenderGroup.STATIC_ACTOR,
-                               RenderMode.GIZMO,
-                               self.scene_manager.spline_gizmo_render_infos,
-                               self.render_color_material)
+                # render spline gizmo
+                self.render_actors(RenderGroup.STATIC_ACTOR,
+                                   RenderMode.GIZMO,
+                                   self.scene_manager.spline_gizmo_render_infos,
+                                   self.render_color_material)
+
+                # render transform axis gizmo
+                glClear(GL_DEPTH_BUFFER_BIT)
+                self.render_axis_gizmo(RenderMode.GIZMO)
+
+            render_graph.add_pass('gizmo',
+                                  render_gizmo,
+                                  reads=(('BACKBUFFER', ResourceAccess.FRAMEBUFFER), 'DEPTH'),
+                                  writes=('BACKBUFFER', 'DEPTH'),
+                                  color_attachments=('BACKBUFFER',),
+                                  depth_attachment='DEPTH')
+
+    def render_scene(self):
+        main_camera = self.get_render_camera()
+
+        # the light probes are rendered in the full size.
+        if RenderOption.RENDER_LIGHT_PROBE:
+            self.framebuffer_manager.set_render_scale(1.0)
+        else:
+            self.framebuffer_manager.set_render_scale(self.dynamic_resolution.render_scale)
+
+        # bind scene constants uniform blocks
+        self.bind_uniform_blocks()
+
+        self.set_blend_state(False)
+
+        glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_NICEST)
+        glPolygonMode(GL_FRONT_AND_BACK, self.view_mode)
+        # glEnable(GL_FRAMEBUFFER_SRGB)
+        glEnable(GL_MULTISAMPLE)
+        glEnable(GL_TEXTURE_CUBE_MAP_SEAMLESS)
+        glDepthFunc(GL_LEQUAL)
+        glEnable(GL_CULL_FACE)
+        glFrontFace(GL_CCW)
+        glEnable(GL_DEPTH_TEST)
+        glDepthMask(True)
+        glClearColor(0.0, 0.0, 0.0, 1.0)
+        glClearDepth(1.0)
+
+        if self.postprocess.is_render_shader() and not RenderOption.RENDER_LIGHT_PROBE:
+            """ debug shader """
+            def render_material_instance():
+                self.set_blend_state(False)
+                glClear(GL_COLOR_BUFFER_BIT)
+                self.postprocess.render_material_instance()
 
-            # render transform axis gizmo
-            glClear(GL_DEPTH_BUFFER_BIT)
-            self.render_axis_gizmo(RenderMode.GIZMO)
+            self.render_graph.add_pass('debug_shader', render_material_instance, color_attachments=('BACKBUFFER',))
+
+        elif RenderOption.RENDER_ONLY_ATMOSPHERE and RenderOption.RENDER_LIGHT_PROBE:
+            """ render light probe preprocess """
+            self.framebuffer_manager.bind_framebuffer(RenderTargets.COMPOSITE_SHADOWMAP)
+            glClearColor(1.0, 1.0, 1.0, 1.0)
+            glClear(GL_COLOR_BUFFER_BIT)
+            self.need_to_composite_shadowmap = True
+
+            self.framebuffer_manager.bind_framebuffer(RenderTargets.WORLD_NORMAL, depth_texture=RenderTargets.DEPTH)
+            glClearColor(0.0, 1.0, 0.0, 1.0)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+            self.framebuffer_manager.bind_framebuffer(RenderTargets.LINEAR_DEPTH)
+            glClearColor(1.0, 1.0, 1.0, 1.0)
+            glClear(GL_COLOR_BUFFER_BIT)
+            self.postprocess.render_linear_depth(RenderTargets.DEPTH, RenderTargets.LINEAR_DEPTH)
+
+            self.framebuffer_manager.bind_framebuffer(RenderTargets.HDR)
+            glClearColor(0.0, 0.0, 0.0, 1.0)
+            glClear(GL_COLOR_BUFFER_BIT)
+
+            # render atmosphere
+            if self.scene_manager.atmosphere.is_render_atmosphere:
+                self.scene_manager.atmosphere.render_precomputed_atmosphere(RenderTargets.LINEAR_DEPTH,
+                                                                            RenderTargets.COMPOSITE_SHADOWMAP,
+                                                                            RenderOption.RENDER_LIGHT_PROBE)
+            # done render light probe preprocess
+            return
+        else:
+            """ render normal scene """
+            self.add_scene_passes(main_camera)
+
+            # render probe done
+            if not RenderOption.RENDER_LIGHT_PROBE:
+                self.add_postprocess_passes()
+
+        if RenderOption.RENDER_LIGHT_PROBE:
+            outputs = ['HDR', ]
+        else:
+            self.add_overlay_passes(main_camera)
+            outputs = ['BACKBUFFER', ]
+            # the screen space reflection of the next frame reads the HDR.
+            if self.postprocess.is_render_ssr:
+                outputs.append('HDR')
+
+        self.render_graph.compile(outputs)
+
+        if RenderOption.RENDER_LIGHT_PROBE:
+            self.render_graph.execute()
+        else:
+            self.dynamic_resolution.begin_frame()
+            self.render_graph.execute()
+            self.dynamic_resolution.end_frame()
+
+        # the callbacks are dropped when the translucent pass is culled.
+        self.render_custom_translucent_callbacks.clear()
@@ -61,11 +61,6 @@ class Renderer_Basic(Singleton):
         self.postprocess = PostProcess()
         self.postprocess.initialize()
 
-        self.uniform_point_light_data = np.zeros(MAX_POINT_LIGHTS, dtype=[('color', np.float32, 3),
-                                                                          ('radius', np.float32, 1),
-                                                                          ('pos', np.float32, 3),
-                                                                          ('render', np.float32, 1)])
-
         self.initialized = True
 
         # Send to GUI
@@ -140,7 +135,7 @@ class Renderer_Basic(Singleton):
     def set_debug_texture(self, texture):
         pass
 
-    def render_light_probe(self, light_probe):
+    def update_light_probes(self):
         pass
 
     def render_actors(self, render_group, render_infos):
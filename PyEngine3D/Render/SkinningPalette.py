@@ -0,0 +1,88 @@
+import numpy as np
+
+from PyEngine3D.Common import logger
+from PyEngine3D.OpenGLContext import ShaderStorageBuffer
+
+
+# reference : default_vs.glsl
+BONE_PALETTE_BINDING = 13
+
+# the matrices of the palette buffer at first, the buffer grows to the double size.
+INITIAL_BONE_PALETTE_SIZE = 4096
+
+MATRIX_SIZE = 64
+
+
+class SkinningPalette:
+    """
+    The bone matrices of the rendered skeleton actors are written into one shader storage buffer once per frame,
+    the current and the previous matrix of a bone are adjacent, a draw gets only the offset of the bones of the actor.
+    """
+    def __init__(self):
+        self.palette = np.zeros((INITIAL_BONE_PALETTE_SIZE, 4, 4), dtype=np.float32)
+        self.palette_size = 0
+        self.palette_offsets = dict()  # (actor, skeleton index) : offset
+        self.bone_palette_buffer = None
+
+    def initialize(self):
+        logger.info("Initialize SkinningPalette")
+        self.create_bone_palette_buffer()
+
+    def close(self):
+        if self.bone_palette_buffer is not None:
+            self.bone_palette_buffer.delete()
+        self.bone_palette_buffer = None
+
+    def create_bone_palette_buffer(self):
+        self.close()
+        self.bone_palette_buffer = ShaderStorageBuffer(name='bone_palette_buffer',
+                                                       data_size=self.palette.nbytes,
+                                                       dtype=np.float32,
+                                                       init_data=self.palette)
+        self.bone_palette_buffer.bind_buffer_base(BONE_PALETTE_BINDING)
+
+    def add_bones(self, actor, skeleton_index):
+        animation_buffer = actor.get_animation_buffer(skeleton_index)
+        prev_animation_buffer = actor.get_prev_animation_buffer(skeleton_index)
+        offset = self.palette_size
+        palette_size = offset + len(animation_buffer) * 2
+
+        if len(self.palette) < palette_size:
+            palette = np.zeros((max(len(self.palette) * 2, palette_size), 4, 4), dtype=np.float32)
+            palette[:offset] = self.palette[:offset]
+            self.palette = palette
+
+        self.palette[offset:palette_size:2] = animation_buffer
+        self.palette[offset + 1:palette_size:2] = prev_animation_buffer
+        self.palette_size = palette_size
+        self.palette_offsets[(actor, skeleton_index)] = offset
+        return offset
+
+    def upload_bones(self, offset):
+        if self.bone_palette_buffer.data_size < self.palette.nbytes:
+            # the whole palette is uploaded to the new buffer
+            self.create_bone_palette_buffer()
+        else:
+            self.bone_palette_buffer.set_buffer_sub_data(self.palette[offset:self.palette_size], offset * MATRIX_SIZE)
+
+    def update_skinning_palette(self, render_infos_list):
+        """ pack the bones of the actors of the render infos and upload them at once. """
+        self.palette_size = 0
+        self.palette_offsets = dict()
+        for render_infos in render_infos_list:
+            for render_info in render_infos:
+                if render_info.actor.is_baked_animation():
+                    continue
+                key = (render_info.actor, render_info.geometry.skeleton.index)
+                if key not in self.palette_offsets:
+                    self.add_bones(*key)
+        self.upload_bones(0)
+        self.bone_palette_buffer.bind_buffer_base(BONE_PALETTE_BINDING)
+
+    def get_bone_palette_offset(self, actor, skeleton_index):
+        offset = self.palette_offsets.get((actor, skeleton_index))
+        if offset is None:
+            # the actor which was not in the render infos of this frame is uploaded alone.
+            offset = self.add_bones(actor, skeleton_index)
+            self.upload_bones(offset)
+        return offset
@@ -1,14 +1,71 @@
+import math
+
 from OpenGL.GL import *
 
 from PyEngine3D.Common import logger
+from PyEngine3D.Common import TERRAIN_LOD_PIXEL_ERROR, TERRAIN_LOD_MIN_RANGE_RATIO, TERRAIN_MORPH_START_RATIO
 from PyEngine3D.App import CoreManager
 from PyEngine3D.Render import Plane
 from PyEngine3D.OpenGLContext import InstanceBuffer
 from PyEngine3D.Utilities import *
 from . import RenderMode
+from .HeightField import HeightField
+
+
+# the morph of the coarsest lod is never started
+NO_MORPH_DISTANCE = 1e30
+
+# the children of a quadtree node : x, y
+CHILD_NODE_OFFSETS = np.array([[0, 0], [1, 0], [0, 1], [1, 1]], dtype=np.int32)
+
+
+def get_tile_texel_ranges(tile_count, texel_count, tiles_per_texture):
+    """ return : the wrapped texels of the bilinear footprints of the tiles in a row, the offsets of the tiles """
+    texels_per_tile = texel_count / tiles_per_texture
+    tiles = np.arange(tile_count + 1, dtype=np.float64)
+    edges = np.floor(tiles * texels_per_tile - 0.5).astype(np.int64)
+    # the footprint ends with the bilinear neighbor of the texel on the next tile edge
+    starts = edges[:-1]
+    counts = edges[1:] - starts + 2
+    offsets = np.concatenate([[0, ], np.cumsum(counts)[:-1]])
+    texels = np.repeat(starts - offsets, counts) + np.arange(np.sum(counts))
+    return texels % texel_count, offsets
+
+
+def get_tile_height_bounds(heights, height_map_size, width, height):
+    """ the height map is repeated every height_map_size tiles. return : min heights, max heights of (height, width) tiles """
+    texture_height, texture_width = heights.shape
+    cols, col_offsets = get_tile_texel_ranges(width, texture_width, height_map_size[0])
+    rows, row_offsets = get_tile_texel_ranges(height, texture_height, height_map_size[1])
+    # the min and the max are separable, reduce every texel of the columns and then of the rows.
+    col_heights = heights[:, cols]
+    min_heights = np.minimum.reduceat(np.minimum.reduceat(col_heights, col_offsets, axis=1)[rows], row_offsets, axis=0)
+    max_heights = np.maximum.reduceat(np.maximum.reduceat(col_heights, col_offsets, axis=1)[rows], row_offsets, axis=0)
+    return min_heights, max_heights
+
+
+def terrain_frustum_culling(camera, bound_centers, bound_extents):
+    """ return : culled flags of the world bound boxes, same test as view_frustum_culling_geometry """
+    to_bounds = bound_centers - camera.transform.pos
+    radius = np.linalg.norm(bound_extents, axis=1)
+    return (np.dot(to_bounds, camera.frustum_vectors.T) > radius[:, None]).any(axis=1)
+
+
+def terrain_shadow_cascade_culling(shadow_cascade, bound_centers, bound_extents):
+    """ return : culled flags of the world bound boxes out of the cascade """
+    view_projection = shadow_cascade.view_projection
+    centers = np.dot(bound_centers, view_projection[:3, :3]) + view_projection[3, :3]
+    extents = np.dot(bound_extents, np.abs(view_projection[:3, :3]))
+    return (1.0 < np.abs(centers) - extents).any(axis=1)
 
 
 class Terrain:
+    """
+    The tiles are the leaves of a quadtree, the nodes are culled with the height bounds of the height map
+    and a node is drawn with the same grid scaled by its size, so the far nodes are coarser.
+    The lod of a node is chosen by the screen space error of the grid spacing,
+    the vertices are morphed to the grid of the next lod before the lod changes to avoid popping and cracks.
+    """
     def __init__(self, **object_data):
         self.renderer = CoreManager.instance().renderer
         self.scene_manager = CoreManager.instance().scene_manager
@@ -27,9 +84,18 @@ class Terrain:
         self.subdivide_level = object_data.get('subdivide_level', 100)
         self.height_map_size = np.array(object_data.get('height_map_size', [10.0, 10.0]), dtype=np.float32)
 
-        self.instance_offset = None
+        # quadtree : min and max heights of the nodes for each lod, lod 0 is the tile.
+        self.lod_count = 1
+        self.node_min_heights = []
+        self.node_max_heights = []
+
+        # the cpu mirror of the height map for the height and the ray queries
+        self.height_field = None
+
         self.instance_buffer = None
+        self.render_node_count = 0
 
+        self.grid_level = 2
         self.terrain_grid = None
 
         self.texture_height_map_name = object_data.get('texture_height_map', "common.noise")
@@ -40,8 +106,9 @@ class Terrain:
         self.attributes = Attributes()
 
     def initialize(self):
-        self.set_instance_offset(self.width, self.height)
-        self.instance_buffer = InstanceBuffer(name="terrain_instance_buffer", location_offset=5, element_datas=[FLOAT4_ZERO, ])
+        self.instance_buffer = InstanceBuffer(name="terrain_instance_buffer",
+                                              location_offset=5,
+                                              element_datas=[FLOAT4_ZERO, FLOAT4_ZERO])
 
         self.generate_terrain(self.subdivide_level)
 
@@ -49,6 +116,8 @@ class Terrain:
         self.terrain_render = self.resource_manager.get_material_instance('terrain.terrain_render_ps')
         self.terrain_shadow = self.resource_manager.get_material_instance('terrain.terrain_shadow')
 
+        self.build_quadtree()
+
     def get_save_data(self):
         save_data = dict(
             is_render_terrain=self.is_render_terrain,
@@ -78,43 +147,199 @@ class Terrain:
             self.transform.set_scale(attribute_value)
         elif attribute_name == 'texture_height_map':
             self.texture_height_map = self.resource_manager.get_texture(attribute_value)
+            self.build_quadtree()
         elif hasattr(self, attribute_name):
             setattr(self, attribute_name, attribute_value)
-            if attribute_name in ('width', 'height'):
-                self.set_instance_offset(self.width, self.height)
-            elif attribute_name in 'subdivide_level':
+            if attribute_name in ('width', 'height', 'height_map_size'):
+                self.build_quadtree()
+            elif attribute_name == 'subdivide_level':
                 self.generate_terrain(self.subdivide_level)
         return self.attributes
 
     def generate_terrain(self, subdivide_level):
-        self.terrain_grid = Plane("Terrain_Grid", mode=GL_QUADS, width=subdivide_level, height=subdivide_level, xz_plane=True)
-
-    def set_instance_offset(self, width, height):
-        count = width * height
-        self.instance_offset = np.zeros(count, (np.float32, 4))
-        i = 0
-        for y in range(height):
-            for x in range(width):
-                self.instance_offset[i][0] = x
-                self.instance_offset[i][1] = y
-                i += 1
+        # the morph snaps the odd vertices to the even ones, so the grid level must be even.
+        self.grid_level = max(2, int(subdivide_level) + int(subdivide_level) % 2)
+        self.terrain_grid = Plane("Terrain_Grid", mode=GL_QUADS, width=self.grid_level, height=self.grid_level, xz_plane=True)
+
+    def get_height_map_data(self):
+        if self.texture_height_map is None:
+            return None
+        data = self.texture_height_map.get_image_data()
+        if data is None:
+            return None
+        texture_width, texture_height = self.texture_height_map.width, self.texture_height_map.height
+        heights = data.reshape(texture_height, texture_width, -1)[..., 0]
+        if np.issubdtype(heights.dtype, np.integer):
+            return heights.astype(np.float32) / np.iinfo(heights.dtype).max
+        return heights.astype(np.float32)
+
+    def build_quadtree(self):
+        width, height = max(1, int(self.width)), max(1, int(self.height))
+        heights = self.get_height_map_data()
+        if heights is not None:
+            tile_min_heights, tile_max_heights = get_tile_height_bounds(heights, self.height_map_size, width, height)
+            self.height_field = HeightField(heights, self.height_map_size)
+        else:
+            logger.warn("%s failed to read the height map, the height bounds are not culled." % self.name)
+            tile_min_heights = np.zeros((height, width), dtype=np.float32)
+            tile_max_heights = np.ones((height, width), dtype=np.float32)
+            self.height_field = HeightField(np.zeros((1, 1), dtype=np.float32), self.height_map_size)
+
+        # the tiles out of the terrain have the empty bounds, min is greater than max.
+        self.lod_count = int(math.ceil(math.log2(max(width, height)))) + 1
+        size = 2 ** (self.lod_count - 1)
+        min_heights = np.full((size, size), np.inf, dtype=np.float32)
+        max_heights = np.full((size, size), -np.inf, dtype=np.float32)
+        min_heights[:height, :width] = tile_min_heights
+        max_heights[:height, :width] = tile_max_heights
+
+        self.node_min_heights = [min_heights, ]
+        self.node_max_heights = [max_heights, ]
+        for lod in range(1, self.lod_count):
+            size //= 2
+            min_heights = min_heights.reshape(size, 2, size, 2).min(axis=(1, 3))
+            max_heights = max_heights.reshape(size, 2, size, 2).max(axis=(1, 3))
+            self.node_min_heights.append(min_heights)
+            self.node_max_heights.append(max_heights)
+
+    def get_lod_ranges(self, camera):
+        """ return : the distance where the error of the next lod is acceptable for each lod """
+        projection_scale = self.renderer.viewport.height * 0.5 * camera.projection[1][1]
+        tile_size = max(abs(self.transform.scale[0]), abs(self.transform.scale[2]))
+        node_sizes = tile_size * (2.0 ** np.arange(self.lod_count))
+        lod_ranges = (node_sizes * 2.0 / self.grid_level) * projection_scale / TERRAIN_LOD_PIXEL_ERROR
+        # the neighbors differ by one lod at most when the range is large enough for the node size.
+        return np.maximum(lod_ranges, node_sizes * TERRAIN_LOD_MIN_RANGE_RATIO)
+
+    def select_nodes(self, camera_position, lod_ranges, culling_func):
+        """ return : instance datas of the visible nodes, [(x, y, size, 0), (morph_start, morph_end, 0, 0)] """
+        matrix = self.transform.matrix
+        nodes = np.zeros((1, 2), dtype=np.int32)
+        node_offsets = []
+        node_morphs = []
+        for lod in range(self.lod_count - 1, -1, -1):
+            min_heights = self.node_min_heights[lod][nodes[:, 1], nodes[:, 0]]
+            max_heights = self.node_max_heights[lod][nodes[:, 1], nodes[:, 0]]
+            valid = min_heights <= max_heights
+            nodes, min_heights, max_heights = nodes[valid], min_heights[valid], max_heights[valid]
+            if 0 == len(nodes):
+                break
+
+            size = 2 ** lod
+            bound_min = np.stack([nodes[:, 0] * size, min_heights, nodes[:, 1] * size], axis=1)
+            bound_max = np.stack([np.minimum((nodes[:, 0] + 1) * size, self.width),
+                                  max_heights,
+                                  np.minimum((nodes[:, 1] + 1) * size, self.height)], axis=1)
+            bound_centers = np.dot((bound_min + bound_max) * 0.5, matrix[:3, :3]) + matrix[3, :3]
+            bound_extents = np.dot((bound_max - bound_min) * 0.5, np.abs(matrix[:3, :3]))
+
+            visible = np.logical_not(culling_func(bound_centers, bound_extents))
+            if 0 < lod:
+                to_bounds = np.maximum(np.abs(camera_position - bound_centers) - bound_extents, 0.0)
+                subdivide = np.linalg.norm(to_bounds, axis=1) < lod_ranges[lod - 1]
+            else:
+                subdivide = np.zeros(len(nodes), dtype=np.bool_)
+
+            selected_nodes = nodes[visible & np.logical_not(subdivide)]
+            if 0 < len(selected_nodes):
+                offsets = np.zeros((len(selected_nodes), 4), dtype=np.float32)
+                offsets[:, 0:2] = selected_nodes * size
+                offsets[:, 2] = size
+                morphs = np.zeros((len(selected_nodes), 4), dtype=np.float32)
+                if lod < self.lod_count - 1:
+                    prev_lod_range = lod_ranges[lod - 1] if 0 < lod else 0.0
+                    morphs[:, 0] = prev_lod_range + (lod_ranges[lod] - prev_lod_range) * TERRAIN_MORPH_START_RATIO
+                    morphs[:, 1] = lod_ranges[lod]
+                else:
+                    morphs[:, 0] = NO_MORPH_DISTANCE
+                    morphs[:, 1] = NO_MORPH_DISTANCE * 2.0
+                node_offsets.append(offsets)
+                node_morphs.append(morphs)
+
+            nodes = (nodes[visible & subdivide][:, None, :] * 2 + CHILD_NODE_OFFSETS).reshape(-1, 2)
+
+        if not node_offsets:
+            return None
+        return [np.concatenate(node_offsets), np.concatenate(node_morphs)]
+
+    def to_local(self, positions):
+        inverse_matrix = self.transform.inverse_matrix
+        return np.dot(np.asarray(positions, dtype=np.float32).reshape(-1, 3), inverse_matrix[:3, :3]) + inverse_matrix[3, :3]
+
+    def get_heights(self, positions):
+        """ positions : (n, 3) world positions. return : the world heights of the terrain at the positions """
+        local_positions = self.to_local(positions)
+        local_positions[:, 1] = self.height_field.get_heights(local_positions[:, 0], local_positions[:, 2])
+        matrix = self.transform.matrix
+        return np.dot(local_positions, matrix[:3, 1]) + matrix[3, 1]
+
+    def get_normals(self, positions):
+        """ positions : (n, 3) world positions. return : the world normals of the terrain at the positions """
+        local_positions = self.to_local(positions)
+        gradient_x, gradient_z = self.height_field.get_gradients(local_positions[:, 0], local_positions[:, 2])
+        normals = np.stack([-gradient_x, np.ones_like(gradient_x), -gradient_z], axis=1)
+        # the normals are transformed by the inverse transpose
+        normals = np.dot(normals, self.transform.inverse_matrix[:3, :3].T)
+        return normals / np.linalg.norm(normals, axis=1)[:, None]
+
+    def ray_cast(self, origins, directions, max_distance=np.inf):
+        """
+        :param origins, directions: (n, 3) world rays
+        return : hit flags, world hit positions, distances along the directions which are inf for the misses
+        """
+        origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        inverse_matrix = self.transform.inverse_matrix
+        local_origins = np.dot(origins, inverse_matrix[:3, :3]) + inverse_matrix[3, :3]
+        local_directions = np.dot(directions, inverse_matrix[:3, :3])
+
+        # clip the rays by the bound box of the terrain
+        bound_min = np.array([0.0, self.height_field.get_min_height(), 0.0])
+        bound_max = np.array([self.width, self.height_field.get_max_height(), self.height])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t0 = (bound_min - local_origins) / local_directions
+            t1 = (bound_max - local_origins) / local_directions
+        outside = (local_directions == 0.0) & ((local_origins < bound_min) | (bound_max < local_origins))
+        t0 = np.where(local_directions == 0.0, -np.inf, t0)
+        t1 = np.where(local_directions == 0.0, np.inf, t1)
+        t_start = np.maximum(np.minimum(t0, t1).max(axis=1), 0.0)
+        t_end = np.minimum(np.maximum(t0, t1).min(axis=1), max_distance)
+        t_end = np.where(outside.any(axis=1), -np.inf, t_end)
+
+        distances = self.height_field.ray_cast(local_origins, local_directions, t_start, t_end)
+        hits = np.isfinite(distances)
+        positions = origins + directions * np.where(hits, distances, 0.0)[:, None]
+        return hits, positions, distances
 
     def update(self, delta):
-        self.transform.update_transform()
+        return self.transform.update_transform(update_inverse_matrix=True)
 
-    def render_terrain(self, render_mode):
+    def render_terrain(self, render_mode, shadow_cascade=None):
+        camera = self.renderer.get_render_camera()
         if RenderMode.GBUFFER == render_mode:
             material_instance = self.terrain_render
+            instance_datas = self.select_nodes(camera.transform.pos,
+                                               self.get_lod_ranges(camera),
+                                               lambda centers, extents: terrain_frustum_culling(camera, centers, extents))
         elif RenderMode.SHADOW == render_mode:
+            # the lods follow the camera to match the rendered terrain, the nodes are culled by the cascade.
             material_instance = self.terrain_shadow
+            instance_datas = self.select_nodes(camera.transform.pos,
+                                               self.get_lod_ranges(camera),
+                                               lambda centers, extents: terrain_shadow_cascade_culling(shadow_cascade, centers, extents))
         else:
             raise BaseException("Unkown terrain render mode %s" % render_mode)
+
+        self.render_node_count = 0 if instance_datas is None else len(instance_datas[0])
+        if 0 == self.render_node_count:
+            return
+
         material_instance.use_program()
         material_instance.bind_material_instance()
         material_instance.bind_uniform_data('height_map_size', self.height_map_size)
+        material_instance.bind_uniform_data('terrain_size', np.array([self.width, self.height], dtype=np.float32))
         material_instance.bind_uniform_data('model', self.transform.matrix)
         material_instance.bind_uniform_data('texture_height_map', self.texture_height_map)
         material_instance.bind_uniform_data('scale', self.transform.scale)
-        material_instance.bind_uniform_data('subdivide_level', self.subdivide_level)
-        self.terrain_grid.get_geometry().draw_elements_instanced(len(self.instance_offset), self.instance_buffer, [self.instance_offset, ])
-
+        material_instance.bind_uniform_data('subdivide_level', float(self.grid_level))
+        self.terrain_grid.get_geometry().draw_elements_instanced(self.render_node_count, self.instance_buffer, instance_datas)
@@ -1,9 +1,10 @@
-from .RenderInfo import RenderInfo, gather_render_infos
-from .RenderInfo import view_frustum_culling_geometry, cone_sphere_culling_actor, always_pass, shadow_culling
+from .RenderInfo import RenderInfo, gather_render_infos, gather_shadow_render_infos
+from .RenderInfo import view_frustum_culling_geometry, cone_sphere_culling_actor, always_pass, shadow_cascade_culling
 from .RenderOptions import BlendMode, RenderOption, RenderingType, RenderGroup, RenderMode, RenderOptionManager
 
 from .MaterialInstance import MaterialInstance
 
+from .AnimationCompression import CompressedAnimation, compress_animation_data
 from .Animation import Animation, AnimationNode
 from .Skeleton import Skeleton, Bone
 from .Mesh import BoundBox, Geometry, Mesh, Triangle, Quad, Cube, Plane, ScreenQuad, Line
@@ -14,14 +15,19 @@ from .Actor import CollisionActor, StaticActor, SkeletonActor
 from .Gizmo import AxisGizmo
 from .Effect import EffectManager, Effect, Particle, EffectInfo, ParticleInfo
 from .Camera import Camera
-from .Light import MainLight, PointLight
+from .Light import ShadowSplitScheme, ShadowCascade, MainLight, PointLight
 from .LightProbe import LightProbe
+from .LightCluster import LightCluster
+from .SkinningPalette import SkinningPalette
+from .BakedAnimation import BakedAnimation, BakedAnimationManager
+from .AnimationLOD import AnimationLOD
 from .Atmosphere import Atmosphere
 from .Ocean import Ocean
+from .HeightField import HeightField
 from .Terrain import Terrain
 from .Spline import SplinePoint, SplineData, Spline3D
 
-from .Font import TextRenderData, FontData, FontManager
+from .Font import TextRenderData, FontData, DynamicFontData, FontManager
 from .RenderTarget import RenderTargets, RenderTargetManager
 
 from .PostProcess import PostProcess
@@ -11,6 +11,7 @@ import numpy as np
 
 from PyEngine3D.Common import logger
 from PyEngine3D.Utilities import *
+from PyEngine3D.Render.AnimationCompression import compress_animation_data, ROTATION_TOLERANCE, LOCATION_TOLERANCE, SCALE_TOLERANCE
 
 
 def convert_float(data, default=0.0):
@@ -491,10 +492,11 @@ class Collada:
             geometry = ColladaGeometry(xml_geometry, self.controllers, self.nodes)
             self.geometries.append(geometry)
 
-    def get_mesh_data(self):
+    def get_mesh_data(self, compress_animation=True, rotation_tolerance=ROTATION_TOLERANCE,
+                      location_tolerance=LOCATION_TOLERANCE, scale_tolerance=SCALE_TOLERANCE):
         geometry_datas = self.get_geometry_data()
         skeleton_datas = self.get_skeleton_data()
-        animation_datas = self.get_animation_data(skeleton_datas)
+        animation_datas = self.get_animation_data(skeleton_datas, compress_animation, rotation_tolerance, location_tolerance, scale_tolerance)
         mesh_data = dict(
             geometry_datas=geometry_datas,
             skeleton_datas=skeleton_datas,
@@ -538,7 +540,8 @@ class Collada:
                 skeleton_datas.append(skeleton_data)
         return skeleton_datas
 
-    def get_animation_data(self, skeleton_datas):
+    def get_animation_data(self, skeleton_datas, compress_animation=True, rotation_tolerance=ROTATION_TOLERANCE,
+                           location_tolerance=LOCATION_TOLERANCE, scale_tolerance=SCALE_TOLERANCE):
         precompute_parent_matrix = True
         precompute_inv_bind_matrix = True
 
@@ -623,6 +626,15 @@ class Collada:
                     animation_node_name = "%s_%s_%s" % (self.name, skeleton_data['name'], bone_name)
                     animation_data.append(get_empty_animation_node_data(animation_node_name, bone_name))
 
+            if compress_animation:
+                animation_name = "%s_%s" % (self.name, skeleton_data['name'])
+                animation_datas[-1] = compress_animation_data(animation_name,
+                                                              animation_data,
+                                                              inv_bind_matrices,
+                                                              rotation_tolerance=rotation_tolerance,
+                                                              location_tolerance=location_tolerance,
+                                                              scale_tolerance=scale_tolerance)
+
         return animation_datas
 
     def get_geometry_data(self):
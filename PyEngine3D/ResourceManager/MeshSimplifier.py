@@ -0,0 +1,206 @@
+import heapq
+
+import numpy as np
+from OpenGL.GL import GL_TRIANGLES
+
+from PyEngine3D.Common import logger
+from PyEngine3D.Common.Constants import *
+
+
+# the quadrics of the border edges are weighted to keep the silhouette of the open meshes.
+BORDER_QUADRIC_WEIGHT = 1000.0
+
+# the collapse is rejected when a triangle turns more than this (cosine of the normals).
+MIN_NORMAL_COSINE = 0.2
+
+# the positions are welded at this precision, the vertices split by the texcoords or the normals collapse together.
+WELD_DECIMALS = 6
+
+
+def get_plane_quadrics(points0, points1, points2, weights):
+    """ return : (n, 4, 4) area weighted quadrics of the planes of the triangles """
+    normals = np.cross(points1 - points0, points2 - points0)
+    areas = np.linalg.norm(normals, axis=1)
+    normals = normals / np.maximum(areas, 1e-12)[:, None]
+    planes = np.concatenate([normals, -np.sum(normals * points0, axis=1, keepdims=True)], axis=1)
+    return planes[:, :, None] * planes[:, None, :] * (areas * 0.5 * weights)[:, None, None]
+
+
+class MeshSimplifier:
+    """
+    Quadric error metric simplification with half edge collapses, the vertex collapses into one of its neighbours,
+    so the simplified indices refer to the vertices of the base geometry and share its vertex buffer,
+    the texcoords and the bone weights are kept as they are.
+    """
+    def __init__(self, positions, indices):
+        positions = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        self.indices = np.array(indices, dtype=np.int64).reshape(-1, 3)
+
+        # the topology is built on the welded positions
+        self.points, self.groups = np.unique(np.round(positions, WELD_DECIMALS), axis=0, return_inverse=True)
+        self.groups = self.groups.reshape(-1)
+        self.triangles = self.groups[self.indices]
+        self.alive = (self.triangles[:, 0] != self.triangles[:, 1]) & \
+                     (self.triangles[:, 1] != self.triangles[:, 2]) & \
+                     (self.triangles[:, 2] != self.triangles[:, 0])
+        self.triangle_count = int(np.count_nonzero(self.alive))
+
+        point_count = len(self.points)
+        self.vertex_triangles = [set() for i in range(point_count)]
+        self.neighbours = [set() for i in range(point_count)]
+        for triangle_index in np.nonzero(self.alive)[0]:
+            a, b, c = self.triangles[triangle_index]
+            for vertex in (a, b, c):
+                self.vertex_triangles[vertex].add(triangle_index)
+            self.neighbours[a].update((b, c))
+            self.neighbours[b].update((a, c))
+            self.neighbours[c].update((a, b))
+
+        self.quadrics = np.zeros((point_count, 4, 4), dtype=np.float64)
+        triangles = self.triangles[self.alive]
+        points = [self.points[triangles[:, i]] for i in range(3)]
+        quadrics = get_plane_quadrics(*points, np.ones(len(triangles)))
+        for i in range(3):
+            np.add.at(self.quadrics, triangles[:, i], quadrics)
+        self.add_border_quadrics(triangles)
+
+        self.versions = np.zeros(point_count, dtype=np.int64)
+        self.heap = []
+        for vertex in range(point_count):
+            for neighbour in self.neighbours[vertex]:
+                if vertex < neighbour:
+                    self.push_edge(vertex, neighbour)
+
+    def add_border_quadrics(self, triangles):
+        edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+        opposites = np.concatenate([triangles[:, 2], triangles[:, 0], triangles[:, 1]])
+        keys = np.sort(edges, axis=1)
+        unique_keys, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        borders = counts[inverse.reshape(-1)] == 1
+        if not np.any(borders):
+            return
+        edges = edges[borders]
+        points0 = self.points[edges[:, 0]]
+        points1 = self.points[edges[:, 1]]
+        # the plane through the border edge perpendicular to the triangle
+        normals = np.cross(points1 - points0, self.points[opposites[borders]] - points0)
+        points2 = points0 + normals / np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None] * \
+            np.linalg.norm(points1 - points0, axis=1)[:, None]
+        quadrics = get_plane_quadrics(points0, points1, points2, np.full(len(edges), BORDER_QUADRIC_WEIGHT))
+        np.add.at(self.quadrics, edges[:, 0], quadrics)
+        np.add.at(self.quadrics, edges[:, 1], quadrics)
+
+    def get_collapse_cost(self, vertex, target):
+        point = np.append(self.points[target], 1.0)
+        return float(point.dot(self.quadrics[vertex] + self.quadrics[target]).dot(point))
+
+    def push_edge(self, vertex0, vertex1):
+        cost0 = self.get_collapse_cost(vertex0, vertex1)
+        cost1 = self.get_collapse_cost(vertex1, vertex0)
+        vertex, target, cost = (vertex0, vertex1, cost0) if cost0 <= cost1 else (vertex1, vertex0, cost1)
+        heapq.heappush(self.heap, (cost, vertex, target, self.versions[vertex], self.versions[target]))
+
+    def is_valid_collapse(self, vertex, target):
+        # the link condition keeps the surface manifold
+        if 2 < len(self.neighbours[vertex] & self.neighbours[target]):
+            return False
+
+        for triangle_index in self.vertex_triangles[vertex]:
+            triangle = self.triangles[triangle_index]
+            if target in triangle:
+                continue
+            points = self.points[triangle]
+            normal = np.cross(points[1] - points[0], points[2] - points[0])
+            points[triangle == vertex] = self.points[target]
+            new_normal = np.cross(points[1] - points[0], points[2] - points[0])
+            length = np.linalg.norm(normal) * np.linalg.norm(new_normal)
+            if length <= 0.0 or np.dot(normal, new_normal) < MIN_NORMAL_COSINE * length:
+                return False
+        return True
+
+    def collapse(self, vertex, target):
+        # the corners of the vertex take the corners of the target which shared the removed triangles
+        corner_map = dict()
+        removed_triangles = [x for x in self.vertex_triangles[vertex] if target in self.triangles[x]]
+        for triangle_index in removed_triangles:
+            triangle = self.triangles[triangle_index]
+            corner_map[self.indices[triangle_index][triangle == vertex][0]] = self.indices[triangle_index][triangle == target][0]
+        default_corner = next(iter(corner_map.values()), None)
+
+        for triangle_index in removed_triangles:
+            self.alive[triangle_index] = False
+            self.triangle_count -= 1
+            for corner in self.triangles[triangle_index]:
+                self.vertex_triangles[corner].discard(triangle_index)
+
+        for triangle_index in self.vertex_triangles[vertex]:
+            triangle = self.triangles[triangle_index]
+            corner = triangle == vertex
+            if default_corner is None:
+                # the target is not connected by a triangle, any vertex of the target group is used.
+                default_corner = np.nonzero(self.groups == target)[0][0]
+            self.indices[triangle_index][corner] = corner_map.get(self.indices[triangle_index][corner][0], default_corner)
+            triangle[corner] = target
+            self.vertex_triangles[target].add(triangle_index)
+        self.vertex_triangles[vertex] = set()
+
+        for neighbour in self.neighbours[vertex]:
+            self.neighbours[neighbour].discard(vertex)
+            if neighbour != target:
+                self.neighbours[neighbour].add(target)
+                self.neighbours[target].add(neighbour)
+        self.neighbours[vertex] = set()
+        self.neighbours[target].discard(target)
+
+        self.quadrics[target] += self.quadrics[vertex]
+        self.versions[vertex] += 1
+        self.versions[target] += 1
+        for neighbour in self.neighbours[target]:
+            self.push_edge(target, neighbour)
+
+    def simplify(self, target_triangle_counts):
+        """ return : the indices per target triangle count, the chain stops when the mesh can not be simplified more. """
+        lod_indices = []
+        for target_triangle_count in sorted(target_triangle_counts, reverse=True):
+            while target_triangle_count < self.triangle_count and self.heap:
+                cost, vertex, target, vertex_version, target_version = heapq.heappop(self.heap)
+                if self.versions[vertex] != vertex_version or self.versions[target] != target_version:
+                    continue
+                if self.is_valid_collapse(vertex, target):
+                    self.collapse(vertex, target)
+
+            if target_triangle_count < self.triangle_count:
+                break
+            lod_indices.append(self.indices[self.alive].reshape(-1).astype(np.uint32))
+        return lod_indices
+
+
+def generate_geometry_lods(geometry_data, triangle_ratios=MESH_LOD_TRIANGLE_RATIOS,
+                           min_triangles=MESH_LOD_MIN_TRIANGLES, max_triangles=MESH_LOD_MAX_TRIANGLES):
+    """ return : the indices of the lods of the triangle geometry, the geometries over max_triangles are not simplified. """
+    positions = geometry_data.get('positions', [])
+    indices = geometry_data.get('indices', [])
+    triangle_count = len(indices) // 3
+    if geometry_data.get('mode', GL_TRIANGLES) != GL_TRIANGLES or triangle_count < min_triangles:
+        return []
+
+    if max_triangles < triangle_count:
+        logger.warn("%s has %d triangles, the lods are generated up to %d triangles." %
+                    (geometry_data.get('name', ''), triangle_count, max_triangles))
+        return []
+
+    simplifier = MeshSimplifier(positions, indices)
+    target_triangle_counts = [max(1, int(triangle_count * ratio)) for ratio in triangle_ratios]
+    return simplifier.simplify(target_triangle_counts)
+
+
+def generate_mesh_lods(mesh_name, mesh_data, triangle_ratios=MESH_LOD_TRIANGLE_RATIOS,
+                       min_triangles=MESH_LOD_MIN_TRIANGLES, max_triangles=MESH_LOD_MAX_TRIANGLES):
+    """ the lods are stored in the geometry datas of the mesh resource as 'lod_indices' """
+    for i, geometry_data in enumerate(mesh_data.get('geometry_datas', [])):
+        lod_indices = generate_geometry_lods(geometry_data, triangle_ratios, min_triangles, max_triangles)
+        geometry_data['lod_indices'] = lod_indices
+        if lod_indices:
+            triangle_counts = [len(geometry_data['indices']) // 3, ] + [len(x) // 3 for x in lod_indices]
+            logger.info("Generate %s %s lods : %s triangles" % (mesh_name, geometry_data.get('name', i), triangle_counts))
+    return mesh_data
@@ -6,6 +6,7 @@ import glob
 import gzip
 import importlib
 import math
+import multiprocessing
 import os
 import pickle
 import pprint
@@ -19,6 +20,7 @@ import traceback
 import uuid
 
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from ctypes import *
 from distutils.dir_util import copy_tree
 from importlib.machinery import SourceFileLoader
@@ -33,15 +35,16 @@ from PyEngine3D.Common import *
 from PyEngine3D.Render import MaterialInstance, Triangle, Quad, Cube, Plane, Mesh, Model, Font
 from PyEngine3D.Render import CreateProceduralTexture, NoiseTexture3D, CloudTexture3D, VectorFieldTexture3D
 from PyEngine3D.Render import EffectInfo, ParticleInfo
-from PyEngine3D.Render import FontData
+from PyEngine3D.Render import FontData, DynamicFontData, BakedAnimationManager
 from PyEngine3D.Render import SplinePoint, SplineData
+from PyEngine3D.Render.AnimationCompression import ROTATION_TOLERANCE, LOCATION_TOLERANCE, SCALE_TOLERANCE
 from PyEngine3D.Render.Ocean.Constants import GRID_VERTEX_COUNT
 from PyEngine3D.OpenGLContext import CreateTexture, Material, Texture2D, Texture2DArray, Texture3D, TextureCube
 from PyEngine3D.OpenGLContext import Shader, ShaderCompileOption, ShaderCompileMessage, default_compile_option
-from PyEngine3D.OpenGLContext import parsing_macros, parsing_uniforms, parsing_material_components
+from PyEngine3D.OpenGLContext import parsing_macros, parsing_uniforms, parsing_material_components, pack_material_parameters
 from PyEngine3D.Utilities import Attributes, Singleton, Config, Logger, Profiler, Float3
 from PyEngine3D.Utilities import GetClassName, is_gz_compressed_file, check_directory_and_mkdir, get_modify_time_of_file
-from . import Collada, OBJ, loadDDS, generate_font_data, TextureGenerator
+from . import Collada, OBJ, generate_mesh_lods, loadDDS, generate_font_data, is_dynamic_unicode_block, GlyphRasterizer, TextureGenerator
 
 
 class LoadingThread(Thread):
@@ -85,6 +88,10 @@ class MetaData:
         self.resource_modify_time = get_modify_time_of_file(resource_filepath)
         self.source_filepath = ""
         self.source_modify_time = ""
+        # parameters of the procedural generator which made the resource
+        self.generator_key = ""
+        # the options of the conversion of the source file, they are edited in the meta file.
+        self.import_options = {}
         self.version_updated = False
         self.changed = False
 
@@ -130,6 +137,12 @@ class MetaData:
         if self.changed and save:
             self.save_meta_file()
 
+    def set_generator_key(self, generator_key, save=True):
+        self.changed |= self.generator_key != generator_key
+        self.generator_key = generator_key
+        if self.changed and save:
+            self.save_meta_file()
+
     def load_meta_file(self):
         if os.path.exists(self.filepath):
             with open(self.filepath, 'r') as f:
@@ -139,6 +152,8 @@ class MetaData:
                 resource_modify_time = load_data.get("resource_modify_time", None)
                 source_filepath = load_data.get("source_filepath", None)
                 source_modify_time = load_data.get("source_modify_time", None)
+                self.generator_key = load_data.get("generator_key", "")
+                self.import_options = load_data.get("import_options", {})
 
                 self.changed |= self.resource_version != resource_version
                 self.changed |= self.resource_filepath != resource_filepath
@@ -169,6 +184,10 @@ class MetaData:
                     source_filepath=self.source_filepath,
                     source_modify_time=self.source_modify_time,
                 )
+                if self.generator_key:
+                    save_data['generator_key'] = self.generator_key
+                if self.import_options:
+                    save_data['import_options'] = self.import_options
                 pprint.pprint(save_data, f)
             self.changed = False
 
@@ -742,6 +761,7 @@ class MaterialLoader(ResourceLoader):
                 final_macros = parsing_macros(shader_code_list)
                 uniforms = parsing_uniforms(shader_code_list)
                 material_components = parsing_material_components(shader_code_list)
+                material_parameters = pack_material_parameters(shader_codes)
 
                 final_material_name = material_name
 
@@ -762,6 +782,7 @@ class MaterialLoader(ResourceLoader):
                     include_files=include_files,
                     uniforms=uniforms,
                     material_components=material_components,
+                    material_parameters=material_parameters,
                     binary_data=None,
                     binary_format=None,
                     macros=final_macros
@@ -1136,6 +1157,7 @@ class MeshLoader(ResourceLoader):
             if mesh_data:
                 mesh = Mesh(resource.name, **mesh_data)
                 resource.set_data(mesh)
+                BakedAnimationManager.instance().rebake_animations(resource.name)
                 return True
         logger.error('%s failed to load %s' % (self.name, resource_name))
         return False
@@ -1143,19 +1165,28 @@ class MeshLoader(ResourceLoader):
     def convert_resource(self, resoure, source_filepath):
         logger.info("Convert Resource : %s" % source_filepath)
         file_ext = os.path.splitext(source_filepath)[1].lower()
+        import_options = resoure.meta_data.import_options
         if file_ext == self.externalFileExt.get('WaveFront'):
             mesh = OBJ(source_filepath, 1, True)
             mesh_data = mesh.get_mesh_data()
         elif file_ext == self.externalFileExt.get('Collada'):
             mesh = Collada(source_filepath)
-            mesh_data = mesh.get_mesh_data()
+            mesh_data = mesh.get_mesh_data(compress_animation=import_options.get('compress_animation', True),
+                                           rotation_tolerance=import_options.get('rotation_tolerance', ROTATION_TOLERANCE),
+                                           location_tolerance=import_options.get('location_tolerance', LOCATION_TOLERANCE),
+                                           scale_tolerance=import_options.get('scale_tolerance', SCALE_TOLERANCE))
         else:
             return
 
         if mesh_data:
+            # the simplification is slow, the lods are generated for the meshes which opt in by the import options.
+            if import_options.get('generate_lods', False):
+                generate_mesh_lods(resoure.name, mesh_data, max_triangles=import_options.get('lod_max_triangles', MESH_LOD_MAX_TRIANGLES))
+
             # create mesh
             mesh = Mesh(resoure.name, **mesh_data)
             resoure.set_data(mesh)
+            BakedAnimationManager.instance().rebake_animations(resoure.name)
             self.save_resource_data(resoure, mesh_data, source_filepath)
 
     def action_resource(self, resource_name):
@@ -1315,6 +1346,41 @@ class FontLoader(ResourceLoader):
         Hangul_Syllables=(0xAC00, 0xD7AF),  # 44032 ~ 55215
     )
 
+    def close(self):
+        for resource in self.resources.values():
+            self.delete_font_datas(resource.data)
+            resource.clear_data()
+
+    def delete_font_datas(self, font_datas):
+        """ release the atlases and the glyph workers of the font datas which are replaced or closed """
+        if font_datas is None:
+            return
+
+        font_manager = Font.FontManager.instance()
+        for font_data in font_datas.values():
+            if font_data is not None:
+                font_manager.remove_dynamic_font_data(font_data)
+                font_data.delete()
+
+    def replace_font_datas(self, old_font_datas, font_datas):
+        """ the old font datas are released and take the new data, so the texts which refer to them are laid out again. """
+        font_manager = Font.FontManager.instance()
+        for unicode_block_name, old_font_data in old_font_datas.items():
+            if old_font_data is None:
+                continue
+            font_manager.remove_dynamic_font_data(old_font_data)
+            old_font_data.delete()
+
+            font_data = font_datas.get(unicode_block_name)
+            if font_data is not None and type(font_data) is type(old_font_data):
+                generation = old_font_data.generation + 1
+                if font_data in font_manager.dynamic_font_datas:
+                    font_manager.remove_dynamic_font_data(font_data)
+                    font_manager.add_dynamic_font_data(old_font_data)
+                old_font_data.__dict__ = font_data.__dict__
+                old_font_data.generation = generation
+                font_datas[unicode_block_name] = old_font_data
+
     def check_font_data(self, font_datas, resoure, source_filepath):
         chaneged = False
 
@@ -1323,23 +1389,39 @@ class FontLoader(ResourceLoader):
         else:
             preview_path = self.project_resource_path
 
-        for unicode_block_name in self.unicode_blocks:
-            if unicode_block_name not in font_datas:
-                range_min, range_max = self.unicode_blocks[unicode_block_name]
-                font_data = generate_font_data(
-                    resource_name=resoure.name,
-                    distance_field_font=False,
-                    anti_aliasing=True,
-                    font_size=20,
-                    padding=1,
-                    unicode_block_name=unicode_block_name,
-                    range_min=range_min,
-                    range_max=range_max,
-                    source_filepath=source_filepath,
-                    preview_path=preview_path
-                )
-                font_datas[unicode_block_name] = font_data
-                chaneged = True
+        missing_unicode_block_names = [unicode_block_name for unicode_block_name in self.unicode_blocks
+                                       if unicode_block_name not in font_datas and
+                                       not is_dynamic_unicode_block(*self.unicode_blocks[unicode_block_name])]
+
+        if missing_unicode_block_names:
+            # font atlases are generated on the cpu, so the unicode blocks are converted in the processes.
+            # the processes are spawned, the forked process would inherit the gl context of this process.
+            max_workers = min(len(missing_unicode_block_names), os.cpu_count() or 1)
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = {}
+                for unicode_block_name in missing_unicode_block_names:
+                    range_min, range_max = self.unicode_blocks[unicode_block_name]
+                    futures[unicode_block_name] = executor.submit(
+                        generate_font_data,
+                        resource_name=resoure.name,
+                        distance_field_font=False,
+                        anti_aliasing=True,
+                        font_size=20,
+                        padding=1,
+                        unicode_block_name=unicode_block_name,
+                        range_min=range_min,
+                        range_max=range_max,
+                        source_filepath=source_filepath,
+                        preview_path=preview_path
+                    )
+
+                for unicode_block_name in missing_unicode_block_names:
+                    try:
+                        font_datas[unicode_block_name] = futures[unicode_block_name].result()
+                    except:
+                        logger.error(traceback.format_exc())
+                        font_datas[unicode_block_name] = None
+                    chaneged = True
 
         if font_datas is not None and chaneged:
             self.save_resource_data(resoure, font_datas, source_filepath)
@@ -1358,9 +1440,17 @@ class FontLoader(ResourceLoader):
             if font_datas is not None:
                 font_datas = self.check_font_data(font_datas, resource, meta_data.source_filepath)
 
-                for unicode_block_name in font_datas:
+                for unicode_block_name in list(font_datas.keys()):
                     font_data = font_datas[unicode_block_name]
 
+                    if unicode_block_name in self.unicode_blocks and \
+                            is_dynamic_unicode_block(*self.unicode_blocks[unicode_block_name]):
+                        dynamic_font_data = self.create_dynamic_font_data(resource_name, unicode_block_name, meta_data.source_filepath)
+                        if dynamic_font_data is not None:
+                            # the atlas of the whole block converted by the old version is not loaded.
+                            font_datas[unicode_block_name] = dynamic_font_data
+                            continue
+
                     if font_data is not None:
                         texture_datas = dict(
                             texture_type=Texture2D,
@@ -1375,11 +1465,34 @@ class FontLoader(ResourceLoader):
                         font_data['texture'] = CreateTexture(name=texture_name, **texture_datas)
                         font_datas[unicode_block_name] = FontData(unicode_block_name, font_data)
 
+                for unicode_block_name in self.unicode_blocks:
+                    if unicode_block_name not in font_datas:
+                        font_datas[unicode_block_name] = self.create_dynamic_font_data(resource_name, unicode_block_name, meta_data.source_filepath)
+
+                if resource.data is not None:
+                    self.replace_font_datas(resource.data, font_datas)
                 resource.set_data(font_datas)
                 return True
         logger.error('%s failed to load %s' % (self.name, resource_name))
         return False
 
+    def create_dynamic_font_data(self, resource_name, unicode_block_name, source_filepath):
+        if not os.path.exists(source_filepath):
+            logger.warn("%s failed to create the glyph cache of %s, there is no %s." % (self.name, unicode_block_name, source_filepath))
+            return None
+
+        try:
+            rasterizer = GlyphRasterizer(source_filepath, font_size=20, padding=1, anti_aliasing=True)
+        except:
+            logger.error(traceback.format_exc())
+            return None
+
+        range_min, range_max = self.unicode_blocks[unicode_block_name]
+        texture_name = "_".join([resource_name, unicode_block_name])
+        font_data = DynamicFontData(texture_name, unicode_block_name, range_min, range_max, rasterizer)
+        Font.FontManager.instance().add_dynamic_font_data(font_data)
+        return font_data
+
 
 # -----------------------#
 # CLASS : EffectLoader
@@ -1,51 +1,65 @@
-import random
-
 import numpy as np
 from numpy import array, mod, floor, ceil, sin, cos, dot
 
 from OpenGL.GL import *
 
-from PyEngine3D.Utilities import normalize
 from PyEngine3D.OpenGLContext import CreateTexture, Texture2D, Texture2DArray, Texture3D, TextureCube
 
 
+# seed of the generated textures, the results are identical on every run.
+DEFAULT_TEXTURE_SEED = 0
+
+
+def get_generator_key(generator, *args, seed=None):
+    return "%s%s seed=%s" % (generator.__name__, str(args), str(seed))
+
+
 def generate_3d_data(size):
     value = 255.0 / float(size)
-    data = array([0, 0, 0, 255] * size * size * size, dtype=np.uint8)
-    for z in range(size):
-        for y in range(size):
-            for x in range(size):
-                index = (x + y * size + z * size * size) * 4
-                data[index] = x * value
-                data[index + 1] = y * value
-                data[index + 2] = z * value
-    return data
-
-
-def generate_random_data(texture_size, data_type):
-    texture_data = np.zeros((texture_size * texture_size, 4), dtype=data_type)
-    for i in range(texture_size * texture_size):
-        texture_data[i][0] = random.random()
-        texture_data[i][1] = random.random()
-        texture_data[i][2] = random.random()
-        texture_data[i][3] = random.random()
-    return texture_data
-
-
-def generate_random_normal(texture_size, data_type):
-    texture_data = np.zeros((texture_size * texture_size, 3), dtype=data_type)
-    for i in range(texture_size * texture_size):
-        texture_data[i][0] = random.uniform(-1.0, 1.0)
-        texture_data[i][1] = 0.0
-        texture_data[i][2] = random.uniform(-1.0, 1.0)
-        texture_data[i][:] = normalize(texture_data[i])
-    return texture_data
+    gradient = (np.arange(size) * value).astype(np.uint8)
+    data = np.empty((size, size, size, 4), dtype=np.uint8)
+    data[..., 0] = gradient[np.newaxis, np.newaxis, :]
+    data[..., 1] = gradient[np.newaxis, :, np.newaxis]
+    data[..., 2] = gradient[:, np.newaxis, np.newaxis]
+    data[..., 3] = 255
+    return data.reshape(-1)
+
+
+def generate_random_data(texture_size, data_type, seed=DEFAULT_TEXTURE_SEED):
+    random_generator = np.random.default_rng(seed)
+    return random_generator.random((texture_size * texture_size, 4)).astype(data_type)
+
+
+def generate_random_normal(texture_size, data_type, seed=DEFAULT_TEXTURE_SEED):
+    random_generator = np.random.default_rng(seed)
+    texture_data = random_generator.uniform(-1.0, 1.0, (texture_size * texture_size, 3))
+    texture_data[:, 1] = 0.0
+    length = np.linalg.norm(texture_data, axis=1, keepdims=True)
+    texture_data = np.divide(texture_data, length, out=texture_data, where=0.0 < length)
+    return texture_data.astype(data_type)
 
 
 def generate_common_textures(texture_loader):
+    def is_generated(resource_name, generator_key):
+        meta_data = texture_loader.get_meta_data(resource_name, noWarn=True)
+        return meta_data is not None and generator_key == meta_data.generator_key
+
+    def save_generated_texture(resource_name, generator_key, texture):
+        resource = texture_loader.get_resource(resource_name, noWarn=True)
+        if resource is None:
+            resource = texture_loader.create_resource(resource_name, texture)
+        else:
+            # the loaded texture takes the generated data, its gl texture is released first.
+            if resource.data is not None:
+                resource.data.delete()
+            resource.set_data(texture)
+        texture_loader.save_resource(resource_name)
+        resource.meta_data.set_generator_key(generator_key)
+
     resource_name = "common.default_3d"
-    if not texture_loader.hasResource(resource_name):
-        size = 64
+    size = 64
+    generator_key = get_generator_key(generate_3d_data, size)
+    if not is_generated(resource_name, generator_key):
         data = generate_3d_data(size)
         texture = CreateTexture(
             name=resource_name,
@@ -61,12 +75,12 @@ def generate_common_textures(texture_loader):
             wrap=GL_REPEAT,
             data=data,
         )
-        texture_loader.create_resource(resource_name, texture)
-        texture_loader.save_resource(resource_name)
+        save_generated_texture(resource_name, generator_key, texture)
 
     resource_name = "common.default_2d_array"
-    if not texture_loader.hasResource(resource_name):
-        size = 64
+    size = 64
+    generator_key = get_generator_key(generate_3d_data, size)
+    if not is_generated(resource_name, generator_key):
         data = generate_3d_data(size)
         texture = CreateTexture(
             name=resource_name,
@@ -82,13 +96,13 @@ def generate_common_textures(texture_loader):
             wrap=GL_REPEAT,
             data=data,
         )
-        texture_loader.create_resource(resource_name, texture)
-        texture_loader.save_resource(resource_name)
+        save_generated_texture(resource_name, generator_key, texture)
 
     resource_name = "common.random"
-    if not texture_loader.hasResource(resource_name):
-        size = 512
-        data = generate_random_data(size, np.float16)
+    size = 512
+    generator_key = get_generator_key(generate_random_data, size, 'float16', seed=DEFAULT_TEXTURE_SEED)
+    if not is_generated(resource_name, generator_key):
+        data = generate_random_data(size, np.float16, seed=DEFAULT_TEXTURE_SEED)
         texture = CreateTexture(
             name=resource_name,
             texture_type=Texture2D,
@@ -102,13 +116,13 @@ def generate_common_textures(texture_loader):
             wrap=GL_REPEAT,
             data=data,
         )
-        texture_loader.create_resource(resource_name, texture)
-        texture_loader.save_resource(resource_name)
+        save_generated_texture(resource_name, generator_key, texture)
 
     resource_name = "common.random_normal"
-    if not texture_loader.hasResource(resource_name):
-        size = 4
-        data = generate_random_normal(size, np.float16)
+    size = 4
+    generator_key = get_generator_key(generate_random_normal, size, 'float16', seed=DEFAULT_TEXTURE_SEED)
+    if not is_generated(resource_name, generator_key):
+        data = generate_random_normal(size, np.float16, seed=DEFAULT_TEXTURE_SEED)
         texture = CreateTexture(
             name=resource_name,
             texture_type=Texture2D,
@@ -122,8 +136,7 @@ def generate_common_textures(texture_loader):
             wrap=GL_REPEAT,
             data=data
         )
-        texture_loader.create_resource(resource_name, texture)
-        texture_loader.save_resource(resource_name)
+        save_generated_texture(resource_name, generator_key, texture)
 
     def generate_color_texture(resource_name, size, color):
         if not texture_loader.hasResource(resource_name):
@@ -1,5 +1,6 @@
 from .ColladaLoader import Collada
 from .DDSLoader import loadDDS
 from .ObjLoader import OBJ
-from .FontLoader import generate_font_data
+from .MeshSimplifier import MeshSimplifier, generate_mesh_lods
+from .FontLoader import generate_font_data, is_dynamic_unicode_block, GlyphRasterizer
 from .ResourceManager import ResourceManager
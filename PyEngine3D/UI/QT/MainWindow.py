@@ -8,7 +8,7 @@ from PyQt4 import Qt, QtCore, QtGui, uic
 from PyQt4.Qt import *
 import numpy
 
-from PyEngine3D.Utilities import Singleton, Attribute, Attributes
+from PyEngine3D.Utilities import Singleton, Attribute, Attributes, get_preview_image
 from PyEngine3D.UI import logger
 from PyEngine3D.Common.Command import *
 
@@ -71,25 +71,13 @@ class MessageThread(QtCore.QThread):
         QtCore.QThread.__init__(self)
         self.running = True
         self.cmdQueue = cmdQueue
-
         self.limitDelta = 1.0 / 60.0  # 60fps
-        self.delta = 0.0
-        self.lastTime = 0.0
 
     def run(self):
-        self.lastTime = time.time()
         while self.running:
-            # Timer
-            self.delta = time.time() - self.lastTime
-            if self.delta < self.limitDelta:
-                time.sleep(self.limitDelta - self.delta)
-            # print(1.0/(time.time() - self.lastTime))
-            self.lastTime = time.time()
-
-            # Process recieved queues
-            if not self.cmdQueue.empty():
-                # receive value must be tuple type
-                cmd, value = self.cmdQueue.get()
+            # wait for the messages then handle all of them, the values of BATCH_COMMANDS are lists.
+            # the wait times out, so the thread stops without a message when running is cleared.
+            for cmd, value in coalesce_messages(self.cmdQueue.get_all(timeout=self.limitDelta)):
                 cmdName = get_command_name(cmd)
                 # recieved queues
                 if cmd == COMMAND.CLOSE_UI:
@@ -109,6 +97,7 @@ class MainWindow(QtGui.QMainWindow, Singleton):
         self.selected_item = None
         self.selected_item_categoty = ''
         self.isFillAttributeTree = False
+        self.texture_preview = None
 
         # MessageThread
         self.message_thread = MessageThread(self.cmdQueue)
@@ -168,7 +157,7 @@ class MainWindow(QtGui.QMainWindow, Singleton):
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.TRANS_RESOURCE_LIST)),
                      self.add_resource_list)
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.TRANS_RESOURCE_INFO)),
-                     self.set_resource_info)
+                     self.set_resource_infos)
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.TRANS_RESOURCE_ATTRIBUTE)),
                      self.fill_resource_attribute)
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.DELETE_RESOURCE_INFO)),
@@ -205,7 +194,7 @@ class MainWindow(QtGui.QMainWindow, Singleton):
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.CLEAR_RENDERTARGET_LIST)),
                      self.clear_render_target_list)
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.TRANS_RENDERTARGET_INFO)),
-                     self.add_render_target)
+                     self.add_render_targets)
 
         # rendering type
         self.comboRenderingType = self.findChild(QtGui.QComboBox, "comboRenderingType")
@@ -244,9 +233,11 @@ class MainWindow(QtGui.QMainWindow, Singleton):
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.DELETE_OBJECT_INFO)),
                      self.delete_object_info)
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.TRANS_OBJECT_INFO)),
-                     self.add_object_info)
+                     self.add_object_infos)
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.TRANS_OBJECT_ATTRIBUTE)),
                      self.fill_object_attribute)
+        self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.TRANS_TEXTURE_PREVIEW)),
+                     self.show_texture_preview)
         self.connect(self.message_thread, QtCore.SIGNAL(get_command_name(COMMAND.CLEAR_OBJECT_LIST)),
                      self.clear_object_list)
 
@@ -349,8 +340,8 @@ class MainWindow(QtGui.QMainWindow, Singleton):
         self.appCmdQueue.put(COMMAND.SET_ANTIALIASING, anti_aliasing_index)
 
     # Render Target
-    def add_render_target(self, rendertarget_name):
-        self.comboRenderTargets.addItem(rendertarget_name)
+    def add_render_targets(self, rendertarget_names):
+        self.comboRenderTargets.addItems(rendertarget_names)
 
     def view_rendertarget(self, rendertarget_index):
         rendertarget_name = self.comboRenderTargets.itemText(rendertarget_index)
@@ -461,6 +452,27 @@ class MainWindow(QtGui.QMainWindow, Singleton):
         self.selected_item_categoty = 'Resource'
         self.fill_attribute(attributes)
 
+    def show_texture_preview(self, texture_preview):
+        texture_name, data = texture_preview
+        if data is None:
+            # the channel logged the dropped payload
+            return
+
+        # data is a copy which the receiver owns, the next messages do not change it.
+        image = get_preview_image(data)
+        height, width = image.shape[:2]
+        # QImage.Format_RGB32 is 0xffRRGGBB
+        image = numpy.ascontiguousarray(image[..., [2, 1, 0, 3]])
+        qimage = QtGui.QImage(image.data, width, height, width * 4, QtGui.QImage.Format_RGB32)
+
+        if self.texture_preview is None:
+            self.texture_preview = QtGui.QLabel()
+            self.texture_preview.setWindowFlags(QtCore.Qt.Tool)
+        self.texture_preview.setWindowTitle("%s (%d x %d)" % (texture_name, data.shape[1], data.shape[0]))
+        self.texture_preview.setPixmap(QtGui.QPixmap.fromImage(qimage))
+        self.texture_preview.resize(width, height)
+        self.texture_preview.show()
+
     def fill_object_attribute(self, attributes):
         self.selected_item = self.objectList.currentItem()
         self.selected_item_categoty = 'Object'
@@ -497,26 +509,36 @@ class MainWindow(QtGui.QMainWindow, Singleton):
         return self.resourceListWidget.selectedItems()
 
     def add_resource_list(self, resourceList):
+        # sort once after the items are inserted
+        self.resourceListWidget.setSortingEnabled(False)
         for resName, resType in resourceList:
             item = QtGui.QTreeWidgetItem(self.resourceListWidget)
             item.setText(0, resName)
             item.setText(1, resType)
+        self.resourceListWidget.setSortingEnabled(True)
 
-    def set_resource_info(self, resource_info):
-        resource_name, resource_type, is_loaded = resource_info
-        items = self.resourceListWidget.findItems(resource_name, QtCore.Qt.MatchExactly, column=0)
-        for item in items:
-            if item.text(1) == resource_type:
-                break
-        else:
-            item = QtGui.QTreeWidgetItem(self.resourceListWidget)
+    def set_resource_infos(self, resource_infos):
+        self.resourceListWidget.setSortingEnabled(False)
 
-        item.is_loaded = is_loaded
-        fontColor = 'black' if is_loaded else 'gray'
-        item.setTextColor(0, QtGui.QColor(fontColor))
-        item.setTextColor(1, QtGui.QColor(fontColor))
-        item.setText(0, resource_name)
-        item.setText(1, resource_type)
+        items = dict()
+        for i in range(self.resourceListWidget.topLevelItemCount()):
+            item = self.resourceListWidget.topLevelItem(i)
+            items[(item.text(0), item.text(1))] = item
+
+        for resource_name, resource_type, is_loaded in resource_infos:
+            item = items.get((resource_name, resource_type))
+            if item is None:
+                item = QtGui.QTreeWidgetItem(self.resourceListWidget)
+                items[(resource_name, resource_type)] = item
+
+            item.is_loaded = is_loaded
+            fontColor = 'black' if is_loaded else 'gray'
+            item.setTextColor(0, QtGui.QColor(fontColor))
+            item.setTextColor(1, QtGui.QColor(fontColor))
+            item.setText(0, resource_name)
+            item.setText(1, resource_type)
+
+        self.resourceListWidget.setSortingEnabled(True)
 
     def select_resource(self):
         items = self.get_selected_resource()
@@ -576,11 +598,13 @@ class MainWindow(QtGui.QMainWindow, Singleton):
     def add_light(self):
         self.appCmdQueue.put(COMMAND.ADD_LIGHT)
 
-    def add_object_info(self, object_info):
-        object_name, object_type = object_info
-        item = QtGui.QTreeWidgetItem(self.objectList)
-        item.setText(0, object_name)
-        item.setText(1, object_type)
+    def add_object_infos(self, object_infos):
+        self.objectList.setSortingEnabled(False)
+        for object_name, object_type in object_infos:
+            item = QtGui.QTreeWidgetItem(self.objectList)
+            item.setText(0, object_name)
+            item.setText(1, object_type)
+        self.objectList.setSortingEnabled(True)
 
     def action_object(self, *args):
         selectedItems = self.objectList.selectedItems()
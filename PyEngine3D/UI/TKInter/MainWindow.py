@@ -84,29 +84,17 @@ class MessageThread(Thread):
         Thread.__init__(self)
         self.running = True
         self.cmdQueue = cmdQueue
-        self.commands = {}
-
         self.limitDelta = 1.0 / 60.0  # 60fps
-        self.delta = 0.0
-        self.lastTime = 0.0
+        self.commands = {}
 
     def connect(self, command_name, command):
         self.commands[command_name] = command
 
     def run(self):
-        self.lastTime = time.time()
         while self.running:
-            # Timer
-            self.delta = time.time() - self.lastTime
-            if self.delta < self.limitDelta:
-                time.sleep(self.limitDelta - self.delta)
-            # print(1.0/(time.time() - self.lastTime))
-            self.lastTime = time.time()
-
-            # Process recieved queues
-            if not self.cmdQueue.empty():
-                # receive value must be tuple type
-                cmd, value = self.cmdQueue.get()
+            # wait for the messages then handle all of them, the values of BATCH_COMMANDS are lists.
+            # the wait times out, so the thread stops without a message when running is cleared.
+            for cmd, value in coalesce_messages(self.cmdQueue.get_all(timeout=self.limitDelta)):
                 cmdName = get_command_name(cmd)
                 # recieved queues
                 if cmd == COMMAND.CLOSE_UI:
@@ -141,7 +129,7 @@ class MainWindow:
 
         self.message_thread.connect(get_command_name(COMMAND.TRANS_SCREEN_INFO), self.set_screen_info)
         self.message_thread.connect(get_command_name(COMMAND.CLEAR_RENDERTARGET_LIST), self.clear_render_target_list)
-        self.message_thread.connect(get_command_name(COMMAND.TRANS_RENDERTARGET_INFO), self.add_render_target)
+        self.message_thread.connect(get_command_name(COMMAND.TRANS_RENDERTARGET_INFO), self.add_render_targets)
         self.message_thread.connect(get_command_name(COMMAND.TRANS_RENDERING_TYPE_LIST), self.add_rendering_type)
         self.message_thread.connect(get_command_name(COMMAND.TRANS_ANTIALIASING_LIST), self.add_anti_aliasing)
         self.message_thread.connect(get_command_name(COMMAND.TRANS_GAME_BACKEND_LIST), self.add_game_backend)
@@ -150,12 +138,12 @@ class MainWindow:
         self.message_thread.connect(get_command_name(COMMAND.CLOSE_UI), self.exit)
         self.message_thread.connect(get_command_name(COMMAND.SORT_UI_ITEMS), self.sort_items)
         self.message_thread.connect(get_command_name(COMMAND.TRANS_RESOURCE_LIST), self.add_resource_list)
-        self.message_thread.connect(get_command_name(COMMAND.TRANS_RESOURCE_INFO), self.set_resource_info)
+        self.message_thread.connect(get_command_name(COMMAND.TRANS_RESOURCE_INFO), self.set_resource_infos)
         self.message_thread.connect(get_command_name(COMMAND.TRANS_RESOURCE_ATTRIBUTE), self.fill_resource_attribute)
         self.message_thread.connect(get_command_name(COMMAND.DELETE_RESOURCE_INFO), self.delete_resource_info)
 
         self.message_thread.connect(get_command_name(COMMAND.DELETE_OBJECT_INFO), self.delete_object_info)
-        self.message_thread.connect(get_command_name(COMMAND.TRANS_OBJECT_INFO), self.add_object_info)
+        self.message_thread.connect(get_command_name(COMMAND.TRANS_OBJECT_INFO), self.add_object_infos)
         self.message_thread.connect(get_command_name(COMMAND.TRANS_OBJECT_ATTRIBUTE), self.fill_object_attribute)
         self.message_thread.connect(get_command_name(COMMAND.CLEAR_OBJECT_LIST), self.clear_object_list)
 
@@ -543,8 +531,9 @@ class MainWindow:
         self.appCmdQueue.put(COMMAND.SET_ANTIALIASING, anti_aliasing_index)
 
     # Render Target
-    def add_render_target(self, rendertarget_name):
-        combobox_add_item(self.comboRenderTargets, rendertarget_name)
+    def add_render_targets(self, rendertarget_names):
+        for rendertarget_name in rendertarget_names:
+            combobox_add_item(self.comboRenderTargets, rendertarget_name)
 
     def view_rendertarget(self, event):
         rendertarget_index = self.comboRenderTargets.current()
@@ -780,22 +769,26 @@ class MainWindow:
         for resName, resType in resourceList:
             self.resource_treeview.insert("", 'end', text=resName, values=(resType,))
 
-    def set_resource_info(self, resource_info):
-        resource_name, resource_type, is_loaded = resource_info
-
+    def set_resource_infos(self, resource_infos):
         self.resource_treeview.tag_configure(TAG_NORMAL, foreground="gray")
         self.resource_treeview.tag_configure(TAG_LOADED, foreground="black")
-        tag = TAG_LOADED if is_loaded else TAG_NORMAL
 
+        # find the items once for all of the infos
+        item_ids = dict()
         for item_id in self.resource_treeview.get_children(''):
             item = self.resource_treeview.item(item_id)
-            # edit item
-            if get_name(item) == resource_name and get_value(item) == resource_type:
+            item_ids[(get_name(item), get_value(item))] = item_id
+
+        for resource_name, resource_type, is_loaded in resource_infos:
+            tag = TAG_LOADED if is_loaded else TAG_NORMAL
+            item_id = item_ids.get((resource_name, resource_type))
+            if item_id is not None:
+                # edit item
                 self.resource_treeview.item(item_id, text=resource_name, values=(resource_type,), tags=(tag, ))
-                break
-        else:
-            # insert item
-            self.resource_treeview.insert("", 'end', text=resource_name, values=(resource_type,), tags=(tag, ))
+            else:
+                # insert item
+                item_ids[(resource_name, resource_type)] = self.resource_treeview.insert(
+                    "", 'end', text=resource_name, values=(resource_type,), tags=(tag, ))
 
     def select_resource(self, event):
         items = self.get_selected_resource()
@@ -881,15 +874,18 @@ class MainWindow:
     def get_selected_object(self):
         return [self.object_treeview.item(item_id) for item_id in self.object_treeview.selection()]
 
-    def add_object_info(self, object_info):
-        object_name, object_type = object_info
+    def add_object_infos(self, object_infos):
+        item_ids = dict()
         for item_id in self.object_treeview.get_children():
             item = self.object_treeview.item(item_id)
-            if get_name(item) == object_name and get_value(item) == object_type:
+            item_ids[(get_name(item), get_value(item))] = item_id
+
+        for object_name, object_type in object_infos:
+            item_id = item_ids.get((object_name, object_type))
+            if item_id is not None:
                 self.object_treeview.item(item_id, text=object_name, values=(object_type, ))
-                break
-        else:
-            self.object_treeview.insert("", 'end', text=object_name, values=(object_type,))
+            else:
+                item_ids[(object_name, object_type)] = self.object_treeview.insert("", 'end', text=object_name, values=(object_type,))
 
     def action_object(self, *args):
         selectedItems = self.get_selected_object()
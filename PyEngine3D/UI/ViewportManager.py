@@ -4,10 +4,11 @@ from PyEngine3D.Common import *
 from PyEngine3D.App.GameBackend import Keyboard
 from PyEngine3D.Utilities import *
 from PyEngine3D.OpenGLContext import FrameBufferManager
-from PyEngine3D.Render import ScreenQuad, RenderTargets
+from PyEngine3D.Render import RenderTargets
 from .Widget import Align, Orientation
 from .Widget import Widget, Button, ToggleButton, Label, TextEdit
 from .Widget import BoxLayout
+from .WidgetBatch import WidgetBatch
 
 
 class ViewportManager(Singleton):
@@ -21,8 +22,8 @@ class ViewportManager(Singleton):
         self.touch_event = False
         self.focused_widget = None
 
-        self.quad = None
-        self.render_widget = None
+        self.widget_batch = WidgetBatch()
+        self.glyph_cache_generation = 0
 
     def initialize(self, core_manager):
         self.touch_event = False
@@ -32,8 +33,7 @@ class ViewportManager(Singleton):
         self.framebuffer_manager = FrameBufferManager.instance()
 
         if not self.core_manager.is_basic_mode:
-            self.quad = ScreenQuad.get_vertex_array_buffer()
-            self.render_widget = self.resource_manager.get_material_instance('ui.render_widget')
+            self.widget_batch.initialize(self.resource_manager)
 
         width, height = self.core_manager.get_window_size()
 
@@ -109,7 +109,13 @@ class ViewportManager(Singleton):
         glClearColor(0.0, 0.0, 0.0, 1.0)
         glClear(GL_COLOR_BUFFER_BIT)
 
-        self.root.render(None, self.render_widget, self.quad)
+        # the glyph caches replaced the glyphs of the texts
+        glyph_cache_generation = self.core_manager.font_manager.get_glyph_cache_generation()
+        if Widget.changed_render_data or self.glyph_cache_generation != glyph_cache_generation:
+            self.glyph_cache_generation = glyph_cache_generation
+            self.widget_batch.build(self.root)
+            Widget.changed_render_data = False
+        self.widget_batch.render(self.root.width, self.root.height)
 
         # blit frame buffer
         self.framebuffer_manager.blit_framebuffer()
@@ -28,9 +28,15 @@ class Widget:
     valigns = (Align.TOP, Align.CENTER, Align.BOTTOM)
     orientations = (Orientation.HORIZONTAL, Orientation.VERTICAL)
     has_cursor = False
+    # the widget batch is rebuilt when any widget changes.
+    changed_render_data = True
 
     def __init__(self, **kwargs):
         self.changed_layout = True
+        self._opacity = 1.0
+        self._visible = True
+        self._texture = None
+        self._pressed = False
         self.parent = None
         self.widgets = []
 
@@ -64,7 +70,7 @@ class Widget:
         self.padding_x = kwargs.get('padding_x', 0.0)
         self.padding_y = kwargs.get('padding_y', 0.0)
         self.spacing = kwargs.get('spacing', 0.0)
-        self.texcoord = np.array(kwargs.get('texcoord', [0.0, 0.0, 1.0, 1.0]), np.float32)
+        self._texcoord = np.array(kwargs.get('texcoord', [0.0, 0.0, 1.0, 1.0]), np.float32)
         self.dragable = kwargs.get('dragable', False)
         self.touchable = kwargs.get('touchable', False) or self.dragable
         self.texture = kwargs.get('texture')
@@ -161,6 +167,7 @@ class Widget:
     @color.setter
     def color(self, color):
         self._color[...] = color
+        Widget.changed_render_data = True
 
     @property
     def pressed_color(self):
@@ -169,6 +176,7 @@ class Widget:
     @pressed_color.setter
     def pressed_color(self, color):
         self._pressed_color[...] = color
+        Widget.changed_render_data = True
 
     @property
     def pressed_opacity(self):
@@ -177,6 +185,56 @@ class Widget:
     @pressed_opacity.setter
     def pressed_opacity(self, opacity):
         self._pressed_color[3] = opacity
+        Widget.changed_render_data = True
+
+    @property
+    def pressed(self):
+        return self._pressed
+
+    @pressed.setter
+    def pressed(self, pressed):
+        if pressed != self._pressed:
+            self._pressed = pressed
+            Widget.changed_render_data = True
+
+    @property
+    def opacity(self):
+        return self._opacity
+
+    @opacity.setter
+    def opacity(self, opacity):
+        if opacity != self._opacity:
+            self._opacity = opacity
+            Widget.changed_render_data = True
+
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        if visible != self._visible:
+            self._visible = visible
+            Widget.changed_render_data = True
+
+    @property
+    def texture(self):
+        return self._texture
+
+    @texture.setter
+    def texture(self, texture):
+        if texture is not self._texture:
+            self._texture = texture
+            Widget.changed_render_data = True
+
+    @property
+    def texcoord(self):
+        return self._texcoord
+
+    @texcoord.setter
+    def texcoord(self, texcoord):
+        self._texcoord[...] = texcoord
+        Widget.changed_render_data = True
 
     @property
     def x(self):
@@ -325,6 +383,7 @@ class Widget:
                 self.viewport_manager.focused_widget = None
 
         self.widgets = []
+        Widget.changed_render_data = True
 
     def add_widget(self, widget):
         if widget.parent is not None:
@@ -334,6 +393,7 @@ class Widget:
             self.widgets.append(widget)
             widget.parent = self
             self.update_layout(changed_layout=True)
+            Widget.changed_render_data = True
 
     def remove_widget(self, widget):
         if widget in self.widgets:
@@ -343,6 +403,7 @@ class Widget:
             self.widgets.remove(widget)
             widget.parent = None
             self.update_layout(changed_layout=True)
+            Widget.changed_render_data = True
 
     def update_layout(self, changed_layout=False, recursive=True):
         changed_layout = self.changed_layout or changed_layout
@@ -388,6 +449,7 @@ class Widget:
                 self.world_center_y = self.center_y + self.parent.world_y
 
             self.changed_layout = False
+            Widget.changed_render_data = True
 
         if recursive:
             for widget in self.widgets:
@@ -419,37 +481,16 @@ class Widget:
 
         return self.touched or touch_event
 
-    def render(self, last_program, render_widget_program, mesh):
-        if 0.0 <= self.opacity and self.visible:
-            render_widget_program.use_program()
-            render_widget_program.bind_material_instance()
-
-            if self.pressed:
-                render_widget_program.bind_uniform_data("color", self.pressed_color)
-            else:
-                render_widget_program.bind_uniform_data("color", self.color)
-
-            render_widget_program.bind_uniform_data("pos_size", [self.world_x, self.world_y, self.width, self.height])
-            render_widget_program.bind_uniform_data("texcoord", self.texcoord)
-            render_widget_program.bind_uniform_data("opacity", self.opacity)
-
-            if self.texture is not None:
-                render_widget_program.bind_uniform_data("texture_diffuse", self.texture)
-                render_widget_program.bind_uniform_data("is_render_diffuse", True)
-            else:
-                render_widget_program.bind_uniform_data("is_render_diffuse", False)
+    def collect_render_data(self, widget_batch):
+        if self.visible:
+            if 0.0 < self.opacity:
+                widget_batch.add_widget(self)
 
-            mesh.draw_elements()
+            if isinstance(self, Label):
+                widget_batch.add_text(self.text_render_data, self.world_x, self.world_y)
 
-        if self.visible:
-            if isinstance(self, Label) and self.text_render_data is not None:
-                self.core_manager.renderer.render_text(self.text_render_data,
-                                                       self.world_x,
-                                                       self.world_y,
-                                                       self.root.width,
-                                                       self.root.height)
             for widget in self.widgets:
-                widget.render(last_program, render_widget_program, mesh)
+                widget.collect_render_data(widget_batch)
 
 
 class Button(Widget):
@@ -505,6 +546,7 @@ class Label(Widget):
     @text.setter
     def text(self, text):
         self.text_render_data.text = text
+        Widget.changed_render_data = True
 
     def set_text(self, text, font_size=10, halign=Align.LEFT, valign=Align.BOTTOM):
         self.halign = halign
@@ -0,0 +1,182 @@
+import numpy as np
+
+from PyEngine3D.Common import logger
+from PyEngine3D.OpenGLContext import InstanceBuffer
+from PyEngine3D.Utilities import *
+from PyEngine3D.Render import ScreenQuad
+
+
+# the batches searched backward for a batch to merge an instance into
+MAX_BATCH_SEARCH_COUNT = 16
+
+# pos_size, color, texcoord, (opacity, is_render_diffuse, 0, 0)
+QUAD_INSTANCE_ELEMENT_DATAS = [FLOAT4_ZERO, FLOAT4_ZERO, FLOAT4_ZERO, FLOAT4_ZERO]
+
+# (x, y, font_size, 0), (texcoord_x, texcoord_y, 0, 0)
+GLYPH_INSTANCE_ELEMENT_DATAS = [FLOAT4_ZERO, FLOAT4_ZERO]
+
+
+def is_overlapped(bound, x, y, width, height):
+    # bound : min_x, min_y, max_x, max_y
+    return x < bound[2] and bound[0] < (x + width) and y < bound[3] and bound[1] < (y + height)
+
+
+class RenderBatch:
+    def __init__(self, is_text, key):
+        self.is_text = is_text
+        self.key = key  # texture of the quads, font data of the glyphs
+        self.bound = [np.inf, np.inf, -np.inf, -np.inf]
+        self.instance_datas = []
+        self.first_instance = 0
+        self.instance_count = 0
+
+    def add_bound(self, x, y, width, height):
+        self.bound[0] = min(self.bound[0], x)
+        self.bound[1] = min(self.bound[1], y)
+        self.bound[2] = max(self.bound[2], x + width)
+        self.bound[3] = max(self.bound[3], y + height)
+
+
+class WidgetBatch:
+    """
+    The visible widgets are flattened into the instance datas which are uploaded once and kept until the widgets change.
+    The quads of a texture and the glyphs of a font are drawn with one instanced draw call,
+    an instance is merged into an earlier batch when it does not overlap the batches drawn after that one,
+    so the drawing order of the overlapped widgets is kept.
+    """
+    def __init__(self):
+        self.quad = None
+        self.render_widget_batch = None
+        self.render_text_batch = None
+        self.quad_instance_buffer = None
+        self.glyph_instance_buffer = None
+
+        self.batches = []
+        self.quad_datas = []
+        self.glyph_datas = []
+        self.upload_quad_datas = False
+        self.upload_glyph_datas = False
+
+    def initialize(self, resource_manager):
+        self.quad = ScreenQuad.get_vertex_array_buffer()
+        self.render_widget_batch = resource_manager.get_material_instance('ui.render_widget_batch')
+        self.render_text_batch = resource_manager.get_material_instance('ui.render_text_batch')
+        self.quad_instance_buffer = InstanceBuffer(name="widget_instance_buffer",
+                                                   location_offset=1,
+                                                   element_datas=QUAD_INSTANCE_ELEMENT_DATAS)
+        self.glyph_instance_buffer = InstanceBuffer(name="glyph_instance_buffer",
+                                                    location_offset=1,
+                                                    element_datas=GLYPH_INSTANCE_ELEMENT_DATAS)
+
+    def get_batch(self, is_text, key, x, y, width, height):
+        for batch in self.batches[:-MAX_BATCH_SEARCH_COUNT - 1:-1]:
+            if batch.is_text == is_text and (batch.key is key or (not is_text and (batch.key is None or key is None))):
+                if batch.key is None:
+                    batch.key = key
+                return batch
+            elif is_overlapped(batch.bound, x, y, width, height):
+                break
+
+        batch = RenderBatch(is_text, key)
+        self.batches.append(batch)
+        return batch
+
+    def add_widget(self, widget):
+        color = widget.pressed_color if widget.pressed else widget.color
+        is_render_diffuse = widget.texture is not None
+        if not is_render_diffuse and 0.0 == color[3]:
+            # transparent
+            return
+
+        batch = self.get_batch(False, widget.texture, widget.world_x, widget.world_y, widget.width, widget.height)
+        batch.add_bound(widget.world_x, widget.world_y, widget.width, widget.height)
+        batch.instance_datas.append((widget.world_x, widget.world_y, widget.width, widget.height,
+                                     *color,
+                                     *widget.texcoord,
+                                     widget.opacity, 1.0 if is_render_diffuse else 0.0, 0.0, 0.0))
+
+    def add_text(self, text_render_data, offset_x, offset_y):
+        text_render_data.update_glyphs()
+        render_count = text_render_data.render_count
+        if 0 == render_count or text_render_data.font_data is None:
+            return
+
+        font_size = text_render_data.font_size
+        render_queue = text_render_data.render_queue[:render_count]
+        glyph_datas = np.zeros((render_count, 8), dtype=np.float32)
+        glyph_datas[:, 0] = offset_x + render_queue[:, 0] * font_size
+        glyph_datas[:, 1] = offset_y - render_queue[:, 1] * font_size
+        glyph_datas[:, 2] = font_size
+        glyph_datas[:, 4:6] = render_queue[:, 2:4]
+
+        x = glyph_datas[:, 0].min()
+        y = glyph_datas[:, 1].min()
+        width = glyph_datas[:, 0].max() + font_size - x
+        height = glyph_datas[:, 1].max() + font_size - y
+
+        batch = self.get_batch(True, text_render_data.font_data, x, y, width, height)
+        batch.add_bound(x, y, width, height)
+        batch.instance_datas.append(glyph_datas)
+
+    def build(self, root):
+        self.batches = []
+        root.collect_render_data(self)
+
+        quad_datas = []
+        glyph_datas = []
+        for batch in self.batches:
+            if batch.is_text:
+                batch.first_instance = sum(len(datas) for datas in glyph_datas)
+                glyph_datas.extend(batch.instance_datas)
+                batch.instance_count = sum(len(datas) for datas in batch.instance_datas)
+            else:
+                batch.first_instance = len(quad_datas)
+                quad_datas.extend(batch.instance_datas)
+                batch.instance_count = len(batch.instance_datas)
+            batch.instance_datas = []
+
+        # the attributes are not interleaved, see InstanceBuffer.bind_instance_buffer
+        if quad_datas:
+            quad_datas = np.array(quad_datas, dtype=np.float32).reshape(-1, 4, 4)
+            self.quad_datas = [np.ascontiguousarray(quad_datas[:, i]) for i in range(4)]
+        else:
+            self.quad_datas = []
+
+        if glyph_datas:
+            glyph_datas = np.concatenate(glyph_datas)
+            self.glyph_datas = [np.ascontiguousarray(glyph_datas[:, 0:4]), np.ascontiguousarray(glyph_datas[:, 4:8])]
+        else:
+            self.glyph_datas = []
+
+        self.upload_quad_datas = True
+        self.upload_glyph_datas = True
+        logger.debug("WidgetBatch : %d batches, %d quads, %d glyphs" %
+                     (len(self.batches), len(quad_datas), len(glyph_datas)))
+
+    def render(self, canvas_width, canvas_height):
+        inv_canvas_size = (1.0 / canvas_width, 1.0 / canvas_height)
+        for batch in self.batches:
+            if batch.is_text:
+                self.render_text_batch.use_program()
+                self.render_text_batch.bind_material_instance()
+                self.render_text_batch.bind_uniform_data("texture_font", batch.key.texture)
+                self.render_text_batch.bind_uniform_data("count_of_side", batch.key.count_of_side)
+                self.render_text_batch.bind_uniform_data("inv_canvas_size", inv_canvas_size)
+                self.quad.draw_elements_instanced(batch.instance_count,
+                                                  self.glyph_instance_buffer,
+                                                  self.glyph_datas,
+                                                  base_instance=batch.first_instance,
+                                                  upload=self.upload_glyph_datas)
+                self.upload_glyph_datas = False
+            else:
+                self.render_widget_batch.use_program()
+                self.render_widget_batch.bind_material_instance()
+                if batch.key is not None:
+                    self.render_widget_batch.bind_uniform_data("texture_diffuse", batch.key)
+                self.render_widget_batch.bind_uniform_data("inv_canvas_size", inv_canvas_size)
+                self.quad.draw_elements_instanced(batch.instance_count,
+                                                  self.quad_instance_buffer,
+                                                  self.quad_datas,
+                                                  base_instance=batch.first_instance,
+                                                  upload=self.upload_quad_datas)
+                self.upload_quad_datas = False
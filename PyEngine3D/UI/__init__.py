@@ -6,4 +6,5 @@ logger = Logger.getLogger()
 from .Widget import Align, Orientation
 from .Widget import Widget, Button, ToggleButton, Label, TextEdit
 from .Widget import BoxLayout
+from .WidgetBatch import WidgetBatch
 from .ViewportManager import ViewportManager
@@ -0,0 +1,122 @@
+import time
+
+import numpy as np
+
+
+# the sleep of the os wakes up late by the timer granularity, the rest of the wait is spun.
+SLEEP_GRANULARITY_MIN = 0.0002
+SLEEP_GRANULARITY_MAX = 0.02
+SLEEP_CALIBRATION_COUNT = 8
+
+# frame deltas kept for the percentiles
+FRAME_HISTORY_SIZE = 240
+
+# the fixed time step catches up at most this many steps a frame, the rest of the time is dropped.
+MAX_FIXED_STEPS = 8
+
+
+def measure_sleep_granularity(sample_count=SLEEP_CALIBRATION_COUNT, sleep_time=0.001):
+    """ return : the worst oversleep of time.sleep in seconds """
+    oversleep = 0.0
+    for i in range(sample_count):
+        start_time = time.perf_counter()
+        time.sleep(sleep_time)
+        oversleep = max(oversleep, time.perf_counter() - start_time - sleep_time)
+    return min(SLEEP_GRANULARITY_MAX, max(SLEEP_GRANULARITY_MIN, oversleep))
+
+
+class FramePacer:
+    """
+    Waits for the frame deadline without busy spinning the whole frame.
+    The deadlines are accumulated from the first frame so the frame rate does not drift,
+    the most of the wait is slept and only the last timer granularity is spun.
+    """
+    def __init__(self, limit_delta=1.0 / 60.0):
+        self.limit_delta = limit_delta
+        self.sleep_granularity = SLEEP_GRANULARITY_MAX
+        self.next_frame_time = 0.0
+        self.sleep_time = 0.0  # seconds slept in the last wait
+        self.spin_time = 0.0  # seconds spun in the last wait
+
+        # fixed time step simulation
+        self.fixed_delta = 0.0
+        self.fixed_time_accumulator = 0.0
+        self.interpolation_alpha = 1.0
+
+        # frame time statistics
+        self.frame_deltas = np.zeros(FRAME_HISTORY_SIZE, dtype=np.float64)
+        self.frame_delta_count = 0
+        self.frame_delta_index = 0
+
+    def initialize(self, limit_delta=None):
+        if limit_delta is not None:
+            self.limit_delta = limit_delta
+        self.sleep_granularity = measure_sleep_granularity()
+        self.next_frame_time = 0.0
+
+    def set_limit_delta(self, limit_delta):
+        self.limit_delta = limit_delta
+        self.next_frame_time = 0.0
+
+    def wait_until(self, target_time):
+        start_time = time.perf_counter()
+        current_time = start_time
+        while self.sleep_granularity < (target_time - current_time):
+            sleep_time = target_time - current_time - self.sleep_granularity
+            time.sleep(sleep_time)
+            sleep_end_time = time.perf_counter()
+            # the granularity grows at once by a late wake up and shrinks slowly while the sleep is accurate.
+            oversleep = sleep_end_time - current_time - sleep_time
+            if self.sleep_granularity < oversleep:
+                self.sleep_granularity = oversleep
+            else:
+                self.sleep_granularity += (oversleep - self.sleep_granularity) * 0.01
+            self.sleep_granularity = min(SLEEP_GRANULARITY_MAX, max(SLEEP_GRANULARITY_MIN, self.sleep_granularity))
+            current_time = sleep_end_time
+        self.sleep_time = current_time - start_time
+
+        while current_time < target_time:
+            current_time = time.perf_counter()
+        self.spin_time = current_time - start_time - self.sleep_time
+        return current_time
+
+    def wait_for_next_frame(self):
+        """ return : the current time after the frame deadline """
+        current_time = time.perf_counter()
+        if self.limit_delta <= 0.0:
+            return current_time
+
+        if self.next_frame_time == 0.0 or self.limit_delta < (current_time - self.next_frame_time):
+            # the first frame or the frame is late more than a frame, restart the deadlines.
+            self.next_frame_time = current_time
+        else:
+            current_time = self.wait_until(self.next_frame_time)
+        self.next_frame_time += self.limit_delta
+        return current_time
+
+    def get_fixed_step_count(self, delta):
+        """ return : the count of the fixed time steps to simulate in this frame, set interpolation_alpha. """
+        if self.fixed_delta <= 0.0:
+            self.interpolation_alpha = 1.0
+            return 1
+
+        self.fixed_time_accumulator += delta
+        step_count = int(self.fixed_time_accumulator / self.fixed_delta)
+        self.fixed_time_accumulator -= step_count * self.fixed_delta
+        if MAX_FIXED_STEPS < step_count:
+            step_count = MAX_FIXED_STEPS
+            self.fixed_time_accumulator = 0.0
+        # blend factor between the previous and the current simulation state for the rendering
+        self.interpolation_alpha = self.fixed_time_accumulator / self.fixed_delta
+        return step_count
+
+    def add_frame_delta(self, delta):
+        self.frame_deltas[self.frame_delta_index] = delta
+        self.frame_delta_index = (self.frame_delta_index + 1) % FRAME_HISTORY_SIZE
+        self.frame_delta_count = min(FRAME_HISTORY_SIZE, self.frame_delta_count + 1)
+
+    def get_frame_time_percentiles(self, percentiles=(50.0, 95.0, 99.0)):
+        """ return : frame times in milliseconds of the percentiles of the recent frames """
+        if 0 == self.frame_delta_count:
+            return [0.0, ] * len(percentiles)
+        return list(np.percentile(self.frame_deltas[:self.frame_delta_count], percentiles) * 1000.0)
@@ -3,91 +3,147 @@ from subprocess import call
 from time import time
 from math import sqrt
 
+import numpy as np
 from PIL import Image
 
 
-def check(limit, ox, oy, px, py, current):
-    lp = getpixel(px, py)
-    if lp == -1:
-        return current
-    if lp != limit:
-        nw = float(ox - px)
-        nh = float(oy - py)
-        new = (nw * nw) + (nh * nh)
-        if new < current:
-            current = new
-    return current
-
-
-def getField(limit, searchLen):
-    print('Calculating field {0}...'.format(str(limit + 1)))
-    if limit == 1:
-        limit = 255
-    distances = []
-    for w in range(oim.size[0]):
-        distances.append([])
-        for h in range(oim.size[1]):
-            current = limit if limit > 0 else (searchLen * searchLen)
-            for x in range(w - searchLen, w + searchLen):
-                for y in range(h - searchLen, h + searchLen):
-                    current = check(limit, w, h, x, y, current)
-            current = int(sqrt(current))
-            current *= int(g)
-            distances[w].append(current)
-    return distances
-
-
-def getpixel(x, y):
-    try:
-        p = inpixels[x, y][0]
-        return p
-    except IndexError:
-        return -1
+# squared distance of the pixels without a feature
+EDT_INFINITE = 1e10
+
+
+# rows shorter than this are solved with a brute force minimum, which is faster in numpy.
+EDT_BRUTE_FORCE_SIZE = 64
+
+
+def distance_transform_1d(f):
+    """
+    Felzenszwalb & Huttenlocher, Distance Transforms of Sampled Functions.
+    The lower envelope of the parabolas is built for all rows at once.
+    :param f: squared distances, shape (rows, n)
+    :return: squared distances, shape (rows, n)
+    """
+    row_count, n = f.shape
+    f = np.ascontiguousarray(f, dtype=np.float64)
+
+    if n <= EDT_BRUTE_FORCE_SIZE:
+        positions = np.arange(n)
+        parabolas = ((positions[:, None] - positions[None, :]) ** 2).astype(np.float64)
+        d = np.empty((row_count, n), dtype=np.float64)
+        chunk_size = max(1, (1 << 22) // (n * n))
+        for start in range(0, row_count, chunk_size):
+            d[start:start + chunk_size] = (f[start:start + chunk_size, None, :] + parabolas).min(axis=-1)
+        return d
+
+    # flat indices of the per row arrays
+    f = f.ravel()
+    v_offset = np.arange(row_count) * n
+    z_offset = np.arange(row_count) * (n + 1)
+    v = np.zeros(row_count * n, dtype=np.int64)
+    z = np.empty(row_count * (n + 1), dtype=np.float64)
+    z[z_offset] = -np.inf
+    z[z_offset + 1] = np.inf
+    k = np.zeros(row_count, dtype=np.int64)
+
+    for q in range(1, n):
+        f_q = f[v_offset + q] + q * q
+        while True:
+            v_k = v[v_offset + k]
+            s = (f_q - (f[v_offset + v_k] + v_k * v_k)) / (2.0 * (q - v_k))
+            pop = s <= z[z_offset + k]
+            if not pop.any():
+                break
+            k -= pop
+        k += 1
+        v[v_offset + k] = q
+        z[z_offset + k] = s
+        z[z_offset + k + 1] = np.inf
+
+    d = np.empty((n, row_count), dtype=np.float64)
+    k[...] = 0
+    for q in range(n):
+        while True:
+            advance = z[z_offset + k + 1] < q
+            if not advance.any():
+                break
+            k += advance
+        v_k = v[v_offset + k]
+        d[q] = (q - v_k) ** 2 + f[v_offset + v_k]
+    return d.T
+
+
+def distance_transform_edt(features):
+    """
+    Exact euclidean distance transform with separable passes.
+    :param features: bool array (..., height, width), the leading axes are transformed independently.
+    :return: distance to the nearest feature pixel, large where there is no feature.
+    """
+    shape = features.shape
+    squared_distance = np.where(features, 0.0, EDT_INFINITE)
+
+    # columns
+    squared_distance = np.swapaxes(squared_distance, -1, -2)
+    squared_distance = distance_transform_1d(squared_distance.reshape(-1, shape[-2])).reshape(squared_distance.shape)
+    squared_distance = np.swapaxes(squared_distance, -1, -2)
+
+    # rows
+    squared_distance = distance_transform_1d(squared_distance.reshape(-1, shape[-1])).reshape(shape)
+    return np.sqrt(squared_distance)
+
+
+def signed_distance_field(image, threshold=0.5, spread=8.0):
+    """
+    :param image: gray scale array (..., height, width) in [0, 1]
+    :param spread: distance in pixels mapped to 0.0 and 1.0
+    :return: 0.5 on the edge, greater inside.
+    """
+    inside = threshold <= image
+    distance_to_inside = distance_transform_edt(inside)
+    distance_to_outside = distance_transform_edt(np.logical_not(inside))
+    signed_distance = np.where(inside, distance_to_outside - 0.5, 0.5 - distance_to_inside)
+    return np.clip(signed_distance / (2.0 * spread) + 0.5, 0.0, 1.0)
+
+
+def get_preview_image(data, max_size=512):
+    """
+    :param data: pixels read back from a texture, (height, width) or (height, width, components) of any dtype.
+    :return: uint8 RGBA image (height, width, 4), top to bottom rows, downsampled to max_size.
+    """
+    step = max(1, (max(data.shape[:2]) + max_size - 1) // max_size)
+    # the texture is stored from the bottom row.
+    data = data[::-step, ::step]
+    if 2 == data.ndim:
+        data = data[..., np.newaxis]
+
+    if np.issubdtype(data.dtype, np.floating):
+        data = (np.clip(data, 0.0, 1.0) * 255.0).astype(np.uint8)
+    elif data.dtype != np.uint8:
+        data = (data >> ((data.dtype.itemsize - 1) * 8)).astype(np.uint8)
+
+    image = np.empty(data.shape[:2] + (4,), dtype=np.uint8)
+    components = data.shape[2]
+    if 1 == components:
+        image[..., :3] = data
+    else:
+        image[..., :min(3, components)] = data[..., :3]
+        image[..., components:3] = 0
+    image[..., 3] = data[..., 3] if 4 == components else 255
+    return image
 
 
 def generate():
     inPath = os.path.dirname(__file__)
     outPath = os.path.join(inPath, 'out.png')
     inPath = os.path.join(inPath, 'in.png')
-    oim = Image.open(inPath).convert('RGBA')
-    img = Image.new('RGBA', oim.size, (0, 0, 0, 0))
+    oim = Image.open(inPath).convert('L')
 
     ct = time()
-
-    inpixels = oim.load()
-    outpixels = img.load()
-
     search = 8
-    last = 0.0
-    g = 255 / search
-
-    field1 = getField(0, search)
-    ct = time() - ct
-    print('Took: {0}'.format(str(round(ct, 1))))
-    ct = time()
-    field2 = getField(1, search)
-    ct = time() - ct
-    print('Took: {0}'.format(str(round(ct, 1))))
-    ct = time()
-    print('Mixing fields...')
-
-    for cw in range(oim.size[0]):
-        for ch in range(oim.size[1]):
-            fc1 = 255 - field1[cw][ch]
-            fc2 = field2[cw][ch]
-            fc = int((fc1 + fc2)/2)
-            outpixels[cw, ch] = (fc, fc, fc, 255)
-
+    field = signed_distance_field(np.array(oim, dtype=np.float32) / 255.0, spread=search)
+    img = Image.fromarray((field * 255.0 + 0.5).astype(np.uint8), mode='L').convert('RGBA')
     ct = time() - ct
-    print('Took: {0}'.format(str(round(ct, 1))))
-    ct = time()
+    print('Took: {0}'.format(str(round(ct, 3))))
 
     print('Resizing and saving output image (128 width)...')
     rf = float(oim.size[0]) / 128
     img = img.resize((128, int(oim.size[1] / rf)), Image.BILINEAR)
-
     img.save(outPath)
-
-    ct = time() - ct
-    print('Took: {0}'.format(str(round(ct, 1))))
-
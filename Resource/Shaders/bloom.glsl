@@ -1,3 +1,4 @@
+#include "scene_constants.glsl"
 #include "quad.glsl"
 
 uniform float bloom_intensity;
@@ -13,7 +14,7 @@ layout (location = 0) in VERTEX_OUTPUT vs_output;
 layout (location = 0) out vec4 fs_output;
 
 void main() {
-    vec2 tex_coord = vs_output.tex_coord.xy;
+    vec2 tex_coord = vs_output.tex_coord.xy * RENDER_SCALE;
 
     fs_output = vec4(0.0, 0.0, 0.0, 1.0);
     fs_output.xyz += texture2D(texture_bloom0, tex_coord).xyz;
@@ -9,7 +9,7 @@ layout (location = 0) in VERTEX_OUTPUT vs_output;
 layout (location = 0) out vec4 fs_output;
 
 void main() {
-    vec2 texcoord = vs_output.tex_coord.xy;
+    vec2 texcoord = vs_output.tex_coord.xy * RENDER_SCALE;
 
     vec2 inv_texture_size = 1.0 / textureSize(texture_source, 0);
     fs_output = texture2D(texture_source, texcoord);
@@ -1,7 +1,12 @@
+#include "scene_constants.glsl"
+
 uniform float focus_sensitivity;
 
 #ifdef COMPUTE_SHADER
-layout(local_size_x = 1, local_size_y = 1) in;
+// reference : PostProcess.py
+#define GROUP_SIZE 8
+
+layout(local_size_x = GROUP_SIZE, local_size_y = GROUP_SIZE) in;
 
 layout(r32f, binding=0) uniform image2D img_input;
 layout(r32f, binding=1) uniform image2D img_output;
@@ -9,7 +14,12 @@ layout(r32f, binding=1) uniform image2D img_output;
 void main()
 {
     ivec2 pixel_coords = ivec2(gl_GlobalInvocationID.xy);
-    ivec2 center_pos = imageSize(img_input) / 2;
+    if(any(greaterThanEqual(pixel_coords, imageSize(img_output))))
+    {
+        return;
+    }
+
+    ivec2 center_pos = ivec2(vec2(imageSize(img_input)) * RENDER_SCALE * 0.5);
     vec4 curr_depth = imageLoad(img_input, center_pos);
     vec4 prev_depth = imageLoad(img_output, pixel_coords);
     curr_depth = mix(prev_depth, curr_depth, focus_sensitivity);
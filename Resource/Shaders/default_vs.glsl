@@ -7,8 +7,15 @@ uniform bool is_instancing;
 uniform mat4 model;
 
 #if 1 == SKELETAL
-uniform mat4 bone_matrices[MAX_BONES];
-uniform mat4 prev_bone_matrices[MAX_BONES];
+// the current and the previous matrix of a bone are adjacent, reference : SkinningPalette.py
+layout(std430, binding=13) readonly buffer bone_palette_buffer { mat4 BONE_PALETTE[]; };
+uniform int bone_palette_offset;
+
+// the instances sample the bones from the baked animation, reference : BakedAnimation.py
+const int MAX_BAKED_ANIMATIONS = 16;
+uniform bool is_baked_animation;
+uniform sampler2D texture_baked_animation;
+uniform vec4 baked_animation_infos[MAX_BAKED_ANIMATIONS];  // row offset, frame count, frame rate, 0
 #endif
 
 struct VERTEX_OUTPUT
@@ -35,9 +42,33 @@ layout (location = 5) in vec4 vs_in_bone_indicies;
 layout (location = 6) in vec4 vs_in_bone_weights;
 #endif
 layout (location = 7) in mat4 vs_in_isntance_matrix;
+#if 1 == SKELETAL
+layout (location = 11) in vec4 vs_in_instance_animation;  // animation index, time offset, playback rate, 0
+#endif
 
 layout (location = 0) out VERTEX_OUTPUT vs_output;
 
+#if 1 == SKELETAL
+mat4 get_baked_bone_matrix(int row, int bone_index)
+{
+    // four texels are the rows of a bone matrix
+    int x = bone_index * 4;
+    return mat4(texelFetch(texture_baked_animation, ivec2(x, row), 0),
+                texelFetch(texture_baked_animation, ivec2(x + 1, row), 0),
+                texelFetch(texture_baked_animation, ivec2(x + 2, row), 0),
+                texelFetch(texture_baked_animation, ivec2(x + 3, row), 0));
+}
+
+// the rows of the two frames of the instance at the time and the ratio between them
+vec3 get_baked_animation_frame(float time)
+{
+    vec4 animation_info = baked_animation_infos[int(vs_in_instance_animation.x)];
+    float frame = mod((time * vs_in_instance_animation.z + vs_in_instance_animation.y) * animation_info.z, animation_info.y);
+    float frame_index = floor(frame);
+    return vec3(animation_info.x + frame_index, animation_info.x + mod(frame_index + 1.0, animation_info.y), frame - frame_index);
+}
+#endif
+
 void main() {
     vec4 position = vec4(0.0, 0.0, 0.0, 0.0);
     vec4 prev_position = vec4(0.0, 0.0, 0.0, 0.0);
@@ -45,12 +76,36 @@ void main() {
     vec3 vertex_tangent = vec3(0.0, 0.0, 0.0);
 
 #if 1 == SKELETAL
+    vec3 frame = vec3(0.0);
+    vec3 prev_frame = vec3(0.0);
+    if(is_baked_animation)
+    {
+        frame = get_baked_animation_frame(TIME);
+        prev_frame = get_baked_animation_frame(TIME - DELTA_TIME);
+    }
+
     for(int i=0; i<MAX_BONES_PER_VERTEX; ++i)
     {
-        prev_position += (prev_bone_matrices[int(vs_in_bone_indicies[i])] * vec4(vs_in_position, 1.0)) * vs_in_bone_weights[i];
-        position += (bone_matrices[int(vs_in_bone_indicies[i])] * vec4(vs_in_position, 1.0)) * vs_in_bone_weights[i];
-        vertex_normal += (bone_matrices[int(vs_in_bone_indicies[i])] * vec4(vs_in_normal, 0.0)).xyz * vs_in_bone_weights[i];
-        vertex_tangent += (bone_matrices[int(vs_in_bone_indicies[i])] * vec4(vs_in_tangent, 0.0)).xyz * vs_in_bone_weights[i];
+        mat4 bone_matrix;
+        mat4 prev_bone_matrix;
+        if(is_baked_animation)
+        {
+            int bone_index = int(vs_in_bone_indicies[i]);
+            bone_matrix = get_baked_bone_matrix(int(frame.x), bone_index) * (1.0 - frame.z) +
+                get_baked_bone_matrix(int(frame.y), bone_index) * frame.z;
+            prev_bone_matrix = get_baked_bone_matrix(int(prev_frame.x), bone_index) * (1.0 - prev_frame.z) +
+                get_baked_bone_matrix(int(prev_frame.y), bone_index) * prev_frame.z;
+        }
+        else
+        {
+            int bone_index = bone_palette_offset + int(vs_in_bone_indicies[i]) * 2;
+            bone_matrix = BONE_PALETTE[bone_index];
+            prev_bone_matrix = BONE_PALETTE[bone_index + 1];
+        }
+        prev_position += (prev_bone_matrix * vec4(vs_in_position, 1.0)) * vs_in_bone_weights[i];
+        position += (bone_matrix * vec4(vs_in_position, 1.0)) * vs_in_bone_weights[i];
+        vertex_normal += (bone_matrix * vec4(vs_in_normal, 0.0)).xyz * vs_in_bone_weights[i];
+        vertex_tangent += (bone_matrix * vec4(vs_in_tangent, 0.0)).xyz * vs_in_bone_weights[i];
     }
     position /= position.w;
     prev_position /= prev_position.w;
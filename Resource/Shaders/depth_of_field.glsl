@@ -39,7 +39,7 @@ layout (location = 0) out vec4 fs_output;
 // reference : https://www.shadertoy.com/view/lst3Df
 
 void main() {
-    vec2 tex_coord = vs_output.tex_coord.xy;
+    vec2 tex_coord = vs_output.tex_coord.xy * RENDER_SCALE;
     float focus_distance = texture2D(texture_focus_distance, vec2(0.5, 0.5)).x;
     float linear_depth = texture2DLod(texture_linear_depth, tex_coord, 0.0).x;
     float blur_amount = clamp(abs(linear_depth - focus_distance - focus_near) / (focus_far - focus_near), 0.0, 1.0);
@@ -215,6 +215,7 @@ void update(inout ParticleData particle_data, uint id)
             {
                 vec4 proj_pos = PROJECTION * VIEW_ORIGIN * vec4(particle_data.relative_position, 1.0);
                 vec3 scene_uvw = (proj_pos.xyz / proj_pos.w) * 0.5 + 0.5;
+                scene_uvw.xy *= RENDER_SCALE;
                 float scene_depth = texture2DLod(texture_depth, scene_uvw.xy, 0.0).x;
                 float scene_linear_depth = depth_to_linear_depth(scene_depth);
                 vec3 scene_normal = normalize(texture2DLod(texture_normal, scene_uvw.xy, 0.0).xyz * 2.0 - 1.0);
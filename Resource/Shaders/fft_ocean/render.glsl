@@ -160,7 +160,7 @@ void main()
     vec3 V = -relative_pos / dist;
     float view_ray_angle = dot(view_center_ray, V);
 
-    float scene_dist = texture2D(texture_linear_depth, screen_tex_coord).x / view_ray_angle;
+    float scene_dist = texture2D(texture_linear_depth, screen_tex_coord * RENDER_SCALE).x / view_ray_angle;
     float vertex_noise = vs_output.vertex_noise;
 
     // fix scene_depth
@@ -195,7 +195,7 @@ void main()
 
     // refract
     vec2 reflected_screen_uv = screen_tex_coord + N.xz * 0.05f;
-    float refracted_scene_dist = texture2D(texture_linear_depth, reflected_screen_uv).x / view_ray_angle;
+    float refracted_scene_dist = texture2D(texture_linear_depth, reflected_screen_uv * RENDER_SCALE).x / view_ray_angle;
     float refracted_scene_dist_origin = refracted_scene_dist;
 
     // fix refractedSceneDepth
@@ -230,7 +230,7 @@ void main()
     vec3 scene_reflect_color = textureCubeLod(texture_probe, invert_y(R), 0.0).xyz;
 
     // Under Water
-    vec3 under_water_color = texture2DLod(texture_scene, (refracted_scene_dist <= dist) ? screen_tex_coord : reflected_screen_uv, 0.0).xyz;
+    vec3 under_water_color = texture2DLod(texture_scene, ((refracted_scene_dist <= dist) ? screen_tex_coord : reflected_screen_uv) * RENDER_SCALE, 0.0).xyz;
     {
         // Under Water Caustic
         if(false == isUnderWater)
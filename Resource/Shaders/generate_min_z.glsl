@@ -1,31 +1,90 @@
 uniform bool generate_min_z;
+uniform int mip_count;
 
 #ifdef COMPUTE_SHADER
-layout(local_size_x = 1, local_size_y = 1) in;
+// reference : PostProcess.py
+#define GROUP_SIZE 8
+#define MAX_MIP_COUNT 4
+
+layout(local_size_x = GROUP_SIZE, local_size_y = GROUP_SIZE) in;
 
 layout(r32f, binding=0) uniform image2D img_input;
-layout(r32f, binding=1) uniform image2D img_output;
+layout(r32f, binding=1) uniform image2D img_output_0;
+layout(r32f, binding=2) uniform image2D img_output_1;
+layout(r32f, binding=3) uniform image2D img_output_2;
+layout(r32f, binding=4) uniform image2D img_output_3;
+
+shared float shared_depth[GROUP_SIZE][GROUP_SIZE];
+
+float reduce_depth(float depth_a, float depth_b)
+{
+    return generate_min_z ? min(depth_a, depth_b) : max(depth_a, depth_b);
+}
+
+ivec2 get_output_size(int mip)
+{
+    if(1 == mip) return imageSize(img_output_1);
+    else if(2 == mip) return imageSize(img_output_2);
+    else if(3 == mip) return imageSize(img_output_3);
+    return imageSize(img_output_0);
+}
+
+void store_depth(int mip, ivec2 pixel_coords, float depth)
+{
+    if(any(greaterThanEqual(pixel_coords, get_output_size(mip))))
+    {
+        return;
+    }
+
+    if(0 == mip) imageStore(img_output_0, pixel_coords, vec4(depth));
+    else if(1 == mip) imageStore(img_output_1, pixel_coords, vec4(depth));
+    else if(2 == mip) imageStore(img_output_2, pixel_coords, vec4(depth));
+    else imageStore(img_output_3, pixel_coords, vec4(depth));
+}
 
 void main()
 {
-    ivec2 imageRatio = imageSize(img_input) / imageSize(img_output);
+    ivec2 input_size = imageSize(img_input);
+    ivec2 output_size = imageSize(img_output_0);
     ivec2 pixel_coords = ivec2(gl_GlobalInvocationID.xy);
-    ivec2 input_pixel_coords = pixel_coords * imageRatio;
+    ivec2 local_coords = ivec2(gl_LocalInvocationID.xy);
+    ivec2 input_pixel_coords = pixel_coords * 2;
+    ivec2 last_input_pixel_coords = input_size - 1;
+
+    // The last texel of an odd sized level also covers the remaining row or column.
+    ivec2 tap_count = ivec2(2) + ivec2(equal(pixel_coords, output_size - 1)) * (input_size & 1);
 
-    vec4 depth = imageLoad(img_input, input_pixel_coords);
-    if(generate_min_z)
+    float depth = imageLoad(img_input, min(input_pixel_coords, last_input_pixel_coords)).x;
+    for(int y=0; y<tap_count.y; ++y)
     {
-        depth = min(depth, imageLoad(img_input, input_pixel_coords + ivec2(1, 0)));
-        depth = min(depth, imageLoad(img_input, input_pixel_coords + ivec2(0, 1)));
-        depth = min(depth, imageLoad(img_input, input_pixel_coords + ivec2(1, 1)));
+        for(int x=0; x<tap_count.x; ++x)
+        {
+            ivec2 tap_coords = min(input_pixel_coords + ivec2(x, y), last_input_pixel_coords);
+            depth = reduce_depth(depth, imageLoad(img_input, tap_coords).x);
+        }
     }
-    else
+
+    store_depth(0, pixel_coords, depth);
+    shared_depth[local_coords.y][local_coords.x] = depth;
+
+    // The next mips are reduced in shared memory. PostProcess continues the chain only while the source level is even sized.
+    int stride = 1;
+    for(int mip=1; mip<min(mip_count, MAX_MIP_COUNT); ++mip)
     {
-        depth = max(depth, imageLoad(img_input, input_pixel_coords + ivec2(1, 0)));
-        depth = max(depth, imageLoad(img_input, input_pixel_coords + ivec2(0, 1)));
-        depth = max(depth, imageLoad(img_input, input_pixel_coords + ivec2(1, 1)));
-    }
+        memoryBarrierShared();
+        barrier();
 
-    imageStore(img_output, pixel_coords, depth);
+        int half_stride = stride;
+        stride *= 2;
+
+        if(all(equal(local_coords % stride, ivec2(0))))
+        {
+            depth = reduce_depth(depth, shared_depth[local_coords.y][local_coords.x + half_stride]);
+            depth = reduce_depth(depth, shared_depth[local_coords.y + half_stride][local_coords.x]);
+            depth = reduce_depth(depth, shared_depth[local_coords.y + half_stride][local_coords.x + half_stride]);
+            shared_depth[local_coords.y][local_coords.x] = depth;
+            store_depth(mip, pixel_coords / stride, depth);
+        }
+    }
 }
-#endif
\ No newline at end of file
+#endif
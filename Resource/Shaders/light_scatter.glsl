@@ -95,16 +95,13 @@ void main()
     {
         float march_dist = march_step * float(i + 1);
         vec3 march_pos = CAMERA_POSITION.xyz + eye_direction * march_dist;
-        vec4 shadow_uv = SHADOW_MATRIX * vec4(march_pos, 1.0);
-        shadow_uv.xyz /= shadow_uv.w;
-        shadow_uv.xyz = shadow_uv.xyz * 0.5 + 0.5;
+        vec3 shadow_uv;
+        vec4 shadow_uv_rect;
+        bool in_shadow_cascade = get_shadow_cascade_uv(march_pos, shadow_uv, shadow_uv_rect);
 
         float shadow_depth = textureLod(texture_shadow, shadow_uv.xy, 0.0).x;
 
-        if(shadow_uv.x < 0.0 || 1.0 < shadow_uv.x ||
-            shadow_uv.y < 0.0 || 1.0 < shadow_uv.y ||
-            shadow_uv.z < 0.0 || 1.0 < shadow_uv.z ||
-            shadow_uv.z <= shadow_depth - shadow_depth_bias)
+        if(false == in_shadow_cascade || shadow_uv.z <= shadow_depth - shadow_depth_bias)
         {
             light_shaft += light_shaft_color * intensity;
         }
@@ -48,9 +48,9 @@ void main()
         vec2 temp_uv_dir = sample_uv - sun_uv;
         temp_uv_dir.y *= screenRatio;
 
-        if(1.0 <= textureLod(texture_depth, sample_uv, 0.0).x && length(temp_uv_dir) < light_shaft_radius)
+        if(1.0 <= textureLod(texture_depth, sample_uv * RENDER_SCALE, 0.0).x && length(temp_uv_dir) < light_shaft_radius)
         {
-            vec3 diffuse = textureLod(texture_diffuse, sample_uv, 0.0).xyz;
+            vec3 diffuse = textureLod(texture_diffuse, sample_uv * RENDER_SCALE, 0.0).xyz;
             float luminance = get_luminance(diffuse);
             diffuse *= saturate((0.0 < luminance) ? ((luminance - light_shaft_threshold) / luminance) : 0.0);
             light_shaft_color += diffuse * illuminationDecay;
@@ -1,5 +1,6 @@
 
 
+#include "scene_constants.glsl"
 #include "quad.glsl"
 
 uniform float motion_blur_scale;
@@ -23,7 +24,7 @@ layout (location = 0) out vec4 fs_output;
 
 void main() {
     vec2 tex_coord = vs_output.tex_coord.xy;
-    vec2 velocity = texture2D(texture_velocity, tex_coord).xy * motion_blur_scale;
+    vec2 velocity = texture2D(texture_velocity, tex_coord * RENDER_SCALE).xy * motion_blur_scale;
 
     float weights = 0.0;
 
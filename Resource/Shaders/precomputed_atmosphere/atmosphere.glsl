@@ -61,7 +61,7 @@ void main()
     vec3 screen_center_ray = -vec3(VIEW_ORIGIN[0].z, VIEW_ORIGIN[1].z, VIEW_ORIGIN[2].z);
     float VdotL = dot(eye_direction, sun_direction);
 
-    float scene_linear_depth = texture2DLod(texture_linear_depth, uv, 0.0).x;
+    float scene_linear_depth = texture2DLod(texture_linear_depth, uv * RENDER_SCALE, 0.0).x;
     float scene_dist = clamp(scene_linear_depth / dot(screen_center_ray, eye_direction), 0.0, NEAR_FAR.y);
     float scene_shadow_length = GetSceneShadowLength(scene_dist, eye_direction, texture_shadow);
 
@@ -65,10 +65,10 @@ void main()
             vec3 point = camera + view_direction * distance_to_intersection;
             vec3 normal = normalize(point - kSphereCenter);
 
-            vec4 shadow_uv = SHADOW_MATRIX * vec4(point, 1.0);
-            shadow_uv.xyz /= shadow_uv.w;
-            shadow_uv.xyz = shadow_uv.xyz * 0.5 + 0.5;
-            float scene_shadow = texture2D(texture_shadow, shadow_uv.xy, 0).x < shadow_uv.z ? 0.0 : 1.0;
+            vec3 shadow_uv;
+            vec4 shadow_uv_rect;
+            bool in_shadow_cascade = get_shadow_cascade_uv(point, shadow_uv, shadow_uv_rect);
+            float scene_shadow = (in_shadow_cascade && texture2D(texture_shadow, shadow_uv.xy, 0).x < shadow_uv.z) ? 0.0 : 1.0;
 
             vec3 sky_irradiance;
             vec3 sun_irradiance = GetSunAndSkyIrradiance(
@@ -102,10 +102,10 @@ void main()
             vec3 point = camera + view_direction * distance_to_intersection;
             vec3 normal = normalize(point - earth_center);
 
-            vec4 shadow_uv = SHADOW_MATRIX * vec4(point, 1.0);
-            shadow_uv.xyz /= shadow_uv.w;
-            shadow_uv.xyz = shadow_uv.xyz * 0.5 + 0.5;
-            float scene_shadow = texture2D(texture_shadow, shadow_uv.xy, 0).x < shadow_uv.z ? 0.0 : 1.0;
+            vec3 shadow_uv;
+            vec4 shadow_uv_rect;
+            bool in_shadow_cascade = get_shadow_cascade_uv(point, shadow_uv, shadow_uv_rect);
+            float scene_shadow = (in_shadow_cascade && texture2D(texture_shadow, shadow_uv.xy, 0).x < shadow_uv.z) ? 0.0 : 1.0;
 
             vec3 sky_irradiance;
             vec3 sun_irradiance = GetSunAndSkyIrradiance(
@@ -14,7 +14,7 @@ layout (location = 0) out vec4 fs_output;
 
 void main()
 {
-    vec2 texcoord = vs_output.tex_coord.xy;
+    vec2 texcoord = vs_output.tex_coord.xy * RENDER_SCALE;
     float linear_depth = texture2D(texture_linear_depth, texcoord).x;
     vec4 color = texture2DLod(texture_atmosphere, texcoord, 0.0);
 
@@ -1056,12 +1056,12 @@ float GetSceneShadowLength(float scene_dist, vec3 view_direction, sampler2D text
     {
         float ray_dist = float(i) * d;
         vec3 world_pos = CAMERA_POSITION.xyz + view_direction * ray_dist;
-        vec4 shadow_uv = SHADOW_MATRIX * vec4(world_pos, 1.0);
-        shadow_uv.xyz /= shadow_uv.w;
-        shadow_uv.xyz = shadow_uv.xyz * 0.5 + 0.5;
+        vec3 shadow_uv;
+        vec4 shadow_uv_rect;
+        bool in_shadow_cascade = get_shadow_cascade_uv(world_pos, shadow_uv, shadow_uv_rect);
         float shadow_depth = texture2D(texture_shadow, shadow_uv.xy, 0).x;
 
-        if(shadow_uv.x < 0.0 || 1.0 < shadow_uv.x || shadow_uv.y < 0.0 || 1.0 < shadow_uv.y || scene_dist <= ray_dist)
+        if(false == in_shadow_cascade || scene_dist <= ray_dist)
         {
             do_exit = true;
         }
@@ -9,6 +9,9 @@ layout(std140, binding=0) uniform scene_constants
     vec2 MOUSE_POS;
     float DELTA_TIME;
     int SCENE_DUMMY_0;
+    // dynamic resolution : the scene render targets are rendered in the sub rect (0, 0) ~ RENDER_SCALE
+    vec2 RENDER_SCALE;
+    vec2 PREV_RENDER_SCALE;
 };
 
 layout(std140, binding=1) uniform view_constants
@@ -33,32 +36,67 @@ layout(std140, binding=2) uniform view_projection
     mat4 PREV_VIEW_PROJECTION;
 };
 
+// referene : Constants.py MAX_SHADOW_CASCADE_COUNT
+const int MAX_SHADOW_CASCADE_COUNT = 4;
+
 layout(std140, binding=3) uniform light_constants
 {
-    mat4 SHADOW_MATRIX;
+    mat4 SHADOW_CASCADE_MATRICES[MAX_SHADOW_CASCADE_COUNT];  // world to the uv and the depth of the cascade
+    vec4 SHADOW_CASCADE_UV_RECTS[MAX_SHADOW_CASCADE_COUNT];  // offset, scale in the shadow map atlas
     vec3 LIGHT_POSITION;
     float SHADOW_EXP;
     vec3 LIGHT_DIRECTION;
     float SHADOW_BIAS;
     vec3 LIGHT_COLOR;
     int SHADOW_SAMPLES;
+    int SHADOW_CASCADE_COUNT;
+    float SHADOW_DUMMY_0;
+    vec2 SHADOW_DUMMY_1;
 };
 
-const int MAX_POINT_LIGHTS = 10;
+// the first cascade which contains the world position. shadow_uv.xy : uv of the atlas, shadow_uv.z : depth
+bool get_shadow_cascade_uv(vec3 world_position, out vec3 shadow_uv, out vec4 shadow_uv_rect)
+{
+    for(int i = 0; i < SHADOW_CASCADE_COUNT; ++i)
+    {
+        vec3 cascade_uv = (SHADOW_CASCADE_MATRICES[i] * vec4(world_position, 1.0)).xyz;
+        if(all(greaterThanEqual(cascade_uv, vec3(0.0))) && all(lessThanEqual(cascade_uv, vec3(1.0))))
+        {
+            shadow_uv_rect = SHADOW_CASCADE_UV_RECTS[i];
+            shadow_uv = vec3(shadow_uv_rect.xy + cascade_uv.xy * shadow_uv_rect.zw, cascade_uv.z);
+            return true;
+        }
+    }
+    shadow_uv = vec3(0.0);
+    shadow_uv_rect = vec4(0.0, 0.0, 1.0, 1.0);
+    return false;
+}
+
+// referene : Constants.py, LightCluster.py
+const int LIGHT_CLUSTER_COUNT_X = 16;
+const int LIGHT_CLUSTER_COUNT_Y = 8;
+const int LIGHT_CLUSTER_COUNT_Z = 24;
 
 struct POINT_LIGHT
 {
     vec3 color;
     float radius;
     vec3 pos;
-    float render;
+    float dummy;
 };
 
-layout(std140, binding=4) uniform point_light_constants
+layout(std140, binding=4) uniform light_cluster_constants
 {
-    POINT_LIGHT POINT_LIGHTS[MAX_POINT_LIGHTS];
+    vec2 LIGHT_CLUSTER_Z_SCALE_BIAS;
+    int POINT_LIGHT_COUNT;
+    int LIGHT_CLUSTER_DUMMY_0;
 };
 
+layout(std430, binding=10) readonly buffer point_light_buffer { POINT_LIGHT POINT_LIGHTS[]; };
+// x : offset of LIGHT_INDEX_LIST, y : light count
+layout(std430, binding=11) readonly buffer light_cluster_grid_buffer { uvec2 LIGHT_CLUSTER_GRID[]; };
+layout(std430, binding=12) readonly buffer light_index_list_buffer { uint LIGHT_INDEX_LIST[]; };
+
 
 layout(std140, binding=5) uniform particle_common
 {
@@ -118,7 +156,6 @@ const int SUBTRACT = 3;
 #define WORK_GROUP_SIZE 64
 
 const int MAX_BONES_PER_VERTEX = 4;
-const int MAX_BONES = 100;
 
 const float PI = 3.14159265358979323846;
 const float HALF_PI = PI * 0.5;
@@ -2,6 +2,9 @@
 
 vec4 SampleDepthtexture2D(sampler2D texDepth, vec4 SampleUV0, vec4 SampleUV1, float level)
 {  
+    SampleUV0 *= RENDER_SCALE.xyxy;
+    SampleUV1 *= RENDER_SCALE.xyxy;
+
     vec4 SampleDepth;
     SampleDepth.x = texture2DLod(texDepth, SampleUV0.xy, level).x;
     SampleDepth.y = texture2DLod(texDepth, SampleUV0.zw, level).x;
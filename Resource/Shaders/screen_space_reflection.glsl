@@ -72,7 +72,7 @@ vec3 TangentToWorld(vec3 vector, vec3 TangentY)
 vec4 SampleScreenColor(sampler2D texPrevSceneColor, vec2 UV, float lod)
 {
     vec4 OutColor;
-    OutColor.xyz = texture2DLod(texPrevSceneColor, UV, lod).xyz;
+    OutColor.xyz = texture2DLod(texPrevSceneColor, UV * PREV_RENDER_SCALE, lod).xyz;
     OutColor.w = 1;
 
     // Off screen masking
@@ -99,7 +99,8 @@ void main() {
     fs_output = vec4(0.0);
 
     vec2 tex_coord = vs_output.tex_coord.xy;
-    float linear_depth = texture2D(texture_depth, tex_coord).x;
+    vec2 scene_tex_coord = tex_coord * RENDER_SCALE;
+    float linear_depth = texture2D(texture_depth, scene_tex_coord).x;
     float depth = linear_depth_to_depth(linear_depth);
 
     if(depth >= 1.0)
@@ -114,7 +115,7 @@ void main() {
     relative_pos.xyz /= relative_pos.w;
 
     vec3 V = normalize(-relative_pos.xyz);
-    vec3 N = normalize(texture2D(texture_normal, vs_output.tex_coord.xy).xyz * 2.0 - 1.0);
+    vec3 N = normalize(texture2D(texture_normal, scene_tex_coord).xyz * 2.0 - 1.0);
     float NdotV = dot(V, N);
 
     if(0.9 < NdotV)
@@ -123,7 +124,7 @@ void main() {
     }
 
     float fresnel = pow(1.0 - clamp(NdotV, 0.0, 1.0), 4.0);
-    float Roughness = texture2D(texture_material, vs_output.tex_coord.xy).x;
+    float Roughness = texture2D(texture_material, scene_tex_coord).x;
     Roughness = mix(Roughness, Roughness * Roughness, fresnel);
     float sqrtRoughness = sqrt(Roughness);
 
@@ -160,7 +161,7 @@ void main() {
         // if there was a hit
         if (HitUVzTime.w < 1)
         {
-            HitSampleUV = HitUVzTime.xy - texture2D(texture_velocity, HitUVzTime.xy).xy;
+            HitSampleUV = HitUVzTime.xy - texture2D(texture_velocity, HitUVzTime.xy * RENDER_SCALE).xy;
             vec4 SampleColor = SampleScreenColor(texture_scene, HitSampleUV, sqrtRoughness * 6.0);
             SampleColor.rgb /= 1 + get_luminance(SampleColor.rgb);
             fs_output += SampleColor;
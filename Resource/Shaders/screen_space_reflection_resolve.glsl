@@ -54,7 +54,7 @@ void main()
         for (int x = -1; x <= 1; ++x)
         {
             vec2 sampleOffset = vec2(x, y);
-            vec2 sampleUV = saturate(uv + sampleOffset / texture_input_size);
+            vec2 sampleUV = saturate(uv + sampleOffset / (texture_input_size * RENDER_SCALE)) * RENDER_SCALE;
             vec4 sampleColor = texture2DLod(texture_input, sampleUV, 0.0);
 
             if(0 == x && 0 == y)
@@ -80,8 +80,8 @@ void main()
     }
 
     // Anti Aliasing
-    vec2 velocity = texture2DLod(texture_velocity, uv, 0.0).xy;
-    vec4 prevColor = texture2DLod(texture_resolve_prev, uv - velocity, 0.0);
+    vec2 velocity = texture2DLod(texture_velocity, uv * RENDER_SCALE, 0.0).xy;
+    vec4 prevColor = texture2DLod(texture_resolve_prev, (uv - velocity) * PREV_RENDER_SCALE, 0.0);
     prevColor.w = saturate(prevColor.w);
 
     // NeighborhoodClampMode
@@ -9,17 +9,17 @@ float get_shadow_factor(vec3 world_position, float NdotL, sampler2D texture_shad
     const vec2 shadow_texel_size = 1.0 / shadow_size;
     const int samnple_count = isSimple ? 1 : SHADOW_SAMPLES;
     const vec2 shadow_noise_radius = shadow_texel_size * max(1.0, log2(samnple_count));
-    const vec2 shadow_uv_min = shadow_texel_size * 0.5;
-    const vec2 shadow_uv_max = vec2(1.0) - shadow_texel_size * 0.5;
-    vec4 shadow_proj = SHADOW_MATRIX * vec4(world_position, 1.0);
-    shadow_proj.xyz /= shadow_proj.w;
-    shadow_proj.xyz = shadow_proj.xyz * 0.5 + 0.5;
-
-    if(1.0 < shadow_proj.x || shadow_proj.x < 0.0 || 1.0 < shadow_proj.y || shadow_proj.y < 0.0 || 1.0 < shadow_proj.z || shadow_proj.z < 0.0)
+    vec3 shadow_proj;
+    vec4 shadow_uv_rect;
+    if(false == get_shadow_cascade_uv(world_position, shadow_proj, shadow_uv_rect))
     {
         return 1.0;
     }
 
+    // the samples stay in the tile of the cascade
+    const vec2 shadow_uv_min = shadow_uv_rect.xy + shadow_texel_size * 0.5;
+    const vec2 shadow_uv_max = shadow_uv_rect.xy + shadow_uv_rect.zw - shadow_texel_size * 0.5;
+
     const vec2 uv_offsets[4] = {
         vec2(0.0, 0.0),
         vec2(shadow_texel_size.x, 0.0),
@@ -173,6 +173,14 @@ vec2 env_BRDF_pproximate(float NdV, float roughness)
 }
 
 
+uint get_light_cluster_index(vec2 screen_tex_coord, float view_depth)
+{
+    vec2 cluster_xy = clamp(screen_tex_coord, 0.0, 0.999) * vec2(LIGHT_CLUSTER_COUNT_X, LIGHT_CLUSTER_COUNT_Y);
+    float cluster_z = log(max(view_depth, NEAR_FAR.x)) * LIGHT_CLUSTER_Z_SCALE_BIAS.x - LIGHT_CLUSTER_Z_SCALE_BIAS.y;
+    cluster_z = clamp(cluster_z, 0.0, float(LIGHT_CLUSTER_COUNT_Z - 1));
+    return (uint(cluster_z) * LIGHT_CLUSTER_COUNT_Y + uint(cluster_xy.y)) * LIGHT_CLUSTER_COUNT_X + uint(cluster_xy.x);
+}
+
 /* PBR reference
     - http://www.curious-creature.com/pbr_sandbox/shaders/pbr.fs
     - https://gist.github.com/galek/53557375251e1a942dfa */
@@ -266,13 +274,11 @@ vec4 surface_shading(vec4 base_color,
         specular_light += cooktorrance_specular(light_fresnel, NdL, NdV, NdH, roughness) * NdL * light_color * shadow_factor;
 
         // Point Lights
-        for(int i=0; i<MAX_POINT_LIGHTS; ++i)
+        float view_depth = -(VIEW * vec4(world_position, 1.0)).z;
+        uvec2 light_cluster = LIGHT_CLUSTER_GRID[get_light_cluster_index(screen_tex_coord, view_depth)];
+        for(uint cluster_light_index=0; cluster_light_index<light_cluster.y; ++cluster_light_index)
         {
-            if(1.0 != POINT_LIGHTS[i].render)
-            {
-                break;
-            }
-
+            uint i = LIGHT_INDEX_LIST[light_cluster.x + cluster_light_index];
             float point_light_radius = POINT_LIGHTS[i].radius;
             vec3 point_light_dir = POINT_LIGHTS[i].pos.xyz - world_position;
             float point_light_dist = length(point_light_dir);
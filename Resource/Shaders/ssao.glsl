@@ -20,9 +20,10 @@ layout (location = 0) out vec4 fs_output;
 
 void main() {
     vec2 tex_coord = vs_output.tex_coord.xy;
+    vec2 scene_tex_coord = tex_coord * RENDER_SCALE;
     vec2 texel_size = 1.0 / texture_size;
 
-    float linear_depth = texture2DLod(texture_linear_depth, tex_coord, texture_lod).x;
+    float linear_depth = texture2DLod(texture_linear_depth, scene_tex_coord, texture_lod).x;
 
     /*if(linear_depth >= NEAR_FAR.y)
     {
@@ -31,7 +32,7 @@ void main() {
     }*/
 
     vec4 relative_pos = linear_depth_to_relative_world(tex_coord, linear_depth);
-    vec3 normal = texture2D(texture_normal, tex_coord).xyz * 2.0 - 1.0;
+    vec3 normal = texture2D(texture_normal, scene_tex_coord).xyz * 2.0 - 1.0;
     vec2 noise_size = textureSize(texture_noise, 0);
 
     vec3 randomVec = texture2D(texture_noise, tex_coord * texture_size / noise_size).xyz;
@@ -57,7 +58,7 @@ void main() {
             continue;
         }
 
-        float sampleDepth = texture2DLod(texture_linear_depth, offset.xy, texture_lod).x;
+        float sampleDepth = texture2DLod(texture_linear_depth, offset.xy * RENDER_SCALE, texture_lod).x;
 
         if(offset.w < sampleDepth) continue;
 
@@ -103,7 +103,7 @@ vec3 Reproject(vec2 texCoord)
 
     if(DilationMode == DilationModes_CenterAverage)
     {
-        velocity += texture2D(texture_velocity, texCoord).xy;
+        velocity += texture2D(texture_velocity, texCoord * RENDER_SCALE).xy;
     }
     else if(DilationMode == DilationModes_DilateNearestDepth)
     {
@@ -113,8 +113,8 @@ vec3 Reproject(vec2 texCoord)
         {
             for(int vx = -1; vx <= 1; ++vx)
             {
-                vec2 neighborVelocity = texture2D(texture_velocity, texCoord + vec2(vx, vy) * inv_velocity_tex_size).xy;
-                float neighborDepth = texture2DLod(texture_linear_depth, texCoord + vec2(vx, vy) * inv_depth_tex_size, 0.0).x;
+                vec2 neighborVelocity = texture2D(texture_velocity, texCoord * RENDER_SCALE + vec2(vx, vy) * inv_velocity_tex_size).xy;
+                float neighborDepth = texture2DLod(texture_linear_depth, texCoord * RENDER_SCALE + vec2(vx, vy) * inv_depth_tex_size, 0.0).x;
                 if(neighborDepth < closestDepth)
                 {
                     velocity = neighborVelocity;
@@ -130,7 +130,7 @@ vec3 Reproject(vec2 texCoord)
         {
             for(int vx = -1; vx <= 1; ++vx)
             {
-                vec2 neighborVelocity = texture2D(texture_velocity, texCoord + vec2(vx, vy) * inv_velocity_tex_size).xy;
+                vec2 neighborVelocity = texture2D(texture_velocity, texCoord * RENDER_SCALE + vec2(vx, vy) * inv_velocity_tex_size).xy;
                 float neighborVelocityMag = dot(neighborVelocity, neighborVelocity).x;
                 if(dot(neighborVelocity, neighborVelocity) > greatestVelocity)
                 {
@@ -142,7 +142,8 @@ vec3 Reproject(vec2 texCoord)
     }
 
     vec2 texture_prev_size = textureSize(texture_prev, 0).xy;
-    vec2 reprojectedUV = texCoord - velocity;
+    // the history is rendered with the render scale of the previous frame.
+    vec2 reprojectedUV = (texCoord - velocity) * PREV_RENDER_SCALE;
     vec2 reprojectedPos = reprojectedUV * texture_prev_size;
 
     if(UseStandardReprojection)
@@ -202,8 +203,8 @@ vec4 ResolvePS(vec2 texCoord, vec2 pixelPos)
         for(int x = -1; x <= 1; ++x)
         {
             vec2 sampleOffset = vec2(x, y);
-            vec2 sampleUV = texCoord + sampleOffset / texture_input_size;
-            sampleUV = clamp(sampleUV, 0.0, 1.0);
+            vec2 sampleUV = texCoord + sampleOffset / (texture_input_size * RENDER_SCALE);
+            sampleUV = clamp(sampleUV, 0.0, 1.0) * RENDER_SCALE;
 
             vec3 sample_color = texture2D(texture_input, sampleUV).xyz;
 
@@ -233,7 +234,7 @@ vec4 ResolvePS(vec2 texCoord, vec2 pixelPos)
         }
     }
 
-    vec4 result = texture2D(texture_input, texCoord);
+    vec4 result = texture2D(texture_input, texCoord * RENDER_SCALE);
 
     vec3 currColor = result.xyz;
     vec3 prevColor = Reproject(texCoord);
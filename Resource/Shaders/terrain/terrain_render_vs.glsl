@@ -3,6 +3,7 @@
 #include "shading.glsl"
 
 uniform vec2 height_map_size;
+uniform vec2 terrain_size;
 uniform vec3 scale;
 uniform float subdivide_level;
 uniform mat4 model;
@@ -22,23 +23,38 @@ layout (location = 1) in vec4 vs_in_color;
 layout (location = 2) in vec3 vs_in_normal;
 layout (location = 3) in vec3 vs_in_tangent;
 layout (location = 4) in vec2 vs_in_tex_coord;
-// instance data
-layout (location = 5) in vec4 vs_in_isntance_offset;
+// instance data : x, y, size of the quadtree node / morph start distance, morph end distance
+layout (location = 5) in vec4 vs_in_instance_offset;
+layout (location = 6) in vec4 vs_in_instance_morph;
 
 layout (location = 0) out VERTEX_OUTPUT vs_output;
 
+float sample_height(vec2 position)
+{
+    return texture2DLod(texture_height_map, position / height_map_size, 0.0).x;
+}
+
 void main()
 {
-    vec4 position = vec4(vs_in_position, 1.0);
-    position.xz = position.xz * 0.5 + 0.5;
-    position.xz += vs_in_isntance_offset.xy;
+    float node_size = vs_in_instance_offset.z;
+    vec2 grid_position = floor((vs_in_position.xz * 0.5 + 0.5) * subdivide_level + 0.5);
+    vec2 node_position = vs_in_instance_offset.xy + grid_position * (node_size / subdivide_level);
+
+    // geomorphing : the odd vertices move to the grid of the next lod as the distance goes to the end of the lod range.
+    vec3 unmorphed_position = vec3(node_position.x, sample_height(node_position), node_position.y);
+    float distance_to_camera = length((model * vec4(unmorphed_position, 1.0)).xyz - CAMERA_POSITION);
+    float morph = clamp((distance_to_camera - vs_in_instance_morph.x) / (vs_in_instance_morph.y - vs_in_instance_morph.x), 0.0, 1.0);
+    grid_position -= fract(grid_position * 0.5) * 2.0 * morph;
+
+    vec4 position = vec4(0.0, 0.0, 0.0, 1.0);
+    position.xz = min(vs_in_instance_offset.xy + grid_position * (node_size / subdivide_level), terrain_size);
 
     vec2 tex_coord = position.xz / height_map_size;
     float height = texture2DLod(texture_height_map, tex_coord, 0.0).x;
     position.y += height;
 
-    vec2 tex_coord_delta = 1.0 / (height_map_size * subdivide_level);
-    vec3 size_of_grid = vec3(scale.x / subdivide_level, scale.y, scale.z / subdivide_level);
+    vec2 tex_coord_delta = node_size / (height_map_size * subdivide_level);
+    vec3 size_of_grid = vec3(scale.x * node_size / subdivide_level, scale.y, scale.z * node_size / subdivide_level);
 
     float height_w = texture2DLod(texture_height_map, tex_coord + vec2(tex_coord_delta.x, 0.0), 0.0).x;
     float height_h = texture2DLod(texture_height_map, tex_coord + vec2(0.0, tex_coord_delta.y), 0.0).x;
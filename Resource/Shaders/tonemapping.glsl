@@ -1,4 +1,5 @@
 #include "blending.glsl"
+#include "scene_constants.glsl"
 #include "quad.glsl"
 
 uniform bool is_render_tonemapping;
@@ -65,16 +66,18 @@ float vignetting(vec2 uv, float inner_value, float outter_value)
 
 void main() {
     vec2 tex_coord = vs_output.tex_coord.xy;
-    vec3 texColor = texture2D(texture_diffuse, tex_coord).xyz;
+    // upscale the sub rect of the dynamic resolution to the back buffer
+    vec2 scene_tex_coord = tex_coord * RENDER_SCALE;
+    vec3 texColor = texture2D(texture_diffuse, scene_tex_coord).xyz;
 
     vec3 bloom = vec3(0.0);
     if(is_render_bloom)
     {
-        bloom += texture2D(texture_bloom0, tex_coord).xyz;
-        bloom += texture2D(texture_bloom1, tex_coord).xyz;
-        bloom += texture2D(texture_bloom2, tex_coord).xyz;
-        bloom += texture2D(texture_bloom3, tex_coord).xyz;
-        bloom += texture2D(texture_bloom4, tex_coord).xyz;
+        bloom += texture2D(texture_bloom0, scene_tex_coord).xyz;
+        bloom += texture2D(texture_bloom1, scene_tex_coord).xyz;
+        bloom += texture2D(texture_bloom2, scene_tex_coord).xyz;
+        bloom += texture2D(texture_bloom3, scene_tex_coord).xyz;
+        bloom += texture2D(texture_bloom4, scene_tex_coord).xyz;
         bloom *= bloom_intensity;
     }
     texColor += bloom;
@@ -82,7 +85,7 @@ void main() {
     vec3 light_shaft = vec3(0.0);
     if(is_render_light_shaft)
     {
-        light_shaft = texture2D(texture_light_shaft, tex_coord).xyz;
+        light_shaft = texture2D(texture_light_shaft, scene_tex_coord).xyz;
     }
     texColor += light_shaft;
 
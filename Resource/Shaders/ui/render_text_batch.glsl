@@ -0,0 +1,41 @@
+uniform sampler2D texture_font;
+uniform vec2 inv_canvas_size;
+uniform float count_of_side;
+
+struct VERTEX_OUTPUT
+{
+    vec2 tex_coord;
+};
+
+#ifdef VERTEX_SHADER
+layout (location = 0) in vec4 vs_in_position;
+// instancing data
+layout (location = 1) in vec4 vs_in_glyph_position;  // x, y, font_size
+layout (location = 2) in vec4 vs_in_glyph_texcoord;  // texcoord_x, texcoord_y
+
+layout (location = 0) out VERTEX_OUTPUT vs_output;
+
+void main()
+{
+    vec2 inv_texture_size = 1.0 / textureSize(texture_font, 0).xy;
+    vec2 font_texcoord_size = 1.0 / count_of_side - inv_texture_size;
+    vec2 texcoord = vs_in_position.xy * 0.5 + 0.5;
+
+    vs_output.tex_coord = vs_in_glyph_texcoord.xy + texcoord * font_texcoord_size + inv_texture_size * 0.5;
+
+    vec2 position = (vs_in_glyph_position.xy + texcoord * vs_in_glyph_position.z) * inv_canvas_size;
+    gl_Position = vec4(position * 2.0 - 1.0, 0.0, 1.0);
+}
+#endif
+
+
+#ifdef FRAGMENT_SHADER
+layout (location = 0) in VERTEX_OUTPUT vs_output;
+layout (location = 0) out vec4 fs_output;
+
+void main()
+{
+    fs_output.xyz = vec3(1.0);
+    fs_output.w = pow(texture2D(texture_font, vs_output.tex_coord).x, 0.1);
+}
+#endif
@@ -0,0 +1,63 @@
+uniform sampler2D texture_diffuse;
+uniform vec2 inv_canvas_size;
+
+struct VERTEX_OUTPUT
+{
+    vec2 tex_coord;
+    vec4 color;
+    vec4 texcoord;
+    float opacity;
+    float is_render_diffuse;
+};
+
+#ifdef VERTEX_SHADER
+layout (location = 0) in vec4 vs_in_position;
+// instancing data
+layout (location = 1) in vec4 vs_in_pos_size;
+layout (location = 2) in vec4 vs_in_color;
+layout (location = 3) in vec4 vs_in_texcoord;
+layout (location = 4) in vec4 vs_in_infos;  // opacity, is_render_diffuse
+
+layout (location = 0) out VERTEX_OUTPUT vs_output;
+
+void main()
+{
+    vec4 pos_size_info = vs_in_pos_size * inv_canvas_size.xyxy;
+
+    vs_output.tex_coord = vs_in_position.xy * 0.5 + 0.5;
+    vs_output.color = vs_in_color;
+    vs_output.texcoord = vs_in_texcoord;
+    vs_output.opacity = vs_in_infos.x;
+    vs_output.is_render_diffuse = vs_in_infos.y;
+
+    gl_Position = vs_in_position;
+    gl_Position.xy = gl_Position.xy * pos_size_info.zw - (1.0 - pos_size_info.zw) + pos_size_info.xy * 2.0;
+}
+#endif // VERTEX_SHADER
+
+
+#ifdef FRAGMENT_SHADER
+layout (location = 0) in VERTEX_OUTPUT vs_output;
+layout (location = 0) out vec4 fs_output;
+
+void main()
+{
+    vec4 color = vs_output.color;
+    vec4 result = color;
+
+    vec2 uv = mix(vs_output.texcoord.xy, vs_output.texcoord.zw, vs_output.tex_coord.xy);
+
+    if(0.0 < vs_output.is_render_diffuse)
+    {
+        if(0.0 < uv.x && 0.0 < uv.y && uv.x < 1.0 && uv.y < 1.0)
+        {
+            vec4 diffuse = texture2D(texture_diffuse, uv);
+            result = mix(diffuse, diffuse * color, color.w);
+        }
+    }
+
+    result.w *= vs_output.opacity;
+
+    fs_output = result;
+}
+#endif
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("OpenGL")
+
+from PyEngine3D.Render.Font import GlyphRunCache, TextRenderData, layout_lines
+
+
+class FakeFontData:
+    def __init__(self):
+        self.count_of_side = 16
+        self.generation = 0
+        self.glyph_run_cache = GlyphRunCache()
+
+    def get_glyph_slots(self, codes):
+        return codes.astype(np.int64) % (self.count_of_side * self.count_of_side)
+
+    def touch_glyphs(self, lines):
+        pass
+
+
+def test_layout_lines_returns_a_run_per_line():
+    runs = layout_lines(['AB\nC', 'DE'], FakeFontData())
+    assert 2 == len(runs)
+    assert [0.0, 1.0, 0.0] == runs[0][0].tolist()
+    assert [0.0, 1.0] == runs[1][0].tolist()
+
+
+def test_multi_line_entry_is_laid_out_per_physical_line():
+    font_data = FakeFontData()
+    text_render_data = TextRenderData()
+    for i in range(2):
+        # the second call is served from the run cache
+        text_render_data.set_text_lines(['AB\nC', 'DE'], font_data)
+        render_queue = text_render_data.render_queue[:text_render_data.render_count]
+        assert 3 == text_render_data.row
+        assert [0.0, 1.0, 0.0, 0.0, 1.0] == render_queue[:, 0].tolist()
+        assert [0.0, 0.0, 1.0, 2.0, 2.0] == render_queue[:, 1].tolist()
+
+    assert sorted(font_data.glyph_run_cache.runs.keys()) == ['AB', 'C', 'DE']